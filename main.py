@@ -9,6 +9,9 @@ AEX - Agent Exchange MVP
 
 import os
 import sys
+import json
+import asyncio
+import argparse
 from dotenv import load_dotenv
 from rich.console import Console
 from rich.panel import Panel
@@ -25,6 +28,24 @@ sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'src'))
 
 from src.usp import UserSidePlatform
 from src.aex import AgentExchange
+from src.result_cache import ResultCache
+from src.server import AEXServer
+from src.routing_pool import RoutingPool
+from src.scheduler import FairScheduler, PRIORITY_SHARES, parse_shares
+from src.task_queue import TaskQueue, QueueFullError, run_workers
+from src.scoring import get_scoring_policy
+from src.circuit_breaker import HubHealthRegistry
+from src.hub_pool import HubInstancePool
+from src.embedding_service import EmbeddingService
+from src.capability_mapper import CapabilityMapper
+from src.llm_cache import configure_llm_cache
+from src.tool_cache import configure_tool_cache
+from src.rate_limiter import configure_rate_limiter
+from src.mock_llm_server import MockLLMServer, LatencyDistribution
+from src.load_test import LoadGenerator, LOAD_MODES
+from src.prebuilt_index import build_prebuilt_index, DEFAULT_PREBUILT_PATH
+from src.hub_catalog import HubCatalog, compile_catalog, DEFAULT_CATALOG_PATH
+from src.distributed import ShardNode, LocalCluster
 
 console = Console()
 
@@ -73,8 +94,420 @@ def display_welcome():
     ))
 
 
+def embedding_options() -> dict:
+    """从环境变量读取嵌入服务配置"""
+    return {
+        "embedding_precision": os.getenv("EMBEDDING_PRECISION", "float32"),
+        "embedding_dimensions": int(os.getenv("EMBEDDING_DIMENSIONS") or 0) or None,
+        "truncate_locally": os.getenv("EMBEDDING_TRUNCATE_LOCALLY", "false").lower() == "true",
+    }
+
+
+def configure_model_clients():
+    """配置进程内共享的LLM响应缓存、限流器和工具结果缓存"""
+    # LLM响应缓存需在Hub创建模型客户端之前配置
+    llm_cache = configure_llm_cache(
+        mode=os.getenv("LLM_CACHE", "off").lower(),
+        db_path=os.getenv("LLM_CACHE_PATH", "cache/llm_responses.db"),
+        max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024)
+    )
+    if llm_cache:
+        console.print(f"[green]LLM响应缓存已启用（{llm_cache.mode}）[/green]")
+    # 限流需在Hub和嵌入服务发出请求之前配置；RATE_LIMIT_SHARED_PATH 设置时多个进程共享额度
+    embedding_limits = (float(os.getenv("EMBEDDING_RPM", "0")), float(os.getenv("EMBEDDING_TPM", "0")))
+    rate_limiter = configure_rate_limiter(
+        rpm=float(os.getenv("RATE_LIMIT_RPM", "0")),
+        tpm=float(os.getenv("RATE_LIMIT_TPM", "0")),
+        shared_path=os.getenv("RATE_LIMIT_SHARED_PATH") or None,
+        overrides={"https://api.jina.ai": embedding_limits} if any(embedding_limits) else None
+    )
+    if rate_limiter:
+        console.print(f"[green]模型请求限流已启用（RPM {rate_limiter.rpm:g}, TPM {rate_limiter.tpm:g}）[/green]")
+    configure_tool_cache(
+        ttl=float(os.getenv("TOOL_CACHE_TTL", "600")),
+        max_entries=int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "2048"))
+    )
+
+
+def build_exchange(config_file: str = "hubs_config.json", result_cache=None) -> AgentExchange:
+    """根据环境变量初始化AEX（打分策略、熔断、Hub实例池和Hub目录）"""
+    scoring_policy = get_scoring_policy(os.getenv("HUB_SCORING_POLICY", "capability"))
+    health = HubHealthRegistry(
+        failure_threshold=int(os.getenv("HUB_FAILURE_THRESHOLD", "3")),
+        cooldown=float(os.getenv("HUB_BREAKER_COOLDOWN", "60"))
+    )
+    # 常驻Hub实例的回收策略，HUB_PINNED 中的热点Hub始终保留
+    hub_pool = HubInstancePool(
+        idle_timeout=float(os.getenv("HUB_IDLE_TIMEOUT", "0")),
+        max_resident=int(os.getenv("HUB_MAX_RESIDENT", "0")),
+        max_memory_bytes=int(float(os.getenv("HUB_MAX_MEMORY_MB", "0")) * 1024 * 1024),
+        pinned=[hub_id.strip() for hub_id in os.getenv("HUB_PINNED", "").split(",") if hub_id.strip()]
+    )
+    hub_pool.start_reaper()
+    # 大规模Hub注册表：HUB_CATALOG 指向 compile-catalog 生成的二进制目录时以内存映射方式加载
+    return AgentExchange(config_file=config_file, catalog_file=os.getenv("HUB_CATALOG") or None,
+                         result_cache=result_cache, scoring_policy=scoring_policy, health=health,
+                         hub_pool=hub_pool)
+
+
+def build_result_cache(embedding_service: EmbeddingService):
+    """USE_RESULT_CACHE 开启时创建语义结果缓存"""
+    if os.getenv("USE_RESULT_CACHE", "false").lower() != "true":
+        return None
+    console.print("[green]语义结果缓存已启用[/green]")
+    return ResultCache(
+        embedding_service,
+        threshold=float(os.getenv("RESULT_CACHE_THRESHOLD", "0.95")),
+        ttl=float(os.getenv("RESULT_CACHE_TTL", "3600"))
+    )
+
+
+def build_worker_exchange() -> AgentExchange:
+    """队列工作进程：与交互和服务模式相同的限流、缓存、打分、熔断和Hub实例池配置"""
+    configure_model_clients()
+    result_cache = None
+    # 语义结果缓存依赖嵌入服务，仅在语义搜索开启时启用
+    if os.getenv("USE_SEMANTIC_SEARCH", "true").lower() == "true":
+        options = embedding_options()
+        result_cache = build_result_cache(EmbeddingService(precision=options["embedding_precision"],
+                                                           dimensions=options["embedding_dimensions"],
+                                                           truncate_locally=options["truncate_locally"]))
+    return build_exchange(result_cache=result_cache)
+
+
+def build_shard_exchange(config_file: str) -> AgentExchange:
+    """分片节点：只加载本节点分片的Hub配置（HUB_CATALOG 对分片无效）"""
+    configure_model_clients()
+    aex = build_exchange(config_file)
+    aex.catalog_file = None
+    return aex
+
+
+def build_platform():
+    """根据环境变量初始化USP和AEX组件"""
+    configure_model_clients()
+    use_semantic = os.getenv("USE_SEMANTIC_SEARCH", "true").lower() == "true"
+    use_ann_index = os.getenv("USE_ANN_INDEX", "false").lower() == "true"
+    use_hybrid = os.getenv("USE_HYBRID_SEARCH", "false").lower() == "true"
+    usp = UserSidePlatform(use_semantic_search=use_semantic, use_ann_index=use_ann_index,
+                           use_hybrid_search=use_hybrid, **embedding_options())
+
+    # 语义结果缓存依赖嵌入服务，仅在语义搜索可用时启用
+    result_cache = build_result_cache(usp.embedding_service) if usp.use_semantic_search else None
+    return usp, build_exchange(result_cache=result_cache)
+
+
+def serve(args) -> int:
+    """以常驻HTTP服务模式运行"""
+    if not check_environment():
+        return 1
+
+    usp, aex = build_platform()
+    if not aex.load_hub_configs():
+        return 1
+
+    # 多进程路由需要语义能力向量
+    routing_pool = None
+    if args.routing_workers > 0 and usp.use_semantic_search:
+        routing_pool = RoutingPool.from_platform(usp.capability_mapper, aex.available_hubs,
+                                                 num_workers=args.routing_workers)
+
+    # 多租户份额，如 TENANT_SHARES="alice=3,bob=1"；未列出的租户份额为1
+    scheduler = FairScheduler(
+        max_concurrent=args.max_concurrent_tasks,
+        tenant_shares=parse_shares(os.getenv("TENANT_SHARES")),
+        priority_shares=parse_shares(os.getenv("PRIORITY_SHARES")) or PRIORITY_SHARES
+    )
+    server = AEXServer(usp, aex, host=args.host, port=args.port,
+                       max_concurrent_tasks=args.max_concurrent_tasks,
+                       routing_pool=routing_pool, scheduler=scheduler)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        console.print("\n[yellow]服务已停止[/yellow]")
+    finally:
+        if routing_pool:
+            routing_pool.close()
+    return 0
+
+
+def shard_node(args) -> int:
+    """以分片节点运行，只持有 --config 中的Hub（由 cluster 或部署脚本按一致性哈希拆分）"""
+    if not check_environment():
+        return 1
+    node = ShardNode(args.node_id, build_shard_exchange(args.config), host=args.host, port=args.port)
+    try:
+        asyncio.run(node.serve_forever())
+    except KeyboardInterrupt:
+        console.print(f"\n[yellow]节点 {args.node_id} 已停止[/yellow]")
+    return 0
+
+
+def cluster(args) -> int:
+    """在本机启动多个分片节点进程，通过前端路由器执行任务"""
+    if not check_environment():
+        return 1
+    use_semantic = os.getenv("USE_SEMANTIC_SEARCH", "true").lower() == "true"
+    use_hybrid = os.getenv("USE_HYBRID_SEARCH", "false").lower() == "true"
+    usp = UserSidePlatform(use_semantic_search=use_semantic, use_hybrid_search=use_hybrid,
+                           **embedding_options())
+    local = LocalCluster(args.nodes, config_file=args.config, base_port=args.base_port,
+                         exchange_factory=build_shard_exchange)
+    try:
+        router = local.start()
+        for prompt in args.prompts:
+            task_request = usp.create_task_request(prompt, timeout=args.timeout)
+            if args.route_only:
+                router.display_ranking(router.rank_hubs(task_request))
+                continue
+            result = router.execute_task(task_request)
+            console.print(Panel(result or "[red]任务执行失败[/red]", title=prompt[:40], border_style="green"))
+        console.print(json.dumps(router.stats(), ensure_ascii=False, indent=2))
+    except RuntimeError as e:
+        console.print(f"[red]{e}[/red]")
+        return 1
+    finally:
+        local.stop()
+    return 0
+
+
+def enqueue(args) -> int:
+    """解析任务并写入持久化队列"""
+    use_semantic = os.getenv("USE_SEMANTIC_SEARCH", "true").lower() == "true"
+    use_hybrid = os.getenv("USE_HYBRID_SEARCH", "false").lower() == "true"
+    usp = UserSidePlatform(use_semantic_search=use_semantic, use_hybrid_search=use_hybrid,
+                           **embedding_options())
+    queue = TaskQueue(args.db)
+    try:
+        for prompt in args.prompts:
+            task_id = queue.enqueue(usp.create_task_request(prompt, timeout=args.timeout,
+                                                            tenant=args.tenant, priority=args.priority))
+            console.print(f"[green]任务已入队: #{task_id}[/green]")
+    except QueueFullError as e:
+        console.print(f"[red]{e}[/red]")
+        return 1
+    return 0
+
+
+def queue_worker(args) -> int:
+    """启动队列工作进程"""
+    if not check_environment():
+        return 1
+    # 每个工作进程按环境变量配置限流、缓存和AEX，与其他运行模式一致
+    run_workers(args.workers, db_path=args.db, visibility_timeout=args.visibility_timeout,
+                exchange_factory=build_worker_exchange,
+                tenant_shares=parse_shares(os.getenv("TENANT_SHARES")),
+                priority_shares=parse_shares(os.getenv("PRIORITY_SHARES")) or PRIORITY_SHARES)
+    return 0
+
+
+def queue_stats(args) -> int:
+    """显示队列统计"""
+    stats = TaskQueue(args.db).stats()
+    console.print(Panel(
+        "\n".join(f"{key}: {value:.2f}" if isinstance(value, float) else f"{key}: {value}"
+                  for key, value in stats.items()),
+        title="任务队列统计",
+        border_style="cyan"
+    ))
+    return 0
+
+
+def warmup(args) -> int:
+    """离线预热：发现全部Hub，批量获取能力向量并写出预构建索引"""
+    options = embedding_options()
+    embedding_service = EmbeddingService(precision=options["embedding_precision"],
+                                         dimensions=options["embedding_dimensions"],
+                                         truncate_locally=options["truncate_locally"])
+    # 不读取旧产物，按当前Hub源码重新构建能力描述
+    mapper = CapabilityMapper(embedding_service, prebuilt_path=None,
+                              ann_precision=options["embedding_precision"])
+    try:
+        prebuilt = build_prebuilt_index(mapper)
+    except RuntimeError as e:
+        console.print(f"[red]预热失败: {e}[/red]")
+        return 1
+    prebuilt.save(args.output)
+
+    if os.getenv("USE_ANN_INDEX", "false").lower() == "true":
+        mapper.build_ann_index()
+    embedding_service.save_cache()
+
+    console.print(Panel(
+        f"能力数: {len(prebuilt)}\n"
+        f"Hub数: {len(prebuilt.hub_hashes)}\n"
+        f"嵌入命名空间: {prebuilt.namespace}\n"
+        f"输出: {args.output}",
+        title="预构建能力索引",
+        border_style="green"
+    ))
+    return 0
+
+
+def compile_hub_catalog(args) -> int:
+    """将Hub配置JSON编译为二进制目录"""
+    try:
+        output = compile_catalog(args.input, args.output)
+        catalog = HubCatalog(output)
+    except (OSError, ValueError, KeyError) as e:
+        console.print(f"[red]生成Hub目录失败: {e}[/red]")
+        return 1
+    console.print(Panel(
+        f"Hub数: {len(catalog)}\n"
+        f"能力数: {len(catalog.capability_names)}\n"
+        f"文件大小: {os.path.getsize(output) / 1024:.1f}KB\n"
+        f"输出: {output}",
+        title="Hub目录",
+        border_style="green"
+    ))
+    return 0
+
+
+def mock_server_from_args(args, port: int) -> MockLLMServer:
+    return MockLLMServer(host=args.mock_host, port=port, ttft=LatencyDistribution.parse(args.ttft),
+                         tokens_per_second=args.tokens_per_second, output_tokens=args.output_tokens,
+                         error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate, seed=args.seed)
+
+
+def mock_llm(args) -> int:
+    """启动模拟的OpenAI兼容服务"""
+    server = mock_server_from_args(args, args.port)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        console.print("\n[yellow]模拟服务已停止[/yellow]")
+    return 0
+
+
+def load_test(args) -> int:
+    """按目标QPS压测AEX，输出吞吐、首token时间和各Hub尾延迟"""
+    mock = None
+    if args.mock_llm:
+        # 同进程启动模拟服务，所有Hub的模型请求都指向它
+        mock = mock_server_from_args(args, 0)
+        os.environ["OPENAI_BASE_URL"] = mock.start_in_thread()
+        os.environ.setdefault("OPENAI_API_KEY", "mock-key")
+        os.environ.setdefault("OPENAI_MODEL", "mock-model")
+    if not check_environment():
+        return 1
+
+    usp, aex = build_platform()
+    generator = LoadGenerator(usp, aex, mode=args.mode, max_in_flight=args.max_in_flight,
+                              hedge_top_k=args.hedge_top_k, timeout=args.timeout)
+    try:
+        report = asyncio.run(generator.run(args.qps, duration=args.duration, num_requests=args.requests,
+                                           prompts=args.prompts, arrival=args.arrival, seed=args.seed))
+    except RuntimeError as e:
+        console.print(f"[red]压测失败: {e}[/red]")
+        return 1
+    report.display()
+    if mock:
+        console.print(f"[dim]模拟服务: {mock.stats()}[/dim]")
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+        console.print(f"[green]压测结果已写入 {args.output}[/green]")
+    return 0
+
+
+def add_mock_llm_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--mock-host", default="127.0.0.1")
+    parser.add_argument("--ttft", default="lognormal:0.3,0.5",
+                        help="首token延迟分布: fixed:0.2 / uniform:0.1,0.5 / exponential:0.3 / lognormal:中位数,sigma")
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--output-tokens", type=int, default=64)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="返回500的概率")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="返回429的概率")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+def parse_args(argv=None):
+    """解析命令行参数，不带子命令时进入交互模式"""
+    parser = argparse.ArgumentParser(description="AEX - 动态智能体市场")
+    subparsers = parser.add_subparsers(dest="command")
+
+    serve_parser = subparsers.add_parser("serve", help="启动HTTP/JSON服务")
+    serve_parser.add_argument("--host", default=os.getenv("AEX_HOST", "127.0.0.1"))
+    serve_parser.add_argument("--port", type=int, default=int(os.getenv("AEX_PORT", "8080")))
+    serve_parser.add_argument("--max-concurrent-tasks", type=int, default=8)
+    serve_parser.add_argument("--routing-workers", type=int,
+                              default=int(os.getenv("AEX_ROUTING_WORKERS", "0")),
+                              help="多进程路由工作进程数，0表示在服务进程内路由")
+    serve_parser.set_defaults(handler=serve)
+
+    enqueue_parser = subparsers.add_parser("enqueue", help="将任务写入持久化队列")
+    enqueue_parser.add_argument("prompts", nargs="+")
+    enqueue_parser.add_argument("--timeout", type=float, default=None,
+                                help="每次执行的超时秒数（从工作进程租用任务时起算）")
+    enqueue_parser.add_argument("--tenant", default="default", help="提交任务的租户")
+    enqueue_parser.add_argument("--priority", choices=list(PRIORITY_SHARES), default="normal")
+    enqueue_parser.add_argument("--db", default="cache/task_queue.db")
+    enqueue_parser.set_defaults(handler=enqueue)
+
+    worker_parser = subparsers.add_parser("queue-worker", help="启动队列工作进程")
+    worker_parser.add_argument("--workers", type=int, default=2)
+    worker_parser.add_argument("--visibility-timeout", type=float, default=300.0)
+    worker_parser.add_argument("--db", default="cache/task_queue.db")
+    worker_parser.set_defaults(handler=queue_worker)
+
+    stats_parser = subparsers.add_parser("queue-stats", help="显示任务队列统计")
+    stats_parser.add_argument("--db", default="cache/task_queue.db")
+    stats_parser.set_defaults(handler=queue_stats)
+
+    warmup_parser = subparsers.add_parser("warmup", help="离线预热能力向量，生成预构建索引")
+    warmup_parser.add_argument("--output", default=DEFAULT_PREBUILT_PATH)
+    warmup_parser.set_defaults(handler=warmup)
+
+    catalog_parser = subparsers.add_parser("compile-catalog", help="将Hub配置JSON编译为内存映射的二进制目录")
+    catalog_parser.add_argument("--input", default="hubs_config.json")
+    catalog_parser.add_argument("--output", default=DEFAULT_CATALOG_PATH)
+    catalog_parser.set_defaults(handler=compile_hub_catalog)
+
+    node_parser = subparsers.add_parser("shard-node", help="以分片节点运行（分布式模式）")
+    node_parser.add_argument("--node-id", required=True)
+    node_parser.add_argument("--config", required=True, help="本节点分片的Hub配置")
+    node_parser.add_argument("--host", default="127.0.0.1")
+    node_parser.add_argument("--port", type=int, default=9100)
+    node_parser.set_defaults(handler=shard_node)
+
+    cluster_parser = subparsers.add_parser("cluster", help="本机启动多个分片节点，经前端路由器执行任务")
+    cluster_parser.add_argument("prompts", nargs="+")
+    cluster_parser.add_argument("--nodes", type=int, default=3)
+    cluster_parser.add_argument("--config", default="hubs_config.json")
+    cluster_parser.add_argument("--base-port", type=int, default=9100)
+    cluster_parser.add_argument("--timeout", type=float, default=None)
+    cluster_parser.add_argument("--route-only", action="store_true", help="只路由，不执行")
+    cluster_parser.set_defaults(handler=cluster)
+
+    mock_parser = subparsers.add_parser("mock-llm", help="启动模拟的OpenAI兼容服务（压测用）")
+    mock_parser.add_argument("--port", type=int, default=8090)
+    add_mock_llm_arguments(mock_parser)
+    mock_parser.set_defaults(handler=mock_llm)
+
+    load_parser = subparsers.add_parser("load-test", help="按目标QPS端到端压测")
+    load_parser.add_argument("--qps", type=float, default=2.0)
+    load_parser.add_argument("--duration", type=float, default=30.0)
+    load_parser.add_argument("--requests", type=int, default=None, help="请求总数，指定后忽略 --duration")
+    load_parser.add_argument("--mode", choices=LOAD_MODES, default="stream")
+    load_parser.add_argument("--arrival", choices=["poisson", "constant"], default="poisson")
+    load_parser.add_argument("--max-in-flight", type=int, default=32)
+    load_parser.add_argument("--hedge-top-k", type=int, default=2)
+    load_parser.add_argument("--timeout", type=float, default=None)
+    load_parser.add_argument("--prompts", nargs="*", default=None)
+    load_parser.add_argument("--output", default=None, help="将结果写入JSON文件")
+    load_parser.add_argument("--mock-llm", action="store_true", help="同进程启动模拟LLM服务")
+    add_mock_llm_arguments(load_parser)
+    load_parser.set_defaults(handler=load_test)
+
+    return parser.parse_args(argv)
+
+
 def main():
     """主程序入口"""
+    args = parse_args()
+    if args.command:
+        return args.handler(args)
+
     try:
         # 显示欢迎信息
         display_welcome()
@@ -84,9 +517,15 @@ def main():
             return 1
         
         # 初始化组件
-        use_semantic = os.getenv("USE_SEMANTIC_SEARCH", "true").lower() == "true"
-        usp = UserSidePlatform(use_semantic_search=use_semantic)
-        aex = AgentExchange()
+        usp, aex = build_platform()
+        # 对冲执行：HEDGE_TOP_K > 1 时同时在排名靠前的多个Hub上推测性执行
+        hedge_top_k = int(os.getenv("HEDGE_TOP_K", "1"))
+        # 团队模式：多能力任务由覆盖全部能力的多个Hub并行完成
+        team_mode = os.getenv("TEAM_MODE", "false").lower() == "true"
+        # 任务拆分：复合任务拆为子任务DAG，相互独立的子任务并发执行
+        task_planning = os.getenv("TASK_PLANNING", "false").lower() == "true"
+        # 任务截止时间（秒），未设置时仅使用各Hub在配置中的默认超时
+        task_timeout = float(os.getenv("TASK_TIMEOUT")) if os.getenv("TASK_TIMEOUT") else None
         
         console.print("[green]系统初始化完成[/green]\n")
         
@@ -100,15 +539,23 @@ def main():
                     break
                 
                 # 2. 创建任务请求
-                task_request = usp.create_task_request(user_input)
+                task_request = usp.create_task_request(user_input, timeout=task_timeout)
                 usp.display_task_info(task_request)
                 
                 # 3. 执行任务
-                result = aex.execute_task(task_request)
+                plan = usp.plan_task(task_request) if task_planning else None
+                if plan is not None and len(plan) > 1:
+                    result = aex.execute_task_plan(plan, task_request)
+                elif team_mode:
+                    result = aex.execute_task_team(task_request)
+                elif hedge_top_k > 1:
+                    result = aex.execute_task_hedged(task_request, top_k=hedge_top_k)
+                else:
+                    result = aex.execute_task(task_request)
                 
                 # 4. 显示结果
                 if result:
-                    console.print(f"\n[green]✅ {result}[/green]")
+                    console.print("\n[green]✅ 任务已完成[/green]")
                 else:
                     console.print(Panel(
                         "[red]任务执行失败，请检查配置或重试[/red]",
@@ -6,29 +6,62 @@ AEX - Agent Exchange
 import json
 import os
 import importlib
+import time
 import inspect
+import asyncio
+import threading
+from contextlib import ExitStack, contextmanager, asynccontextmanager
 from pathlib import Path
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Iterable
+import numpy as np
 from rich.console import Console
 from rich.panel import Panel
 from rich.table import Table
 
 from .usp import TaskRequest
-from .agent_hub import BaseAgentHub
+from .agent_hub import BaseAgentHub, TaskTimeoutError, is_cacheable_output, is_partial_output
+from .result_cache import ResultCache
+from .hub_stats import HubStatsRegistry
+from .scoring import ScoringPolicy, CapabilityScoringPolicy
+from .hedging import HedgeReport, HedgeSummary, run_hedged
+from .circuit_breaker import HubHealthRegistry, HALF_OPEN
+from .team_composer import TeamComposer, TeamPlan
+from .task_planner import TaskPlan, PlanExecutor
+from .hub_pool import HubInstancePool
+from .hub_catalog import HubCatalog
+from .llm_cache import get_llm_cache
+from .rate_limiter import get_rate_limiter
+from .tool_cache import get_tool_cache
 
 console = Console()
 
 
+class HubLockTimeoutError(TaskTimeoutError):
+    """截止时间前未能获取Hub的执行锁（Hub并未执行）"""
+    pass
+
+
 class HubInfo:
-    """Hub信息类"""
+    """Hub信息类（大规模注册表使用 hub_catalog.HubView，二者属性相同）"""
+
+    __slots__ = ("hub_id", "name", "description", "capabilities", "hub_class",
+                 "cacheable", "timeout", "cost", "cache_ttl")
     
     def __init__(self, hub_id: str, name: str, description: str, 
-                 capabilities: List[str], hub_class: str):
+                 capabilities: List[str], hub_class: str, cacheable: bool = True,
+                 timeout: Optional[float] = None, cost: float = 1.0,
+                 cache_ttl: Optional[float] = None):
         self.hub_id = hub_id
         self.name = name
         self.description = description
         self.capabilities = capabilities
         self.hub_class = hub_class
+        self.cacheable = cacheable
+        self.timeout = timeout
+        # 相对调用成本（用于团队组合时的加权）
+        self.cost = cost
+        # 结果缓存有效期（秒），未设置时使用 RESULT_CACHE_TTL
+        self.cache_ttl = cache_ttl
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'HubInfo':
@@ -37,18 +70,48 @@ class HubInfo:
             name=data['name'],
             description=data['description'],
             capabilities=data['capabilities'],
-            hub_class=data['hub_class']
+            hub_class=data['hub_class'],
+            cacheable=data.get('cacheable', True),
+            timeout=data.get('timeout'),
+            cost=data.get('cost', 1.0),
+            cache_ttl=data.get('cache_ttl')
         )
 
 
 class AgentExchange:
     """代理交换平台 - 核心控制器"""
 
-    def __init__(self, config_file: str = "hubs_config.json"):
+    def __init__(self, config_file: str = "hubs_config.json",
+                 catalog_file: Optional[str] = None,
+                 result_cache: Optional[ResultCache] = None,
+                 scoring_policy: Optional[ScoringPolicy] = None,
+                 health: Optional[HubHealthRegistry] = None,
+                 team_composer: Optional[TeamComposer] = None,
+                 hub_pool: Optional[HubInstancePool] = None):
         self.config_file = config_file
+        self.result_cache = result_cache
+        self.scoring_policy = scoring_policy or CapabilityScoringPolicy()
+        self.hub_stats = HubStatsRegistry()
+        self.health = health or HubHealthRegistry()
+        self.team_composer = team_composer or TeamComposer()
+        self.hedge_summary = HedgeSummary()
+        # 设置 catalog_file 时从内存映射的二进制目录加载，available_hubs 为 HubView 序列
+        self.catalog_file = catalog_file
+        self.catalog: Optional[HubCatalog] = None
+        self._catalog_mtime: Optional[float] = None
         self.available_hubs: List[HubInfo] = []
-        self.hub_instances: Dict[str, Any] = {}
+        # 常驻Hub实例：按空闲超时和LRU回收，借出和正在执行的Hub不回收
+        self.hub_pool = hub_pool if hub_pool is not None else HubInstancePool()
+        if self.hub_pool.in_use is None:
+            self.hub_pool.in_use = lambda hub_id: self.hub_stats.get(hub_id).in_flight > 0
+        if self.hub_pool.shared_objects is None:
+            # 进程内共享的缓存和限流器不计入单个Hub的内存
+            self.hub_pool.shared_objects = lambda: (get_llm_cache(), get_rate_limiter(), get_tool_cache())
         self.hub_classes: Dict[str, type] = {}
+        self._instance_lock = threading.RLock()
+        # 同一个agno Team不支持并发运行，所有执行路径按Hub串行
+        self._hub_locks: Dict[str, threading.Lock] = {}
+        self._hub_locks_guard = threading.Lock()
         self._discover_hub_classes()
 
     def _discover_hub_classes(self):
@@ -97,6 +160,8 @@ class AgentExchange:
 
     def load_hub_configs(self) -> bool:
         """加载Hub配置文件"""
+        if self.catalog_file:
+            return self.load_hub_catalog()
         try:
             if not os.path.exists(self.config_file):
                 console.print(f"[red]错误: 配置文件 {self.config_file} 不存在[/red]")
@@ -114,6 +179,46 @@ class AgentExchange:
             console.print(f"[red]加载配置文件失败: {e}[/red]")
             return False
     
+    def load_hub_catalog(self) -> bool:
+        """以内存映射方式打开二进制Hub目录，文件未变化时复用已打开的目录"""
+        try:
+            mtime = os.stat(self.catalog_file).st_mtime
+            if self.catalog is not None and mtime == self._catalog_mtime:
+                return True
+            self.catalog = HubCatalog(self.catalog_file)
+            self._catalog_mtime = mtime
+            self.available_hubs = self.catalog
+            console.print(f"[green]成功加载Hub目录 {self.catalog_file}（{len(self.catalog)} 个Hub）[/green]")
+            return True
+        except (OSError, ValueError) as e:
+            console.print(f"[red]加载Hub目录失败: {e}[/red]")
+            return False
+
+    def get_hub(self, hub_id: str) -> Optional[HubInfo]:
+        """按hub_id查找Hub"""
+        if self.catalog is not None:
+            return self.catalog.get(hub_id)
+        return next((hub for hub in self.available_hubs if hub.hub_id == hub_id), None)
+
+    def candidate_hubs(self, required_capabilities: List[str]):
+        """可能匹配所需能力的Hub；使用目录时只返回倒排索引中至少具备一项能力的Hub"""
+        if self.catalog is None:
+            return self.available_hubs
+        rows, _ = self.catalog.match_counts(required_capabilities)
+        return [self.catalog[int(row)] for row in rows]
+
+    def _catalog_capability_scores(self, required_capabilities: List[str]) -> List[Tuple[HubInfo, float]]:
+        """对目录中匹配至少一项能力的Hub批量计算能力分数（与 calculate_hub_score 相同的公式）"""
+        required = set(required_capabilities)
+        rows, matched = self.catalog.match_counts(required)
+        if not len(rows):
+            return []
+        totals = self.catalog.capability_counts()[rows]
+        scores = (matched / len(required)
+                  + np.where(totals > 0, matched / np.maximum(totals, 1), 0.0) * 0.3
+                  + np.where(matched == len(required), 0.2, 0.0))
+        return [(self.catalog[int(row)], float(score)) for row, score in zip(rows, np.minimum(scores, 1.0))]
+
     def calculate_hub_score(self, hub: HubInfo, required_capabilities: List[str]) -> float:
         """计算Hub与任务的匹配分数"""
         if not required_capabilities:
@@ -141,20 +246,43 @@ class AgentExchange:
         
         return min(final_score, 1.0)  # 确保分数不超过1.0
     
+    def rank_hubs(self, task_request: TaskRequest) -> List[Tuple[HubInfo, float]]:
+        """计算每个Hub的分数并按分数降序排列（跳过熔断中的Hub）
+
+        使用Hub目录时只对至少匹配一项所需能力的Hub打分；没有任何Hub匹配时与JSON配置一致，全部Hub记0分。
+        """
+        if self.catalog is not None and task_request.required_capabilities:
+            candidates = (self._catalog_capability_scores(task_request.required_capabilities)
+                          or ((hub, 0.0) for hub in self.available_hubs))
+        else:
+            candidates = ((hub, self.calculate_hub_score(hub, task_request.required_capabilities))
+                          for hub in self.available_hubs)
+        return self.score_candidates(candidates, task_request)
+
+    def score_candidates(self, candidates: Iterable[Tuple[HubInfo, float]],
+                         task_request: TaskRequest) -> List[Tuple[HubInfo, float]]:
+        """对 (Hub, 能力分数) 候选跳过熔断中的Hub、应用打分策略，按分数降序返回"""
+        hub_scores = []
+        for hub, capability_score in candidates:
+            if not self.health.is_available(hub.hub_id):
+                continue
+            score = self.scoring_policy.score(hub, task_request.required_capabilities,
+                                              capability_score, self.hub_stats.get(hub.hub_id))
+            hub_scores.append((hub, score))
+        
+        hub_scores.sort(key=lambda x: x[1], reverse=True)
+        return hub_scores
+    
     def select_best_hub(self, task_request: TaskRequest) -> Optional[Tuple[HubInfo, float]]:
         """选择最适合的Hub"""
         if not self.available_hubs:
             console.print("[red]没有可用的Hub[/red]")
             return None
         
-        # 计算每个Hub的分数
-        hub_scores = []
-        for hub in self.available_hubs:
-            score = self.calculate_hub_score(hub, task_request.required_capabilities)
-            hub_scores.append((hub, score))
-        
-        # 按分数排序
-        hub_scores.sort(key=lambda x: x[1], reverse=True)
+        hub_scores = self.rank_hubs(task_request)
+        if not hub_scores:
+            console.print("[red]所有Hub均处于熔断状态，暂无可用Hub[/red]")
+            return None
         
         # 显示选择过程
         self.display_hub_selection(hub_scores, task_request.required_capabilities)
@@ -189,6 +317,8 @@ class AgentExchange:
                 capabilities_str = capabilities_str[:37] + "..."
             
             status = "🏆 最佳匹配" if i == 0 else f"#{i+1}"
+            if self.health.state(hub.hub_id) == HALF_OPEN:
+                status += " (熔断试探)"
             
             table.add_row(
                 hub.name,
@@ -200,28 +330,164 @@ class AgentExchange:
         
         console.print(table)
     
-    def get_hub_instance(self, hub_info: HubInfo):
-        """获取或创建Hub实例"""
-        if hub_info.hub_id not in self.hub_instances:
-            # 使用自动发现的Hub类
-            try:
-                hub_class_name = hub_info.hub_class
-
-                if hub_class_name in self.hub_classes:
-                    hub_class = self.hub_classes[hub_class_name]
-                    self.hub_instances[hub_info.hub_id] = hub_class()
-                    console.print(f"[green]成功创建Hub实例: {hub_class_name}[/green]")
-                else:
-                    console.print(f"[red]未找到Hub类: {hub_class_name}[/red]")
-                    console.print(f"[yellow]可用的Hub类: {list(self.hub_classes.keys())}[/yellow]")
+    def get_hub_instance(self, hub_info: HubInfo, lease: bool = False):
+        """获取或创建Hub实例（熔断期间不重复尝试创建）
+
+        lease 为True时从实例池借出，归还前不会被回收；执行路径使用 lease_hub_instance。
+        """
+        with self._instance_lock:
+            hub_instance = self.hub_pool.get(hub_info.hub_id, lease=lease)
+            if hub_instance is None:
+                if not self.health.is_available(hub_info.hub_id):
+                    console.print(f"[yellow]Hub {hub_info.hub_id} 处于熔断状态，跳过实例创建[/yellow]")
                     return None
 
-            except Exception as e:
-                console.print(f"[red]创建Hub实例失败 {hub_info.hub_class}: {e}[/red]")
-                return None
+                # 使用自动发现的Hub类
+                try:
+                    hub_class_name = hub_info.hub_class
 
-        return self.hub_instances[hub_info.hub_id]
+                    if hub_class_name in self.hub_classes:
+                        hub_class = self.hub_classes[hub_class_name]
+                        hub_instance = hub_class()
+                        # 立即构建团队，使配置错误在此处暴露并计入熔断
+                        if not hub_instance.initialize():
+                            self.health.record_failure(hub_info.hub_id, "团队初始化失败")
+                            return None
+                        self.hub_pool.put(hub_info.hub_id, hub_instance, lease=lease)
+                        console.print(f"[green]成功创建Hub实例: {hub_class_name}[/green]")
+                    else:
+                        console.print(f"[red]未找到Hub类: {hub_class_name}[/red]")
+                        console.print(f"[yellow]可用的Hub类: {list(self.hub_classes.keys())}[/yellow]")
+                        self.health.record_failure(hub_info.hub_id, f"未找到Hub类: {hub_class_name}")
+                        return None
+
+                except Exception as e:
+                    console.print(f"[red]创建Hub实例失败 {hub_info.hub_class}: {e}[/red]")
+                    self.health.record_failure(hub_info.hub_id, str(e))
+                    return None
+
+            return hub_instance
+
+    @contextmanager
+    def lease_hub_instance(self, hub_info: HubInfo):
+        """借出Hub实例直到执行结束，期间实例池不会回收它；无法获取时产出None"""
+        hub_instance = self.get_hub_instance(hub_info, lease=True)
+        try:
+            yield hub_instance
+        finally:
+            if hub_instance is not None:
+                self.hub_pool.release(hub_info.hub_id)
+
+    def hub_lock(self, hub_id: str) -> threading.Lock:
+        """Hub的执行锁"""
+        with self._hub_locks_guard:
+            return self._hub_locks.setdefault(hub_id, threading.Lock())
+
+    @asynccontextmanager
+    async def ahold_hub(self, hub_id: str, poll_interval: float = 0.05,
+                        deadline: Optional[float] = None):
+        """在事件循环中持有Hub的执行锁；轮询等待，不占用线程，等待可被取消
+
+        设置 deadline 时，到期仍未拿到锁则抛出 HubLockTimeoutError。
+        """
+        lock = self.hub_lock(hub_id)
+        while not lock.acquire(blocking=False):
+            if deadline is not None and time.time() >= deadline:
+                raise HubLockTimeoutError(f"等待Hub {hub_id} 的执行锁超时")
+            delay = poll_interval if deadline is None else min(poll_interval, max(deadline - time.time(), 0))
+            await asyncio.sleep(delay)
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @contextmanager
+    def hold_hub(self, hub_id: str, deadline: Optional[float] = None):
+        """持有Hub的执行锁；设置 deadline 时，到期仍未拿到锁则抛出 HubLockTimeoutError"""
+        lock = self.hub_lock(hub_id)
+        timeout = -1 if deadline is None else max(deadline - time.time(), 0)
+        if not lock.acquire(timeout=timeout):
+            raise HubLockTimeoutError(f"等待Hub {hub_id} 的执行锁超时")
+        try:
+            yield
+        finally:
+            lock.release()
+
+    @contextmanager
+    def _record_execution(self, hub_id: str):
+        try:
+            with self.hub_stats.track(hub_id) as outcome:
+                try:
+                    yield outcome
+                except HubLockTimeoutError as e:
+                    # 排队超时时Hub并未执行，不计入熔断，归还试探名额
+                    outcome["error"] = str(e)
+                    self.health.release(hub_id)
+                    raise
+                except Exception as e:
+                    self.health.record_failure(hub_id, str(e))
+                    raise
+                if outcome["success"]:
+                    self.health.record_success(hub_id)
+                elif self.health.record_failure(hub_id, outcome.get("error")):
+                    console.print(f"[red]Hub {hub_id} 连续失败，已熔断[/red]")
+        finally:
+            # 会话记忆随执行增长，标记后由Hub实例池的后台线程重新估算内存并检查容量上限
+            self.hub_pool.refresh(hub_id)
+
+    @contextmanager
+    def track_execution(self, hub_id: str, deadline: Optional[float] = None):
+        """跟踪一次Hub执行：持有该Hub的执行锁，更新运行统计和熔断器状态
+
+        先登记在途再等待执行锁，排队的任务计入在途数，等锁时间计入延迟，负载感知评分才能看到排队。
+        设置 deadline 时最多等待到截止时间，仍未拿到锁则抛出 HubLockTimeoutError。
+        """
+        with self._record_execution(hub_id) as outcome, self.hold_hub(hub_id, deadline):
+            yield outcome
+
+    @asynccontextmanager
+    async def atrack_execution(self, hub_id: str, deadline: Optional[float] = None):
+        """track_execution 的异步版本，等待执行锁时不阻塞事件循环"""
+        with self._record_execution(hub_id) as outcome:
+            async with self.ahold_hub(hub_id, deadline=deadline):
+                yield outcome
     
+    def resolve_deadline(self, hub_info: HubInfo, task_request: TaskRequest) -> Optional[float]:
+        """合并任务截止时间和Hub默认超时，取较早者"""
+        deadlines = [task_request.deadline] if task_request.deadline is not None else []
+        if hub_info.timeout:
+            deadlines.append(time.time() + hub_info.timeout)
+        return min(deadlines) if deadlines else None
+
+    def lookup_cached_result(self, hub_info: HubInfo, prompt: str) -> Optional[Tuple[str, float]]:
+        """查询语义结果缓存，返回 (结果, 相似度)"""
+        if self.result_cache is None or not hub_info.cacheable:
+            return None
+        return self.result_cache.lookup(hub_info.hub_id, prompt)
+
+    def store_result(self, hub_info: HubInfo, prompt: str, result: str):
+        """将Hub的完成结果写入语义结果缓存（失败或空输出不缓存）"""
+        if self.result_cache is not None and hub_info.cacheable and is_cacheable_output(result):
+            self.result_cache.store(hub_info.hub_id, prompt, result, ttl=hub_info.cache_ttl)
+
+    @staticmethod
+    def team_cache_key(hubs: Iterable[HubInfo]) -> str:
+        """团队合并结果的缓存键：与成员顺序无关，不与单个Hub的结果混用"""
+        return "team:" + "+".join(sorted(hub.hub_id for hub in hubs))
+
+    def lookup_team_result(self, hubs: List[HubInfo], prompt: str) -> Optional[Tuple[str, float]]:
+        """查询团队合并结果缓存，任一成员不可缓存时不查询"""
+        if self.result_cache is None or not all(hub.cacheable for hub in hubs):
+            return None
+        return self.result_cache.lookup(self.team_cache_key(hubs), prompt)
+
+    def store_team_result(self, hubs: List[HubInfo], prompt: str, result: str):
+        """缓存团队合并结果，有效期取成员中最短的 cache_ttl"""
+        if self.result_cache is None or not all(hub.cacheable for hub in hubs) or not is_cacheable_output(result):
+            return
+        ttls = [hub.cache_ttl for hub in hubs if hub.cache_ttl]
+        self.result_cache.store(self.team_cache_key(hubs), prompt, result, ttl=min(ttls) if ttls else None)
+
     def execute_task(self, task_request: TaskRequest) -> Optional[str]:
         """执行任务的主要流程"""
         console.print(Panel.fit(
@@ -251,17 +517,242 @@ class AgentExchange:
             border_style="green"
         ))
         
-        # 3. 获取Hub实例
-        hub_instance = self.get_hub_instance(best_hub)
-        if not hub_instance:
-            return None
-        
-        # 4. 执行任务
+        # 3. 查询语义结果缓存
+        cached = self.lookup_cached_result(best_hub, task_request.original_prompt)
+        if cached:
+            result, similarity = cached
+            console.print(Panel(
+                result,
+                title=f"命中结果缓存 (相似度: {similarity:.3f})",
+                border_style="cyan"
+            ))
+            return result
+
+        # 4. 借出Hub实例（执行结束前不会被实例池回收）
+        with self.lease_hub_instance(best_hub) as hub_instance:
+            if not hub_instance:
+                return None
+
+            if not self.health.acquire(best_hub.hub_id):
+                console.print(f"[yellow]Hub {best_hub.name} 正在熔断试探中，请稍后重试[/yellow]")
+                return None
+
+            # 5. 执行任务
+            return self._execute_on_hub(best_hub, hub_instance, task_request)
+
+    def _execute_on_hub(self, hub: HubInfo, hub_instance: BaseAgentHub,
+                        task_request: TaskRequest) -> Optional[str]:
+        """在已借出的Hub实例上执行任务并写入结果缓存"""
         try:
             console.print("[yellow]正在执行任务，请稍候...[/yellow]")
-            result = hub_instance.run(task_request.original_prompt)
+            deadline = self.resolve_deadline(hub, task_request)
+            with self.track_execution(hub.hub_id, deadline) as outcome:
+                result = hub_instance.run(task_request.original_prompt, deadline=deadline)
+                timed_out = deadline is not None and time.time() >= deadline
+                outcome["success"] = result is not None and not timed_out
+                if timed_out:
+                    outcome["error"] = "执行超时"
+            if timed_out:
+                return result
+            if result:
+                self.store_result(hub, task_request.original_prompt, result)
             return result
             
         except Exception as e:
             console.print(f"[red]任务执行失败: {e}[/red]")
             return None
+
+    async def aexecute_task_hedged(self, task_request: TaskRequest, top_k: int = 2,
+                                   hedge_delay: Optional[float] = None
+                                   ) -> Tuple[Optional[str], Optional[HedgeReport]]:
+        """对冲执行：在排名前top_k的Hub上推测性执行，取最先成功的结果
+
+        hedge_delay 为0时同时启动所有候选；为None时按前一个Hub的p95延迟决定何时启动下一个。
+        """
+        if not self.available_hubs and not self.load_hub_configs():
+            return None, None
+
+        hub_scores = [(hub, score) for hub, score in self.rank_hubs(task_request) if score > 0]
+        if not hub_scores:
+            hub_scores = self.rank_hubs(task_request)[:1]
+        if not hub_scores:
+            console.print("[red]所有Hub均处于熔断状态，暂无可用Hub[/red]")
+            return None, None
+        self.display_hub_selection(hub_scores[:top_k], task_request.required_capabilities)
+
+        primary_hub = hub_scores[0][0]
+        cached = self.lookup_cached_result(primary_hub, task_request.original_prompt)
+        if cached:
+            return cached[0], None
+
+        # 候选实例在对冲结束前保持借出，等待启动期间不会被实例池回收
+        with ExitStack() as leases:
+            candidates = []
+            for hub, _ in hub_scores[:top_k]:
+                hub_instance = leases.enter_context(self.lease_hub_instance(hub))
+                if hub_instance and self.health.acquire(hub.hub_id):
+                    candidates.append((hub.hub_id, hub_instance))
+            if not candidates:
+                return None, None
+
+            result, report = await run_hedged(candidates, task_request.original_prompt,
+                                              self.hub_stats, hedge_delay=hedge_delay,
+                                              deadline=self.resolve_deadline(primary_hub, task_request),
+                                              on_finish=self.health.record, exclusive=self.ahold_hub)
+        self.hedge_summary.record(report)
+        # 被取消或未启动的候选归还熔断试探名额
+        for hub_id, _ in candidates:
+            if hub_id in report.cancelled or hub_id not in report.started:
+                self.health.release(hub_id)
+
+        console.print(Panel(
+            f"获胜Hub: {report.winner_hub_id or '无'}\n"
+            f"启动: {', '.join(report.started)} | 取消: {', '.join(report.cancelled) or '无'}\n"
+            f"耗时: {report.latency:.2f}s | 浪费: {report.wasted_seconds:.2f}s | "
+            f"预计节省: {report.estimated_gain:.2f}s",
+            title="对冲执行报告",
+            border_style="magenta"
+        ))
+
+        if result:
+            winner = next(hub for hub, _ in hub_scores if hub.hub_id == report.winner_hub_id)
+            self.store_result(winner, task_request.original_prompt, result)
+        return result, report
+
+    def execute_task_hedged(self, task_request: TaskRequest, top_k: int = 2,
+                            hedge_delay: Optional[float] = None) -> Optional[str]:
+        """对冲执行的同步入口"""
+        console.print(Panel.fit(
+            "[bold blue]开始对冲执行流程[/bold blue]",
+            border_style="blue"
+        ))
+        if not self.load_hub_configs():
+            return None
+        result, _ = asyncio.run(self.aexecute_task_hedged(task_request, top_k, hedge_delay))
+        return result
+
+    def compose_team(self, task_request: TaskRequest) -> TeamPlan:
+        """为多能力任务组合覆盖全部所需能力的Hub团队（跳过熔断中的Hub）"""
+        hubs = [hub for hub in self.candidate_hubs(task_request.required_capabilities)
+                if self.health.is_available(hub.hub_id)]
+        return self.team_composer.compose(hubs, task_request.required_capabilities, self.hub_stats)
+
+    def display_team_plan(self, plan: TeamPlan):
+        """显示团队组合结果"""
+        table = Table(title="Hub团队组合")
+        table.add_column("Hub名称", style="cyan")
+        table.add_column("负责能力", style="green")
+        table.add_column("权重", style="yellow")
+        for member in plan.members:
+            table.add_row(member.hub.name, ", ".join(member.capabilities), f"{member.weight:.2f}")
+        console.print(table)
+        if plan.uncovered:
+            console.print(f"[yellow]没有Hub能覆盖以下能力: {', '.join(plan.uncovered)}[/yellow]")
+
+    @staticmethod
+    def build_subtask_prompt(prompt: str, capabilities: List[str], teammates: List[str]) -> str:
+        """为团队成员构造子任务提示词"""
+        return (
+            f"{prompt}\n\n"
+            f"[团队分工] 你负责上述任务中与以下能力相关的部分: {', '.join(capabilities)}。"
+            f"其他部分由 {', '.join(teammates) or '其他团队'} 并行完成，请只输出你负责部分的结果。"
+        )
+
+    @staticmethod
+    def merge_team_results(results: List[Tuple[HubInfo, List[str], Optional[str]]]) -> Optional[str]:
+        """按成员顺序合并各子任务结果"""
+        sections = []
+        for hub, capabilities, result in results:
+            body = result if result else "（该部分执行失败或超时，未返回结果）"
+            sections.append(f"## {hub.name}（{', '.join(capabilities)}）\n\n{body}")
+        if not any(result for _, _, result in results):
+            return None
+        return "\n\n".join(sections)
+
+    async def arun_member(self, hub: HubInfo, prompt: str,
+                          task_request: TaskRequest) -> Optional[str]:
+        """在指定Hub上异步执行一次提示词：持有该Hub的执行锁，遵守截止时间并更新统计和熔断状态"""
+        with self.lease_hub_instance(hub) as hub_instance:
+            if not hub_instance or not self.health.acquire(hub.hub_id):
+                return None
+            deadline = self.resolve_deadline(hub, task_request)
+            try:
+                async with self.atrack_execution(hub.hub_id, deadline) as outcome:
+                    result = await hub_instance.arun(prompt, deadline=deadline)
+                    # 超时返回的部分输出计为失败
+                    outcome["success"] = result is not None and not is_partial_output(result)
+                    if is_partial_output(result):
+                        outcome["error"] = "执行超时"
+            except HubLockTimeoutError as e:
+                console.print(f"[yellow]{e}[/yellow]")
+                return None
+            return result
+
+    async def aexecute_task_team(self, task_request: TaskRequest) -> Optional[str]:
+        """团队模式：选出覆盖全部能力的最小加权Hub集合，并行执行各自的子任务并合并结果
+
+        只需要一个Hub时退化为普通执行流程。
+        """
+        if not self.available_hubs and not self.load_hub_configs():
+            return None
+
+        plan = self.compose_team(task_request)
+        if len(plan.members) <= 1:
+            return await asyncio.to_thread(self.execute_task, task_request)
+        self.display_team_plan(plan)
+
+        member_hubs = [member.hub for member in plan.members]
+        cached = self.lookup_team_result(member_hubs, task_request.original_prompt)
+        if cached:
+            return cached[0]
+
+        names = [member.hub.name for member in plan.members]
+        jobs = []
+        for member in plan.members:
+            teammates = [name for name in names if name != member.hub.name]
+            prompt = self.build_subtask_prompt(task_request.original_prompt, member.capabilities, teammates)
+            jobs.append(self.arun_member(member.hub, prompt, task_request))
+
+        console.print(f"[yellow]团队并行执行中: {', '.join(names)}[/yellow]")
+        outputs = await asyncio.gather(*jobs, return_exceptions=True)
+        results = [
+            (member.hub, member.capabilities, None if isinstance(output, BaseException) else output)
+            for member, output in zip(plan.members, outputs)
+        ]
+        merged = self.merge_team_results(results)
+        if merged and all(is_cacheable_output(result) for _, _, result in results):
+            self.store_team_result(member_hubs, task_request.original_prompt, merged)
+        return merged
+
+    def execute_task_team(self, task_request: TaskRequest) -> Optional[str]:
+        """团队模式的同步入口"""
+        return asyncio.run(self.aexecute_task_team(task_request))
+
+    async def aexecute_task_plan(self, plan: TaskPlan, task_request: TaskRequest) -> Optional[str]:
+        """按子任务DAG执行：相互独立的子任务在各自最佳Hub上并发执行
+
+        计划只有一个子任务时退化为普通执行流程。
+        """
+        if not self.available_hubs and not self.load_hub_configs():
+            return None
+        if len(plan) <= 1:
+            return await asyncio.to_thread(self.execute_task, task_request)
+
+        # 整体任务的结果缓存在其最佳Hub名下，与普通执行流程一致
+        ranked = self.rank_hubs(task_request)
+        best_hub = ranked[0][0] if ranked else None
+        if best_hub:
+            hit = self.lookup_cached_result(best_hub, task_request.original_prompt)
+            if hit:
+                return hit[0]
+
+        console.print(f"[yellow]任务已拆分为 {len(plan)} 个子任务，按依赖关系执行中...[/yellow]")
+        result = await PlanExecutor(self).execute(plan, task_request)
+        if best_hub and result and all(subtask.status == "done" and is_cacheable_output(subtask.result)
+                                       for subtask in plan.subtasks):
+            self.store_result(best_hub, task_request.original_prompt, result)
+        return result
+
+    def execute_task_plan(self, plan: TaskPlan, task_request: TaskRequest) -> Optional[str]:
+        """子任务DAG执行的同步入口"""
+        return asyncio.run(self.aexecute_task_plan(plan, task_request))
@@ -4,15 +4,76 @@ Agent Hub Base Classes
 """
 
 import os
+import time
+import queue
+import asyncio
+import inspect
+import threading
 from abc import ABC, abstractmethod
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Iterator, Optional
+import httpx
+from openai import OpenAI, AsyncOpenAI
 from rich.console import Console
 
+from .llm_cache import get_llm_cache, CachingTransport, AsyncCachingTransport
+from .rate_limiter import get_rate_limiter, RateLimitedTransport, AsyncRateLimitedTransport
+from .tool_cache import get_tool_cache
+
 console = Console()
 
+_STREAM_END = object()
+# 团队没有文本输出时 run 返回的提示，不是Hub的实际结果
+EMPTY_OUTPUT_PLACEHOLDER = "任务已完成，详细结果请查看上方输出。"
+# 超过截止时间时附加在部分输出之后
+PARTIAL_OUTPUT_SUFFIX = "\n\n[任务超时，以上为部分输出]"
+
+
+def is_partial_output(result: Optional[str]) -> bool:
+    """超时返回的部分输出"""
+    return bool(result) and result.endswith(PARTIAL_OUTPUT_SUFFIX)
+
+
+def is_cacheable_output(result: Optional[str]) -> bool:
+    """只有Hub实际产出的完整输出才能写入结果缓存（排除失败、空输出、占位提示和超时的部分输出）"""
+    return bool(result) and result != EMPTY_OUTPUT_PLACEHOLDER and not is_partial_output(result)
+
+
+def build_model_clients(api_key: Optional[str], base_url: Optional[str]) -> dict:
+    """构造经过共享限流器和响应缓存的OpenAI同步/异步客户端（OpenAIChat 的 client / async_client 参数）
+
+    缓存位于限流之外，命中缓存的请求不消耗额度；两者都未启用时返回空字典，
+    OpenAIChat 按默认方式创建客户端。
+    """
+    cache, limiter = get_llm_cache(), get_rate_limiter()
+    if cache is None and limiter is None:
+        return {}
+
+    sync_transport, async_transport = httpx.HTTPTransport(), httpx.AsyncHTTPTransport()
+    if limiter is not None:
+        limit_url = base_url or "https://api.openai.com/v1"
+        sync_transport = RateLimitedTransport(limiter, limit_url, api_key, sync_transport)
+        async_transport = AsyncRateLimitedTransport(limiter, limit_url, api_key, async_transport)
+    if cache is not None:
+        sync_transport = CachingTransport(cache, sync_transport)
+        async_transport = AsyncCachingTransport(cache, async_transport)
+    return {
+        "client": OpenAI(api_key=api_key, base_url=base_url,
+                         http_client=httpx.Client(transport=sync_transport)),
+        "async_client": AsyncOpenAI(api_key=api_key, base_url=base_url,
+                                    http_client=httpx.AsyncClient(transport=async_transport)),
+    }
+
+
+class TaskTimeoutError(Exception):
+    """任务执行超过截止时间"""
+    pass
+
 
 class BaseAgentHub(ABC):
     """Agent Hub抽象基类"""
+
+    # 超时后等待后台团队在下一个输出块处停止的最长秒数
+    stop_grace_period: float = 5.0
     
     def __init__(self, name: str, description: str):
         self.name = name
@@ -42,8 +103,91 @@ class BaseAgentHub(ABC):
             console.print(f"[red]Hub '{self.name}' 初始化失败: {e}[/red]")
             return False
     
-    def run(self, task: str) -> Optional[str]:
-        """执行任务"""
+    def teardown(self):
+        """释放团队、成员的模型客户端和会话记忆；之后再次执行时重新初始化"""
+        team, self.team = self.team, None
+        self._initialized = False
+        pending, seen = [team], set()
+        while pending:
+            node = pending.pop()
+            if node is None or id(node) in seen:
+                continue
+            seen.add(id(node))
+            members = getattr(node, "members", None)
+            if isinstance(members, list):
+                pending.extend(members)
+            # 同步客户端持有连接池，显式关闭；异步客户端需要事件循环，随对象一起回收
+            client = getattr(getattr(node, "model", None), "client", None)
+            close = getattr(client, "close", None)
+            if callable(close) and not inspect.iscoroutinefunction(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+
+    def _iter_team_output(self, task: str) -> Iterator[str]:
+        for chunk in self.team.run(task, stream=True):
+            content = getattr(chunk, "content", None)
+            if isinstance(content, str) and content:
+                yield content
+
+    def stream(self, task: str, deadline: Optional[float] = None) -> Iterator[str]:
+        """流式执行任务，逐块产出团队输出的文本内容
+
+        设置 deadline（time.time() 时间戳）时，团队在后台线程中执行；
+        到期后通知其在下一个输出块处停止，等待后台线程退出后抛出 TaskTimeoutError，
+        保证调用方持有的Hub执行锁和在途计数覆盖团队的整个执行过程。
+        团队在 stop_grace_period 秒内仍未停止（例如卡在一次模型请求上）时不再等待，
+        后台线程作为守护线程继续运行到结束。
+        """
+        if not self.initialize():
+            return
+
+        if deadline is None:
+            yield from self._iter_team_output(task)
+            return
+
+        chunks: queue.Queue = queue.Queue()
+        cancelled = threading.Event()
+
+        def produce():
+            try:
+                for content in self._iter_team_output(task):
+                    if cancelled.is_set():
+                        break
+                    chunks.put(content)
+            except Exception as e:
+                chunks.put(e)
+            finally:
+                chunks.put(_STREAM_END)
+
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        try:
+            while True:
+                remaining = deadline - time.time()
+                try:
+                    if remaining <= 0:
+                        raise queue.Empty
+                    item = chunks.get(timeout=remaining)
+                except queue.Empty:
+                    raise TaskTimeoutError(f"Hub '{self.name}' 执行超时")
+                if item is _STREAM_END:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # 超时或调用方提前停止读取时，团队仍在使用模型客户端和会话记忆，等其停止后再返回
+            cancelled.set()
+            producer.join(timeout=self.stop_grace_period)
+            if producer.is_alive():
+                console.print(f"[yellow]Hub '{self.name}' 的团队未在 {self.stop_grace_period:.0f} 秒内停止，"
+                              f"不再等待，后台继续运行至结束[/yellow]")
+
+    def run(self, task: str, deadline: Optional[float] = None) -> Optional[str]:
+        """执行任务，超过截止时间时返回已输出的部分结果"""
+        chunks = []
         try:
             # 确保Hub已初始化
             if not self.initialize():
@@ -51,50 +195,85 @@ class BaseAgentHub(ABC):
 
             console.print(f"[blue]Hub '{self.name}' 开始执行任务[/blue]")
 
-            # 使用agno team的print_response方法
             print(f"\n{'='*60}")
             print(f"🤖 {self.name} 正在处理您的任务...")
             print(f"{'='*60}\n")
 
-            # 执行任务并直接打印响应
-            self.team.print_response(task, stream=True)
+            # 边执行边打印响应，同时收集完整输出
+            for content in self.stream(task, deadline):
+                print(content, end="", flush=True)
+                chunks.append(content)
+            print()
 
             console.print(f"\n[green]Hub '{self.name}' 任务执行完成[/green]")
 
-            # 返回一个简单的完成消息，因为实际结果已经通过print_response输出了
-            return "任务已完成，详细结果请查看上方输出。"
+            return "".join(chunks) or EMPTY_OUTPUT_PLACEHOLDER
+
+        except TaskTimeoutError as e:
+            console.print(f"\n[yellow]{e}，返回部分输出[/yellow]")
+            if not chunks:
+                return None
+            return "".join(chunks) + PARTIAL_OUTPUT_SUFFIX
 
         except Exception as e:
             console.print(f"[red]Hub '{self.name}' 执行任务时出错: {e}[/red]")
             return None
     
-    async def arun(self, task: str) -> Optional[str]:
-        """异步执行任务"""
+    async def _aiter_team_output(self, task: str) -> AsyncIterator[str]:
+        response = self.team.arun(task, stream=True)
+        if inspect.isawaitable(response):
+            response = await response
+        async for chunk in response:
+            content = getattr(chunk, "content", None)
+            if isinstance(content, str) and content:
+                yield content
+
+    async def arun(self, task: str, deadline: Optional[float] = None) -> Optional[str]:
+        """异步执行任务，超过截止时间时取消执行并返回已输出的部分结果"""
+        chunks = []
         try:
             # 确保Hub已初始化
             if not self.initialize():
                 return None
             
             console.print(f"[blue]Hub '{self.name}' 开始异步执行任务[/blue]")
-            
-            # 异步执行任务
-            result = await self.team.arun(task)
+
+            async def collect():
+                async for content in self._aiter_team_output(task):
+                    chunks.append(content)
+
+            # 异步流式执行任务，超时取消时保留已收到的输出
+            timeout = None if deadline is None else max(deadline - time.time(), 0)
+            await asyncio.wait_for(collect(), timeout)
             
             console.print(f"[green]Hub '{self.name}' 异步任务执行完成[/green]")
-            return result
+            return "".join(chunks) or EMPTY_OUTPUT_PLACEHOLDER
             
+        except asyncio.TimeoutError:
+            console.print(f"[yellow]Hub '{self.name}' 异步执行超时，已取消，返回部分输出[/yellow]")
+            if not chunks:
+                return None
+            return "".join(chunks) + PARTIAL_OUTPUT_SUFFIX
         except Exception as e:
             console.print(f"[red]Hub '{self.name}' 异步执行任务时出错: {e}[/red]")
             return None
     
-    def get_model_config(self) -> dict:
-        """获取模型配置"""
+    def get_model_config(self, model_name: Optional[str] = None) -> dict:
+        """获取模型配置；启用LLM响应缓存或限流时附带共享的客户端"""
+        api_key = os.getenv("OPENAI_API_KEY")
+        base_url = os.getenv("OPENAI_BASE_URL")
         return {
-            "id": os.getenv("OPENAI_MODEL", "gpt-4o"),
-            "api_key": os.getenv("OPENAI_API_KEY"),
-            "base_url": os.getenv("OPENAI_BASE_URL")
+            "id": model_name or os.getenv("OPENAI_MODEL", "gpt-4o"),
+            "api_key": api_key,
+            "base_url": base_url,
+            **build_model_clients(api_key, base_url),
         }
     
+    def cache_tools(self, *toolkits) -> list:
+        """为无副作用的工具（如网络搜索）接入共享的工具结果缓存"""
+        cache = get_tool_cache()
+        return [cache.wrap_toolkit(toolkit) for toolkit in toolkits]
+
     def __str__(self) -> str:
         return f"Hub(name='{self.name}', description='{self.description}')"
     
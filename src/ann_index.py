@@ -0,0 +1,268 @@
+"""
+ANN Index
+近似最近邻索引：基于k-means粗量化器的倒排文件索引（IVF），用于大规模能力库检索
+"""
+
+import json
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import numpy as np
+
+from .quantization import QuantizedVectors
+
+
+def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class IVFIndex:
+    """倒排文件索引：余弦相似度上的近似最近邻检索
+
+    nlist 控制聚类中心数量，nprobe 控制每次查询扫描的倒排列表数量，
+    nprobe 越大召回率越高、延迟越大；nprobe == nlist 时等价于精确检索。
+    precision 为向量存储精度（float32 / float16 / int8），rescore > 0 时额外保留
+    float32 原始向量，对量化检索出的 top_k * rescore 个候选做精确重排。
+    """
+
+    def __init__(self, nlist: int = None, nprobe: int = 8, kmeans_iterations: int = 10,
+                 max_training_points: int = 50000, seed: int = 0,
+                 precision: str = "float32", rescore: int = 0):
+        self.nlist = nlist
+        self.precision = precision
+        self.rescore = rescore
+        self.nprobe = nprobe
+        self.kmeans_iterations = kmeans_iterations
+        self.max_training_points = max_training_points
+        self.seed = seed
+
+        self.dim: Optional[int] = None
+        self.centroids: Optional[np.ndarray] = None
+        self._vectors: Optional[QuantizedVectors] = None
+        self._size = 0
+        self._ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._lists: List[List[int]] = []
+        self._list_arrays: List[Optional[np.ndarray]] = []
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def __contains__(self, item_id: str) -> bool:
+        return item_id in self._id_to_row
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def _train_centroids(self, vectors: np.ndarray) -> np.ndarray:
+        """球面k-means训练粗量化器"""
+        rng = np.random.default_rng(self.seed)
+        nlist = self.nlist or max(1, int(np.sqrt(len(vectors))))
+        nlist = min(nlist, len(vectors))
+        self.nlist = nlist
+
+        if len(vectors) > self.max_training_points:
+            sample = vectors[rng.choice(len(vectors), self.max_training_points, replace=False)]
+        else:
+            sample = vectors
+
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assignments = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(nlist):
+                members = sample[assignments == c]
+                if len(members):
+                    centroids[c] = members.sum(axis=0)
+                else:
+                    # 空簇重新随机初始化
+                    centroids[c] = sample[rng.integers(len(sample))]
+            centroids = _normalize_rows(centroids)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray, chunk_size: int = 8192) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), chunk_size):
+            block = vectors[start:start + chunk_size]
+            assignments[start:start + chunk_size] = np.argmax(block @ self.centroids.T, axis=1)
+        return assignments
+
+    @property
+    def memory_bytes(self) -> int:
+        """向量存储占用的字节数"""
+        return self._vectors.nbytes if self._vectors is not None else 0
+
+    def _new_store(self) -> QuantizedVectors:
+        return QuantizedVectors(self.dim, self.precision, keep_exact=self.rescore > 0)
+
+    def _reserve(self, capacity: int):
+        """按需扩容行属性存储（容量翻倍）"""
+        if capacity <= len(self._assignments):
+            return
+        new_capacity = max(capacity, 2 * len(self._assignments), 16)
+        assignments = np.zeros(new_capacity, dtype=np.int32)
+        assignments[:self._size] = self._assignments[:self._size]
+        alive = np.zeros(new_capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._assignments, self._alive = assignments, alive
+
+    def build(self, ids: List[str], vectors: np.ndarray):
+        """从全量数据构建索引"""
+        vectors = _normalize_rows(vectors)
+        if len(ids) != len(vectors):
+            raise ValueError("ids 与 vectors 数量不一致")
+        if len(ids) == 0:
+            raise ValueError("无法用空数据构建索引")
+
+        self.dim = vectors.shape[1]
+        self.centroids = self._train_centroids(vectors)
+        self._size = 0
+        self._vectors = self._new_store()
+        self._assignments = np.zeros(0, dtype=np.int32)
+        self._alive = np.zeros(0, dtype=bool)
+        self._ids, self._id_to_row = [], {}
+        self._lists = [[] for _ in range(self.nlist)]
+        self._list_arrays = [None] * self.nlist
+
+        self._reserve(len(vectors))
+        assignments = self._assign(vectors)
+        self._vectors.append(vectors)
+        self._assignments[:len(vectors)] = assignments
+        self._alive[:len(vectors)] = True
+        self._size = len(vectors)
+        for row, (item_id, cluster) in enumerate(zip(ids, assignments)):
+            self._ids.append(item_id)
+            self._id_to_row[item_id] = row
+            self._lists[cluster].append(row)
+
+    def add(self, item_id: str, vector: np.ndarray):
+        """增量添加（或更新）单个向量，沿用已训练的聚类中心"""
+        vector = _normalize_rows(vector)
+        if not self.is_trained:
+            self.build([item_id], vector)
+            return
+        if vector.shape[1] != self.dim:
+            raise ValueError(f"向量维度不匹配: {vector.shape[1]} != {self.dim}")
+
+        self.remove(item_id)
+        row = self._size
+        self._reserve(row + 1)
+        cluster = int(np.argmax(self.centroids @ vector[0]))
+        self._vectors.append(vector)
+        self._assignments[row] = cluster
+        self._alive[row] = True
+        self._size += 1
+        self._ids.append(item_id)
+        self._id_to_row[item_id] = row
+        self._lists[cluster].append(row)
+        self._list_arrays[cluster] = None
+
+    def remove(self, item_id: str) -> bool:
+        """删除向量（标记删除，查询时跳过）"""
+        row = self._id_to_row.pop(item_id, None)
+        if row is None:
+            return False
+        self._alive[row] = False
+        return True
+
+    def _list_rows(self, cluster: int) -> np.ndarray:
+        rows = self._list_arrays[cluster]
+        if rows is None:
+            rows = np.fromiter(
+                (row for row in self._lists[cluster] if self._alive[row]), dtype=np.int64
+            )
+            self._lists[cluster] = rows.tolist()
+            self._list_arrays[cluster] = rows
+        return rows
+
+    def _top_k(self, query: np.ndarray, rows: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        return [(self._ids[row], score)
+                for row, score in self._vectors.search(query, top_k, rows, rescore=self.rescore)]
+
+    def search(self, query: np.ndarray, top_k: int = 10,
+               nprobe: int = None) -> List[Tuple[str, float]]:
+        """近似检索，返回 [(id, 余弦相似度)]"""
+        if not self.is_trained or not self._id_to_row:
+            return []
+        query = _normalize_rows(query)[0]
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        centroid_scores = self.centroids @ query
+        probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        rows = np.concatenate([self._list_rows(int(c)) for c in probe])
+        rows = rows[self._alive[rows]]
+        if len(rows) == 0:
+            return []
+        return self._top_k(query, rows, top_k)
+
+    def search_exact(self, query: np.ndarray, top_k: int = 10) -> List[Tuple[str, float]]:
+        """精确检索（暴力扫描），用于召回率对比"""
+        if not self._id_to_row:
+            return []
+        query = _normalize_rows(query)[0]
+        rows = np.flatnonzero(self._alive[:self._size])
+        return self._top_k(query, rows, top_k)
+
+    def save(self, file_path: str, metadata: Dict[str, Any] = None):
+        """持久化索引（仅保存存活向量）"""
+        Path(file_path).parent.mkdir(parents=True, exist_ok=True)
+        rows = np.flatnonzero(self._alive[:self._size])
+        header = {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "precision": self.precision,
+            "rescore": self.rescore,
+            "ids": [self._ids[row] for row in rows],
+            "metadata": metadata or {},
+        }
+        arrays = {
+            "centroids": self.centroids,
+            "codes": self._vectors.codes[rows],
+            "scales": self._vectors.scales[rows],
+            "assignments": self._assignments[rows],
+        }
+        if self._vectors.exact is not None:
+            arrays["exact"] = self._vectors.exact[rows]
+        with open(file_path, 'wb') as f:
+            np.savez(
+                f,
+                header=np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'),
+                                     dtype=np.uint8),
+                **arrays
+            )
+
+    @classmethod
+    def load(cls, file_path: str) -> Tuple['IVFIndex', Dict[str, Any]]:
+        """加载索引，返回 (索引, 元数据)"""
+        with np.load(file_path) as data:
+            header = json.loads(data["header"].tobytes().decode('utf-8'))
+            centroids = data["centroids"]
+            assignments = data["assignments"]
+            # 兼容未量化的旧格式
+            codes = data["codes"] if "codes" in data else data["vectors"]
+            scales = data["scales"] if "scales" in data else np.ones(len(codes), dtype=np.float32)
+            exact = data["exact"] if "exact" in data else None
+
+        index = cls(nlist=header["nlist"], nprobe=header["nprobe"],
+                    precision=header.get("precision", "float32"),
+                    rescore=header.get("rescore", 0) if exact is not None else 0)
+        index.dim = centroids.shape[1]
+        index.centroids = centroids
+        index._vectors = QuantizedVectors.from_arrays(codes, scales, index.precision, exact)
+        index._assignments = assignments.astype(np.int32)
+        index._alive = np.ones(len(codes), dtype=bool)
+        index._size = len(codes)
+        index._ids = list(header["ids"])
+        index._id_to_row = {item_id: row for row, item_id in enumerate(index._ids)}
+        index._lists = [[] for _ in range(index.nlist)]
+        index._list_arrays = [None] * index.nlist
+        for row, cluster in enumerate(index._assignments):
+            index._lists[cluster].append(row)
+        return index, header.get("metadata", {})
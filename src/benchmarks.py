@@ -0,0 +1,240 @@
+"""
+Benchmarks
+性能基准：对比近似检索与精确检索的召回率和延迟，量化存储的精度/内存/速度，
+以及嵌入降维对路由一致性和延迟的影响
+
+用法: python -m src.benchmarks [ann|quantization|dimensions]
+"""
+
+import sys
+import time
+from typing import List, Dict, Any, Sequence
+import numpy as np
+from rich.console import Console
+from rich.table import Table
+
+from .ann_index import IVFIndex
+from .quantization import QuantizedVectors, unpack_vector
+from .embedding_service import EmbeddingService, truncate_embeddings
+
+console = Console()
+
+
+def make_clustered_vectors(num_vectors: int, dim: int, num_clusters: int = 256,
+                           noise: float = 2.0, seed: int = 0) -> np.ndarray:
+    """生成带聚类结构的合成向量（近似真实文本嵌入的分布）"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(num_clusters, size=num_vectors)
+    vectors = centers[labels] + noise * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def benchmark_ann_recall(index: IVFIndex, queries: np.ndarray, top_k: int = 10,
+                         nprobes: Sequence[int] = (1, 2, 4, 8, 16, 32)) -> List[Dict[str, Any]]:
+    """测量不同nprobe下的recall@k和单次查询延迟"""
+    exact_start = time.perf_counter()
+    exact_results = [{item_id for item_id, _ in index.search_exact(q, top_k)} for q in queries]
+    exact_ms = (time.perf_counter() - exact_start) * 1000 / len(queries)
+
+    rows = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            continue
+        start = time.perf_counter()
+        approx_results = [index.search(q, top_k, nprobe=nprobe) for q in queries]
+        ann_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = np.mean([
+            len(expected & {item_id for item_id, _ in found}) / max(len(expected), 1)
+            for expected, found in zip(exact_results, approx_results)
+        ])
+        rows.append({
+            "nprobe": nprobe,
+            "recall": float(recall),
+            "ann_ms": ann_ms,
+            "exact_ms": exact_ms,
+            "speedup": exact_ms / ann_ms if ann_ms else 0.0,
+        })
+    return rows
+
+
+def display_recall_benchmark(rows: List[Dict[str, Any]], top_k: int):
+    """显示召回率基准结果"""
+    table = Table(title=f"IVF近似检索 vs 精确检索 (recall@{top_k})")
+    table.add_column("nprobe", style="cyan")
+    table.add_column("召回率", style="green")
+    table.add_column("近似(ms)", style="yellow")
+    table.add_column("精确(ms)", style="yellow")
+    table.add_column("加速比", style="bold")
+    for row in rows:
+        table.add_row(str(row["nprobe"]), f"{row['recall']:.3f}", f"{row['ann_ms']:.3f}",
+                      f"{row['exact_ms']:.3f}", f"{row['speedup']:.1f}x")
+    console.print(table)
+
+
+def run_ann_benchmark(num_vectors: int = 100000, dim: int = 256, num_queries: int = 200,
+                      top_k: int = 10):
+    """在合成能力库上运行召回率基准"""
+    vectors = make_clustered_vectors(num_vectors + num_queries, dim)
+    corpus, queries = vectors[:num_vectors], vectors[num_vectors:]
+
+    start = time.perf_counter()
+    index = IVFIndex()
+    index.build([f"capability_{i}" for i in range(num_vectors)], corpus)
+    console.print(f"[cyan]构建索引: {num_vectors} 个向量, {index.nlist} 个倒排列表, "
+                  f"耗时 {time.perf_counter() - start:.2f}s[/cyan]")
+
+    display_recall_benchmark(benchmark_ann_recall(index, queries, top_k), top_k)
+
+
+def benchmark_quantization(corpus: np.ndarray, queries: np.ndarray, top_k: int = 10,
+                           configs: Sequence[tuple] = (("float32", 0), ("float16", 0),
+                                                       ("int8", 0), ("int8", 4))
+                           ) -> List[Dict[str, Any]]:
+    """测量不同存储精度下的recall@k、分数误差、内存占用和单次查询延迟"""
+    exact = QuantizedVectors.from_vectors(corpus, "float32")
+    exact_results = [{row for row, _ in exact.search(q, top_k)} for q in queries]
+    exact_scores = [exact.scores(q) for q in queries[:20]]
+
+    rows = []
+    for precision, rescore in configs:
+        store = QuantizedVectors.from_vectors(corpus, precision, keep_exact=rescore > 0)
+        store.search(queries[0], top_k, rescore=rescore)
+
+        start = time.perf_counter()
+        results = [store.search(q, top_k, rescore=rescore) for q in queries]
+        elapsed_ms = (time.perf_counter() - start) * 1000 / len(queries)
+
+        recall = np.mean([
+            len(expected & {row for row, _ in found}) / max(len(expected), 1)
+            for expected, found in zip(exact_results, results)
+        ])
+        score_error = np.mean([
+            np.abs(store.scores(q) - expected).mean() for q, expected in zip(queries, exact_scores)
+        ])
+        rows.append({
+            "precision": precision,
+            "rescore": rescore,
+            "recall": float(recall),
+            "score_error": float(score_error),
+            "memory_mb": store.nbytes / 1024 / 1024,
+            "query_ms": elapsed_ms,
+        })
+    return rows
+
+
+def display_quantization_benchmark(rows: List[Dict[str, Any]], top_k: int):
+    """显示量化基准结果"""
+    table = Table(title=f"量化存储: 精度 / 内存 / 速度 (recall@{top_k}, 相对float32精确检索)")
+    table.add_column("精度", style="cyan")
+    table.add_column("精确重排", style="cyan")
+    table.add_column("召回率", style="green")
+    table.add_column("平均分数误差", style="green")
+    table.add_column("内存(MB)", style="yellow")
+    table.add_column("查询(ms)", style="yellow")
+    for row in rows:
+        table.add_row(row["precision"], f"{row['rescore']}x" if row["rescore"] else "-",
+                      f"{row['recall']:.3f}", f"{row['score_error']:.5f}",
+                      f"{row['memory_mb']:.1f}", f"{row['query_ms']:.2f}")
+    console.print(table)
+
+
+def run_quantization_benchmark(num_vectors: int = 50000, dim: int = 1024, num_queries: int = 100,
+                               top_k: int = 10):
+    """在jina-clip-v2维度的合成向量上运行量化基准"""
+    vectors = make_clustered_vectors(num_vectors + num_queries, dim)
+    corpus, queries = vectors[:num_vectors], vectors[num_vectors:]
+    display_quantization_benchmark(benchmark_quantization(corpus, queries, top_k), top_k)
+
+
+def make_matryoshka_vectors(num_vectors: int, dim: int, num_clusters: int = 64,
+                            noise: float = 1.0, decay: float = 0.75, seed: int = 0) -> np.ndarray:
+    """生成信息集中在前部维度的合成向量（近似Matryoshka训练后的嵌入）"""
+    weights = (1 + np.arange(dim) / 32.0) ** -decay
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((num_clusters, dim)).astype(np.float32)
+    labels = rng.integers(num_clusters, size=num_vectors)
+    vectors = centers[labels] + noise * rng.standard_normal((num_vectors, dim)).astype(np.float32)
+    vectors *= weights.astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def benchmark_dimension_truncation(capabilities: np.ndarray, queries: np.ndarray,
+                                   dimensions: Sequence[int], top_k: int = 3) -> List[Dict[str, Any]]:
+    """对比不同维度下与完整维度的路由一致性（top-1一致率、top-k重合率）和单次路由延迟"""
+    full_scores = queries @ capabilities.T
+    full_top1 = np.argmax(full_scores, axis=1)
+    full_topk = np.argsort(-full_scores, axis=1)[:, :top_k]
+
+    rows = []
+    for dim in dimensions:
+        if dim > capabilities.shape[1]:
+            continue
+        caps = truncate_embeddings(capabilities, dim)
+        qs = truncate_embeddings(queries, dim)
+
+        start = time.perf_counter()
+        for query in qs:
+            np.argmax(caps @ query)
+        route_ms = (time.perf_counter() - start) * 1000 / len(qs)
+
+        scores = qs @ caps.T
+        topk = np.argsort(-scores, axis=1)[:, :top_k]
+        rows.append({
+            "dimensions": dim,
+            "top1_agreement": float(np.mean(np.argmax(scores, axis=1) == full_top1)),
+            "topk_overlap": float(np.mean([
+                len(set(a) & set(b)) / top_k for a, b in zip(topk, full_topk)
+            ])),
+            "route_ms": route_ms,
+            "memory_kb": caps.nbytes / 1024,
+        })
+    return rows
+
+
+def display_dimension_benchmark(rows: List[Dict[str, Any]], top_k: int, source: str):
+    """显示降维基准结果"""
+    table = Table(title=f"嵌入降维: 路由一致性与延迟（{source}，相对完整维度）")
+    table.add_column("维度", style="cyan")
+    table.add_column("top-1一致率", style="green")
+    table.add_column(f"top-{top_k}重合率", style="green")
+    table.add_column("路由(ms)", style="yellow")
+    table.add_column("能力矩阵(KB)", style="yellow")
+    for row in rows:
+        table.add_row(str(row["dimensions"]), f"{row['top1_agreement']:.3f}",
+                      f"{row['topk_overlap']:.3f}", f"{row['route_ms']:.4f}",
+                      f"{row['memory_kb']:.1f}")
+    console.print(table)
+
+
+def run_dimension_benchmark(num_capabilities: int = 300, num_queries: int = 2000, dim: int = 1024,
+                            dimensions: Sequence[int] = (64, 128, 256, 512, 768, 1024),
+                            top_k: int = 3):
+    """本地嵌入缓存中有足够的完整维度向量时使用真实向量，否则使用合成向量"""
+    service = EmbeddingService()
+    cached = [unpack_vector(value) for key, value in service.embedding_cache.items()
+              if key.startswith(f"{service.model}:full:")]
+    if len(cached) >= num_capabilities + 100:
+        vectors = truncate_embeddings(np.stack(cached), dim)
+        capabilities, queries = vectors[:num_capabilities], vectors[num_capabilities:]
+        source = f"嵌入缓存中的 {len(vectors)} 个真实向量"
+    else:
+        vectors = make_matryoshka_vectors(num_capabilities + num_queries, dim)
+        capabilities, queries = vectors[:num_capabilities], vectors[num_capabilities:]
+        source = "合成向量"
+    rows = benchmark_dimension_truncation(capabilities, queries, dimensions, top_k)
+    display_dimension_benchmark(rows, top_k, source)
+
+
+if __name__ == "__main__":
+    benchmark = sys.argv[1] if len(sys.argv) > 1 else "ann"
+    if benchmark == "ann":
+        run_ann_benchmark()
+    elif benchmark == "quantization":
+        run_quantization_benchmark()
+    elif benchmark == "dimensions":
+        run_dimension_benchmark()
+    else:
+        console.print(f"[red]未知的基准: {benchmark}[/red]")
+        sys.exit(1)
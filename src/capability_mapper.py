@@ -4,14 +4,20 @@ Capability Mapper
 """
 
 import json
+import hashlib
 import importlib
 import inspect
-from typing import List, Dict, Any, Tuple
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
+import numpy as np
 from rich.console import Console
 
 from .embedding_service import EmbeddingService
 from .agent_hub import BaseAgentHub
+from .ann_index import IVFIndex
+from .keyword_matcher import KeywordMatcher, KeywordSpec
+from .bm25_index import BM25Index, reciprocal_rank_fusion
+from .prebuilt_index import PrebuiltCapabilityIndex, DEFAULT_PREBUILT_PATH, hub_content_hashes
 
 console = Console()
 
@@ -19,11 +25,42 @@ console = Console()
 class CapabilityMapper:
     """智能能力映射器"""
 
-    def __init__(self, embedding_service: EmbeddingService):
+    def __init__(self, embedding_service: EmbeddingService, use_ann_index: bool = False,
+                 ann_index_path: str = "cache/capability_index.npz",
+                 ann_nprobe: int = 8, ann_top_k: int = 10,
+                 ann_precision: str = "float32", ann_rescore: int = 0,
+                 use_hybrid_search: bool = False, lexical_accept_score: float = 6.0,
+                 lexical_margin: float = 0.5, rrf_k: int = 60,
+                 prebuilt_path: Optional[str] = DEFAULT_PREBUILT_PATH):
         self.embedding_service = embedding_service
         self.hub_classes = self._discover_hub_classes()
-        self.capability_descriptions = self._build_dynamic_capability_descriptions()
+        # 优先使用离线预构建的能力描述和向量，省去启动时实例化Hub和调用嵌入接口
+        self.prebuilt_path = prebuilt_path
+        self.capability_descriptions = (self._load_prebuilt_index()
+                                        or self._build_dynamic_capability_descriptions())
         self.capability_keywords = self._load_capability_keywords()
+        self.keyword_matcher = KeywordMatcher.from_capability_keywords(self.capability_keywords)
+
+        # 词法检索：BM25分数达到 accept 且与其余能力拉开足够差距时视为明确匹配，
+        # 不需要调用嵌入接口
+        self.use_hybrid_search = use_hybrid_search
+        self.lexical_accept_score = lexical_accept_score
+        self.lexical_margin = lexical_margin
+        self.rrf_k = rrf_k
+        self.lexical_field_boost = 3
+        self.bm25_index = BM25Index()
+        for name in self.capability_descriptions:
+            self._index_capability_text(name)
+
+        # 近似最近邻索引（能力库很大时替代暴力检索）
+        self.ann_index_path = ann_index_path
+        self.ann_nprobe = ann_nprobe
+        self.ann_top_k = ann_top_k
+        self.ann_precision = ann_precision
+        self.ann_rescore = ann_rescore
+        self.ann_index: Optional[IVFIndex] = None
+        if use_ann_index:
+            self._load_or_build_ann_index()
 
     def _discover_hub_classes(self) -> Dict[str, type]:
         """动态发现所有Hub类"""
@@ -62,6 +99,26 @@ class CapabilityMapper:
 
         return hub_classes
 
+    def _load_prebuilt_index(self) -> Optional[Dict[str, str]]:
+        """加载并校验预构建能力索引，成功时返回能力描述并预热向量缓存"""
+        if not self.prebuilt_path or not Path(self.prebuilt_path).exists():
+            return None
+        try:
+            prebuilt = PrebuiltCapabilityIndex.load(self.prebuilt_path)
+        except Exception as e:
+            console.print(f"[yellow]加载预构建能力索引失败: {e}[/yellow]")
+            return None
+
+        valid, reason = prebuilt.validate(self.embedding_service.namespace,
+                                          hub_content_hashes(self.hub_classes))
+        if not valid:
+            console.print(f"[yellow]预构建能力索引已过期（{reason}），重新构建能力描述[/yellow]")
+            return None
+
+        self.embedding_service.seed_embeddings(prebuilt.embedding_map())
+        console.print(f"[green]加载了预构建能力索引: {len(prebuilt)} 个能力[/green]")
+        return dict(prebuilt.descriptions)
+
     def _build_dynamic_capability_descriptions(self) -> Dict[str, str]:
         """动态构建能力描述"""
         descriptions = {}
@@ -112,6 +169,123 @@ class CapabilityMapper:
         }
         return keywords
 
+    def _capability_fingerprint(self) -> str:
+        """能力描述的内容指纹，用于判断持久化索引是否过期"""
+        digest = hashlib.md5(self.embedding_service.namespace.encode('utf-8'))
+        for name in sorted(self.capability_descriptions):
+            digest.update(f"{name}\t{self.capability_descriptions[name]}\n".encode('utf-8'))
+        return digest.hexdigest()
+
+    def build_ann_index(self, save: bool = True) -> bool:
+        """为全部能力描述构建近似最近邻索引"""
+        names = list(self.capability_descriptions.keys())
+        texts = [self.capability_descriptions[name] for name in names]
+        embeddings = self.embedding_service.get_batch_embeddings(texts)
+
+        ids = [name for name, text in zip(names, texts) if text in embeddings]
+        if not ids:
+            console.print("[yellow]无法获取能力向量，未构建近似索引[/yellow]")
+            return False
+
+        index = IVFIndex(nprobe=self.ann_nprobe, precision=self.ann_precision,
+                         rescore=self.ann_rescore)
+        index.build(ids, np.stack([embeddings[self.capability_descriptions[name]] for name in ids]))
+        self.ann_index = index
+        console.print(f"[green]构建了能力近似索引: {len(ids)} 个能力, {index.nlist} 个倒排列表[/green]")
+
+        if save:
+            self.save_ann_index()
+        return True
+
+    def save_ann_index(self):
+        """持久化能力近似索引"""
+        if self.ann_index is None:
+            return
+        try:
+            self.ann_index.save(self.ann_index_path,
+                                metadata={"fingerprint": self._capability_fingerprint()})
+        except Exception as e:
+            console.print(f"[yellow]保存能力近似索引失败: {e}[/yellow]")
+
+    def _load_or_build_ann_index(self):
+        """优先加载持久化索引，内容变化时重新构建"""
+        if Path(self.ann_index_path).exists():
+            try:
+                index, metadata = IVFIndex.load(self.ann_index_path)
+                if (metadata.get("fingerprint") == self._capability_fingerprint()
+                        and index.precision == self.ann_precision):
+                    index.nprobe = self.ann_nprobe
+                    self.ann_index = index
+                    console.print(f"[green]加载了能力近似索引: {len(index)} 个能力[/green]")
+                    return
+                console.print("[yellow]能力描述或向量精度已变化，重新构建近似索引[/yellow]")
+            except Exception as e:
+                console.print(f"[yellow]加载能力近似索引失败: {e}[/yellow]")
+        self.build_ann_index()
+
+    def _search_ann_index(self, task_text: str, threshold: float) -> List[str]:
+        """通过近似索引检索能力"""
+        matched_capabilities = []
+        for capability_name, similarity in self._ann_ranking(task_text):
+            if similarity >= threshold:
+                matched_capabilities.append(capability_name)
+                console.print(f"[dim]语义匹配: {capability_name} (相似度: {similarity:.3f})[/dim]")
+        return matched_capabilities
+
+    def _ann_ranking(self, task_text: str) -> List[Tuple[str, float]]:
+        """近似索引返回的 (能力, 相似度) 排名"""
+        query_embedding = self.embedding_service.get_embedding(task_text)
+        if query_embedding is None:
+            return []
+        return self.ann_index.search(query_embedding, top_k=self.ann_top_k)
+
+    def _semantic_ranking(self, task_text: str) -> List[Tuple[str, float]]:
+        """按语义相似度降序返回全部 (能力, 相似度)"""
+        if self.ann_index is not None:
+            return self._ann_ranking(task_text)
+
+        capability_names = list(self.capability_descriptions.keys())
+        capability_texts = [self.capability_descriptions[name] for name in capability_names]
+        similarities = self.embedding_service.find_most_similar(
+            task_text, capability_texts, top_k=len(capability_texts)
+        )
+
+        # 多个能力可能共用同一段Hub描述，逐一展开
+        names_by_text: Dict[str, List[str]] = {}
+        for name, text in zip(capability_names, capability_texts):
+            names_by_text.setdefault(text, []).append(name)
+
+        ranking = []
+        for text, similarity in similarities:
+            for name in names_by_text.pop(text, []):
+                ranking.append((name, similarity))
+        return ranking
+
+    def _index_capability_text(self, name: str):
+        """将能力名称、描述和关键词写入BM25索引"""
+        keywords = self.capability_keywords.get(name, [])
+        # 名称和关键词是能力独有的信号（描述常由同一Hub的多个能力共用），重复以提高其权重
+        specific = " ".join([name.replace("_", " "), " ".join(keywords)])
+        text = " ".join([specific] * self.lexical_field_boost
+                        + [self.capability_descriptions.get(name, "")])
+        self.bm25_index.add(name, text)
+
+    def _lexical_short_circuit(self, lexical_ranking: List[Tuple[str, float]]) -> Optional[List[str]]:
+        """词法结果足够明确时直接返回能力，否则返回None
+
+        明确是指：至少一个能力达到 accept 分数，且其余能力的最高分不超过
+        入选能力最低分的 margin 倍。
+        """
+        accepted = [(name, score) for name, score in lexical_ranking
+                    if score >= self.lexical_accept_score]
+        if not accepted:
+            return None
+        if len(accepted) < len(lexical_ranking):
+            runner_up = lexical_ranking[len(accepted)][1]
+            if runner_up > accepted[-1][1] * self.lexical_margin:
+                return None
+        return [name for name, _ in accepted]
+
     def display_discovered_capabilities(self):
         """显示动态发现的能力"""
         if self.capability_descriptions:
@@ -126,66 +300,91 @@ class CapabilityMapper:
     def extract_capabilities_semantic(self, task_text: str, threshold: float = 0.3) -> List[str]:
         """使用语义搜索提取能力"""
         try:
-            # 获取所有能力描述
-            capability_texts = []
-            capability_names = []
-            
-            for capability, description in self.capability_descriptions.items():
-                capability_texts.append(description)
-                capability_names.append(capability)
-            
-            # 找到最相似的能力
-            similarities = self.embedding_service.find_most_similar(
-                task_text, capability_texts, top_k=len(capability_texts)
-            )
-            
+            if self.ann_index is not None:
+                return self._search_ann_index(task_text, threshold)
+
             # 筛选超过阈值的能力
             matched_capabilities = []
-            for text, similarity in similarities:
+            for capability_name, similarity in self._semantic_ranking(task_text):
                 if similarity >= threshold:
-                    # 找到对应的能力名称
-                    for i, desc in enumerate(capability_texts):
-                        if desc == text:
-                            capability_name = capability_names[i]
-                            matched_capabilities.append(capability_name)
-                            console.print(f"[dim]语义匹配: {capability_name} (相似度: {similarity:.3f})[/dim]")
-                            break
+                    matched_capabilities.append(capability_name)
+                    console.print(f"[dim]语义匹配: {capability_name} (相似度: {similarity:.3f})[/dim]")
             
             return matched_capabilities
             
         except Exception as e:
             console.print(f"[yellow]语义搜索失败，使用关键词匹配: {e}[/yellow]")
             return self.extract_capabilities_keywords(task_text)
+
+    def lexical_match(self, task_text: str) -> Optional[List[str]]:
+        """词法结果明确时返回能力（无需调用嵌入接口），否则返回None"""
+        return self._lexical_short_circuit(self.bm25_index.search(task_text))
+
+    def extract_capabilities_hybrid(self, task_text: str, threshold: float = 0.3,
+                                    semantic_ranking: Optional[List[Tuple[str, float]]] = None) -> List[str]:
+        """词法 + 语义混合检索
+
+        先查BM25索引，结果明确时直接返回，不调用嵌入接口；
+        否则将语义排名与词法排名做倒数排名融合，保留语义相似度达到阈值
+        或词法分数达到 accept 的能力，按融合分数排序。都没有时返回空列表，
+        由调用方回退到关键词匹配。semantic_ranking 可由调用方提供
+        （如多进程路由工作池已算好的语义排名），此时不再计算语义相似度。
+        """
+        lexical_ranking = self.bm25_index.search(task_text)
+        lexical_capabilities = self._lexical_short_circuit(lexical_ranking)
+        if lexical_capabilities:
+            for name, score in lexical_ranking[:len(lexical_capabilities)]:
+                console.print(f"[dim]词法匹配: {name} (BM25: {score:.2f})[/dim]")
+            return lexical_capabilities
+
+        if semantic_ranking is None:
+            try:
+                semantic_ranking = self._semantic_ranking(task_text)
+            except Exception as e:
+                console.print(f"[yellow]语义搜索失败，使用词法匹配: {e}[/yellow]")
+                semantic_ranking = []
+
+        selected = {name for name, similarity in semantic_ranking if similarity >= threshold}
+        selected.update(name for name, score in lexical_ranking if score >= self.lexical_accept_score)
+
+        fused = reciprocal_rank_fusion(
+            [[name for name, _ in semantic_ranking], [name for name, _ in lexical_ranking]],
+            k=self.rrf_k
+        )
+        matched_capabilities = []
+        for name, score in fused:
+            if name in selected:
+                matched_capabilities.append(name)
+                console.print(f"[dim]混合匹配: {name} (RRF: {score:.4f})[/dim]")
+        return matched_capabilities
     
     def extract_capabilities_keywords(self, task_text: str) -> List[str]:
         """使用关键词匹配提取能力（备用方案）"""
-        matched_capabilities = set()
+        # 自动机一次扫描完成全部关键词匹配，按加权投票得分排序
+        matched_capabilities = self.keyword_matcher.match_capabilities(task_text)
         task_lower = task_text.lower()
         
-        for capability, keywords in self.capability_keywords.items():
-            for keyword in keywords:
-                if keyword in task_lower:
-                    matched_capabilities.add(capability)
-                    break
-        
         # 如果没有匹配到任何能力，使用默认能力
         if not matched_capabilities:
             # 简单的启发式规则
             if any(word in task_lower for word in ["写", "生成", "创作", "撰写"]):
-                matched_capabilities.add("writing")
+                matched_capabilities.append("writing")
             if any(word in task_lower for word in ["研究", "调研", "分析", "了解"]):
-                matched_capabilities.add("research")
+                matched_capabilities.append("research")
             
             # 如果还是没有，默认为研究和写作
             if not matched_capabilities:
-                matched_capabilities.update(["research", "writing"])
+                matched_capabilities.extend(["research", "writing"])
         
-        return list(matched_capabilities)
+        return matched_capabilities
     
     def extract_capabilities(self, task_text: str, use_semantic: bool = True) -> List[str]:
         """提取任务所需的能力"""
         if use_semantic:
-            semantic_capabilities = self.extract_capabilities_semantic(task_text)
+            if self.use_hybrid_search:
+                semantic_capabilities = self.extract_capabilities_hybrid(task_text)
+            else:
+                semantic_capabilities = self.extract_capabilities_semantic(task_text)
             if semantic_capabilities:
                 return semantic_capabilities
         
@@ -196,11 +395,20 @@ class CapabilityMapper:
         """获取能力描述"""
         return self.capability_descriptions.get(capability, capability)
     
-    def add_capability(self, name: str, description: str, keywords: List[str] = None):
-        """添加新的能力"""
+    def add_capability(self, name: str, description: str, keywords: KeywordSpec = None):
+        """添加新的能力，keywords 可为关键词列表或 关键词 -> 权重 字典"""
         self.capability_descriptions[name] = description
         if keywords:
             self.capability_keywords[name] = keywords
+            # 只替换该能力的关键词，无需重建整个自动机
+            self.keyword_matcher.set_keywords(name, keywords)
+        self._index_capability_text(name)
+
+        # 增量写入近似索引，沿用已训练的聚类中心
+        if self.ann_index is not None:
+            embedding = self.embedding_service.get_embedding(description)
+            if embedding is not None:
+                self.ann_index.add(name, embedding)
         
         console.print(f"[green]添加新能力: {name}[/green]")
     
@@ -218,6 +426,8 @@ class CapabilityMapper:
                 json.dump(config, f, ensure_ascii=False, indent=2)
                 
             console.print(f"[green]能力配置已保存到 {file_path}[/green]")
+
+            self.save_ann_index()
             
         except Exception as e:
             console.print(f"[red]保存能力配置失败: {e}[/red]")
@@ -231,8 +441,19 @@ class CapabilityMapper:
                 
                 if "descriptions" in config:
                     self.capability_descriptions.update(config["descriptions"])
+                    if self.ann_index is not None:
+                        embeddings = self.embedding_service.get_batch_embeddings(
+                            list(config["descriptions"].values())
+                        )
+                        for name, description in config["descriptions"].items():
+                            if description in embeddings:
+                                self.ann_index.add(name, embeddings[description])
                 if "keywords" in config:
                     self.capability_keywords.update(config["keywords"])
+                    for name, keywords in config["keywords"].items():
+                        self.keyword_matcher.set_keywords(name, keywords)
+                for name in set(config.get("descriptions", {})) | set(config.get("keywords", {})):
+                    self._index_capability_text(name)
                 
                 console.print(f"[green]从 {file_path} 加载了能力配置[/green]")
                 
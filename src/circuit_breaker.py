@@ -0,0 +1,149 @@
+"""
+Circuit Breaker
+熔断器：按Hub跟踪健康状态，连续失败后暂停路由，冷却后放行试探请求
+"""
+
+import time
+import threading
+from typing import Dict, Any, Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """单个Hub的熔断器
+
+    closed: 正常放行；连续失败达到阈值后进入 open
+    open: 拒绝所有请求；冷却时间过后进入 half_open
+    half_open: 只放行有限的试探请求，成功则 closed，失败则重新 open
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.opened_at: Optional[float] = None
+        self.half_open_calls = 0
+        self.last_error: Optional[str] = None
+
+    def _refresh(self, now: float):
+        if self.state == OPEN and now - self.opened_at >= self.cooldown:
+            self.state = HALF_OPEN
+            self.half_open_calls = 0
+
+    def is_available(self, now: float = None) -> bool:
+        """是否可以参与路由（不占用试探名额）"""
+        self._refresh(now or time.time())
+        if self.state == OPEN:
+            return False
+        if self.state == HALF_OPEN:
+            return self.half_open_calls < self.half_open_max_calls
+        return True
+
+    def acquire(self, now: float = None) -> bool:
+        """申请执行许可，half_open 状态下占用一个试探名额"""
+        if not self.is_available(now):
+            return False
+        if self.state == HALF_OPEN:
+            self.half_open_calls += 1
+        return True
+
+    def release(self):
+        """归还未使用的试探名额（例如执行被取消）"""
+        if self.state == HALF_OPEN and self.half_open_calls > 0:
+            self.half_open_calls -= 1
+
+    def record_success(self):
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        self.state = CLOSED
+        self.opened_at = None
+        self.half_open_calls = 0
+
+    def record_failure(self, error: str = None, now: float = None):
+        now = now or time.time()
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_error = error
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.state = OPEN
+            self.opened_at = now
+            self.half_open_calls = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        self._refresh(time.time())
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_successes": self.total_successes,
+            "opened_at": self.opened_at,
+            "last_error": self.last_error,
+        }
+
+
+class HubHealthRegistry:
+    """所有Hub的熔断器（线程安全）"""
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 60.0,
+                 half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, hub_id: str) -> CircuitBreaker:
+        if hub_id not in self._breakers:
+            self._breakers[hub_id] = CircuitBreaker(
+                self.failure_threshold, self.cooldown, self.half_open_max_calls
+            )
+        return self._breakers[hub_id]
+
+    def is_available(self, hub_id: str) -> bool:
+        with self._lock:
+            return self._get(hub_id).is_available()
+
+    def acquire(self, hub_id: str) -> bool:
+        with self._lock:
+            return self._get(hub_id).acquire()
+
+    def release(self, hub_id: str):
+        with self._lock:
+            self._get(hub_id).release()
+
+    def state(self, hub_id: str) -> str:
+        with self._lock:
+            breaker = self._get(hub_id)
+            breaker.is_available()
+            return breaker.state
+
+    def record_success(self, hub_id: str):
+        with self._lock:
+            self._get(hub_id).record_success()
+
+    def record_failure(self, hub_id: str, error: str = None) -> bool:
+        """登记失败，返回是否因此触发熔断"""
+        with self._lock:
+            breaker = self._get(hub_id)
+            was_open = breaker.state == OPEN
+            breaker.record_failure(error)
+            return breaker.state == OPEN and not was_open
+
+    def record(self, hub_id: str, success: bool, error: str = None):
+        if success:
+            self.record_success(hub_id)
+        else:
+            self.record_failure(hub_id, error)
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {hub_id: breaker.to_dict() for hub_id, breaker in self._breakers.items()}
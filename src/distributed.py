@@ -0,0 +1,374 @@
+"""
+Distributed Exchange
+分布式交换：按hub_id一致性哈希把Hub注册表划分到多个交换节点，前端路由器并行向各分片打分、合并top-k，
+并把执行转发给持有该Hub的节点
+
+分片节点接口:
+    GET  /health    节点状态
+    POST /rank      {"task": TaskRequest, "top_k": 5}，返回本分片得分最高的Hub
+    POST /execute   {"hub_id": "...", "task": TaskRequest}，在本节点执行指定Hub
+
+本机模拟: python main.py cluster --nodes 4 "调研2025年AI Agent趋势"
+"""
+
+import json
+import time
+import heapq
+import bisect
+import asyncio
+import hashlib
+import multiprocessing
+from typing import List, Dict, Any, Optional, Tuple, Callable
+from pathlib import Path
+import httpx
+from rich.console import Console
+from rich.table import Table
+
+from .usp import TaskRequest
+from .aex import AgentExchange
+from .server import HTTPError, HTTPRequest, read_request, write_json, hub_to_dict, int_field
+
+console = Console()
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], "big")
+
+
+class ConsistentHashRing:
+    """一致性哈希环：每个节点放置 vnodes 个虚拟节点，增删节点时只迁移约 1/N 的Hub"""
+
+    def __init__(self, nodes: List[str] = (), vnodes: int = 160):
+        self.vnodes = vnodes
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self.nodes: List[str] = []
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str):
+        if node in self.nodes:
+            return
+        self.nodes.append(node)
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove_node(self, node: str):
+        if node not in self.nodes:
+            return
+        self.nodes.remove(node)
+        kept = [(p, o) for p, o in zip(self._points, self._owners) if o != node]
+        self._points = [p for p, _ in kept]
+        self._owners = [o for _, o in kept]
+
+    def node_for(self, key: str) -> str:
+        """顺时针方向第一个虚拟节点的所属节点"""
+        if not self._points:
+            raise ValueError("哈希环上没有节点")
+        index = bisect.bisect(self._points, _hash(key)) % len(self._points)
+        return self._owners[index]
+
+
+def partition_hub_configs(config_file: str, ring: ConsistentHashRing,
+                          output_dir: str = "cache/shards") -> Dict[str, str]:
+    """按哈希环把Hub配置拆成每个节点一份，返回 节点 -> 配置文件路径"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    partitions: Dict[str, List[Dict[str, Any]]] = {node: [] for node in ring.nodes}
+    for config in configs:
+        partitions[ring.node_for(config['hub_id'])].append(config)
+
+    Path(output_dir).mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for node, node_configs in partitions.items():
+        paths[node] = str(Path(output_dir) / f"{node}.json")
+        with open(paths[node], 'w', encoding='utf-8') as f:
+            json.dump(node_configs, f, ensure_ascii=False, indent=2)
+    return paths
+
+
+class RemoteHub:
+    """前端路由器看到的远端Hub（由分片返回的Hub信息）"""
+
+    def __init__(self, node_id: str, data: Dict[str, Any]):
+        self.node_id = node_id
+        self.hub_id = data["hub_id"]
+        self.name = data["name"]
+        self.description = data["description"]
+        self.capabilities = data["capabilities"]
+
+    def __repr__(self) -> str:
+        return f"RemoteHub(hub_id='{self.hub_id}', node='{self.node_id}')"
+
+
+class ShardNode:
+    """分片节点：持有部分Hub的 AgentExchange，提供打分和执行接口"""
+
+    def __init__(self, node_id: str, aex: AgentExchange, host: str = "127.0.0.1", port: int = 9000):
+        self.node_id = node_id
+        self.aex = aex
+        self.host = host
+        self.port = port
+        self.ranked = 0
+        self.executed = 0
+
+    async def handle_health(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        await write_json(writer, 200, {
+            "status": "ok",
+            "node_id": self.node_id,
+            "hubs": len(self.aex.available_hubs),
+            "ranked": self.ranked,
+            "executed": self.executed,
+            "hub_pool": self.aex.hub_pool.stats(),
+            "hub_health": self.aex.health.snapshot(),
+        })
+
+    async def handle_rank(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        payload = request.json()
+        task_request = self._task_request(payload)
+        top_k = int_field(payload, "top_k", 5)
+        ranked = await asyncio.to_thread(self.aex.rank_hubs, task_request)
+        self.ranked += 1
+        await write_json(writer, 200, {
+            "node_id": self.node_id,
+            "hubs": [dict(hub_to_dict(hub), score=score) for hub, score in ranked[:top_k]],
+        })
+
+    async def handle_execute(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        payload = request.json()
+        task_request = self._task_request(payload)
+        hub = self.aex.get_hub(payload.get("hub_id") or "")
+        if hub is None:
+            raise HTTPError(404, f"节点 {self.node_id} 不持有Hub: {payload.get('hub_id')}")
+
+        prompt = task_request.original_prompt
+        cached = await asyncio.to_thread(self.aex.lookup_cached_result, hub, prompt)
+        if cached:
+            await write_json(writer, 200, {"node_id": self.node_id, "hub_id": hub.hub_id,
+                                           "result": cached[0], "cached": True})
+            return
+        # 同一Hub的执行由 AgentExchange 的执行锁串行
+        result = await self.aex.arun_member(hub, prompt, task_request)
+        self.executed += 1
+        if result is None:
+            raise HTTPError(500, f"Hub {hub.hub_id} 执行失败")
+        self.aex.store_result(hub, prompt, result)
+        await write_json(writer, 200, {"node_id": self.node_id, "hub_id": hub.hub_id,
+                                       "result": result, "cached": False})
+
+    @staticmethod
+    def _task_request(payload: Dict[str, Any]) -> TaskRequest:
+        task = payload.get("task")
+        if not isinstance(task, dict) or not task.get("original_prompt"):
+            raise HTTPError(400, "缺少 task 字段")
+        try:
+            return TaskRequest.from_dict(task)
+        except (KeyError, TypeError) as e:
+            raise HTTPError(400, f"task 格式错误: {e}")
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        routes = {
+            "/health": ("GET", self.handle_health),
+            "/rank": ("POST", self.handle_rank),
+            "/execute": ("POST", self.handle_execute),
+        }
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            if request.path not in routes:
+                raise HTTPError(404, f"未知路径: {request.path}")
+            method, handler = routes[request.path]
+            if request.method != method:
+                raise HTTPError(405, f"{request.path} 仅支持 {method}")
+            await handler(request, writer)
+        except HTTPError as e:
+            await write_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            console.print(f"[red]节点 {self.node_id} 处理请求失败: {e}[/red]")
+            try:
+                await write_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        if not self.aex.available_hubs and not self.aex.load_hub_configs():
+            raise RuntimeError(f"节点 {self.node_id} 加载Hub配置失败")
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        console.print(f"[green]分片节点 {self.node_id} 已启动: http://{self.host}:{self.port} "
+                      f"（{len(self.aex.available_hubs)} 个Hub）[/green]")
+        async with server:
+            await server.serve_forever()
+
+
+class DistributedExchange:
+    """前端路由器：并行向全部分片请求候选Hub，合并全局top-k，并把执行转发给Hub所属节点"""
+
+    def __init__(self, nodes: Dict[str, str], top_k: int = 5, request_timeout: float = 10.0):
+        self.nodes = dict(nodes)
+        self.top_k = top_k
+        self.request_timeout = request_timeout
+        self.shard_errors: Dict[str, int] = {node: 0 for node in nodes}
+        self.forwarded: Dict[str, int] = {node: 0 for node in nodes}
+
+    async def _rank_shard(self, client: httpx.AsyncClient, node_id: str,
+                          task_request: TaskRequest, top_k: int) -> List[Tuple[RemoteHub, float]]:
+        try:
+            response = await client.post(f"{self.nodes[node_id]}/rank",
+                                         json={"task": task_request.to_dict(), "top_k": top_k})
+            response.raise_for_status()
+            return [(RemoteHub(node_id, hub), hub["score"]) for hub in response.json()["hubs"]]
+        except (httpx.HTTPError, ValueError, KeyError) as e:
+            # 单个分片不可用时只丢失该分片的候选，不影响整体路由
+            self.shard_errors[node_id] += 1
+            console.print(f"[yellow]分片 {node_id} 打分失败: {e}[/yellow]")
+            return []
+
+    async def arank_hubs(self, task_request: TaskRequest,
+                         top_k: Optional[int] = None) -> List[Tuple[RemoteHub, float]]:
+        """扇出到全部分片并合并各分片的top-k"""
+        top_k = top_k or self.top_k
+        async with httpx.AsyncClient(timeout=self.request_timeout) as client:
+            shard_results = await asyncio.gather(*(
+                self._rank_shard(client, node_id, task_request, top_k) for node_id in self.nodes
+            ))
+        return heapq.nlargest(top_k, (item for result in shard_results for item in result),
+                              key=lambda item: item[1])
+
+    def rank_hubs(self, task_request: TaskRequest, top_k: Optional[int] = None) -> List[Tuple[RemoteHub, float]]:
+        return asyncio.run(self.arank_hubs(task_request, top_k))
+
+    async def aexecute_task(self, task_request: TaskRequest) -> Optional[str]:
+        """按全局排名依次尝试，把执行转发给Hub所属节点；节点失败时转向下一个候选"""
+        ranked = await self.arank_hubs(task_request)
+        if not ranked:
+            console.print("[red]所有分片均没有可用的Hub[/red]")
+            return None
+        self.display_ranking(ranked)
+
+        for hub, _ in ranked:
+            # 转发给返回该候选的分片，分片划分以节点实际加载的配置为准
+            node_id = hub.node_id
+            remaining = task_request.remaining_time()
+            if remaining is not None and remaining <= 0:
+                break
+            # 执行耗时较长，HTTP超时跟随任务截止时间
+            timeout = None if remaining is None else remaining + self.request_timeout
+            try:
+                async with httpx.AsyncClient(timeout=timeout) as client:
+                    response = await client.post(f"{self.nodes[node_id]}/execute",
+                                                 json={"hub_id": hub.hub_id, "task": task_request.to_dict()})
+                response.raise_for_status()
+                self.forwarded[node_id] += 1
+                return response.json()["result"]
+            except (httpx.HTTPError, ValueError, KeyError) as e:
+                self.shard_errors[node_id] += 1
+                console.print(f"[yellow]节点 {node_id} 执行Hub {hub.hub_id} 失败: {e}，尝试下一个候选[/yellow]")
+        return None
+
+    def execute_task(self, task_request: TaskRequest) -> Optional[str]:
+        return asyncio.run(self.aexecute_task(task_request))
+
+    async def ahealth(self) -> Dict[str, Any]:
+        async def probe(client: httpx.AsyncClient, node_id: str):
+            try:
+                response = await client.get(f"{self.nodes[node_id]}/health")
+                return node_id, response.json()
+            except (httpx.HTTPError, ValueError) as e:
+                return node_id, {"status": "unreachable", "error": str(e)}
+
+        async with httpx.AsyncClient(timeout=self.request_timeout) as client:
+            return dict(await asyncio.gather(*(probe(client, node_id) for node_id in self.nodes)))
+
+    def display_ranking(self, ranked: List[Tuple[RemoteHub, float]]):
+        table = Table(title="分布式Hub排名")
+        table.add_column("Hub名称", style="cyan")
+        table.add_column("节点", style="magenta")
+        table.add_column("匹配分数", style="yellow")
+        table.add_column("能力", style="green")
+        for hub, score in ranked:
+            table.add_row(hub.name, hub.node_id, f"{score:.2f}", ", ".join(hub.capabilities))
+        console.print(table)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "nodes": self.nodes,
+            "forwarded": self.forwarded,
+            "shard_errors": self.shard_errors,
+        }
+
+
+def _node_main(node_id: str, config_file: str, host: str, port: int,
+               exchange_factory: Optional[Callable[[str], AgentExchange]] = None):
+    """节点进程入口：每个进程只加载自己分片的Hub配置"""
+    aex = exchange_factory(config_file) if exchange_factory else AgentExchange(config_file=config_file)
+    node = ShardNode(node_id, aex, host=host, port=port)
+    try:
+        asyncio.run(node.serve_forever())
+    except KeyboardInterrupt:
+        pass
+
+
+class LocalCluster:
+    """在本机以多个进程模拟分片节点（测试和单机扩展用）
+
+    exchange_factory(config_file) 用于在节点进程中创建 AgentExchange，默认使用默认配置。
+    """
+
+    def __init__(self, num_nodes: int = 3, config_file: str = "hubs_config.json",
+                 host: str = "127.0.0.1", base_port: int = 9100, vnodes: int = 160,
+                 shard_dir: str = "cache/shards",
+                 exchange_factory: Optional[Callable[[str], AgentExchange]] = None):
+        self.node_ids = [f"node-{i}" for i in range(num_nodes)]
+        self.config_file = config_file
+        self.host = host
+        self.base_port = base_port
+        self.vnodes = vnodes
+        self.shard_dir = shard_dir
+        self.exchange_factory = exchange_factory
+        self.processes: List[multiprocessing.Process] = []
+        self.nodes: Dict[str, str] = {}
+
+    def start(self, ready_timeout: float = 60.0) -> DistributedExchange:
+        """拆分配置、启动节点进程并等待全部就绪，返回前端路由器"""
+        ring = ConsistentHashRing(self.node_ids, self.vnodes)
+        partitions = partition_hub_configs(self.config_file, ring, self.shard_dir)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+        for i, node_id in enumerate(self.node_ids):
+            port = self.base_port + i
+            process = context.Process(target=_node_main,
+                                      args=(node_id, partitions[node_id], self.host, port,
+                                            self.exchange_factory),
+                                      daemon=True)
+            process.start()
+            self.processes.append(process)
+            self.nodes[node_id] = f"http://{self.host}:{port}"
+
+        deadline = time.time() + ready_timeout
+        for (node_id, url), process in zip(self.nodes.items(), self.processes):
+            while True:
+                try:
+                    httpx.get(f"{url}/health", timeout=1.0).raise_for_status()
+                    break
+                except httpx.HTTPError:
+                    if not process.is_alive() or time.time() > deadline:
+                        self.stop()
+                        raise RuntimeError(f"节点 {node_id} 未能在 {ready_timeout}s 内就绪")
+                    time.sleep(0.2)
+        console.print(f"[green]本地集群已就绪: {len(self.nodes)} 个节点[/green]")
+        return DistributedExchange(self.nodes)
+
+    def stop(self):
+        for process in self.processes:
+            process.terminate()
+        for process in self.processes:
+            process.join()
+        self.processes = []
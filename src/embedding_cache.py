@@ -0,0 +1,253 @@
+"""
+Embedding Cache
+嵌入向量缓存：多进程共享的追加日志存储，文件锁保护写入，原子重命名完成压缩
+"""
+
+import os
+import zlib
+import struct
+import atexit
+import threading
+from typing import Dict, Optional, Tuple, Iterator, List
+from pathlib import Path
+import numpy as np
+from rich.console import Console
+
+from .quantization import PackedVector
+
+try:
+    import fcntl
+except ImportError:  # Windows 上没有fcntl，退化为单进程使用
+    fcntl = None
+
+console = Console()
+
+# 记录头: 魔数, 键长度, 向量类型, 维度, int8缩放系数, 载荷CRC32
+_HEADER = struct.Struct("<HHBIfI")
+_MAGIC = 0xAE01
+_KINDS = {0: np.float32, 1: np.float16, 2: np.int8}
+_KIND_CODES = {np.dtype(dtype): code for code, dtype in _KINDS.items()}
+
+
+def _encode_record(key: str, packed: PackedVector) -> bytes:
+    if isinstance(packed, tuple):
+        vector, scale = packed
+    else:
+        vector, scale = packed, 1.0
+    vector = np.ascontiguousarray(vector)
+    if vector.dtype not in _KIND_CODES:
+        vector = vector.astype(np.float32)
+    key_bytes = key.encode('utf-8')
+    payload = key_bytes + vector.tobytes()
+    header = _HEADER.pack(_MAGIC, len(key_bytes), _KIND_CODES[vector.dtype], len(vector),
+                          float(scale), zlib.crc32(payload))
+    return header + payload
+
+
+def _decode_records(data: bytes, offset: int = 0) -> Tuple[List[Tuple[str, PackedVector]], int]:
+    """解析日志数据，返回 (记录列表, 最后一条完整记录的结束位置)
+
+    遇到不完整或校验失败的记录（例如写入进程崩溃留下的残尾）时停止。
+    """
+    records = []
+    while offset + _HEADER.size <= len(data):
+        magic, key_length, kind, dim, scale, checksum = _HEADER.unpack_from(data, offset)
+        if magic != _MAGIC or kind not in _KINDS:
+            break
+        dtype = np.dtype(_KINDS[kind])
+        start = offset + _HEADER.size
+        end = start + key_length + dim * dtype.itemsize
+        if end > len(data) or zlib.crc32(data[start:end]) != checksum:
+            break
+        key = data[start:start + key_length].decode('utf-8')
+        vector = np.frombuffer(data[start + key_length:end], dtype=dtype).copy()
+        records.append((key, (vector, scale) if kind == 2 else vector))
+        offset = end
+    return records, offset
+
+
+class EmbeddingCache:
+    """多进程安全的嵌入缓存
+
+    所有进程共享同一个追加日志文件：新向量先写入内存，由后台线程定期在排他锁下
+    追加到日志末尾，并读取其他进程追加的记录。日志中的重复键超过一定比例时，
+    在锁内写出压缩后的新文件并原子重命名替换；其他进程通过inode变化感知并重新加载。
+    文件读写和fsync只持有文件锁和进程内的IO锁，内存锁仅在读写字典时短暂持有，不阻塞查询。
+    """
+
+    def __init__(self, cache_dir: str = "cache/embeddings", flush_interval: float = 5.0,
+                 compact_ratio: float = 2.0, background: bool = True):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.log_path = self.cache_dir / "embeddings.log"
+        self.lock_path = self.cache_dir / "embeddings.lock"
+        self.flush_interval = flush_interval
+        self.compact_ratio = compact_ratio
+
+        self._entries: Dict[str, PackedVector] = {}
+        self._pending: Dict[str, PackedVector] = {}
+        self._lock = threading.RLock()
+        # 串行化本进程的日志读写，保护下面的日志位置状态
+        self._io_lock = threading.Lock()
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._log_records = 0
+
+        self.refresh()
+
+        self._stop = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        if background and flush_interval > 0:
+            self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+            self._flusher.start()
+        atexit.register(self.close)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._entries
+
+    def __setitem__(self, key: str, packed: PackedVector):
+        with self._lock:
+            self._entries[key] = packed
+            self._pending[key] = packed
+
+    def seed(self, key: str, packed: PackedVector):
+        """只写入内存、不写入日志（用于加载已持久化在别处的向量）"""
+        with self._lock:
+            self._entries.setdefault(key, packed)
+
+    def get(self, key: str) -> Optional[PackedVector]:
+        with self._lock:
+            return self._entries.get(key)
+
+    def items(self) -> Iterator[Tuple[str, PackedVector]]:
+        with self._lock:
+            return iter(list(self._entries.items()))
+
+    def _file_lock(self, exclusive: bool):
+        """跨进程文件锁（上下文管理器）"""
+        return _FileLock(self.lock_path, exclusive)
+
+    def _read_new_records(self, skip: Dict[str, PackedVector] = None):
+        """读取日志中尚未加载的部分；文件被压缩替换后从头重新加载
+
+        调用方持有 _io_lock 和文件锁；skip 中的键（正在写出的本进程新值）不被覆盖。
+        """
+        try:
+            stat = self.log_path.stat()
+        except FileNotFoundError:
+            self._offset, self._inode, self._log_records = 0, None, 0
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            self._offset, self._inode, self._log_records = 0, stat.st_ino, 0
+        if stat.st_size == self._offset:
+            return
+
+        with open(self.log_path, 'rb') as f:
+            f.seek(self._offset)
+            data = f.read()
+        records, consumed = _decode_records(data)
+        skip = skip or {}
+        with self._lock:
+            for key, packed in records:
+                if key not in self._pending and key not in skip:
+                    self._entries[key] = packed
+        self._offset += consumed
+        self._log_records += len(records)
+
+    def refresh(self):
+        """加载其他进程写入的新记录"""
+        with self._io_lock, self._file_lock(exclusive=False):
+            self._read_new_records()
+
+    def flush(self):
+        """将内存中的新向量追加到共享日志"""
+        with self._io_lock:
+            with self._lock:
+                if not self._pending:
+                    return
+                pending = self._pending
+                self._pending = {}
+            try:
+                with self._file_lock(exclusive=True):
+                    self._read_new_records(skip=pending)
+                    # 截掉崩溃进程留下的不完整记录，保证追加位置对齐
+                    if self.log_path.exists() and self.log_path.stat().st_size > self._offset:
+                        os.truncate(self.log_path, self._offset)
+                    data = b"".join(_encode_record(key, packed) for key, packed in pending.items())
+                    with open(self.log_path, 'ab') as f:
+                        f.write(data)
+                        f.flush()
+                        os.fsync(f.fileno())
+                    stat = self.log_path.stat()
+                    self._inode, self._offset = stat.st_ino, stat.st_size
+                    self._log_records += len(pending)
+
+                    if self._log_records > self.compact_ratio * max(len(self), 1):
+                        self._compact_locked()
+            except OSError as e:
+                # 写入失败时保留待写数据，下次重试（期间写入的新值优先）
+                with self._lock:
+                    pending.update(self._pending)
+                    self._pending = pending
+                console.print(f"[yellow]写入向量缓存失败: {e}[/yellow]")
+
+    def _compact_locked(self):
+        """在排他锁内重写日志，去除重复键（写临时文件后原子重命名）"""
+        with self._lock:
+            entries = list(self._entries.items())
+        tmp_path = self.log_path.with_suffix(f".tmp.{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            f.write(b"".join(_encode_record(key, packed) for key, packed in entries))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.log_path)
+        stat = self.log_path.stat()
+        self._inode, self._offset = stat.st_ino, stat.st_size
+        self._log_records = len(entries)
+
+    def compact(self):
+        with self._io_lock, self._file_lock(exclusive=True):
+            self._read_new_records()
+            self._compact_locked()
+
+    def _flush_loop(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+                self.refresh()
+            except Exception as e:
+                console.print(f"[yellow]后台刷新向量缓存失败: {e}[/yellow]")
+
+    def close(self):
+        """停止后台线程并写出剩余数据"""
+        self._stop.set()
+        if self._flusher is not None and self._flusher is not threading.current_thread():
+            self._flusher.join(timeout=self.flush_interval)
+            self._flusher = None
+        self.flush()
+
+
+class _FileLock:
+    """基于flock的跨进程读写锁；无fcntl时不加锁"""
+
+    def __init__(self, path: Path, exclusive: bool):
+        self.path = path
+        self.exclusive = exclusive
+        self._fd: Optional[int] = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(self._fd, fcntl.LOCK_EX if self.exclusive else fcntl.LOCK_SH)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+            os.close(self._fd)
+            self._fd = None
@@ -13,80 +13,167 @@ import requests
 import numpy as np
 from rich.console import Console
 
+from .quantization import PackedVector, pack_vector, unpack_vector
+from .embedding_cache import EmbeddingCache
+from .rate_limiter import get_rate_limiter, limiter_key, estimate_request_tokens, DEFAULT_RETRY_AFTER
+
 console = Console()
 
+# jina-clip-v2 输出1024维向量，采用Matryoshka训练，截断前缀后重新归一化仍可用于检索
+FULL_DIMENSIONS = {"jina-clip-v2": 1024}
+
+
+def truncate_embeddings(vectors: np.ndarray, dimensions: int) -> np.ndarray:
+    """Matryoshka式降维：保留前 dimensions 维并重新L2归一化"""
+    vectors = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
 
 class EmbeddingService:
     """向量嵌入服务"""
     
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, precision: str = "float32",
+                 dimensions: int = None, truncate_locally: bool = False,
+                 cache_flush_interval: float = 5.0):
         self.api_key = api_key or os.getenv("JINA_API_KEY", "jina_1eab753c55994fe0973e7996d65e9432j_ghOOZ4ayKDNh0J4WgKZGC1Ihqt")
         self.base_url = "https://api.jina.ai/v1/embeddings"
         self.model = "jina-clip-v2"
+        # dimensions 为None时使用模型完整维度；truncate_locally 为True时请求完整向量后本地截断，
+        # 否则通过API的 dimensions 参数直接请求低维向量
+        self.dimensions = dimensions
+        self.truncate_locally = truncate_locally
         self.cache_dir = Path("cache/embeddings")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # 向量缓存
-        self.embedding_cache: Dict[str, np.ndarray] = {}
+        # 向量缓存，按 precision（float32 / float16 / int8）压缩存储，读取时还原为float32；
+        # 多个进程共享同一个缓存目录，新向量由后台线程每 cache_flush_interval 秒写出
+        self.precision = precision
+        self.cache_flush_interval = cache_flush_interval
+        self.embedding_cache: EmbeddingCache = None
         self.load_cache()
     
-    def _get_cache_key(self, text: str) -> str:
+    @property
+    def namespace(self) -> str:
+        """缓存命名空间：不同模型和维度的向量互不混用"""
+        return f"{self.model}:{self.dimensions or 'full'}"
+
+    def _get_cache_key(self, text: str, namespace: str = None) -> str:
         """生成缓存键"""
-        return hashlib.md5(text.encode('utf-8')).hexdigest()
+        digest = hashlib.md5(text.encode('utf-8')).hexdigest()
+        return f"{namespace or self.namespace}:{digest}"
+
+    def _lookup_cache(self, text: str) -> Optional[np.ndarray]:
+        """查询缓存；低维请求可复用完整维度的缓存向量截断得到"""
+        packed = self.embedding_cache.get(self._get_cache_key(text))
+        if packed is not None:
+            return unpack_vector(packed)
+        if self.dimensions:
+            packed = self.embedding_cache.get(self._get_cache_key(text, f"{self.model}:full"))
+            if packed is not None:
+                embedding = truncate_embeddings(unpack_vector(packed), self.dimensions)
+                self.embedding_cache[self._get_cache_key(text)] = self._pack(embedding)
+                return embedding
+        return None
+
+    def _request_payload(self, texts: List[str]) -> Dict[str, Any]:
+        data = {
+            "model": self.model,
+            "input": [{"text": text} for text in texts]
+        }
+        if self.dimensions and not self.truncate_locally:
+            data["dimensions"] = self.dimensions
+        return data
+
+    def _post(self, data: Dict[str, Any], max_retries: int = 3) -> requests.Response:
+        """发送嵌入请求；启用限流时先排队等待额度，收到429后退让并重试"""
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.api_key}"
+        }
+        limiter = get_rate_limiter()
+        key = limiter_key(self.base_url, self.api_key, self.model)
+        for attempt in range(max_retries + 1):
+            if limiter is not None:
+                limiter.acquire(key, estimate_request_tokens(data))
+            response = requests.post(self.base_url, headers=headers, json=data)
+            if response.status_code != 429 or limiter is None or attempt == max_retries:
+                return response
+            try:
+                retry_after = float(response.headers.get("Retry-After", DEFAULT_RETRY_AFTER))
+            except ValueError:
+                retry_after = DEFAULT_RETRY_AFTER
+            limiter.penalize(key, retry_after)
+        return response
+
+    def _fit_dimensions(self, embedding: np.ndarray) -> np.ndarray:
+        """需要时截断到配置的维度"""
+        if self.dimensions and embedding.shape[-1] > self.dimensions:
+            return truncate_embeddings(embedding, self.dimensions)
+        return embedding
     
     def load_cache(self):
-        """加载缓存的向量"""
-        cache_file = self.cache_dir / "embeddings.pkl"
-        if cache_file.exists():
+        """打开共享向量缓存，并迁移旧版pickle缓存"""
+        self.embedding_cache = EmbeddingCache(str(self.cache_dir), flush_interval=self.cache_flush_interval)
+
+        legacy_file = self.cache_dir / "embeddings.pkl"
+        # 旧文件保持原样，迁移后写入标记文件；旧文件更新后重新迁移
+        marker = legacy_file.with_suffix(".pkl.migrated")
+        if legacy_file.exists() and (not marker.exists() or marker.stat().st_mtime < legacy_file.stat().st_mtime):
             try:
-                with open(cache_file, 'rb') as f:
-                    self.embedding_cache = pickle.load(f)
-                console.print(f"[green]加载了 {len(self.embedding_cache)} 个缓存向量[/green]")
+                with open(legacy_file, 'rb') as f:
+                    cache = pickle.load(f)
+                # 旧版缓存键不含命名空间，均为 jina-clip-v2 完整维度向量
+                for key, value in cache.items():
+                    key = key if ":" in key else f"jina-clip-v2:full:{key}"
+                    if key not in self.embedding_cache:
+                        self.embedding_cache[key] = self._pack(unpack_vector(value))
+                self.embedding_cache.flush()
+                marker.touch()
+                console.print(f"[green]已迁移 {len(cache)} 个旧版缓存向量[/green]")
             except Exception as e:
-                console.print(f"[yellow]加载向量缓存失败: {e}[/yellow]")
-                self.embedding_cache = {}
+                console.print(f"[yellow]迁移旧版向量缓存失败: {e}[/yellow]")
+
+        if len(self.embedding_cache):
+            console.print(f"[green]加载了 {len(self.embedding_cache)} 个缓存向量[/green]")
     
     def save_cache(self):
-        """保存向量缓存"""
-        cache_file = self.cache_dir / "embeddings.pkl"
-        try:
-            with open(cache_file, 'wb') as f:
-                pickle.dump(self.embedding_cache, f)
-            console.print(f"[green]保存了 {len(self.embedding_cache)} 个向量到缓存[/green]")
-        except Exception as e:
-            console.print(f"[yellow]保存向量缓存失败: {e}[/yellow]")
+        """立即写出缓存（后台线程也会定期写出）"""
+        self.embedding_cache.flush()
     
+    def seed_embeddings(self, embeddings: Dict[str, np.ndarray]):
+        """用预构建的 文本 -> 向量 填充内存缓存（向量需属于当前模型和维度）"""
+        for text, embedding in embeddings.items():
+            self.embedding_cache.seed(self._get_cache_key(text), self._pack(embedding))
+
+    def _pack(self, embedding: np.ndarray) -> PackedVector:
+        return pack_vector(embedding, self.precision)
+
     def get_embedding(self, text: str) -> Optional[np.ndarray]:
         """获取文本的向量嵌入"""
         cache_key = self._get_cache_key(text)
         
         # 检查缓存
-        if cache_key in self.embedding_cache:
-            return self.embedding_cache[cache_key]
+        cached = self._lookup_cache(text)
+        if cached is not None:
+            return cached
         
         # 调用API获取嵌入
         try:
-            headers = {
-                "Content-Type": "application/json",
-                "Authorization": f"Bearer {self.api_key}"
-            }
-            
-            data = {
-                "model": self.model,
-                "input": [{"text": text}]
-            }
-            
-            response = requests.post(self.base_url, headers=headers, json=data)
+            response = self._post(self._request_payload([text]))
             response.raise_for_status()
             
             result = response.json()
             if "data" in result and len(result["data"]) > 0:
-                embedding = np.array(result["data"][0]["embedding"])
+                embedding = self._fit_dimensions(
+                    np.array(result["data"][0]["embedding"], dtype=np.float32)
+                )
                 
                 # 缓存结果
-                self.embedding_cache[cache_key] = embedding
+                self.embedding_cache[cache_key] = self._pack(embedding)
                 
-                return embedding
+                return unpack_vector(self.embedding_cache.get(cache_key))
             else:
                 console.print(f"[red]API返回格式错误: {result}[/red]")
                 return None
@@ -102,26 +189,16 @@ class EmbeddingService:
         
         # 检查缓存
         for text in texts:
-            cache_key = self._get_cache_key(text)
-            if cache_key in self.embedding_cache:
-                results[text] = self.embedding_cache[cache_key]
+            cached = self._lookup_cache(text)
+            if cached is not None:
+                results[text] = cached
             else:
                 uncached_texts.append(text)
         
         # 批量获取未缓存的嵌入
         if uncached_texts:
             try:
-                headers = {
-                    "Content-Type": "application/json",
-                    "Authorization": f"Bearer {self.api_key}"
-                }
-                
-                data = {
-                    "model": self.model,
-                    "input": [{"text": text} for text in uncached_texts]
-                }
-                
-                response = requests.post(self.base_url, headers=headers, json=data)
+                response = self._post(self._request_payload(uncached_texts))
                 response.raise_for_status()
                 
                 result = response.json()
@@ -129,12 +206,14 @@ class EmbeddingService:
                     for i, item in enumerate(result["data"]):
                         if i < len(uncached_texts):
                             text = uncached_texts[i]
-                            embedding = np.array(item["embedding"])
+                            embedding = self._fit_dimensions(
+                                np.array(item["embedding"], dtype=np.float32)
+                            )
                             
                             # 缓存结果
                             cache_key = self._get_cache_key(text)
-                            self.embedding_cache[cache_key] = embedding
-                            results[text] = embedding
+                            self.embedding_cache[cache_key] = self._pack(embedding)
+                            results[text] = unpack_vector(self.embedding_cache.get(cache_key))
                 
             except Exception as e:
                 console.print(f"[red]批量获取嵌入向量失败: {e}[/red]")
@@ -175,7 +254,3 @@ class EmbeddingService:
         similarities.sort(key=lambda x: x[1], reverse=True)
         
         return similarities[:top_k]
-    
-    def __del__(self):
-        """析构函数，保存缓存"""
-        self.save_cache()
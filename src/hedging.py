@@ -0,0 +1,181 @@
+"""
+Hedged Execution
+对冲执行：在排名靠前的多个Hub上推测性执行同一任务，取最先成功的结果以降低尾延迟
+"""
+
+import time
+import asyncio
+import threading
+from typing import List, Dict, Any, Optional, Tuple, Callable, AsyncContextManager
+
+from .agent_hub import is_partial_output
+from .hub_stats import HubStatsRegistry
+
+
+class HedgeReport:
+    """一次对冲执行的结果报告"""
+
+    def __init__(self, primary_hub_id: str):
+        self.primary_hub_id = primary_hub_id
+        self.winner_hub_id: Optional[str] = None
+        self.latency = 0.0
+        self.started: List[str] = []
+        self.cancelled: List[str] = []
+        self.failed: List[str] = []
+        # 被取消或失败的执行所消耗的时间（秒），即额外的LLM开销
+        self.wasted_seconds = 0.0
+        # 相对主Hub p95延迟节省的时间估计（秒）
+        self.estimated_gain = 0.0
+
+    @property
+    def hedged(self) -> bool:
+        return len(self.started) > 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "primary_hub_id": self.primary_hub_id,
+            "winner_hub_id": self.winner_hub_id,
+            "latency": self.latency,
+            "started": self.started,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "wasted_seconds": self.wasted_seconds,
+            "estimated_gain": self.estimated_gain,
+        }
+
+
+class HedgeSummary:
+    """对冲执行的累计统计"""
+
+    def __init__(self):
+        self.runs = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.wasted_seconds = 0.0
+        self.estimated_gain = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, report: HedgeReport):
+        with self._lock:
+            self.runs += 1
+            if report.hedged:
+                self.hedges_fired += 1
+            if report.winner_hub_id and report.winner_hub_id != report.primary_hub_id:
+                self.hedge_wins += 1
+            self.wasted_seconds += report.wasted_seconds
+            self.estimated_gain += report.estimated_gain
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self.runs,
+                "hedges_fired": self.hedges_fired,
+                "hedge_wins": self.hedge_wins,
+                "wasted_seconds": self.wasted_seconds,
+                "estimated_gain": self.estimated_gain,
+            }
+
+
+async def run_hedged(candidates: List[Tuple[str, Any]], prompt: str, hub_stats: HubStatsRegistry,
+                     hedge_delay: Optional[float] = None, default_delay: float = 10.0,
+                     percentile: float = 95,
+                     deadline: Optional[float] = None,
+                     on_finish: Optional[Callable[[str, bool], None]] = None,
+                     exclusive: Optional[Callable[[str], AsyncContextManager]] = None
+                     ) -> Tuple[Optional[str], HedgeReport]:
+    """按排名顺序对冲执行
+
+    candidates 为 [(hub_id, hub_instance)]，第一个为主Hub。
+    hedge_delay 为0时所有候选同时启动；为None时使用上一个Hub的p95延迟
+    （样本不足时使用 default_delay）作为启动下一个候选前的等待时间。
+    deadline 会传递给每个Hub的 arun，到期的执行会被取消。
+    只有成功的输出会胜出并取消其余候选；超时返回的部分输出在所有候选都结束且没有成功结果时才返回。
+    on_finish(hub_id, success) 在每个执行完成（非取消）时回调，用于更新Hub健康状态。
+    exclusive(hub_id) 返回执行期间持有的异步上下文管理器（Hub执行锁），保证同一Hub不被并发调用。
+    """
+    primary_id = candidates[0][0]
+    report = HedgeReport(primary_id)
+    start = time.perf_counter()
+    running: Dict[asyncio.Task, Tuple[str, float]] = {}
+
+    async def execute(hub_id: str, hub_instance) -> Optional[str]:
+        if exclusive is None:
+            return await hub_instance.arun(prompt, deadline=deadline)
+        async with exclusive(hub_id):
+            return await hub_instance.arun(prompt, deadline=deadline)
+
+    def launch(hub_id: str, hub_instance):
+        hub_stats.start(hub_id)
+        task = asyncio.ensure_future(execute(hub_id, hub_instance))
+        running[task] = (hub_id, time.perf_counter())
+        report.started.append(hub_id)
+
+    def delay_after(hub_id: str) -> float:
+        if hedge_delay is not None:
+            return hedge_delay
+        observed = hub_stats.get(hub_id).latency_percentile(percentile)
+        return observed if observed is not None else default_delay
+
+    result = None
+    # 超时返回的部分输出：只有所有候选都结束且没有成功结果时才作为结果返回
+    fallback: Optional[Tuple[str, str, float]] = None
+    pending_candidates = list(candidates)
+    launch(*pending_candidates.pop(0))
+    try:
+        while running:
+            # 还有候选时，最多等待对冲延迟；否则等待任意执行完成
+            timeout = delay_after(report.started[-1]) if pending_candidates else None
+            if timeout == 0:
+                launch(*pending_candidates.pop(0))
+                continue
+
+            done, _ = await asyncio.wait(running, timeout=timeout,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                launch(*pending_candidates.pop(0))
+                continue
+
+            for task in done:
+                hub_id, started_at = running.pop(task)
+                elapsed = time.perf_counter() - started_at
+                output = None if task.exception() else task.result()
+                succeeded = output is not None and not is_partial_output(output)
+                hub_stats.finish(hub_id, started_at, succeeded)
+                if on_finish:
+                    on_finish(hub_id, succeeded)
+                if succeeded and result is None:
+                    result = output
+                    report.winner_hub_id = hub_id
+                    continue
+                if output is None:
+                    report.failed.append(hub_id)
+                elif not succeeded and fallback is None:
+                    fallback = (hub_id, output, elapsed)
+                report.wasted_seconds += elapsed
+
+            if result is not None:
+                break
+            # 全部失败时立即启动下一个候选
+            if not running and pending_candidates:
+                launch(*pending_candidates.pop(0))
+    finally:
+        # 取消仍在运行的执行
+        for task, (hub_id, started_at) in running.items():
+            task.cancel()
+            hub_stats.abandon(hub_id)
+            report.cancelled.append(hub_id)
+            report.wasted_seconds += time.perf_counter() - started_at
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
+
+    if result is None and fallback is not None:
+        hub_id, result, elapsed = fallback
+        report.winner_hub_id = hub_id
+        report.wasted_seconds -= elapsed
+    report.latency = time.perf_counter() - start
+    if report.winner_hub_id and report.winner_hub_id != primary_id:
+        primary_stats = hub_stats.get(primary_id)
+        expected = primary_stats.latency_percentile(percentile) or primary_stats.ewma_latency
+        if expected is not None:
+            report.estimated_gain = max(expected - report.latency, 0.0)
+    return result, report
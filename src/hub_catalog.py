@@ -0,0 +1,312 @@
+"""
+Hub Catalog
+编译后的二进制Hub目录：字符串表 + 列式数组 + 能力→Hub倒排索引，以内存映射方式加载，适用于十万级以上的Hub注册表
+
+生成: python main.py compile-catalog --input hubs_config.json --output cache/hubs_catalog.bin
+"""
+
+import os
+import json
+import mmap
+import struct
+from typing import List, Dict, Any, Optional, Iterable, Iterator, Tuple
+from pathlib import Path
+import numpy as np
+
+CATALOG_MAGIC = b"AEXHUBC\x00"
+# 格式版本，格式变化时递增，旧版本文件拒绝加载
+CATALOG_VERSION = 2
+DEFAULT_CATALOG_PATH = "cache/hubs_catalog.bin"
+
+# 文件头: 魔数, 版本, Hub数, 能力数, 段数
+_HEADER = struct.Struct("<8sIIII")
+# 段表项: 段名, dtype, 偏移, 元素个数
+_SECTION = struct.Struct("<24s4sQQ")
+_ALIGN = 8
+
+
+class _StringTable:
+    """UTF-8字符串表：偏移数组 + 拼接后的字节，按需解码"""
+
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def encoded(self, index: int) -> bytes:
+        return self.blob[int(self.offsets[index]):int(self.offsets[index + 1])].tobytes()
+
+    def __getitem__(self, index: int) -> str:
+        return self.encoded(index).decode('utf-8')
+
+    @staticmethod
+    def build(values: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+        encoded = [value.encode('utf-8') for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(value) for value in encoded])
+        return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class HubView:
+    """目录中一行Hub记录的只读视图，字段在访问时从内存映射中读取
+
+    与 HubInfo 具有相同的属性，可直接用于路由、打分和执行。
+    """
+
+    __slots__ = ("catalog", "row")
+
+    def __init__(self, catalog: 'HubCatalog', row: int):
+        self.catalog = catalog
+        self.row = row
+
+    @property
+    def hub_id(self) -> str:
+        return self.catalog.hub_ids[self.row]
+
+    @property
+    def name(self) -> str:
+        return self.catalog.names[self.row]
+
+    @property
+    def description(self) -> str:
+        return self.catalog.descriptions[self.row]
+
+    @property
+    def capabilities(self) -> List[str]:
+        return self.catalog.hub_capabilities(self.row)
+
+    @property
+    def hub_class(self) -> str:
+        return self.catalog.hub_classes[self.catalog.hub_class_ids[self.row]]
+
+    @property
+    def cacheable(self) -> bool:
+        return bool(self.catalog.cacheable[self.row])
+
+    @property
+    def timeout(self) -> Optional[float]:
+        timeout = float(self.catalog.timeouts[self.row])
+        return None if np.isnan(timeout) else timeout
+
+    @property
+    def cost(self) -> float:
+        return float(self.catalog.costs[self.row])
+
+    @property
+    def cache_ttl(self) -> Optional[float]:
+        cache_ttl = float(self.catalog.cache_ttls[self.row])
+        return None if np.isnan(cache_ttl) else cache_ttl
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "hub_id": self.hub_id,
+            "name": self.name,
+            "description": self.description,
+            "capabilities": self.capabilities,
+            "hub_class": self.hub_class,
+            "cacheable": self.cacheable,
+            "timeout": self.timeout,
+            "cost": self.cost,
+            "cache_ttl": self.cache_ttl,
+        }
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, HubView) and other.catalog is self.catalog and other.row == self.row
+
+    def __hash__(self) -> int:
+        return hash((id(self.catalog), self.row))
+
+    def __repr__(self) -> str:
+        return f"HubView(hub_id='{self.hub_id}', row={self.row})"
+
+
+class HubCatalog:
+    """内存映射的只读Hub目录，按行号提供 HubView 序列
+
+    文件布局: 文件头 | 段表 | 按8字节对齐的各段数组
+        hub_id / name / description     字符串表（offsets + blob）
+        class / capability              去重后的字符串表，Hub以整数id引用
+        hub_class                       Hub -> 类名id
+        hub_cap_indptr / hub_cap_ids    Hub -> 能力id 的CSR
+        cap_hub_indptr / cap_hub_rows   能力id -> Hub行号 的倒排CSR
+        cacheable / timeout / cost / cache_ttl  列式字段（timeout、cache_ttl 为NaN表示未设置）
+        hub_id_order                    按hub_id字节序排序的行号，用于二分查找
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            # 只读映射，多个进程共享同一份操作系统页缓存
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, hub_count, capability_count, section_count = _HEADER.unpack_from(self._mmap, 0)
+        if magic != CATALOG_MAGIC:
+            raise ValueError(f"不是Hub目录文件: {path}")
+        if version != CATALOG_VERSION:
+            raise ValueError(f"Hub目录版本 {version} 与当前版本 {CATALOG_VERSION} 不一致，请重新生成")
+
+        sections = {}
+        for i in range(section_count):
+            name, dtype, offset, count = _SECTION.unpack_from(self._mmap, _HEADER.size + i * _SECTION.size)
+            sections[name.rstrip(b"\0").decode('ascii')] = np.frombuffer(
+                self._mmap, dtype=np.dtype(dtype.rstrip(b"\0").decode('ascii')), count=count, offset=offset)
+
+        self.hub_ids = _StringTable(sections["hub_id_offsets"], sections["hub_id_blob"])
+        self.names = _StringTable(sections["name_offsets"], sections["name_blob"])
+        self.descriptions = _StringTable(sections["description_offsets"], sections["description_blob"])
+        capability_table = _StringTable(sections["capability_offsets"], sections["capability_blob"])
+        class_table = _StringTable(sections["class_offsets"], sections["class_blob"])
+        # 能力名和类名数量很少，解码一次常驻内存
+        self.capability_names: List[str] = [capability_table[i] for i in range(capability_count)]
+        self.capability_ids: Dict[str, int] = {name: i for i, name in enumerate(self.capability_names)}
+        self.hub_classes: List[str] = [class_table[i] for i in range(len(class_table))]
+
+        self.hub_class_ids = sections["hub_class"]
+        self.hub_cap_indptr = sections["hub_cap_indptr"]
+        self.hub_cap_ids = sections["hub_cap_ids"]
+        self.cap_hub_indptr = sections["cap_hub_indptr"]
+        self.cap_hub_rows = sections["cap_hub_rows"]
+        self.cacheable = sections["cacheable"]
+        self.timeouts = sections["timeout"]
+        self.costs = sections["cost"]
+        self.cache_ttls = sections["cache_ttl"]
+        self.hub_id_order = sections["hub_id_order"]
+        self._count = hub_count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, row: int) -> HubView:
+        if row < 0:
+            row += self._count
+        if not 0 <= row < self._count:
+            raise IndexError(row)
+        return HubView(self, row)
+
+    def __iter__(self) -> Iterator[HubView]:
+        return (HubView(self, row) for row in range(self._count))
+
+    def hub_capabilities(self, row: int) -> List[str]:
+        ids = self.hub_cap_ids[self.hub_cap_indptr[row]:self.hub_cap_indptr[row + 1]]
+        return [self.capability_names[i] for i in ids]
+
+    def capability_counts(self) -> np.ndarray:
+        """每个Hub的能力数"""
+        return np.diff(self.hub_cap_indptr)
+
+    def index_of(self, hub_id: str) -> Optional[int]:
+        """按hub_id二分查找行号"""
+        target = hub_id.encode('utf-8')
+        low, high = 0, self._count
+        while low < high:
+            mid = (low + high) // 2
+            if self.hub_ids.encoded(self.hub_id_order[mid]) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self._count and self.hub_ids.encoded(self.hub_id_order[low]) == target:
+            return int(self.hub_id_order[low])
+        return None
+
+    def get(self, hub_id: str) -> Optional[HubView]:
+        row = self.index_of(hub_id)
+        return None if row is None else HubView(self, row)
+
+    def match_counts(self, capabilities: Iterable[str]) -> Tuple[np.ndarray, np.ndarray]:
+        """通过倒排索引找出至少具备一项所需能力的Hub，返回 (行号, 匹配的能力数)"""
+        ids = {self.capability_ids[name] for name in capabilities if name in self.capability_ids}
+        if not ids:
+            return np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int64)
+        rows = np.concatenate([self.cap_hub_rows[self.cap_hub_indptr[i]:self.cap_hub_indptr[i + 1]]
+                               for i in ids])
+        return np.unique(rows, return_counts=True)
+
+    def close(self):
+        """关闭映射，之后不能再访问目录中的Hub"""
+        # 各段数组引用着映射内存，先释放才能关闭映射
+        for name, value in list(vars(self).items()):
+            if isinstance(value, (np.ndarray, _StringTable)):
+                setattr(self, name, None)
+        try:
+            self._mmap.close()
+        except BufferError:
+            # 调用方仍持有映射内存上的数组，映射在这些引用释放后由垃圾回收关闭
+            pass
+
+    @staticmethod
+    def write(path: str, configs: List[Dict[str, Any]]) -> str:
+        """将Hub配置（hubs_config.json 的内容）编译为目录文件"""
+        capability_names = sorted({cap for config in configs for cap in config['capabilities']})
+        capability_ids = {name: i for i, name in enumerate(capability_names)}
+        class_names = sorted({config['hub_class'] for config in configs})
+        class_ids = {name: i for i, name in enumerate(class_names)}
+
+        hub_cap_indptr = np.zeros(len(configs) + 1, dtype=np.int64)
+        hub_cap_ids: List[int] = []
+        cap_rows: List[List[int]] = [[] for _ in capability_names]
+        for row, config in enumerate(configs):
+            ids = sorted({capability_ids[cap] for cap in config['capabilities']})
+            hub_cap_ids.extend(ids)
+            hub_cap_indptr[row + 1] = len(hub_cap_ids)
+            for cap_id in ids:
+                cap_rows[cap_id].append(row)
+        cap_hub_indptr = np.zeros(len(capability_names) + 1, dtype=np.int64)
+        cap_hub_indptr[1:] = np.cumsum([len(rows) for rows in cap_rows])
+
+        hub_ids = [config['hub_id'] for config in configs]
+        if len(set(hub_ids)) != len(hub_ids):
+            raise ValueError("hub_id 存在重复")
+        encoded_ids = [hub_id.encode('utf-8') for hub_id in hub_ids]
+
+        sections: Dict[str, np.ndarray] = {}
+        for table, values in (("hub_id", hub_ids),
+                              ("name", [config['name'] for config in configs]),
+                              ("description", [config['description'] for config in configs]),
+                              ("capability", capability_names),
+                              ("class", class_names)):
+            sections[f"{table}_offsets"], sections[f"{table}_blob"] = _StringTable.build(values)
+        sections.update({
+            "hub_class": np.array([class_ids[config['hub_class']] for config in configs], dtype=np.int32),
+            "hub_cap_indptr": hub_cap_indptr,
+            "hub_cap_ids": np.array(hub_cap_ids, dtype=np.int32),
+            "cap_hub_indptr": cap_hub_indptr,
+            "cap_hub_rows": np.fromiter((row for rows in cap_rows for row in rows), dtype=np.int32),
+            "cacheable": np.array([config.get('cacheable', True) for config in configs], dtype=np.uint8),
+            "timeout": np.array([np.nan if config.get('timeout') is None else config['timeout']
+                                 for config in configs], dtype=np.float64),
+            "cost": np.array([config.get('cost', 1.0) for config in configs], dtype=np.float64),
+            "cache_ttl": np.array([np.nan if config.get('cache_ttl') is None else config['cache_ttl']
+                                   for config in configs], dtype=np.float64),
+            "hub_id_order": np.array(sorted(range(len(configs)), key=encoded_ids.__getitem__), dtype=np.int32),
+        })
+
+        offset = _HEADER.size + _SECTION.size * len(sections)
+        table, body = [], []
+        for name, array in sections.items():
+            if len(name) > 24:
+                raise ValueError(f"段名过长: {name}")
+            padding = -offset % _ALIGN
+            body.append(b"\0" * padding)
+            offset += padding
+            data = np.ascontiguousarray(array).tobytes()
+            table.append(_SECTION.pack(name.encode('ascii'), array.dtype.str.encode('ascii'), offset, len(array)))
+            body.append(data)
+            offset += len(data)
+
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{path}.tmp-{os.getpid()}"
+        with open(tmp_path, 'wb') as f:
+            f.write(_HEADER.pack(CATALOG_MAGIC, CATALOG_VERSION, len(configs), len(capability_names), len(sections)))
+            f.writelines(table)
+            f.writelines(body)
+        # 原子替换，已映射旧文件的进程不受影响
+        os.replace(tmp_path, path)
+        return path
+
+
+def compile_catalog(config_file: str, output: str = DEFAULT_CATALOG_PATH) -> str:
+    """将 hubs_config.json 转换为二进制目录"""
+    with open(config_file, 'r', encoding='utf-8') as f:
+        configs = json.load(f)
+    return HubCatalog.write(output, configs)
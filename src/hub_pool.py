@@ -0,0 +1,289 @@
+"""
+Hub Instance Pool
+Hub实例池：统计常驻Hub实例的内存占用，按空闲超时和LRU回收团队（固定的热点Hub除外）
+"""
+
+import gc
+import sys
+import time
+import types
+import threading
+from collections import OrderedDict, deque
+from typing import Dict, Any, Optional, Callable, Iterable, List
+
+from rich.console import Console
+
+console = Console()
+
+# 估算内存时不展开的对象：代码、类和模块由所有实例共享，不属于某个Hub
+_SHARED_TYPES = (
+    type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType,
+    types.MethodType, types.CodeType, types.FrameType,
+)
+
+
+def estimate_memory(root: Any, exclude: Iterable[Any] = (), max_objects: int = 200000) -> int:
+    """递归估算对象图占用的字节数（sys.getsizeof 之和，每个对象只计一次）
+
+    exclude 中的对象（如进程内共享的缓存和限流器）及其引用的对象不计入。
+    """
+    seen = {id(obj) for obj in exclude if obj is not None}
+    pending = [root]
+    total = 0
+    while pending and len(seen) < max_objects:
+        obj = pending.pop()
+        if id(obj) in seen or isinstance(obj, _SHARED_TYPES):
+            continue
+        seen.add(id(obj))
+        try:
+            total += sys.getsizeof(obj)
+        except TypeError:
+            continue
+        if isinstance(obj, (str, bytes, bytearray, int, float, bool)):
+            continue
+        if isinstance(obj, dict):
+            pending.extend(obj.keys())
+            pending.extend(obj.values())
+        elif isinstance(obj, (list, tuple, set, frozenset, deque)):
+            pending.extend(obj)
+        if hasattr(obj, "__dict__"):
+            pending.append(obj.__dict__)
+        for slot in getattr(type(obj), "__slots__", ()):
+            value = getattr(obj, slot, None)
+            if value is not None:
+                pending.append(value)
+    return total
+
+
+class ResidentHub:
+    """常驻的Hub实例及其占用统计"""
+
+    def __init__(self, hub_id: str, instance: Any):
+        self.hub_id = hub_id
+        self.instance = instance
+        self.created_at = time.time()
+        self.last_used = time.time()
+        self.uses = 0
+        # 调用方借出（正在使用或等待执行）的次数，借出期间不回收
+        self.leases = 0
+        self.memory_bytes = 0
+        # 新建或执行后会话记忆可能增长，由后台线程重新估算
+        self.stale = False
+
+    def idle_seconds(self) -> float:
+        return time.time() - self.last_used
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "memory_bytes": self.memory_bytes,
+            "idle_seconds": round(self.idle_seconds(), 1),
+            "uses": self.uses,
+            "leases": self.leases,
+            "age_seconds": round(time.time() - self.created_at, 1),
+        }
+
+
+class HubInstancePool:
+    """按hub_id缓存的Hub实例池
+
+    淘汰策略:
+        idle_timeout     空闲超过该秒数的实例被回收（0表示不按空闲回收）
+        max_resident     常驻实例数上限，超出时回收最久未使用的实例（0表示不限）
+        max_memory_bytes 常驻实例估算内存之和上限，超出时按LRU回收（0表示不限）
+
+    固定（pinned）的Hub、被调用方借出（lease）的Hub和正在执行任务的Hub不会被回收。被回收的Hub
+    调用 teardown 释放团队、模型客户端和会话记忆，下次被选中时重新创建。新建实例和执行结束后的
+    内存估算需要遍历对象图，不在请求路径上进行，由后台线程每 remeasure_interval 秒处理一次。
+    """
+
+    def __init__(self, idle_timeout: float = 0.0, max_resident: int = 0, max_memory_bytes: int = 0,
+                 pinned: Iterable[str] = (), in_use: Optional[Callable[[str], bool]] = None,
+                 shared_objects: Callable[[], Iterable[Any]] = None, remeasure_interval: float = 30.0):
+        self.idle_timeout = idle_timeout
+        self.max_resident = max_resident
+        self.max_memory_bytes = max_memory_bytes
+        self.remeasure_interval = remeasure_interval
+        self.pinned = set(pinned)
+        self.in_use = in_use
+        self.shared_objects = shared_objects
+
+        self.created = 0
+        self.evictions: Dict[str, int] = {}
+        self.reclaimed_bytes = 0
+        self._hubs: "OrderedDict[str, ResidentHub]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    def __contains__(self, hub_id: str) -> bool:
+        with self._lock:
+            return hub_id in self._hubs
+
+    def __len__(self) -> int:
+        return len(self._hubs)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._hubs.keys())
+
+    def get(self, hub_id: str, lease: bool = False) -> Optional[Any]:
+        """取出实例并标记为最近使用；lease 为True时借出实例，调用方用完后 release"""
+        with self._lock:
+            resident = self._hubs.get(hub_id)
+            if resident is None:
+                return None
+            resident.last_used = time.time()
+            resident.uses += 1
+            if lease:
+                resident.leases += 1
+            self._hubs.move_to_end(hub_id)
+            return resident.instance
+
+    def put(self, hub_id: str, instance: Any, lease: bool = False):
+        """登记新创建的实例，超出数量或内存上限时回收其他实例
+
+        内存估算留给后台线程，新实例在下一轮重新估算前按0字节计。
+        """
+        resident = ResidentHub(hub_id, instance)
+        resident.uses = 1
+        resident.leases = 1 if lease else 0
+        resident.stale = True
+        with self._lock:
+            self._hubs[hub_id] = resident
+            self.created += 1
+        self._evict_over_capacity(keep=hub_id)
+
+    def release(self, hub_id: str):
+        """归还借出的实例"""
+        with self._lock:
+            resident = self._hubs.get(hub_id)
+            if resident is None:
+                return
+            resident.leases = max(resident.leases - 1, 0)
+            resident.last_used = time.time()
+
+    def measure(self, instance: Any) -> int:
+        return estimate_memory(instance, exclude=self.shared_objects() if self.shared_objects else ())
+
+    def refresh(self, hub_id: str):
+        """执行结束后标记该实例需要重新估算内存（会话记忆会随执行增长）"""
+        with self._lock:
+            resident = self._hubs.get(hub_id)
+            if resident is None:
+                return
+            resident.last_used = time.time()
+            resident.stale = True
+
+    def remeasure(self):
+        """重新估算新建和执行过的实例的内存并检查容量上限；借出或正在执行的实例留到下一轮"""
+        with self._lock:
+            stale = [resident for hub_id, resident in self._hubs.items()
+                     if resident.stale and not self._busy(hub_id)]
+        for resident in stale:
+            memory_bytes = self.measure(resident.instance)
+            with self._lock:
+                resident.memory_bytes = memory_bytes
+                resident.stale = False
+        if stale:
+            self._evict_over_capacity()
+
+    def pin(self, hub_id: str):
+        self.pinned.add(hub_id)
+
+    def unpin(self, hub_id: str):
+        self.pinned.discard(hub_id)
+
+    def _evictable_locked(self, hub_id: str) -> bool:
+        return hub_id not in self.pinned and not self._busy(hub_id)
+
+    def _busy(self, hub_id: str) -> bool:
+        resident = self._hubs.get(hub_id)
+        if resident is not None and resident.leases > 0:
+            return True
+        return self.in_use is not None and self.in_use(hub_id)
+
+    def _take_locked(self, hub_id: str, reason: str) -> ResidentHub:
+        resident = self._hubs.pop(hub_id)
+        self.evictions[reason] = self.evictions.get(reason, 0) + 1
+        self.reclaimed_bytes += resident.memory_bytes
+        return resident
+
+    def _teardown(self, evicted: List[ResidentHub], reason: str):
+        for resident in evicted:
+            try:
+                resident.instance.teardown()
+            except Exception as e:
+                console.print(f"[yellow]回收Hub {resident.hub_id} 时出错: {e}[/yellow]")
+            console.print(f"[dim]已回收Hub实例 {resident.hub_id}（{reason}，"
+                          f"约 {resident.memory_bytes / 1024 / 1024:.1f}MB）[/dim]")
+        if evicted:
+            # 团队对象之间存在循环引用，显式回收使内存尽快归还
+            gc.collect()
+
+    def _evict_over_capacity(self, keep: Optional[str] = None):
+        evicted = []
+        with self._lock:
+            for hub_id in list(self._hubs.keys()):
+                over_count = self.max_resident and len(self._hubs) > self.max_resident
+                over_memory = (self.max_memory_bytes and
+                               sum(r.memory_bytes for r in self._hubs.values()) > self.max_memory_bytes)
+                if not (over_count or over_memory):
+                    break
+                # 按最久未使用的顺序回收
+                if hub_id != keep and self._evictable_locked(hub_id):
+                    evicted.append(self._take_locked(hub_id, "max_resident" if over_count else "max_memory"))
+        self._teardown(evicted, "超出容量")
+
+    def evict_idle(self) -> List[str]:
+        """回收空闲超过 idle_timeout 的实例，返回被回收的hub_id"""
+        if self.idle_timeout <= 0:
+            return []
+        evicted = []
+        with self._lock:
+            for hub_id, resident in list(self._hubs.items()):
+                if resident.idle_seconds() >= self.idle_timeout and self._evictable_locked(hub_id):
+                    evicted.append(self._take_locked(hub_id, "idle"))
+        self._teardown(evicted, "空闲超时")
+        return [resident.hub_id for resident in evicted]
+
+    def evict(self, hub_id: str) -> bool:
+        """主动回收指定实例（固定的Hub同样回收）"""
+        with self._lock:
+            if hub_id not in self._hubs or self._busy(hub_id):
+                return False
+            resident = self._take_locked(hub_id, "manual")
+        self._teardown([resident], "手动")
+        return True
+
+    def start_reaper(self, interval: Optional[float] = None):
+        """启动后台线程定期重新估算执行过的实例并回收空闲实例（未设置空闲超时和内存上限时不启动）"""
+        if (self.idle_timeout <= 0 and not self.max_memory_bytes) or self._reaper is not None:
+            return
+        intervals = [self.remeasure_interval] if self.max_memory_bytes else []
+        if self.idle_timeout > 0:
+            intervals.append(min(max(self.idle_timeout / 2, 1.0), 60.0))
+        interval = interval or min(intervals)
+
+        def reap():
+            while not self._stopped.wait(interval):
+                self.remeasure()
+                self.evict_idle()
+
+        self._reaper = threading.Thread(target=reap, name="hub-reaper", daemon=True)
+        self._reaper.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "resident": len(self._hubs),
+                "resident_bytes": sum(r.memory_bytes for r in self._hubs.values()),
+                "created": self.created,
+                "evictions": dict(self.evictions),
+                "reclaimed_bytes": self.reclaimed_bytes,
+                "pinned": sorted(self.pinned),
+                "hubs": {hub_id: dict(resident.to_dict(), pinned=hub_id in self.pinned)
+                         for hub_id, resident in self._hubs.items()},
+            }
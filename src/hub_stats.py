@@ -0,0 +1,107 @@
+"""
+Hub Stats
+Hub运行统计：记录每个Hub的EWMA延迟、在途任务数和错误率
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+
+class HubStats:
+    """单个Hub的实时运行统计"""
+
+    def __init__(self, hub_id: str, alpha: float = 0.2, window: int = 200):
+        self.hub_id = hub_id
+        self.alpha = alpha
+        self.recent_latencies = deque(maxlen=window)
+        self.ewma_latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.in_flight = 0
+        self.completed = 0
+        self.errors = 0
+        self.last_finished_at: Optional[float] = None
+
+    def record(self, latency: float, success: bool):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+        self.error_rate = self.alpha * (0.0 if success else 1.0) + (1 - self.alpha) * self.error_rate
+        self.completed += 1
+        if success:
+            self.recent_latencies.append(latency)
+        else:
+            self.errors += 1
+        self.last_finished_at = time.time()
+
+    def latency_percentile(self, q: float, min_samples: int = 5) -> Optional[float]:
+        """最近成功执行延迟的分位数，样本不足时返回None"""
+        if len(self.recent_latencies) < min_samples:
+            return None
+        samples = sorted(self.recent_latencies)
+        return samples[min(int(q / 100 * len(samples)), len(samples) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "ewma_latency": self.ewma_latency,
+            "error_rate": self.error_rate,
+            "p95_latency": self.latency_percentile(95),
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "errors": self.errors,
+        }
+
+
+class HubStatsRegistry:
+    """所有Hub的运行统计（线程安全）"""
+
+    def __init__(self, alpha: float = 0.2):
+        self.alpha = alpha
+        self._stats: Dict[str, HubStats] = {}
+        self._lock = threading.Lock()
+
+    def get(self, hub_id: str) -> HubStats:
+        with self._lock:
+            if hub_id not in self._stats:
+                self._stats[hub_id] = HubStats(hub_id, self.alpha)
+            return self._stats[hub_id]
+
+    def start(self, hub_id: str) -> float:
+        """登记一个开始执行的任务，返回开始时间"""
+        stats = self.get(hub_id)
+        with self._lock:
+            stats.in_flight += 1
+        return time.perf_counter()
+
+    def finish(self, hub_id: str, started_at: float, success: bool):
+        """登记任务结束"""
+        stats = self.get(hub_id)
+        with self._lock:
+            stats.in_flight = max(stats.in_flight - 1, 0)
+            stats.record(time.perf_counter() - started_at, success)
+
+    def abandon(self, hub_id: str):
+        """登记被取消的任务：释放在途计数，但不计入延迟和错误率"""
+        stats = self.get(hub_id)
+        with self._lock:
+            stats.in_flight = max(stats.in_flight - 1, 0)
+
+    @contextmanager
+    def track(self, hub_id: str):
+        """跟踪一次执行；代码块内可将 outcome["success"] 置为False表示失败"""
+        outcome = {"success": True}
+        started_at = self.start(hub_id)
+        try:
+            yield outcome
+        except BaseException:
+            outcome["success"] = False
+            raise
+        finally:
+            self.finish(hub_id, started_at, outcome["success"])
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {hub_id: stats.to_dict() for hub_id, stats in self._stats.items()}
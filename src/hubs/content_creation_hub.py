@@ -40,7 +40,7 @@ class ContentCreationHub(BaseAgentHub):
             信息的准确性和时效性，为团队提供高质量的研究基础。
             """,
             model=OpenAIChat(**model_config),
-            tools=[DuckDuckGoTools()],
+            tools=self.cache_tools(DuckDuckGoTools()),
             instructions=[
                 "始终使用最新和可靠的信息源",
                 "提供详细的研究结果和数据支持",
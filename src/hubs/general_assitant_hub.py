@@ -29,7 +29,7 @@ class GeneralAssitantHub(BaseAgentHub):
             goal="高效完成用户交代的各种常规性任务，如信息查询、内容摘要、邮件草拟等",
             description="我是一个任劳任怨的通用助理，也许不是每个领域最顶尖的专家，但我学习能力强，能快速上手，以最高性价比完成任务。",
             model=OpenAIChat(**model_config),
-            tools=[DuckDuckGoTools()],
+            tools=self.cache_tools(DuckDuckGoTools()),
         )
         
         team = Team(
@@ -31,7 +31,7 @@ class SocialSparkHub(BaseAgentHub):
             goal="发现社交媒体上的热门话题、流行趋势和用户兴趣点",
             description="你是一个网络冲浪达人，对各大社交平台的热点了如指掌，能够精准预测下一个爆点。",
             model=OpenAIChat(**model_config),
-            tools=[DuckDuckGoTools()],
+            tools=self.cache_tools(DuckDuckGoTools()),
         )
 
         # 创建内容创意师Agent
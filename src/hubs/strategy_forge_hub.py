@@ -31,7 +31,7 @@ class StrategyForgeHub(BaseAgentHub):
             goal="收集和分析市场数据、行业报告和竞争对手动态，输出洞察",
             description="你是一位前麦肯锡分析师，对数字极度敏感，能从繁杂的数据中洞悉市场格局和未来趋势。",
             model=OpenAIChat(**model_config),
-            tools=[DuckDuckGoTools()],
+            tools=self.cache_tools(DuckDuckGoTools()),
         )
 
         # 创建战略顾问Agent
@@ -0,0 +1,175 @@
+"""
+Keyword Matcher
+关键词匹配器：基于Aho-Corasick自动机，一次扫描文本即可匹配全部能力关键词
+"""
+
+from collections import deque
+from typing import List, Dict, Tuple, Union, Iterable
+
+# 关键词列表，或 关键词 -> 权重
+KeywordSpec = Union[Iterable[str], Dict[str, float]]
+
+
+class KeywordMatcher:
+    """多模式关键词匹配自动机
+
+    节点以数组形式存储：goto 为字符转移，fail 为失败链接，
+    output_link 指向失败链上最近的关键词终止节点。
+    新增关键词时只插入trie并标记失败链接过期，下次匹配前按BFS重新计算链接，
+    已有关键词不需要重新插入。
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output_link: List[int] = [-1]
+        # 终止节点上的关键词及其对应的 能力 -> 权重
+        self._keyword: List[str] = [""]
+        self._outputs: List[Dict[str, float]] = [{}]
+        self._capability_keywords: Dict[str, Dict[str, float]] = {}
+        self._dirty = False
+
+    @classmethod
+    def from_capability_keywords(cls, capability_keywords: Dict[str, KeywordSpec]) -> 'KeywordMatcher':
+        """从 能力 -> 关键词 映射构建"""
+        matcher = cls()
+        for capability, keywords in capability_keywords.items():
+            matcher.add_keywords(capability, keywords)
+        return matcher
+
+    @classmethod
+    def from_keyword_mapping(cls, keyword_to_capability: Dict[str, str]) -> 'KeywordMatcher':
+        """从 关键词 -> 能力 映射构建"""
+        matcher = cls()
+        for keyword, capability in keyword_to_capability.items():
+            matcher.add_keyword(keyword, capability)
+        return matcher
+
+    def __len__(self) -> int:
+        return sum(len(keywords) for keywords in self._capability_keywords.values())
+
+    def _insert(self, keyword: str) -> int:
+        node = 0
+        for char in keyword:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._output_link.append(-1)
+                self._keyword.append("")
+                self._outputs.append({})
+            node = next_node
+        self._keyword[node] = keyword
+        return node
+
+    def _find_node(self, keyword: str) -> int:
+        node = 0
+        for char in keyword:
+            node = self._goto[node].get(char)
+            if node is None:
+                return -1
+        return node
+
+    def add_keyword(self, keyword: str, capability: str, weight: float = 1.0):
+        """添加一个关键词（不区分大小写）"""
+        keyword = keyword.strip().lower()
+        if not keyword:
+            return
+        node = self._insert(keyword)
+        self._outputs[node][capability] = weight
+        self._capability_keywords.setdefault(capability, {})[keyword] = weight
+        self._dirty = True
+
+    def add_keywords(self, capability: str, keywords: KeywordSpec):
+        """为能力添加一组关键词，可传入列表或 关键词 -> 权重 字典"""
+        if isinstance(keywords, dict):
+            for keyword, weight in keywords.items():
+                self.add_keyword(keyword, capability, float(weight))
+        else:
+            for keyword in keywords:
+                self.add_keyword(keyword, capability)
+
+    def remove_capability(self, capability: str):
+        """移除能力的全部关键词；trie节点保留，只清除输出"""
+        for keyword in self._capability_keywords.pop(capability, {}):
+            node = self._find_node(keyword)
+            if node >= 0:
+                self._outputs[node].pop(capability, None)
+
+    def set_keywords(self, capability: str, keywords: KeywordSpec):
+        """替换能力的关键词"""
+        self.remove_capability(capability)
+        self.add_keywords(capability, keywords)
+
+    def _build_links(self):
+        """按BFS计算失败链接和输出链接"""
+        queue = deque()
+        for node in self._goto[0].values():
+            self._fail[node] = 0
+            self._output_link[node] = -1
+            queue.append(node)
+
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._output_link[child] = fail if self._keyword[fail] else self._output_link[fail]
+                queue.append(child)
+        self._dirty = False
+
+    def iter_matches(self, text: str) -> Iterable[Tuple[int, int]]:
+        """单次扫描文本，产出 (结束位置, 终止节点)"""
+        if self._dirty:
+            self._build_links()
+
+        goto = self._goto
+        fail = self._fail
+        node = 0
+        for position, char in enumerate(text.lower()):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+
+            match = node if self._keyword[node] else self._output_link[node]
+            while match > 0:
+                if self._outputs[match]:
+                    yield position, match
+                match = self._output_link[match]
+
+    def find_keywords(self, text: str) -> List[str]:
+        """返回文本中出现的关键词（去重，按首次出现顺序）"""
+        found = {}
+        for _, node in self.iter_matches(text):
+            found.setdefault(self._keyword[node], None)
+        return list(found)
+
+    def vote(self, text: str) -> Dict[str, float]:
+        """加权投票：每个命中的关键词为其能力投一次票，返回 能力 -> 得分"""
+        scores: Dict[str, float] = {}
+        seen = set()
+        for _, node in self.iter_matches(text):
+            if node in seen:
+                continue
+            seen.add(node)
+            for capability, weight in self._outputs[node].items():
+                scores[capability] = scores.get(capability, 0.0) + weight
+        return scores
+
+    def match_capabilities(self, text: str, min_score: float = 0.0) -> List[str]:
+        """按投票得分降序返回命中的能力"""
+        scores = self.vote(text)
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [capability for capability, score in ranked if score > min_score]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "capabilities": len(self._capability_keywords),
+            "keywords": len(self),
+            "nodes": len(self._goto),
+        }
@@ -0,0 +1,295 @@
+"""
+LLM Response Cache
+模型响应缓存：在HTTP传输层拦截chat/completions请求，所有Hub的模型客户端共享同一个磁盘缓存
+"""
+
+import json
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Callable, Iterator, AsyncIterator, Tuple
+from pathlib import Path
+import httpx
+
+# 缓存模式
+OFF = "off"
+READ_WRITE = "on"        # 命中返回缓存，未命中请求上游并写入
+RECORD = "record"        # 总是请求上游并覆盖写入
+REPLAY = "replay"        # 只读缓存，未命中直接报错（用于可复现的基准测试）
+MODES = (OFF, READ_WRITE, RECORD, REPLAY)
+
+# 参与缓存键计算的请求字段；stream 和 response_format 会改变响应格式，因此也计入
+_KEY_FIELDS = ("model", "messages", "tools", "tool_choice", "temperature", "response_format", "stream")
+# 回放时保留的响应头
+_KEPT_HEADERS = ("content-type", "content-encoding")
+
+
+class LLMResponseCache:
+    """SQLite磁盘缓存，按总字节数做LRU淘汰，多进程可共享同一个数据库文件"""
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS responses (
+        key TEXT PRIMARY KEY,
+        model TEXT,
+        status INTEGER NOT NULL,
+        headers TEXT NOT NULL,
+        body BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses (accessed_at);
+    """
+
+    def __init__(self, db_path: str = "cache/llm_responses.db", max_bytes: int = 256 * 1024 * 1024,
+                 mode: str = READ_WRITE):
+        if mode not in MODES:
+            raise ValueError(f"未知的LLM缓存模式: {mode}，可选: {list(MODES)}")
+        self.db_path = db_path
+        self.max_bytes = max_bytes
+        self.mode = mode
+
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+
+    @staticmethod
+    def make_key(payload: Dict[str, Any]) -> str:
+        """按 (模型, 消息, 工具, 温度...) 计算缓存键"""
+        fields = {name: payload.get(name) for name in _KEY_FIELDS}
+        canonical = json.dumps(fields, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[httpx.Response]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        status, headers, body = row
+        return httpx.Response(status, headers=json.loads(headers), content=body)
+
+    def put(self, key: str, model: Optional[str], response: httpx.Response, body: bytes):
+        """只缓存成功响应；写入后超出容量时按最近访问时间淘汰"""
+        if response.status_code != 200:
+            return
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, model, status, headers, body, size, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, model, response.status_code, json.dumps(headers), body, len(body), now, now)
+            )
+            self.stores += 1
+            self._evict_locked()
+
+    def _evict_locked(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        # 淘汰到容量的90%，避免每次写入都触发淘汰
+        target = total - int(self.max_bytes * 0.9)
+        freed = 0
+        keys = []
+        for key, size in self._conn.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            keys.append(key)
+            freed += size
+            if freed >= target:
+                break
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", [(key,) for key in keys])
+        self.evictions += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "mode": self.mode,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
+
+    def lookup(self, request: httpx.Request) -> Tuple[Optional[str], Optional[str], Optional[httpx.Response]]:
+        """解析请求，返回 (缓存键, 模型, 缓存的响应)；不可缓存的请求返回 (None, None, None)"""
+        if self.mode == OFF or request.method != "POST" or not request.url.path.endswith("/chat/completions"):
+            return None, None, None
+        try:
+            payload = json.loads(request.content)
+        except (ValueError, httpx.RequestNotRead):
+            return None, None, None
+        key = self.make_key(payload)
+        cached = None if self.mode == RECORD else self.get(key)
+        if cached is None and self.mode == REPLAY:
+            cached = _replay_miss_response(key)
+        return key, payload.get("model"), cached
+
+
+def _replay_miss_response(key: str) -> httpx.Response:
+    # 返回400而不是抛出传输异常，避免OpenAI SDK把缓存未命中当作网络错误重试
+    return httpx.Response(400, json={"error": {
+        "message": f"LLM缓存回放模式下未命中: {key[:16]}",
+        "type": "llm_cache_miss",
+    }})
+
+
+class TeeStream(httpx.SyncByteStream):
+    """边向调用方输出响应体边收集，读取完毕后回调（流式响应不必等待完整结果）
+
+    partial 为True时，调用方提前关闭响应也会用已读取的部分回调。
+    """
+
+    def __init__(self, stream: httpx.SyncByteStream, on_complete: Callable[[bytes], None],
+                 partial: bool = False):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._partial = partial
+        self._chunks = []
+        self._reported = False
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            self._on_complete(b"".join(self._chunks))
+
+    def __iter__(self) -> Iterator[bytes]:
+        for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._report()
+
+    def close(self):
+        self._stream.close()
+        if self._partial:
+            self._report()
+
+
+class AsyncTeeStream(httpx.AsyncByteStream):
+    def __init__(self, stream: httpx.AsyncByteStream, on_complete: Callable[[bytes], None],
+                 partial: bool = False):
+        self._stream = stream
+        self._on_complete = on_complete
+        self._partial = partial
+        self._chunks = []
+        self._reported = False
+
+    def _report(self):
+        if not self._reported:
+            self._reported = True
+            self._on_complete(b"".join(self._chunks))
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        async for chunk in self._stream:
+            self._chunks.append(chunk)
+            yield chunk
+        self._report()
+
+    async def aclose(self):
+        await self._stream.aclose()
+        if self._partial:
+            self._report()
+
+
+def observe_body(response: httpx.Response, on_complete: Callable[[bytes], None], partial: bool = False):
+    """在响应体被读取后回调 on_complete(响应体)，不改变调用方的读取方式
+
+    partial 为False时只在完整读取后回调（用于缓存），为True时提前关闭也会回调（用于用量统计）。
+    """
+    if isinstance(response.stream, httpx.ByteStream):
+        # 已在内存中的响应体直接回调
+        on_complete(b"".join(response.stream))
+    elif isinstance(response.stream, httpx.SyncByteStream):
+        response.stream = TeeStream(response.stream, on_complete, partial)
+    else:
+        response.stream = AsyncTeeStream(response.stream, on_complete, partial)
+
+
+class CachingTransport(httpx.BaseTransport):
+    """同步httpx传输层缓存"""
+
+    def __init__(self, cache: LLMResponseCache, transport: httpx.BaseTransport = None):
+        self.cache = cache
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, model, cached = self.cache.lookup(request)
+        if cached is not None:
+            return cached
+        response = self.transport.handle_request(request)
+        if key is None or response.status_code != 200:
+            return response
+        observe_body(response, lambda body: self.cache.put(key, model, response, body))
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    """异步httpx传输层缓存"""
+
+    def __init__(self, cache: LLMResponseCache, transport: httpx.AsyncBaseTransport = None):
+        self.cache = cache
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # 缓存读写是SQLite操作，放到线程池中执行，不阻塞事件循环
+        key, model, cached = await asyncio.to_thread(self.cache.lookup, request)
+        if cached is not None:
+            return cached
+        response = await self.transport.handle_async_request(request)
+        if key is None or response.status_code != 200:
+            return response
+
+        def store(body: bytes):
+            asyncio.get_running_loop().run_in_executor(None, self.cache.put, key, model, response, body)
+
+        observe_body(response, store)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+_llm_cache: Optional[LLMResponseCache] = None
+
+
+def configure_llm_cache(mode: str = READ_WRITE, db_path: str = "cache/llm_responses.db",
+                        max_bytes: int = 256 * 1024 * 1024) -> Optional[LLMResponseCache]:
+    """设置进程内共享的LLM响应缓存；mode 为 off 时关闭"""
+    global _llm_cache
+    _llm_cache = None if mode == OFF else LLMResponseCache(db_path, max_bytes, mode)
+    return _llm_cache
+
+
+def get_llm_cache() -> Optional[LLMResponseCache]:
+    return _llm_cache
+
@@ -0,0 +1,227 @@
+"""
+Load Test
+端到端压测：按目标QPS开环发起任务，统计吞吐、首token时间和各Hub的尾延迟
+
+配合模拟LLM服务使用: python main.py load-test --mock-llm --qps 5 --duration 30
+"""
+
+import time
+import random
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+from rich.console import Console
+from rich.table import Table
+
+from .usp import TaskRequest
+from .agent_hub import TaskTimeoutError
+
+console = Console()
+
+LOAD_MODES = ("stream", "async", "hedged", "team")
+
+DEFAULT_PROMPTS = [
+    "请帮我调研一下2025年AI Agent技术的发展趋势，并生成一份总结报告",
+    "写一段Python代码实现快速排序",
+    "分析新能源汽车市场的竞争格局",
+    "为新产品发布写一条社交媒体文案",
+    "总结大语言模型推理加速的主要方法",
+]
+
+
+def percentile(samples: List[float], q: float) -> Optional[float]:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(int(q / 100 * len(ordered)), len(ordered) - 1)]
+
+
+class RequestRecord:
+    """单个压测请求的结果"""
+
+    def __init__(self, prompt: str, scheduled_at: float):
+        self.prompt = prompt
+        self.scheduled_at = scheduled_at
+        self.hub_id: Optional[str] = None
+        self.ttft: Optional[float] = None
+        self.latency: Optional[float] = None
+        self.success = False
+        self.error: Optional[str] = None
+
+
+class LoadReport:
+    """压测结果汇总"""
+
+    def __init__(self, mode: str, target_qps: float, records: List[RequestRecord], wall_time: float):
+        self.mode = mode
+        self.target_qps = target_qps
+        self.records = records
+        self.wall_time = wall_time
+
+    @staticmethod
+    def _summarize(records: List[RequestRecord], wall_time: float) -> Dict[str, Any]:
+        succeeded = [r for r in records if r.success]
+        latencies = [r.latency for r in succeeded]
+        ttfts = [r.ttft for r in succeeded if r.ttft is not None]
+        return {
+            "requests": len(records),
+            "succeeded": len(succeeded),
+            "error_rate": 1 - len(succeeded) / len(records) if records else 0.0,
+            "throughput": len(succeeded) / wall_time if wall_time else 0.0,
+            "ttft_p50": percentile(ttfts, 50),
+            "ttft_p99": percentile(ttfts, 99),
+            "latency_p50": percentile(latencies, 50),
+            "latency_p95": percentile(latencies, 95),
+            "latency_p99": percentile(latencies, 99),
+        }
+
+    def overall(self) -> Dict[str, Any]:
+        return self._summarize(self.records, self.wall_time)
+
+    def per_hub(self) -> Dict[str, Dict[str, Any]]:
+        hubs: Dict[str, List[RequestRecord]] = {}
+        for record in self.records:
+            hubs.setdefault(record.hub_id or "(未路由)", []).append(record)
+        return {hub_id: self._summarize(records, self.wall_time) for hub_id, records in sorted(hubs.items())}
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "target_qps": self.target_qps,
+            "wall_time": self.wall_time,
+            "overall": self.overall(),
+            "hubs": self.per_hub(),
+        }
+
+    def display(self):
+        def fmt(value: Optional[float], scale: float = 1000.0) -> str:
+            return "-" if value is None else f"{value * scale:.0f}"
+
+        table = Table(title=f"压测结果（模式 {self.mode}，目标 {self.target_qps} QPS，耗时 {self.wall_time:.1f}s）")
+        table.add_column("Hub", style="cyan")
+        table.add_column("请求", style="white")
+        table.add_column("错误率", style="red")
+        table.add_column("吞吐(req/s)", style="green")
+        table.add_column("TTFT p50/p99(ms)", style="yellow")
+        table.add_column("延迟 p50/p95/p99(ms)", style="magenta")
+        rows = list(self.per_hub().items()) + [("全部", self.overall())]
+        for hub_id, summary in rows:
+            table.add_row(
+                hub_id,
+                str(summary["requests"]),
+                f"{summary['error_rate']:.1%}",
+                f"{summary['throughput']:.2f}",
+                f"{fmt(summary['ttft_p50'])}/{fmt(summary['ttft_p99'])}",
+                f"{fmt(summary['latency_p50'])}/{fmt(summary['latency_p95'])}/{fmt(summary['latency_p99'])}",
+            )
+        console.print(table)
+
+
+class LoadGenerator:
+    """开环压测发生器
+
+    请求按泊松（或固定间隔）到达时间表发出，不等待前一个请求完成；延迟从计划到达时刻起算，
+    因此排队等待也计入延迟，避免协调遗漏（coordinated omission）低估尾延迟。
+
+    模式:
+        stream   与HTTP服务相同的路径：选最佳Hub，按Hub串行地流式执行，可测首token时间
+        async    在最佳Hub上调用异步接口 arun
+        hedged   对冲执行（前 hedge_top_k 个Hub）
+        team     团队模式
+    """
+
+    def __init__(self, usp, aex, mode: str = "stream", max_in_flight: int = 32,
+                 hedge_top_k: int = 2, timeout: Optional[float] = None):
+        if mode not in LOAD_MODES:
+            raise ValueError(f"未知的压测模式: {mode}，可选: {list(LOAD_MODES)}")
+        self.usp = usp
+        self.aex = aex
+        self.mode = mode
+        self.max_in_flight = max_in_flight
+        self.hedge_top_k = hedge_top_k
+        self.timeout = timeout
+
+    def _run_stream(self, task_request: TaskRequest, record: RequestRecord):
+        """阻塞执行（在线程池中），记录首块输出时间"""
+        ranked = self.aex.rank_hubs(task_request)
+        if not ranked:
+            raise RuntimeError("没有可用的Hub")
+        hub = ranked[0][0]
+        record.hub_id = hub.hub_id
+        with self.aex.lease_hub_instance(hub) as hub_instance:
+            if not hub_instance:
+                raise RuntimeError(f"无法创建Hub实例: {hub.hub_class}")
+            if not self.aex.health.acquire(hub.hub_id):
+                raise RuntimeError(f"Hub {hub.hub_id} 处于熔断状态")
+
+            deadline = self.aex.resolve_deadline(hub, task_request)
+            with self.aex.track_execution(hub.hub_id, deadline) as outcome:
+                chunks = 0
+                try:
+                    for _ in hub_instance.stream(task_request.original_prompt, deadline):
+                        if record.ttft is None:
+                            record.ttft = time.perf_counter() - record.scheduled_at
+                        chunks += 1
+                except TaskTimeoutError:
+                    outcome["success"] = False
+                    outcome["error"] = "执行超时"
+                    raise
+                outcome["success"] = chunks > 0
+            if not chunks:
+                raise RuntimeError("Hub没有输出")
+
+    async def _run_one(self, prompt: str, record: RequestRecord, slots: asyncio.Semaphore):
+        async with slots:
+            try:
+                # 能力解析（嵌入请求）和排名是阻塞调用，放到线程池中执行，不阻塞事件循环上的其他请求
+                capabilities = await asyncio.to_thread(self.usp.extract_capabilities, prompt)
+                task_request = TaskRequest(prompt, capabilities, timeout=self.timeout)
+                if self.mode == "stream":
+                    await asyncio.to_thread(self._run_stream, task_request, record)
+                    record.success = True
+                elif self.mode == "async":
+                    ranked = await asyncio.to_thread(self.aex.rank_hubs, task_request)
+                    if ranked:
+                        record.hub_id = ranked[0][0].hub_id
+                        result = await self.aex.arun_member(ranked[0][0], prompt, task_request)
+                        record.success = result is not None
+                elif self.mode == "hedged":
+                    result, report = await self.aex.aexecute_task_hedged(task_request, top_k=self.hedge_top_k)
+                    record.hub_id = report.winner_hub_id if report else None
+                    record.success = result is not None
+                else:
+                    result = await self.aex.aexecute_task_team(task_request)
+                    record.hub_id = "team"
+                    record.success = result is not None
+            except Exception as e:
+                record.error = str(e)
+            record.latency = time.perf_counter() - record.scheduled_at
+
+    async def run(self, qps: float, duration: float = None, num_requests: int = None,
+                  prompts: List[str] = None, arrival: str = "poisson", seed: int = None) -> LoadReport:
+        """按目标QPS发出请求，duration 与 num_requests 至少指定一个"""
+        if not self.aex.available_hubs and not self.aex.load_hub_configs():
+            raise RuntimeError("加载Hub配置失败")
+        prompts = prompts or DEFAULT_PROMPTS
+        rng = random.Random(seed)
+        if num_requests is None:
+            num_requests = max(1, int(qps * (duration or 10.0)))
+
+        # 阻塞执行的线程池需要容纳全部在途请求
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(self.max_in_flight))
+        slots = asyncio.Semaphore(self.max_in_flight)
+        records: List[RequestRecord] = []
+        jobs = []
+        started = time.perf_counter()
+        next_at = started
+        for i in range(num_requests):
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            record = RequestRecord(prompts[i % len(prompts)], next_at)
+            records.append(record)
+            jobs.append(asyncio.ensure_future(self._run_one(record.prompt, record, slots)))
+            next_at += rng.expovariate(qps) if arrival == "poisson" else 1.0 / qps
+
+        await asyncio.gather(*jobs)
+        return LoadReport(self.mode, qps, records, time.perf_counter() - started)
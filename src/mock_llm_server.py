@@ -0,0 +1,262 @@
+"""
+Mock LLM Server
+本地模拟的OpenAI兼容服务：支持流式输出、可配置的首token延迟分布、生成速率和错误注入，用于压测
+
+接口:
+    GET  /v1/models              模型列表
+    POST /v1/chat/completions    对话补全（"stream": true 时以SSE流式返回）
+
+用法: python main.py mock-llm --ttft lognormal:0.3,0.5 --tokens-per-second 80 --error-rate 0.01
+"""
+
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from typing import Dict, Any, List, Optional, Iterator
+from rich.console import Console
+
+from .server import HTTPError, HTTPRequest, read_request, write_json, HTTP_REASONS
+from .rate_limiter import estimate_tokens
+
+console = Console()
+
+LATENCY_KINDS = ("fixed", "uniform", "exponential", "lognormal")
+
+
+class LatencyDistribution:
+    """延迟分布（秒）
+
+    规格字符串:
+        fixed:0.2             固定值
+        uniform:0.1,0.5       均匀分布
+        exponential:0.3       指数分布，参数为均值
+        lognormal:0.3,0.5     对数正态分布，参数为中位数和sigma（长尾）
+    """
+
+    def __init__(self, kind: str = "fixed", params: List[float] = None):
+        if kind not in LATENCY_KINDS:
+            raise ValueError(f"未知的延迟分布: {kind}，可选: {list(LATENCY_KINDS)}")
+        self.kind = kind
+        self.params = params or [0.0]
+
+    @classmethod
+    def parse(cls, spec: str) -> 'LatencyDistribution':
+        kind, _, args = spec.partition(":")
+        if not args:
+            # 只写数字时视为固定延迟
+            try:
+                return cls("fixed", [float(kind)])
+            except ValueError:
+                pass
+        try:
+            params = [float(value) for value in args.split(",") if value]
+        except ValueError:
+            raise ValueError(f"延迟分布参数格式错误: {spec}")
+        return cls(kind, params)
+
+    def sample(self, rng: random.Random) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return rng.uniform(self.params[0], self.params[1])
+        if self.kind == "exponential":
+            return rng.expovariate(1.0 / self.params[0]) if self.params[0] > 0 else 0.0
+        median, sigma = self.params[0], self.params[1] if len(self.params) > 1 else 0.5
+        return median * rng.lognormvariate(0.0, sigma)
+
+    def __str__(self) -> str:
+        return f"{self.kind}:{','.join(str(p) for p in self.params)}"
+
+
+class MockLLMServer:
+    """OpenAI兼容的模拟服务"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 8090,
+                 ttft: LatencyDistribution = None, tokens_per_second: float = 50.0,
+                 output_tokens: int = 64, error_rate: float = 0.0, rate_limit_rate: float = 0.0,
+                 seed: Optional[int] = None):
+        self.host = host
+        self.port = port
+        self.ttft = ttft or LatencyDistribution("fixed", [0.2])
+        self.tokens_per_second = tokens_per_second
+        self.output_tokens = output_tokens
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.rng = random.Random(seed)
+
+        self.requests = 0
+        self.errors_injected = 0
+        self.tokens_generated = 0
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "errors_injected": self.errors_injected,
+            "tokens_generated": self.tokens_generated,
+            "ttft": str(self.ttft),
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+    def _completion_tokens(self, payload: Dict[str, Any]) -> List[str]:
+        """生成确定性的输出token：先复述问题，再用编号token补足长度"""
+        limit = payload.get("max_completion_tokens") or payload.get("max_tokens") or self.output_tokens
+        count = max(1, min(int(limit), self.output_tokens))
+        prompt = ""
+        for message in reversed(payload.get("messages") or []):
+            if message.get("role") == "user" and isinstance(message.get("content"), str):
+                prompt = message["content"]
+                break
+        tokens = [f"[mock] {prompt[:40]}"]
+        tokens.extend(f" token{i}" for i in range(1, count))
+        return tokens
+
+    def _inject_error(self):
+        roll = self.rng.random()
+        if roll < self.rate_limit_rate:
+            self.errors_injected += 1
+            raise HTTPError(429, "模拟限流")
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors_injected += 1
+            raise HTTPError(500, "模拟服务错误")
+
+    @staticmethod
+    def _chunk(completion_id: str, model: str, delta: Dict[str, Any],
+               finish_reason: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+        }
+
+    def _usage(self, payload: Dict[str, Any], completion_tokens: int) -> Dict[str, int]:
+        prompt_tokens = sum(estimate_tokens(str(m.get("content") or "")) for m in payload.get("messages") or [])
+        return {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def handle_chat(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        payload = request.json()
+        model = payload.get("model") or "mock-model"
+        self._inject_error()
+        tokens = self._completion_tokens(payload)
+        self.tokens_generated += len(tokens)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:24]}"
+        token_interval = 1.0 / self.tokens_per_second if self.tokens_per_second > 0 else 0.0
+
+        await asyncio.sleep(self.ttft.sample(self.rng))
+        if not payload.get("stream"):
+            await asyncio.sleep(token_interval * (len(tokens) - 1))
+            await write_json(writer, 200, {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": "".join(tokens)},
+                    "finish_reason": "stop",
+                }],
+                "usage": self._usage(payload, len(tokens)),
+            })
+            return
+
+        writer.write(
+            "HTTP/1.1 200 OK\r\n"
+            "Content-Type: text/event-stream; charset=utf-8\r\n"
+            "Transfer-Encoding: chunked\r\n"
+            "Cache-Control: no-cache\r\n"
+            "Connection: close\r\n\r\n".encode('latin-1')
+        )
+        for event in self._stream_events(payload, completion_id, model, tokens):
+            if event is None:
+                await asyncio.sleep(token_interval)
+                continue
+            data = f"data: {event}\n\n".encode('utf-8')
+            writer.write(f"{len(data):X}\r\n".encode('latin-1') + data + b"\r\n")
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _stream_events(self, payload: Dict[str, Any], completion_id: str, model: str,
+                       tokens: List[str]) -> Iterator[Optional[str]]:
+        """SSE事件序列；None 表示按生成速率等待一个token间隔"""
+        for i, token in enumerate(tokens):
+            if i:
+                yield None
+            delta = {"role": "assistant", "content": token} if i == 0 else {"content": token}
+            yield json.dumps(self._chunk(completion_id, model, delta), ensure_ascii=False)
+        yield json.dumps(self._chunk(completion_id, model, {}, "stop"))
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            usage_chunk = self._chunk(completion_id, model, {})
+            usage_chunk["choices"] = []
+            usage_chunk["usage"] = self._usage(payload, len(tokens))
+            yield json.dumps(usage_chunk)
+        yield "[DONE]"
+
+    async def handle_models(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        await write_json(writer, 200, {"object": "list", "data": [
+            {"id": "mock-model", "object": "model", "owned_by": "aex"}
+        ]})
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            self.requests += 1
+            if request.path.endswith("/chat/completions") and request.method == "POST":
+                await self.handle_chat(request, writer)
+            elif request.path.endswith("/models") and request.method == "GET":
+                await self.handle_models(request, writer)
+            else:
+                raise HTTPError(404, f"未知路径: {request.path}")
+        except HTTPError as e:
+            # OpenAI格式的错误体，SDK据此区分可重试错误
+            await write_json(writer, e.status, {"error": {
+                "message": e.message, "type": HTTP_REASONS.get(e.status, "error"), "code": e.status
+            }})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            console.print(f"[red]模拟服务处理请求失败: {e}[/red]")
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        # 端口为0时使用系统分配的端口
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def serve_forever(self):
+        await self.start()
+        console.print(f"[green]模拟LLM服务已启动: {self.base_url} "
+                      f"(首token {self.ttft}, {self.tokens_per_second} token/s)[/green]")
+        async with self._server:
+            await self._server.serve_forever()
+
+    def start_in_thread(self) -> str:
+        """在后台线程的事件循环中运行，返回 base_url（用于同进程压测）"""
+        ready = threading.Event()
+
+        def run():
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            loop.run_until_complete(self.start())
+            ready.set()
+            loop.run_forever()
+
+        threading.Thread(target=run, daemon=True).start()
+        ready.wait()
+        return self.base_url
@@ -0,0 +1,129 @@
+"""
+Prebuilt Capability Index
+预构建能力索引：离线生成能力描述和向量，运行时按Hub源码哈希校验后直接加载
+
+生成: python main.py warmup
+"""
+
+import os
+import json
+import time
+import hashlib
+import inspect
+from typing import List, Dict, Tuple
+from pathlib import Path
+import numpy as np
+
+# 产物格式版本，格式变化时递增，旧版本产物会被忽略
+ARTIFACT_VERSION = 1
+DEFAULT_PREBUILT_PATH = "cache/prebuilt/capabilities.npz"
+
+
+def hub_content_hashes(hub_classes: Dict[str, type]) -> Dict[str, str]:
+    """按Hub类所在源文件计算内容哈希，无需实例化Hub"""
+    hashes = {}
+    for class_name, hub_class in sorted(hub_classes.items()):
+        try:
+            source = Path(inspect.getfile(hub_class)).read_bytes()
+        except (TypeError, OSError):
+            source = class_name.encode('utf-8')
+        hashes[class_name] = hashlib.md5(source).hexdigest()
+    return hashes
+
+
+class PrebuiltCapabilityIndex:
+    """能力描述与对应向量的离线产物"""
+
+    def __init__(self, namespace: str, hub_hashes: Dict[str, str], names: List[str],
+                 descriptions: Dict[str, str], embeddings: np.ndarray,
+                 version: int = ARTIFACT_VERSION, created_at: float = None):
+        self.version = version
+        self.namespace = namespace
+        self.hub_hashes = hub_hashes
+        self.names = names
+        self.descriptions = descriptions
+        self.embeddings = embeddings
+        self.created_at = created_at or time.time()
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def embedding_map(self) -> Dict[str, np.ndarray]:
+        """能力描述 -> 向量"""
+        return {self.descriptions[name]: self.embeddings[i] for i, name in enumerate(self.names)}
+
+    def validate(self, namespace: str, hub_hashes: Dict[str, str]) -> Tuple[bool, str]:
+        """校验产物是否与当前模型配置和Hub源码一致，返回 (是否有效, 原因)"""
+        if self.version != ARTIFACT_VERSION:
+            return False, f"产物版本 {self.version} 与当前版本 {ARTIFACT_VERSION} 不一致"
+        if self.namespace != namespace:
+            return False, f"嵌入模型/维度不一致: {self.namespace} != {namespace}"
+        if self.hub_hashes != hub_hashes:
+            changed = sorted(
+                name for name in set(self.hub_hashes) | set(hub_hashes)
+                if self.hub_hashes.get(name) != hub_hashes.get(name)
+            )
+            return False, f"Hub内容已变化: {changed}"
+        return True, "ok"
+
+    def save(self, file_path: str):
+        """写入临时文件后原子重命名，避免运行中的进程读到写了一半的产物"""
+        path = Path(file_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = {
+            "version": self.version,
+            "namespace": self.namespace,
+            "hub_hashes": self.hub_hashes,
+            "names": self.names,
+            "descriptions": self.descriptions,
+            "created_at": self.created_at,
+        }
+        tmp_path = path.with_name(f"{path.name}.tmp.{os.getpid()}")
+        with open(tmp_path, 'wb') as f:
+            np.savez(
+                f,
+                header=np.frombuffer(json.dumps(header, ensure_ascii=False).encode('utf-8'),
+                                     dtype=np.uint8),
+                embeddings=self.embeddings.astype(np.float32),
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, file_path: str) -> 'PrebuiltCapabilityIndex':
+        with np.load(file_path) as data:
+            header = json.loads(data["header"].tobytes().decode('utf-8'))
+            embeddings = data["embeddings"]
+        return cls(
+            namespace=header["namespace"],
+            hub_hashes=header["hub_hashes"],
+            names=header["names"],
+            descriptions=header["descriptions"],
+            embeddings=embeddings,
+            version=header.get("version", 0),
+            created_at=header.get("created_at"),
+        )
+
+
+def build_prebuilt_index(capability_mapper, batch_size: int = 64) -> PrebuiltCapabilityIndex:
+    """为映射器当前的全部能力描述批量获取向量，生成预构建产物"""
+    names = list(capability_mapper.capability_descriptions.keys())
+    texts = list(dict.fromkeys(capability_mapper.capability_descriptions[name] for name in names))
+
+    embeddings = {}
+    for start in range(0, len(texts), batch_size):
+        embeddings.update(
+            capability_mapper.embedding_service.get_batch_embeddings(texts[start:start + batch_size])
+        )
+
+    missing = [name for name in names if capability_mapper.capability_descriptions[name] not in embeddings]
+    if missing:
+        raise RuntimeError(f"以下能力未能获取向量: {missing}")
+
+    service = capability_mapper.embedding_service
+    return PrebuiltCapabilityIndex(
+        namespace=service.namespace,
+        hub_hashes=hub_content_hashes(capability_mapper.hub_classes),
+        names=names,
+        descriptions=dict(capability_mapper.capability_descriptions),
+        embeddings=np.stack([embeddings[capability_mapper.capability_descriptions[name]] for name in names]),
+    )
@@ -0,0 +1,204 @@
+"""
+Quantization
+向量量化：float16 / 按行缩放的int8 存储，以及直接在量化数据上计算相似度的内核
+"""
+
+from typing import List, Tuple, Optional, Union
+import numpy as np
+
+PRECISIONS = ("float32", "float16", "int8")
+
+# 单个向量的紧凑表示：float32/float16 数组，或 int8 的 (编码, 缩放系数)
+PackedVector = Union[np.ndarray, Tuple[np.ndarray, float]]
+
+
+def _check_precision(precision: str):
+    if precision not in PRECISIONS:
+        raise ValueError(f"未知的向量精度: {precision}，可选: {list(PRECISIONS)}")
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """对称int8量化：每行使用独立缩放系数 scale = max|v| / 127"""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if vectors.ndim == 1:
+        vectors = vectors[None, :]
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * np.asarray(scales, dtype=np.float32)[..., None]
+
+
+def pack_vector(vector: np.ndarray, precision: str) -> PackedVector:
+    """按指定精度压缩单个向量"""
+    _check_precision(precision)
+    vector = np.asarray(vector, dtype=np.float32)
+    if precision == "int8":
+        codes, scales = quantize_int8(vector)
+        return codes[0], float(scales[0])
+    return vector.astype(precision)
+
+
+def unpack_vector(packed: PackedVector) -> np.ndarray:
+    """还原为float32向量（兼容旧缓存中的float64数组）"""
+    if isinstance(packed, tuple):
+        codes, scale = packed
+        return codes.astype(np.float32) * np.float32(scale)
+    return np.asarray(packed, dtype=np.float32)
+
+
+class QuantizedVectors:
+    """按行存储的量化向量矩阵
+
+    scores() 分块把量化数据转换到一个可复用的float32小缓冲区中再做矩阵向量乘，
+    扫描时只读取量化后的字节，内存占用为float32的1/2（float16）或约1/4（int8）。
+    keep_exact 为True时额外保留float32原始向量，用于对候选结果做精确重排。
+    """
+
+    def __init__(self, dim: int, precision: str = "int8", keep_exact: bool = False,
+                 block_size: int = 256):
+        _check_precision(precision)
+        self.dim = dim
+        self.precision = precision
+        self.keep_exact = keep_exact
+        self.block_size = block_size
+        self._size = 0
+        self.codes = np.zeros((0, dim), dtype=np.int8 if precision == "int8" else precision)
+        self.scales = np.zeros(0, dtype=np.float32)
+        self.exact: Optional[np.ndarray] = np.zeros((0, dim), dtype=np.float32) if keep_exact else None
+
+    @classmethod
+    def from_vectors(cls, vectors: np.ndarray, precision: str = "int8",
+                     keep_exact: bool = False) -> 'QuantizedVectors':
+        vectors = np.asarray(vectors, dtype=np.float32)
+        store = cls(vectors.shape[1], precision, keep_exact)
+        store.reserve(len(vectors))
+        store.set_rows(0, vectors)
+        store._size = len(vectors)
+        return store
+
+    @classmethod
+    def from_arrays(cls, codes: np.ndarray, scales: np.ndarray, precision: str,
+                    exact: np.ndarray = None) -> 'QuantizedVectors':
+        """从已量化的数组恢复（用于加载持久化数据）"""
+        store = cls(codes.shape[1], precision, keep_exact=exact is not None)
+        store.codes = np.array(codes, dtype=store.codes.dtype)
+        store.scales = np.array(scales, dtype=np.float32)
+        if exact is not None:
+            store.exact = np.array(exact, dtype=np.float32)
+        store._size = len(codes)
+        return store
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def capacity(self) -> int:
+        return len(self.codes)
+
+    @property
+    def nbytes(self) -> int:
+        """实际占用的字节数（按容量计算）"""
+        total = self.codes.nbytes + self.scales.nbytes
+        if self.exact is not None:
+            total += self.exact.nbytes
+        return total
+
+    def reserve(self, capacity: int):
+        """按需扩容（容量翻倍）"""
+        if capacity <= self.capacity:
+            return
+        new_capacity = max(capacity, 2 * self.capacity, 16)
+        codes = np.zeros((new_capacity, self.dim), dtype=self.codes.dtype)
+        codes[:self._size] = self.codes[:self._size]
+        scales = np.ones(new_capacity, dtype=np.float32)
+        scales[:self._size] = self.scales[:self._size]
+        self.codes, self.scales = codes, scales
+        if self.exact is not None:
+            exact = np.zeros((new_capacity, self.dim), dtype=np.float32)
+            exact[:self._size] = self.exact[:self._size]
+            self.exact = exact
+
+    def set_rows(self, start: int, vectors: np.ndarray):
+        """写入从 start 开始的连续行，不改变已用行数"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        end = start + len(vectors)
+        if self.precision == "int8":
+            self.codes[start:end], self.scales[start:end] = quantize_int8(vectors)
+        else:
+            self.codes[start:end] = vectors
+        if self.exact is not None:
+            self.exact[start:end] = vectors
+
+    def append(self, vectors: np.ndarray) -> int:
+        """追加向量，返回第一行的行号"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if vectors.ndim == 1:
+            vectors = vectors[None, :]
+        start = self._size
+        self.reserve(start + len(vectors))
+        self.set_rows(start, vectors)
+        self._size += len(vectors)
+        return start
+
+    def rows(self, rows: np.ndarray) -> np.ndarray:
+        """取出指定行并还原为float32（近似值）"""
+        if self.precision == "int8":
+            return dequantize_int8(self.codes[rows], self.scales[rows])
+        return self.codes[rows].astype(np.float32)
+
+    def scores(self, query: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """量化数据上的内积；rows 为None时扫描全部已用行"""
+        query = np.asarray(query, dtype=np.float32)
+        if self.precision == "float32":
+            data = self.codes[:self._size] if rows is None else self.codes[rows]
+            return data @ query
+
+        count = self._size if rows is None else len(rows)
+        out = np.empty(count, dtype=np.float32)
+        buffer = np.empty((min(self.block_size, max(count, 1)), self.dim), dtype=np.float32)
+        for start in range(0, count, self.block_size):
+            end = min(start + self.block_size, count)
+            block = self.codes[start:end] if rows is None else self.codes[rows[start:end]]
+            work = buffer[:end - start]
+            work[...] = block
+            np.dot(work, query, out=out[start:end])
+        if self.precision == "int8":
+            out *= self.scales[:self._size] if rows is None else self.scales[rows]
+        return out
+
+    def exact_scores(self, query: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """float32 精确内积；未保留原始向量时退化为量化分数"""
+        if self.exact is None:
+            return self.scores(query, rows)
+        return self.exact[rows] @ np.asarray(query, dtype=np.float32)
+
+    def search(self, query: np.ndarray, top_k: int = 10, rows: np.ndarray = None,
+               rescore: int = 0) -> List[Tuple[int, float]]:
+        """返回 [(行号, 分数)]
+
+        rescore > 0 时先按量化分数取 top_k * rescore 个候选，再用float32原始向量精确重排。
+        """
+        # 全量扫描时按连续内存分块读取，避免花式索引复制整个矩阵
+        scores = self.scores(query, rows)
+        if rows is None:
+            rows = np.arange(self._size)
+        if len(rows) == 0:
+            return []
+
+        num_candidates = top_k * rescore if rescore > 0 and self.exact is not None else top_k
+        if len(scores) > num_candidates:
+            part = np.argpartition(-scores, num_candidates)[:num_candidates]
+            rows, scores = rows[part], scores[part]
+        if num_candidates > top_k:
+            scores = self.exact_scores(query, rows)
+            if len(scores) > top_k:
+                part = np.argpartition(-scores, top_k)[:top_k]
+                rows, scores = rows[part], scores[part]
+        order = np.argsort(-scores)
+        return [(int(rows[i]), float(scores[i])) for i in order]
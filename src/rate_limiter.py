@@ -0,0 +1,346 @@
+"""
+Rate Limiter
+速率限制：按 (base_url, API Key, 模型) 的令牌桶，同时约束每分钟请求数（RPM）和token数（TPM），
+可选用SQLite文件在多个进程间共享额度
+"""
+
+import json
+import time
+import sqlite3
+import asyncio
+import hashlib
+import threading
+from typing import Dict, Any, Optional, Tuple, Callable
+from pathlib import Path
+import httpx
+
+from .llm_cache import observe_body
+
+# 无法从请求中得知输出长度时按此估计补全token数，收到响应后按实际用量修正
+DEFAULT_COMPLETION_TOKENS = 512
+# 收到429但没有Retry-After时的退让时间（秒）
+DEFAULT_RETRY_AFTER = 1.0
+_RATE_LIMITED_PATHS = ("/chat/completions", "/embeddings")
+
+
+def estimate_tokens(text: str) -> int:
+    """粗略估计token数：中文按字，其他按4个字符一个token"""
+    cjk = sum(1 for ch in text if "\u4e00" <= ch <= "\u9fff")
+    return cjk + (len(text) - cjk) // 4 + 1
+
+
+def limiter_key(base_url: Optional[str], api_key: Optional[str], model: Optional[str]) -> str:
+    """限流键；API Key只保留哈希前缀，避免写入共享状态文件"""
+    key_hash = hashlib.sha256((api_key or "").encode('utf-8')).hexdigest()[:12]
+    return f"{(base_url or '').rstrip('/')}|{key_hash}|{model or ''}"
+
+
+def estimate_request_tokens(payload: Dict[str, Any]) -> int:
+    """估计一次chat/embeddings请求消耗的token数（输入 + 预计输出）"""
+    if "messages" in payload:
+        prompt = sum(estimate_tokens(json.dumps(m.get("content"), ensure_ascii=False))
+                     for m in payload.get("messages") or [])
+        completion = (payload.get("max_completion_tokens") or payload.get("max_tokens")
+                      or DEFAULT_COMPLETION_TOKENS)
+        return prompt + int(completion)
+    inputs = payload.get("input") or []
+    if isinstance(inputs, (str, dict)):
+        inputs = [inputs]
+    return sum(estimate_tokens(item.get("text", "") if isinstance(item, dict) else str(item))
+               for item in inputs)
+
+
+def usage_from_body(body: bytes) -> Optional[int]:
+    """从响应体（JSON或SSE流）中读取实际消耗的总token数"""
+    try:
+        usage = json.loads(body).get("usage")
+    except (ValueError, AttributeError):
+        usage = None
+        # SSE流：用量在最后几个事件中（需请求时开启 stream_options.include_usage）
+        for line in reversed(body.decode('utf-8', 'ignore').splitlines()):
+            if line.startswith("data: {") and '"usage"' in line:
+                try:
+                    usage = json.loads(line[6:]).get("usage")
+                except ValueError:
+                    continue
+                if usage:
+                    break
+    if isinstance(usage, dict) and usage.get("total_tokens") is not None:
+        return int(usage["total_tokens"])
+    return None
+
+
+class _LocalBuckets:
+    """进程内令牌桶状态"""
+
+    def __init__(self):
+        self._levels: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, fn: Callable[[Dict[str, Tuple[float, float]]], Any]) -> Any:
+        with self._lock:
+            return fn(self._levels)
+
+
+class _SharedBuckets:
+    """SQLite共享的令牌桶状态，IMMEDIATE事务保证跨进程的读-改-写原子性"""
+
+    SCHEMA = "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, level REAL NOT NULL, updated_at REAL NOT NULL)"
+
+    def __init__(self, db_path: str):
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(self.SCHEMA)
+
+    def update(self, fn: Callable[[Dict[str, Tuple[float, float]]], Any]) -> Any:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                levels = {name: (level, updated_at) for name, level, updated_at
+                          in self._conn.execute("SELECT name, level, updated_at FROM buckets")}
+                before = dict(levels)
+                result = fn(levels)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO buckets (name, level, updated_at) VALUES (?, ?, ?)",
+                    [(name, level, updated_at) for name, (level, updated_at) in levels.items()
+                     if before.get(name) != (level, updated_at)]
+                )
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+
+class RateLimiter:
+    """令牌桶限流器
+
+    每个键有两个桶：请求桶（容量 rpm，每秒补充 rpm/60）和token桶（容量 tpm，每秒补充 tpm/60）。
+    申请额度时先扣减再等待：余额为负时等待到余额回到0，后到的调用方因此排在前面的调用之后，
+    而不是各自失败后重试。收到429时按 Retry-After 把请求桶压到负值，让所有调用方一起退让。
+    rpm / tpm 为0表示不限制该项。
+    """
+
+    def __init__(self, rpm: float = 0, tpm: float = 0, shared_path: Optional[str] = None,
+                 overrides: Dict[str, Tuple[float, float]] = None):
+        self.rpm = rpm
+        self.tpm = tpm
+        # base_url 前缀 -> (rpm, tpm)，例如为嵌入服务单独设置额度
+        self.overrides = overrides or {}
+        self.shared_path = shared_path
+        self._buckets = _SharedBuckets(shared_path) if shared_path else _LocalBuckets()
+
+        self.waits = 0
+        self.total_wait = 0.0
+        self.throttled = 0
+        self._stats_lock = threading.Lock()
+
+    def limits(self, key: str) -> Tuple[float, float]:
+        base_url = key.split("|", 1)[0]
+        for prefix, limits in self.overrides.items():
+            if base_url.startswith(prefix.rstrip('/')):
+                return limits
+        return self.rpm, self.tpm
+
+    @staticmethod
+    def _take(levels: Dict[str, Tuple[float, float]], name: str, capacity: float, amount: float,
+              now: float) -> float:
+        """按流逝时间补充后扣减 amount，返回需要等待的秒数"""
+        rate = capacity / 60.0
+        level, updated_at = levels.get(name, (capacity, now))
+        level = min(capacity, level + max(now - updated_at, 0.0) * rate) - amount
+        levels[name] = (level, now)
+        return max(0.0, -level / rate)
+
+    def reserve(self, key: str, tokens: int = 0) -> float:
+        """扣减一次请求和 tokens 个token的额度，返回调用方需要等待的秒数"""
+        rpm, tpm = self.limits(key)
+        if not rpm and not tpm:
+            return 0.0
+
+        def take(levels):
+            now = time.time()
+            wait = 0.0
+            if rpm:
+                wait = max(wait, self._take(levels, f"{key}|requests", rpm, 1, now))
+            if tpm and tokens:
+                wait = max(wait, self._take(levels, f"{key}|tokens", tpm, tokens, now))
+            return wait
+
+        wait = self._buckets.update(take)
+        if wait > 0:
+            with self._stats_lock:
+                self.waits += 1
+                self.total_wait += wait
+        return wait
+
+    def acquire(self, key: str, tokens: int = 0):
+        """阻塞直到额度可用"""
+        wait = self.reserve(key, tokens)
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self, key: str, tokens: int = 0):
+        """acquire 的异步版本；共享额度的SQLite事务可能等待其他进程的写锁，放到线程中执行"""
+        if self.shared_path:
+            wait = await asyncio.to_thread(self.reserve, key, tokens)
+        else:
+            wait = self.reserve(key, tokens)
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def adjust(self, key: str, delta_tokens: int):
+        """按实际用量修正token桶：delta 为正时补扣，为负时退还"""
+        _, tpm = self.limits(key)
+        if not tpm or not delta_tokens:
+            return
+
+        def correct(levels):
+            now = time.time()
+            self._take(levels, f"{key}|tokens", tpm, delta_tokens, now)
+            level, updated_at = levels[f"{key}|tokens"]
+            levels[f"{key}|tokens"] = (min(level, tpm), updated_at)
+
+        self._buckets.update(correct)
+
+    def penalize(self, key: str, retry_after: float = DEFAULT_RETRY_AFTER):
+        """收到429后让该键的全部调用方至少退让 retry_after 秒"""
+        rpm, _ = self.limits(key)
+        with self._stats_lock:
+            self.throttled += 1
+        if not rpm:
+            return
+
+        def drain(levels):
+            name = f"{key}|requests"
+            level, _ = levels.get(name, (rpm, time.time()))
+            levels[name] = (min(level, -retry_after * rpm / 60.0), time.time())
+
+        self._buckets.update(drain)
+
+    async def apenalize(self, key: str, retry_after: float = DEFAULT_RETRY_AFTER):
+        """penalize 的异步版本，共享额度时不阻塞事件循环"""
+        if self.shared_path:
+            await asyncio.to_thread(self.penalize, key, retry_after)
+        else:
+            self.penalize(key, retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+                "shared": self.shared_path is not None,
+                "waits": self.waits,
+                "total_wait": self.total_wait,
+                "throttled": self.throttled,
+            }
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return float(response.headers.get("retry-after", DEFAULT_RETRY_AFTER))
+    except ValueError:
+        return DEFAULT_RETRY_AFTER
+
+
+def _request_budget(request: httpx.Request, base_url: str,
+                    api_key: Optional[str]) -> Optional[Tuple[str, int]]:
+    """返回 (限流键, 预计token数)；不需要限流的请求返回None"""
+    if request.method != "POST" or not request.url.path.endswith(_RATE_LIMITED_PATHS):
+        return None
+    try:
+        payload = json.loads(request.content)
+    except (ValueError, httpx.RequestNotRead):
+        return None
+    return limiter_key(base_url, api_key, payload.get("model")), estimate_request_tokens(payload)
+
+
+class RateLimitedTransport(httpx.BaseTransport):
+    """同步httpx传输层限流：发送前申请额度，响应后按实际用量修正，429时全体退让"""
+
+    def __init__(self, limiter: RateLimiter, base_url: str, api_key: Optional[str],
+                 transport: httpx.BaseTransport = None):
+        self.limiter = limiter
+        self.base_url = base_url
+        self.api_key = api_key
+        self.transport = transport or httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        budget = _request_budget(request, self.base_url, self.api_key)
+        if budget is None:
+            return self.transport.handle_request(request)
+        key, estimated = budget
+        self.limiter.acquire(key, estimated)
+        response = self.transport.handle_request(request)
+        if response.status_code == 429:
+            self.limiter.penalize(key, _retry_after(response))
+        elif response.status_code == 200:
+            observe_body(response, _usage_callback(self.limiter, key, estimated), partial=True)
+        return response
+
+    def close(self):
+        self.transport.close()
+
+
+class AsyncRateLimitedTransport(httpx.AsyncBaseTransport):
+    """异步httpx传输层限流"""
+
+    def __init__(self, limiter: RateLimiter, base_url: str, api_key: Optional[str],
+                 transport: httpx.AsyncBaseTransport = None):
+        self.limiter = limiter
+        self.base_url = base_url
+        self.api_key = api_key
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        budget = _request_budget(request, self.base_url, self.api_key)
+        if budget is None:
+            return await self.transport.handle_async_request(request)
+        key, estimated = budget
+        await self.limiter.aacquire(key, estimated)
+        response = await self.transport.handle_async_request(request)
+        if response.status_code == 429:
+            await self.limiter.apenalize(key, _retry_after(response))
+        elif response.status_code == 200:
+            observe_body(response, _usage_callback(self.limiter, key, estimated, in_event_loop=True),
+                         partial=True)
+        return response
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+def _usage_callback(limiter: RateLimiter, key: str, estimated: int,
+                    in_event_loop: bool = False) -> Callable[[bytes], None]:
+    """响应体读取完成后按实际用量修正额度；在事件循环中回调且额度共享时，修正放到线程池执行"""
+    def on_complete(body: bytes):
+        used = usage_from_body(body)
+        if used is None:
+            return
+        if in_event_loop and limiter.shared_path:
+            asyncio.get_running_loop().run_in_executor(None, limiter.adjust, key, used - estimated)
+        else:
+            limiter.adjust(key, used - estimated)
+    return on_complete
+
+
+_rate_limiter: Optional[RateLimiter] = None
+
+
+def configure_rate_limiter(rpm: float = 0, tpm: float = 0, shared_path: Optional[str] = None,
+                           overrides: Dict[str, Tuple[float, float]] = None) -> Optional[RateLimiter]:
+    """设置进程内共享的限流器；未设置任何额度时关闭"""
+    global _rate_limiter
+    if not rpm and not tpm and not any(any(limits) for limits in (overrides or {}).values()):
+        _rate_limiter = None
+    else:
+        _rate_limiter = RateLimiter(rpm, tpm, shared_path, overrides)
+    return _rate_limiter
+
+
+def get_rate_limiter() -> Optional[RateLimiter]:
+    return _rate_limiter
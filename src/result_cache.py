@@ -0,0 +1,182 @@
+"""
+Result Cache
+任务结果缓存：对语义近似的重复任务直接返回已完成的Hub输出
+"""
+
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+
+from .embedding_service import EmbeddingService
+
+
+class CacheEntry:
+    """缓存条目"""
+
+    def __init__(self, prompt: str, embedding: np.ndarray, result: str, ttl: float):
+        self.prompt = prompt
+        self.embedding = embedding
+        self.result = result
+        self.created_at = time.time()
+        self.expires_at = self.created_at + ttl
+        self.hits = 0
+
+    def is_expired(self, now: float = None) -> bool:
+        return (now or time.time()) >= self.expires_at
+
+
+class HyperplaneLSH:
+    """随机超平面局部敏感哈希，用于近似最近邻候选召回"""
+
+    def __init__(self, dim: int, num_planes: int = 8, num_tables: int = 8, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.dim = dim
+        self.num_tables = num_tables
+        # 每张表一组超平面，形状为 (表数, 超平面数, 维度)
+        self.planes = rng.standard_normal((num_tables, num_planes, dim)).astype(np.float32)
+        self.powers = (1 << np.arange(num_planes, dtype=np.int64))
+        self.tables: List[Dict[int, List[int]]] = [{} for _ in range(num_tables)]
+
+    def _signatures(self, vector: np.ndarray) -> np.ndarray:
+        bits = (self.planes @ vector.astype(np.float32)) > 0
+        return bits.astype(np.int64) @ self.powers
+
+    def add(self, item_id: int, vector: np.ndarray):
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            table.setdefault(int(signature), []).append(item_id)
+
+    def remove(self, item_id: int, vector: np.ndarray):
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            bucket = table.get(int(signature))
+            if bucket and item_id in bucket:
+                bucket.remove(item_id)
+                if not bucket:
+                    del table[int(signature)]
+
+    def candidates(self, vector: np.ndarray) -> List[int]:
+        found = set()
+        for table, signature in zip(self.tables, self._signatures(vector)):
+            found.update(table.get(int(signature), ()))
+        return list(found)
+
+
+class ResultCache:
+    """语义近重复任务结果缓存（按Hub隔离）"""
+
+    def __init__(self, embedding_service: EmbeddingService, threshold: float = 0.95,
+                 ttl: float = 3600.0, max_entries_per_hub: int = 10000):
+        self.embedding_service = embedding_service
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries_per_hub = max_entries_per_hub
+
+        self._entries: Dict[str, Dict[int, CacheEntry]] = {}
+        self._indexes: Dict[str, HyperplaneLSH] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, embedding: np.ndarray) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            return None
+        return vector / norm
+
+    def _embed(self, prompt: str) -> Optional[np.ndarray]:
+        # 能力映射阶段已对原始提示词计算过向量，这里通常直接命中嵌入缓存
+        embedding = self.embedding_service.get_embedding(prompt)
+        if embedding is None:
+            return None
+        return self._normalize(embedding)
+
+    def _evict(self, hub_id: str, entry_id: int):
+        entry = self._entries[hub_id].pop(entry_id)
+        self._indexes[hub_id].remove(entry_id, entry.embedding)
+
+    def _purge_expired(self, hub_id: str, now: float):
+        expired = [entry_id for entry_id, entry in self._entries.get(hub_id, {}).items()
+                   if entry.is_expired(now)]
+        for entry_id in expired:
+            self._evict(hub_id, entry_id)
+
+    def lookup(self, hub_id: str, prompt: str) -> Optional[Tuple[str, float]]:
+        """查找语义近似的已缓存结果，返回 (结果, 相似度)"""
+        query = self._embed(prompt)
+        if query is None:
+            return None
+
+        with self._lock:
+            index = self._indexes.get(hub_id)
+            if index is None or index.dim != query.shape[0]:
+                self.misses += 1
+                return None
+
+            now = time.time()
+            best_entry, best_similarity = None, -1.0
+            for entry_id in index.candidates(query):
+                entry = self._entries[hub_id][entry_id]
+                if entry.is_expired(now):
+                    self._evict(hub_id, entry_id)
+                    continue
+                similarity = float(np.dot(query, entry.embedding))
+                if similarity > best_similarity:
+                    best_entry, best_similarity = entry, similarity
+
+            if best_entry is None or best_similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            best_entry.hits += 1
+            self.hits += 1
+            return best_entry.result, best_similarity
+
+    def store(self, hub_id: str, prompt: str, result: str, ttl: Optional[float] = None) -> bool:
+        """缓存Hub的完成结果，ttl 为该Hub的有效期（未设置时使用默认值）"""
+        embedding = self._embed(prompt)
+        if embedding is None:
+            return False
+
+        with self._lock:
+            entries = self._entries.setdefault(hub_id, {})
+            index = self._indexes.get(hub_id)
+            if index is None or index.dim != embedding.shape[0]:
+                index = HyperplaneLSH(embedding.shape[0])
+                self._indexes[hub_id] = index
+                entries.clear()
+
+            now = time.time()
+            self._purge_expired(hub_id, now)
+            if len(entries) >= self.max_entries_per_hub:
+                # 淘汰最早写入的条目
+                oldest_id = min(entries, key=lambda entry_id: entries[entry_id].created_at)
+                self._evict(hub_id, oldest_id)
+
+            entry_id = self._next_id
+            self._next_id += 1
+            entries[entry_id] = CacheEntry(prompt, embedding, result, ttl or self.ttl)
+            index.add(entry_id, embedding)
+            return True
+
+    def invalidate(self, hub_id: str = None):
+        """清除指定Hub（或全部）的缓存"""
+        with self._lock:
+            if hub_id is None:
+                self._entries.clear()
+                self._indexes.clear()
+            else:
+                self._entries.pop(hub_id, None)
+                self._indexes.pop(hub_id, None)
+
+    def stats(self) -> Dict[str, float]:
+        """缓存统计信息"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": sum(len(entries) for entries in self._entries.values()),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -0,0 +1,230 @@
+"""
+Routing Pool
+多进程路由工作池：多个路由进程共享只读的能力向量矩阵和Hub索引（内存映射文件）
+"""
+
+import os
+import json
+import hashlib
+import multiprocessing
+from typing import List, Dict, Any, Optional, Tuple
+from pathlib import Path
+import numpy as np
+from rich.console import Console
+
+console = Console()
+
+
+class RoutingResult:
+    """单个任务的路由结果"""
+
+    def __init__(self, capabilities: List[Tuple[str, float]], hub_scores: List[Tuple[str, float]]):
+        self.capabilities = capabilities
+        self.hub_scores = hub_scores
+
+    @property
+    def required_capabilities(self) -> List[str]:
+        return [name for name, _ in self.capabilities]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "capabilities": [{"name": name, "similarity": round(sim, 4)}
+                             for name, sim in self.capabilities],
+            "hub_scores": [{"hub_id": hub_id, "score": round(score, 4)}
+                           for hub_id, score in self.hub_scores],
+        }
+
+
+class SharedCatalog:
+    """以内存映射文件共享的只读路由目录
+
+    目录文件:
+        manifest.json        能力名和Hub ID（字符串表）
+        embeddings.npy       归一化能力向量矩阵 (能力数, 维度)
+        hub_indptr.npy       Hub -> 能力 的CSR行指针
+        hub_indices.npy      Hub -> 能力 的CSR列索引
+        cap_indptr.npy       能力 -> Hub 的倒排CSR行指针
+        cap_indices.npy      能力 -> Hub 的倒排CSR列索引
+    """
+
+    ARRAYS = ("embeddings", "hub_indptr", "hub_indices", "cap_indptr", "cap_indices")
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        with open(self.path / "manifest.json", 'r', encoding='utf-8') as f:
+            manifest = json.load(f)
+        self.capabilities: List[str] = manifest["capabilities"]
+        self.hub_ids: List[str] = manifest["hub_ids"]
+        # mmap_mode='r' 让所有进程共享同一份操作系统页缓存
+        for name in self.ARRAYS:
+            setattr(self, name, np.load(self.path / f"{name}.npy", mmap_mode='r'))
+
+    @staticmethod
+    def write(base_dir: str, capability_embeddings: Dict[str, np.ndarray],
+              hubs: List[Tuple[str, List[str]]]) -> str:
+        """写出目录，返回目录路径（按内容哈希命名，已打开的旧目录不受影响）"""
+        capabilities = sorted(set(capability_embeddings) |
+                              {cap for _, caps in hubs for cap in caps})
+        cap_ids = {name: i for i, name in enumerate(capabilities)}
+
+        dim = len(next(iter(capability_embeddings.values()))) if capability_embeddings else 1
+        embeddings = np.zeros((len(capabilities), dim), dtype=np.float32)
+        for name, vector in capability_embeddings.items():
+            vector = np.asarray(vector, dtype=np.float32)
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                embeddings[cap_ids[name]] = vector / norm
+
+        hub_indptr = np.zeros(len(hubs) + 1, dtype=np.int64)
+        hub_indices = []
+        cap_to_hubs: List[List[int]] = [[] for _ in capabilities]
+        for row, (_, caps) in enumerate(hubs):
+            ids = sorted({cap_ids[cap] for cap in caps})
+            hub_indices.extend(ids)
+            hub_indptr[row + 1] = len(hub_indices)
+            for cap_id in ids:
+                cap_to_hubs[cap_id].append(row)
+
+        cap_indptr = np.zeros(len(capabilities) + 1, dtype=np.int64)
+        cap_indptr[1:] = np.cumsum([len(rows) for rows in cap_to_hubs])
+        cap_indices = np.fromiter((row for rows in cap_to_hubs for row in rows), dtype=np.int32)
+
+        arrays = {
+            "embeddings": embeddings,
+            "hub_indptr": hub_indptr,
+            "hub_indices": np.asarray(hub_indices, dtype=np.int32),
+            "cap_indptr": cap_indptr,
+            "cap_indices": cap_indices,
+        }
+        manifest = {"capabilities": capabilities, "hub_ids": [hub_id for hub_id, _ in hubs]}
+
+        digest = hashlib.md5(json.dumps(manifest, ensure_ascii=False).encode('utf-8'))
+        digest.update(embeddings.tobytes())
+        target = Path(base_dir) / digest.hexdigest()[:16]
+        if (target / "manifest.json").exists():
+            return str(target)
+
+        tmp_dir = Path(base_dir) / f".tmp-{os.getpid()}-{digest.hexdigest()[:8]}"
+        tmp_dir.mkdir(parents=True, exist_ok=True)
+        for name, array in arrays.items():
+            np.save(tmp_dir / f"{name}.npy", array)
+        with open(tmp_dir / "manifest.json", 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        try:
+            os.replace(tmp_dir, target)
+        except OSError:
+            # 其他进程已写入相同内容的目录
+            for file in tmp_dir.iterdir():
+                file.unlink()
+            tmp_dir.rmdir()
+        return str(target)
+
+    def route(self, query: np.ndarray, threshold: float = 0.3,
+              max_capabilities: int = 10, top_k: Optional[int] = None) -> RoutingResult:
+        """对单个查询向量进行能力检索和Hub打分；top_k 为None时返回全部候选Hub"""
+        query = np.asarray(query, dtype=np.float32)
+        norm = np.linalg.norm(query)
+        if norm == 0 or query.shape[0] != self.embeddings.shape[1]:
+            return RoutingResult([], [])
+
+        similarities = self.embeddings @ (query / norm)
+        matched = np.flatnonzero(similarities >= threshold)
+        matched = matched[np.argsort(-similarities[matched])][:max_capabilities]
+        capabilities = [(self.capabilities[i], float(similarities[i])) for i in matched]
+        if len(matched) == 0:
+            return RoutingResult(capabilities, [])
+
+        # 通过倒排索引只统计与所需能力有交集的Hub
+        intersection = np.zeros(len(self.hub_ids), dtype=np.float32)
+        for cap_id in matched:
+            rows = self.cap_indices[self.cap_indptr[cap_id]:self.cap_indptr[cap_id + 1]]
+            intersection[rows] += 1
+        candidates = np.flatnonzero(intersection)
+        if len(candidates) == 0:
+            return RoutingResult(capabilities, [])
+
+        # 与 AgentExchange.calculate_hub_score 相同的打分公式（向量化）
+        counts = intersection[candidates]
+        hub_sizes = (self.hub_indptr[candidates + 1] - self.hub_indptr[candidates]).astype(np.float32)
+        base_score = counts / len(matched)
+        coverage_bonus = counts / np.maximum(hub_sizes, 1)
+        perfect_match_bonus = np.where(counts == len(matched), 0.2, 0.0)
+        scores = np.minimum(base_score + coverage_bonus * 0.3 + perfect_match_bonus, 1.0)
+
+        order = np.argsort(-scores, kind="stable")
+        if top_k is not None:
+            order = order[:top_k]
+        return RoutingResult(capabilities,
+                             [(self.hub_ids[candidates[i]], float(scores[i])) for i in order])
+
+
+# 每个工作进程持有的只读目录（内存映射）
+_worker_catalog: Optional[SharedCatalog] = None
+
+
+def _init_worker(catalog_path: str):
+    global _worker_catalog
+    _worker_catalog = SharedCatalog(catalog_path)
+
+
+def _route_batch(args: Tuple[np.ndarray, Dict[str, Any]]) -> List[RoutingResult]:
+    queries, options = args
+    return [_worker_catalog.route(query, **options) for query in queries]
+
+
+class RoutingPool:
+    """多进程路由工作池"""
+
+    def __init__(self, catalog_path: str, num_workers: int = None, threshold: float = 0.3,
+                 max_capabilities: int = 10, top_k: Optional[int] = None):
+        self.catalog_path = catalog_path
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.options = {"threshold": threshold, "max_capabilities": max_capabilities, "top_k": top_k}
+
+        # 启动工作池时服务进程中已有后台线程（实例回收、缓存刷新等），fork 可能复制被持有的锁，
+        # 使用 forkserver（不支持时 spawn）从干净的进程创建工作进程
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        self._pool = context.Pool(self.num_workers, initializer=_init_worker,
+                                  initargs=(catalog_path,))
+        self.routed = 0
+        console.print(f"[green]路由工作池已启动: {self.num_workers} 个进程[/green]")
+
+    @classmethod
+    def from_platform(cls, capability_mapper, hubs, base_dir: str = "cache/routing",
+                      **kwargs) -> Optional['RoutingPool']:
+        """根据能力映射器和Hub配置生成共享目录并启动工作池"""
+        names = list(capability_mapper.capability_descriptions.keys())
+        texts = [capability_mapper.capability_descriptions[name] for name in names]
+        embeddings = capability_mapper.embedding_service.get_batch_embeddings(texts)
+        capability_embeddings = {name: embeddings[text]
+                                 for name, text in zip(names, texts) if text in embeddings}
+        if not capability_embeddings:
+            console.print("[yellow]无法获取能力向量，未启动路由工作池[/yellow]")
+            return None
+
+        catalog_path = SharedCatalog.write(
+            base_dir, capability_embeddings, [(hub.hub_id, hub.capabilities) for hub in hubs]
+        )
+        return cls(catalog_path, **kwargs)
+
+    def route(self, query: np.ndarray, top_k: Optional[int] = None) -> RoutingResult:
+        """路由单个查询向量；top_k 为调用方需要的候选数，未指定时使用工作池的设置"""
+        return self.route_batch([query], top_k)[0]
+
+    def route_batch(self, queries: List[np.ndarray], top_k: Optional[int] = None) -> List[RoutingResult]:
+        """将一批查询均匀分配给各工作进程"""
+        if not queries:
+            return []
+        options = self.options if top_k is None else dict(self.options, top_k=top_k)
+        chunk_size = max(1, -(-len(queries) // self.num_workers))
+        chunks = [(queries[i:i + chunk_size], options)
+                  for i in range(0, len(queries), chunk_size)]
+        results = [result for batch in self._pool.map(_route_batch, chunks) for result in batch]
+        self.routed += len(results)
+        return results
+
+    def close(self):
+        """关闭工作池"""
+        self._pool.close()
+        self._pool.join()
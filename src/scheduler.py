@@ -0,0 +1,277 @@
+"""
+Fair Scheduler
+多租户公平调度：按租户和优先级加权公平排队，限制同时执行的任务数，并统计各租户的排队深度和等待时间
+"""
+
+import time
+import asyncio
+import threading
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+from typing import Dict, Any, Optional, Callable
+from rich.console import Console
+from rich.table import Table
+
+from .usp import TaskRequest, DEFAULT_TENANT, DEFAULT_PRIORITY
+
+console = Console()
+
+# 优先级类别及默认份额：同一租户内高优先级任务按份额比例优先出队，但不会饿死低优先级任务
+PRIORITY_SHARES = {"high": 4.0, "normal": 2.0, "low": 1.0}
+
+
+def parse_shares(spec: Optional[str]) -> Dict[str, float]:
+    """解析 "alice=3,bob=1" 形式的份额配置"""
+    shares = {}
+    for item in (spec or "").split(","):
+        name, sep, value = item.partition("=")
+        if not item.strip():
+            continue
+        if not sep or not name.strip():
+            raise ValueError(f"份额配置格式错误: {item}")
+        share = float(value)
+        if share <= 0:
+            raise ValueError(f"份额必须为正数: {item}")
+        shares[name.strip()] = share
+    return shares
+
+
+class TenantMetrics:
+    """单个租户的排队统计"""
+
+    def __init__(self, window: int = 500):
+        self.queued = 0
+        self.running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.abandoned = 0
+        self.total_wait = 0.0
+        self.recent_waits = deque(maxlen=window)
+
+    def wait_percentile(self, q: float) -> Optional[float]:
+        if not self.recent_waits:
+            return None
+        samples = sorted(self.recent_waits)
+        return samples[min(int(q / 100 * len(samples)), len(samples) - 1)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        started = self.submitted - self.queued - self.abandoned
+        return {
+            "queue_depth": self.queued,
+            "running": self.running,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "abandoned": self.abandoned,
+            "avg_wait": self.total_wait / started if started > 0 else None,
+            "wait_p50": self.wait_percentile(50),
+            "wait_p95": self.wait_percentile(95),
+            "max_wait": max(self.recent_waits) if self.recent_waits else None,
+        }
+
+
+class _Ticket:
+    """排队中的一次执行请求，获得执行槽位时调用 wake"""
+
+    def __init__(self, tenant: str, priority: str, wake: Callable[[], None]):
+        self.tenant = tenant
+        self.priority = priority
+        self.wake = wake
+        self.enqueued_at = time.perf_counter()
+        self.granted = False
+
+
+class _TenantQueue:
+    """单个租户按优先级分类的等待队列
+
+    出队采用步进调度（stride scheduling）：每个队列维护一个虚拟进度，出队一次前进 1/份额，
+    总是选择进度最小的队列，长期出队比例等于份额比例。
+    """
+
+    def __init__(self, name: str, share: float):
+        self.name = name
+        self.share = share
+        self.pass_value = 0.0
+        self.classes: Dict[str, deque] = {}
+        self.class_pass: Dict[str, float] = {}
+        self.virtual_time = 0.0
+        self.depth = 0
+
+    def push(self, ticket: _Ticket):
+        queue = self.classes.setdefault(ticket.priority, deque())
+        if not queue:
+            # 重新变为积压的类别从当前虚拟时间开始，空闲期间不累积额度
+            self.class_pass[ticket.priority] = max(self.class_pass.get(ticket.priority, 0.0), self.virtual_time)
+        queue.append(ticket)
+        self.depth += 1
+
+    def pop(self, priority_shares: Dict[str, float]) -> _Ticket:
+        priority = min((p for p, queue in self.classes.items() if queue),
+                       key=lambda p: (self.class_pass[p], -priority_shares.get(p, 1.0)))
+        self.virtual_time = self.class_pass[priority]
+        self.class_pass[priority] += 1.0 / priority_shares.get(priority, 1.0)
+        self.depth -= 1
+        return self.classes[priority].popleft()
+
+    def remove(self, ticket: _Ticket) -> bool:
+        queue = self.classes.get(ticket.priority)
+        if not queue or ticket not in queue:
+            return False
+        queue.remove(ticket)
+        self.depth -= 1
+        return True
+
+
+class FairScheduler:
+    """AgentExchange 前的多租户加权公平调度器
+
+    最多同时执行 max_concurrent 个任务。有空闲槽位时，先在有积压的租户中按份额选出租户，
+    再在该租户内按优先级份额选出任务。调度是work-conserving的：只有一个租户积压时它可以
+    用满全部槽位；多个租户竞争时各自获得的槽位比例等于份额比例，单个租户的大批量任务
+    不会让其他租户一直排在后面。
+    """
+
+    def __init__(self, max_concurrent: int = 8,
+                 tenant_shares: Optional[Dict[str, float]] = None,
+                 priority_shares: Optional[Dict[str, float]] = None,
+                 default_share: float = 1.0):
+        self.max_concurrent = max(1, max_concurrent)
+        self.tenant_shares = dict(tenant_shares or {})
+        self.priority_shares = dict(priority_shares or PRIORITY_SHARES)
+        self.default_share = default_share
+        self.running = 0
+        self._virtual_time = 0.0
+        self._tenants: Dict[str, _TenantQueue] = {}
+        self._metrics: Dict[str, TenantMetrics] = {}
+        self._lock = threading.Lock()
+
+    def validate_priority(self, priority: str):
+        if priority not in self.priority_shares:
+            raise ValueError(f"未知的优先级: {priority}，可选: {list(self.priority_shares)}")
+
+    def _submit(self, task_request: TaskRequest, wake: Callable[[], None]) -> _Ticket:
+        tenant = task_request.tenant or DEFAULT_TENANT
+        priority = task_request.priority or DEFAULT_PRIORITY
+        self.validate_priority(priority)
+        ticket = _Ticket(tenant, priority, wake)
+        with self._lock:
+            queue = self._tenants.get(tenant)
+            if queue is None:
+                queue = self._tenants[tenant] = _TenantQueue(
+                    tenant, self.tenant_shares.get(tenant, self.default_share))
+            if not queue.depth:
+                queue.pass_value = max(queue.pass_value, self._virtual_time)
+            queue.push(ticket)
+            metrics = self._metrics.setdefault(tenant, TenantMetrics())
+            metrics.submitted += 1
+            metrics.queued += 1
+            self._dispatch_locked()
+        return ticket
+
+    def _dispatch_locked(self):
+        while self.running < self.max_concurrent:
+            backlogged = [queue for queue in self._tenants.values() if queue.depth]
+            if not backlogged:
+                return
+            queue = min(backlogged, key=lambda q: (q.pass_value, -q.share, q.name))
+            self._virtual_time = queue.pass_value
+            queue.pass_value += 1.0 / queue.share
+            ticket = queue.pop(self.priority_shares)
+
+            wait = time.perf_counter() - ticket.enqueued_at
+            metrics = self._metrics[ticket.tenant]
+            metrics.queued -= 1
+            metrics.running += 1
+            metrics.total_wait += wait
+            metrics.recent_waits.append(wait)
+            self.running += 1
+            ticket.granted = True
+            ticket.wake()
+
+    def _release(self, ticket: _Ticket):
+        with self._lock:
+            metrics = self._metrics[ticket.tenant]
+            metrics.running -= 1
+            metrics.completed += 1
+            self.running -= 1
+            self._dispatch_locked()
+
+    def _abandon(self, ticket: _Ticket):
+        """等待被取消（如客户端断开）：仍在排队则移出队列，已获得槽位则归还"""
+        with self._lock:
+            if not ticket.granted:
+                if self._tenants[ticket.tenant].remove(ticket):
+                    metrics = self._metrics[ticket.tenant]
+                    metrics.queued -= 1
+                    metrics.abandoned += 1
+                return
+        self._release(ticket)
+
+    @contextmanager
+    def slot(self, task_request: TaskRequest):
+        """阻塞等待执行槽位，退出时归还"""
+        granted = threading.Event()
+        ticket = self._submit(task_request, granted.set)
+        try:
+            granted.wait()
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, task_request: TaskRequest):
+        """在事件循环中等待执行槽位，等待期间不占用线程"""
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        ticket = self._submit(task_request, wake)
+        try:
+            await granted
+        except BaseException:
+            self._abandon(ticket)
+            raise
+        try:
+            yield
+        finally:
+            self._release(ticket)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "max_concurrent": self.max_concurrent,
+                "running": self.running,
+                "queued": sum(queue.depth for queue in self._tenants.values()),
+                "tenants": {
+                    tenant: dict(metrics.to_dict(),
+                                 share=self.tenant_shares.get(tenant, self.default_share))
+                    for tenant, metrics in sorted(self._metrics.items())
+                },
+            }
+
+    def display_stats(self):
+        def fmt(value: Optional[float]) -> str:
+            return "-" if value is None else f"{value * 1000:.0f}"
+
+        stats = self.stats()
+        table = Table(title=f"租户调度统计（执行中 {stats['running']}/{stats['max_concurrent']}，"
+                            f"排队 {stats['queued']}）")
+        table.add_column("租户", style="cyan")
+        table.add_column("份额", style="white")
+        table.add_column("排队/执行中", style="yellow")
+        table.add_column("已提交/已完成", style="green")
+        table.add_column("等待 平均/p50/p95(ms)", style="magenta")
+        for tenant, metrics in stats["tenants"].items():
+            table.add_row(
+                tenant,
+                f"{metrics['share']:g}",
+                f"{metrics['queue_depth']}/{metrics['running']}",
+                f"{metrics['submitted']}/{metrics['completed']}",
+                f"{fmt(metrics['avg_wait'])}/{fmt(metrics['wait_p50'])}/{fmt(metrics['wait_p95'])}",
+            )
+        console.print(table)
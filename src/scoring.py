@@ -0,0 +1,75 @@
+"""
+Scoring Policies
+Hub打分策略：在能力匹配分数的基础上融合实时运行信号
+"""
+
+from abc import ABC, abstractmethod
+from typing import List
+
+from .hub_stats import HubStats
+
+
+class ScoringPolicy(ABC):
+    """Hub打分策略抽象基类"""
+
+    @abstractmethod
+    def score(self, hub, required_capabilities: List[str], capability_score: float,
+              stats: HubStats) -> float:
+        """根据能力匹配分数和Hub运行统计计算最终分数"""
+        pass
+
+
+class CapabilityScoringPolicy(ScoringPolicy):
+    """仅按能力匹配打分（默认行为）"""
+
+    def score(self, hub, required_capabilities: List[str], capability_score: float,
+              stats: HubStats) -> float:
+        return capability_score
+
+
+class LoadAwareScoringPolicy(ScoringPolicy):
+    """融合延迟、负载和错误率的打分策略
+
+    最终分数 = 能力分数 × 加权健康系数，能力不匹配的Hub仍为0分；
+    能力相同的Hub之间，延迟低、在途任务少、错误率低的Hub得分更高。
+    """
+
+    def __init__(self, latency_weight: float = 0.2, load_weight: float = 0.2,
+                 error_weight: float = 0.3, reference_latency: float = 30.0):
+        if latency_weight + load_weight + error_weight > 1.0:
+            raise ValueError("权重之和不能超过1")
+        self.latency_weight = latency_weight
+        self.load_weight = load_weight
+        self.error_weight = error_weight
+        self.reference_latency = reference_latency
+
+    def score(self, hub, required_capabilities: List[str], capability_score: float,
+              stats: HubStats) -> float:
+        if capability_score <= 0:
+            return capability_score
+
+        # 尚无观测数据的Hub视为与参考延迟相当，避免新Hub永远得不到流量
+        latency = stats.ewma_latency if stats.ewma_latency is not None else self.reference_latency
+        latency_factor = self.reference_latency / (self.reference_latency + latency)
+        load_factor = 1.0 / (1 + stats.in_flight)
+        health_factor = 1.0 - stats.error_rate
+
+        fixed_weight = 1.0 - self.latency_weight - self.load_weight - self.error_weight
+        multiplier = (fixed_weight
+                      + self.latency_weight * latency_factor
+                      + self.load_weight * load_factor
+                      + self.error_weight * health_factor)
+        return capability_score * multiplier
+
+
+SCORING_POLICIES = {
+    "capability": CapabilityScoringPolicy,
+    "load_aware": LoadAwareScoringPolicy,
+}
+
+
+def get_scoring_policy(name: str) -> ScoringPolicy:
+    """按名称创建打分策略"""
+    if name not in SCORING_POLICIES:
+        raise ValueError(f"未知的打分策略: {name}，可选: {list(SCORING_POLICIES)}")
+    return SCORING_POLICIES[name]()
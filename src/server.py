@@ -0,0 +1,439 @@
+"""
+AEX Server
+HTTP/JSON服务模式：常驻进程复用USP、AEX、嵌入缓存和已初始化的Hub
+
+接口:
+    GET  /health   健康检查
+    POST /route    仅路由，返回所需能力和Hub排名
+    POST /tasks    路由并执行，以NDJSON分块流式返回执行过程（"hedge": true 时对冲执行）
+
+任务可携带 "tenant" 和 "priority"（high/normal/low），执行前经多租户公平调度器排队
+"""
+
+import json
+import asyncio
+from typing import Dict, Any, Optional, Tuple, AsyncIterator
+from urllib.parse import urlsplit
+from rich.console import Console
+
+from .usp import UserSidePlatform, TaskRequest, DEFAULT_TENANT, DEFAULT_PRIORITY
+from .aex import AgentExchange, HubInfo
+from .agent_hub import TaskTimeoutError
+from .routing_pool import RoutingPool
+from .scheduler import FairScheduler
+from .llm_cache import get_llm_cache
+from .tool_cache import get_tool_cache
+from .rate_limiter import get_rate_limiter
+
+console = Console()
+
+MAX_BODY_SIZE = 1024 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    429: "Too Many Requests",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class HTTPError(Exception):
+    """带状态码的请求错误"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+class HTTPRequest:
+    """解析后的HTTP请求"""
+
+    def __init__(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        self.method = method
+        self.path = path
+        self.headers = headers
+        self.body = body
+
+    def json(self) -> Dict[str, Any]:
+        if not self.body:
+            return {}
+        try:
+            data = json.loads(self.body.decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError) as e:
+            raise HTTPError(400, f"请求体不是合法JSON: {e}")
+        if not isinstance(data, dict):
+            raise HTTPError(400, "请求体必须是JSON对象")
+        return data
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[HTTPRequest]:
+    """读取并解析一个HTTP/1.1请求"""
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    try:
+        method, target, _ = request_line.decode('latin-1').strip().split(" ", 2)
+    except ValueError:
+        raise HTTPError(400, "请求行格式错误")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode('latin-1').partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    try:
+        length = int(headers.get("content-length", "0") or 0)
+    except ValueError:
+        raise HTTPError(400, "Content-Length 不是合法整数")
+    if length < 0:
+        raise HTTPError(400, "Content-Length 不能为负数")
+    if length > MAX_BODY_SIZE:
+        raise HTTPError(413, "请求体过大")
+    body = await reader.readexactly(length) if length else b""
+    return HTTPRequest(method.upper(), urlsplit(target).path, headers, body)
+
+
+def _encode_json(data: Any) -> bytes:
+    return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+
+async def write_json(writer: asyncio.StreamWriter, status: int, data: Any):
+    """写出完整的JSON响应"""
+    body = _encode_json(data)
+    writer.write(
+        f"HTTP/1.1 {status} {HTTP_REASONS.get(status, '')}\r\n"
+        "Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        "Connection: close\r\n\r\n".encode('latin-1') + body
+    )
+    await writer.drain()
+
+
+async def write_stream(writer: asyncio.StreamWriter, events: AsyncIterator[Dict[str, Any]]):
+    """以分块传输编码写出NDJSON事件流"""
+    writer.write(
+        "HTTP/1.1 200 OK\r\n"
+        "Content-Type: application/x-ndjson; charset=utf-8\r\n"
+        "Transfer-Encoding: chunked\r\n"
+        "Cache-Control: no-cache\r\n"
+        "Connection: close\r\n\r\n".encode('latin-1')
+    )
+    async for event in events:
+        line = _encode_json(event) + b"\n"
+        writer.write(f"{len(line):X}\r\n".encode('latin-1') + line + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def int_field(payload: Dict[str, Any], name: str, default: int, minimum: int = 1) -> int:
+    """读取请求中的整数字段，类型或取值不合法时返回400"""
+    value = payload.get(name, default)
+    if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+        raise HTTPError(400, f"{name} 必须是不小于 {minimum} 的整数")
+    return value
+
+
+def hub_to_dict(hub: HubInfo, score: float = None) -> Dict[str, Any]:
+    data = {
+        "hub_id": hub.hub_id,
+        "name": hub.name,
+        "description": hub.description,
+        "capabilities": hub.capabilities,
+    }
+    if score is not None:
+        data["score"] = round(score, 4)
+    return data
+
+
+class AEXServer:
+    """常驻的AEX HTTP服务"""
+
+    def __init__(self, usp: UserSidePlatform, aex: AgentExchange,
+                 host: str = "127.0.0.1", port: int = 8080, max_concurrent_tasks: int = 8,
+                 routing_pool: Optional[RoutingPool] = None,
+                 scheduler: Optional[FairScheduler] = None):
+        self.usp = usp
+        self.aex = aex
+        self.routing_pool = routing_pool
+        self.host = host
+        self.port = port
+        self.max_concurrent_tasks = max_concurrent_tasks
+        # 执行槽位按租户和优先级公平分配，单个租户的大批量任务不会阻塞其他租户
+        self.scheduler = scheduler or FairScheduler(max_concurrent=max_concurrent_tasks)
+        self.requests_served = 0
+
+    def _build_task_request_prompt(self, payload: Dict[str, Any]) -> str:
+        prompt = payload.get("prompt")
+        if not isinstance(prompt, str) or not prompt.strip():
+            raise HTTPError(400, "缺少 prompt 字段")
+        return prompt.strip()
+
+    def _scheduling_fields(self, payload: Dict[str, Any]) -> Dict[str, str]:
+        tenant = payload.get("tenant", DEFAULT_TENANT)
+        if not isinstance(tenant, str) or not tenant.strip():
+            raise HTTPError(400, "tenant 必须是非空字符串")
+        priority = payload.get("priority", DEFAULT_PRIORITY)
+        try:
+            self.scheduler.validate_priority(priority)
+        except (ValueError, TypeError) as e:
+            raise HTTPError(400, str(e))
+        return {"tenant": tenant.strip(), "priority": priority}
+
+    @staticmethod
+    def _timeout_field(payload: Dict[str, Any]) -> Optional[float]:
+        timeout = payload.get("timeout")
+        if timeout is not None and (isinstance(timeout, bool) or not isinstance(timeout, (int, float))
+                                    or timeout <= 0):
+            raise HTTPError(400, "timeout 必须是正数（秒）")
+        return timeout
+
+    @staticmethod
+    def _hedge_options(payload: Dict[str, Any]) -> Dict[str, Any]:
+        hedge_delay = payload.get("hedge_delay")
+        if hedge_delay is not None and (isinstance(hedge_delay, bool) or
+                                        not isinstance(hedge_delay, (int, float)) or hedge_delay < 0):
+            raise HTTPError(400, "hedge_delay 必须是非负数（秒）")
+        return {"top_k": int_field(payload, "hedge_top_k", 2), "hedge_delay": hedge_delay}
+
+    def _build_task_request(self, payload: Dict[str, Any]) -> TaskRequest:
+        prompt = self._build_task_request_prompt(payload)
+        scheduling = self._scheduling_fields(payload)
+        timeout = self._timeout_field(payload)
+        capabilities = payload.get("required_capabilities")
+        if capabilities is not None:
+            if not isinstance(capabilities, list):
+                raise HTTPError(400, "required_capabilities 必须是列表")
+            return TaskRequest(prompt, capabilities, timeout=timeout, **scheduling)
+        return self.usp.create_task_request(prompt, timeout=timeout, **scheduling)
+
+    def _route_with_pool(self, prompt: str, timeout: Optional[float], scheduling: Dict[str, str],
+                         top_k: Optional[int] = None) -> Optional[Tuple[TaskRequest, list]]:
+        """通过多进程路由工作池完成语义能力检索，再按与 rank_hubs 相同的策略对候选Hub打分
+
+        词法结果明确时不需要嵌入，交给常规路由；启用混合检索时把工作池的语义排名与BM25排名融合。
+        top_k 为调用方需要的候选数，为None时工作池返回全部候选。
+        """
+        mapper = self.usp.capability_mapper
+        if mapper.use_hybrid_search and mapper.lexical_match(prompt):
+            return None
+        embedding = self.usp.embedding_service.get_embedding(prompt)
+        if embedding is None:
+            return None
+        result = self.routing_pool.route(embedding, top_k)
+        capabilities = result.required_capabilities
+        if mapper.use_hybrid_search:
+            capabilities = mapper.extract_capabilities_hybrid(prompt, semantic_ranking=result.capabilities)
+        if not capabilities:
+            return None
+
+        task_request = TaskRequest(prompt, capabilities, timeout=timeout, **scheduling)
+        hub_scores = []
+        if capabilities == result.required_capabilities:
+            # 工作池的能力分数与 calculate_hub_score 相同，这里补上熔断过滤和打分策略
+            candidates = [(self.aex.get_hub(hub_id), score) for hub_id, score in result.hub_scores]
+            hub_scores = self.aex.score_candidates(
+                [(hub, score) for hub, score in candidates if hub is not None], task_request)
+        if not hub_scores:
+            # 融合后能力变化或候选均不可用时，在全部Hub上重新排名
+            hub_scores = self.aex.rank_hubs(task_request)
+        return task_request, hub_scores
+
+    def route(self, payload: Dict[str, Any], top_k: Optional[int] = None) -> Tuple[TaskRequest, list]:
+        """解析任务并对Hub排名（阻塞调用，在线程池中执行）；top_k 限制路由工作池返回的候选数"""
+        if not self.aex.available_hubs:
+            raise HTTPError(503, "没有可用的Hub")
+        routed = None
+        if (self.routing_pool is not None and self.usp.use_semantic_search
+                and payload.get("required_capabilities") is None):
+            scheduling = self._scheduling_fields(payload)
+            routed = self._route_with_pool(self._build_task_request_prompt(payload),
+                                           self._timeout_field(payload), scheduling, top_k)
+        if routed:
+            task_request, hub_scores = routed
+        else:
+            task_request = self._build_task_request(payload)
+            hub_scores = self.aex.rank_hubs(task_request)
+        if not hub_scores:
+            # 熔断过滤后没有候选
+            raise HTTPError(503, "所有Hub均处于熔断状态")
+        return task_request, hub_scores
+
+    async def handle_route(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        payload = request.json()
+        top_k = int_field(payload, "top_k", 3)
+        task_request, hub_scores = await asyncio.to_thread(self.route, payload, top_k)
+        await write_json(writer, 200, {
+            "task": task_request.to_dict(),
+            "hub": hub_to_dict(*hub_scores[0]),
+            "candidates": [hub_to_dict(hub, score) for hub, score in hub_scores[:top_k]],
+        })
+
+    def _run_hub(self, hub: HubInfo, task_request: TaskRequest, emit) -> Tuple[str, bool]:
+        """在工作线程中执行Hub并逐块回传输出，返回 (输出, 是否超时)"""
+        with self.aex.lease_hub_instance(hub) as hub_instance:
+            if not hub_instance:
+                raise RuntimeError(f"无法创建Hub实例: {hub.hub_class}")
+
+            prompt = task_request.original_prompt
+            deadline = self.aex.resolve_deadline(hub, task_request)
+            chunks = []
+            timed_out = False
+            if not self.aex.health.acquire(hub.hub_id):
+                raise RuntimeError(f"Hub {hub.hub_id} 处于熔断状态")
+            # track_execution 持有该Hub的执行锁，同一个agno Team不会被并发运行
+            with self.aex.track_execution(hub.hub_id, deadline) as outcome:
+                try:
+                    for content in hub_instance.stream(prompt, deadline):
+                        chunks.append(content)
+                        emit({"type": "chunk", "content": content})
+                except TaskTimeoutError:
+                    timed_out = True
+                    outcome["success"] = False
+                    outcome["error"] = "执行超时"
+            result = "".join(chunks)
+            if result and not timed_out:
+                self.aex.store_result(hub, prompt, result)
+            return result, timed_out
+
+    async def task_events(self, payload: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """路由并执行任务，产出事件流"""
+        try:
+            hedge_options = self._hedge_options(payload) if payload.get("hedge") else None
+            task_request, hub_scores = await asyncio.to_thread(self.route, payload)
+        except HTTPError as e:
+            yield {"type": "error", "status": e.status, "message": e.message}
+            return
+        except Exception as e:
+            yield {"type": "error", "status": 500, "message": str(e)}
+            return
+
+        hub, score = hub_scores[0]
+        yield {"type": "route", "task": task_request.to_dict(), "hub": hub_to_dict(hub, score)}
+
+        if hedge_options is not None:
+            async with self.scheduler.aslot(task_request):
+                result, report = await self.aex.aexecute_task_hedged(task_request, **hedge_options)
+            if result is None:
+                yield {"type": "error", "status": 500, "message": "任务执行失败"}
+                return
+            yield {"type": "chunk", "content": result}
+            yield {"type": "done", "result": result, "cached": report is None,
+                   "hedge": report.to_dict() if report else None}
+            return
+
+        prompt = task_request.original_prompt
+        cached = await asyncio.to_thread(self.aex.lookup_cached_result, hub, prompt)
+        if cached:
+            result, similarity = cached
+            yield {"type": "chunk", "content": result}
+            yield {"type": "done", "result": result, "cached": True, "similarity": similarity}
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def emit(event: Dict[str, Any]):
+            loop.call_soon_threadsafe(queue.put_nowait, event)
+
+        started = False
+
+        async def execute():
+            nonlocal started
+            # 槽位由执行任务持有到Hub执行结束，客户端中途断开时不会提前释放
+            async with self.scheduler.aslot(task_request):
+                started = True
+                return await asyncio.to_thread(self._run_hub, hub, task_request, emit)
+
+        job = asyncio.ensure_future(execute())
+        job.add_done_callback(lambda _: emit(None))
+        try:
+            while True:
+                event = await queue.get()
+                if event is None:
+                    break
+                yield event
+        finally:
+            if not started:
+                # 客户端在排队期间断开，放弃排队
+                job.cancel()
+
+        try:
+            result, timed_out = job.result()
+            yield {"type": "done", "result": result, "cached": False, "timed_out": timed_out}
+        except TaskTimeoutError as e:
+            # 截止时间前未能拿到Hub的执行锁
+            yield {"type": "error", "status": 504, "message": str(e)}
+        except Exception as e:
+            yield {"type": "error", "status": 500, "message": str(e)}
+
+    async def handle_tasks(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        payload = request.json()
+        await write_stream(writer, self.task_events(payload))
+
+    async def handle_health(self, request: HTTPRequest, writer: asyncio.StreamWriter):
+        await write_json(writer, 200, {
+            "status": "ok",
+            "hubs": len(self.aex.available_hubs),
+            "warm_hubs": self.aex.hub_pool.keys(),
+            "hub_pool": self.aex.hub_pool.stats(),
+            "requests_served": self.requests_served,
+            "routing_workers": self.routing_pool.num_workers if self.routing_pool else 0,
+            "result_cache": self.aex.result_cache.stats() if self.aex.result_cache else None,
+            "hub_stats": self.aex.hub_stats.snapshot(),
+            "hedging": self.aex.hedge_summary.to_dict(),
+            "hub_health": self.aex.health.snapshot(),
+            "llm_cache": get_llm_cache().stats() if get_llm_cache() else None,
+            "tool_cache": get_tool_cache().stats(),
+            "rate_limiter": get_rate_limiter().stats() if get_rate_limiter() else None,
+            "scheduler": self.scheduler.stats(),
+        })
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        routes = {
+            "/health": ("GET", self.handle_health),
+            "/route": ("POST", self.handle_route),
+            "/tasks": ("POST", self.handle_tasks),
+        }
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            if request.path not in routes:
+                raise HTTPError(404, f"未知路径: {request.path}")
+            method, handler = routes[request.path]
+            if request.method != method:
+                raise HTTPError(405, f"{request.path} 仅支持 {method}")
+            self.requests_served += 1
+            await handler(request, writer)
+        except HTTPError as e:
+            await write_json(writer, e.status, {"error": e.message})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as e:
+            console.print(f"[red]处理请求失败: {e}[/red]")
+            try:
+                await write_json(writer, 500, {"error": str(e)})
+            except ConnectionError:
+                pass
+        finally:
+            writer.close()
+
+    async def serve_forever(self):
+        """启动服务并持续运行"""
+        if not self.aex.available_hubs and not self.aex.load_hub_configs():
+            raise RuntimeError("加载Hub配置失败")
+
+        server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        console.print(f"[green]AEX服务已启动: http://{self.host}:{self.port}[/green]")
+        async with server:
+            await server.serve_forever()
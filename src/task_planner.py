@@ -0,0 +1,255 @@
+"""
+Task Planner
+任务规划：把复合任务拆分为带依赖关系的子任务DAG，并发执行相互独立的子任务
+"""
+
+import re
+import time
+import asyncio
+from typing import List, Dict, Optional, Callable, TYPE_CHECKING
+from rich.console import Console
+from rich.table import Table
+
+if TYPE_CHECKING:
+    from .usp import TaskRequest
+
+console = Console()
+
+# 子句分隔：中英文标点和常见连接词前（包括「并生成/并撰写」等引出产出物的连接词）
+_CLAUSE_SPLIT = re.compile(r"[，,。；;！!？?\n]+|(?=然后|之后|接着|最后|同时|并(?:生成|撰写|写|整理))")
+# 表示依赖前序结果的标记（中文按子串匹配）
+_SEQUENTIAL_MARKERS = ("然后", "之后", "接着", "最后", "并生成", "并撰写", "并写", "并整理",
+                       "基于", "根据", "汇总", "总结", "整理成", "形成")
+# 英文标记按整词匹配，避免 "then" 命中 "authentication"
+_SEQUENTIAL_WORDS = re.compile(r"(?<![a-z])(?:then|based on)(?![a-z])")
+# 「再」只在子句开头作连接词，排除「再生」「再现」「再保险」等词语
+_LEADING_ZAI = re.compile(r"^并?再(?!生|现|保险)")
+# 明确表示并行的标记（出现在子句开头）
+_PARALLEL_MARKERS = ("同时", "另外", "此外")
+_PARALLEL_WORDS = re.compile(r"^(?:meanwhile|also)(?![a-z])")
+# 过短的片段并入前一个子任务
+_MIN_CLAUSE_LENGTH = 4
+
+
+class SubTask:
+    """DAG中的一个子任务"""
+
+    def __init__(self, task_id: str, prompt: str, required_capabilities: List[str],
+                 depends_on: List[str] = None):
+        self.task_id = task_id
+        self.prompt = prompt
+        self.required_capabilities = required_capabilities
+        self.depends_on = depends_on or []
+
+        self.hub_id: Optional[str] = None
+        self.result: Optional[str] = None
+        self.status = "pending"
+        self.latency = 0.0
+
+
+class TaskPlan:
+    """子任务DAG"""
+
+    def __init__(self, original_prompt: str, subtasks: List[SubTask]):
+        self.original_prompt = original_prompt
+        self.subtasks = subtasks
+        self.by_id = {subtask.task_id: subtask for subtask in subtasks}
+        self._validate()
+
+    def __len__(self) -> int:
+        return len(self.subtasks)
+
+    def _validate(self):
+        for subtask in self.subtasks:
+            for dependency in subtask.depends_on:
+                if dependency not in self.by_id:
+                    raise ValueError(f"子任务 {subtask.task_id} 依赖不存在的子任务 {dependency}")
+        self.levels()
+
+    def levels(self) -> List[List[SubTask]]:
+        """Kahn拓扑分层：同一层内的子任务互不依赖；存在环时抛出ValueError"""
+        remaining = {subtask.task_id: set(subtask.depends_on) for subtask in self.subtasks}
+        levels = []
+        while remaining:
+            ready = [task_id for task_id, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"子任务存在循环依赖: {sorted(remaining)}")
+            levels.append([self.by_id[task_id] for task_id in ready])
+            for task_id in ready:
+                del remaining[task_id]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return levels
+
+    def dependents(self, task_id: str) -> List[SubTask]:
+        return [subtask for subtask in self.subtasks if task_id in subtask.depends_on]
+
+    def sinks(self) -> List[SubTask]:
+        """没有下游的子任务，其输出构成最终结果"""
+        return [subtask for subtask in self.subtasks if not self.dependents(subtask.task_id)]
+
+    def critical_path_latency(self) -> float:
+        """按实际耗时计算的关键路径长度"""
+        finish: Dict[str, float] = {}
+        for level in self.levels():
+            for subtask in level:
+                start = max((finish[dep] for dep in subtask.depends_on), default=0.0)
+                finish[subtask.task_id] = start + subtask.latency
+        return max(finish.values(), default=0.0)
+
+
+class TaskPlanner:
+    """基于子句和连接词的规则拆分
+
+    按标点和连接词切分子句；带有「然后/最后/基于/总结」等标记的子句依赖此前各条分支的末端子任务，
+    带有「同时/另外」或无标记的子句与之前的子任务并行。每个子句单独提取所需能力。
+    """
+
+    def __init__(self, extract_capabilities: Callable[[str], List[str]], max_subtasks: int = 6):
+        self.extract_capabilities = extract_capabilities
+        self.max_subtasks = max_subtasks
+
+    def split_clauses(self, prompt: str) -> List[str]:
+        clauses = []
+        for clause in _CLAUSE_SPLIT.split(prompt):
+            clause = clause.strip()
+            if not clause:
+                continue
+            if clauses and len(clause) < _MIN_CLAUSE_LENGTH:
+                clauses[-1] += clause
+            else:
+                clauses.append(clause)
+        # 超出上限的子句并入最后一个子任务
+        if len(clauses) > self.max_subtasks:
+            clauses = clauses[:self.max_subtasks - 1] + ["，".join(clauses[self.max_subtasks - 1:])]
+        return clauses
+
+    @staticmethod
+    def is_sequential(clause: str) -> bool:
+        lowered = clause.lower()
+        if lowered.startswith(_PARALLEL_MARKERS) or _PARALLEL_WORDS.match(lowered):
+            return False
+        return (any(marker in lowered for marker in _SEQUENTIAL_MARKERS)
+                or bool(_SEQUENTIAL_WORDS.search(lowered) or _LEADING_ZAI.match(lowered)))
+
+    def plan(self, task_request: 'TaskRequest') -> TaskPlan:
+        """生成子任务DAG；无法拆分时返回只含一个子任务的计划"""
+        clauses = self.split_clauses(task_request.original_prompt)
+        if len(clauses) <= 1:
+            return TaskPlan(task_request.original_prompt, [
+                SubTask("t1", task_request.original_prompt, task_request.required_capabilities)
+            ])
+
+        subtasks: List[SubTask] = []
+        for i, clause in enumerate(clauses, start=1):
+            depends_on = []
+            if subtasks and self.is_sequential(clause):
+                # 依赖此前尚未被其他子任务依赖的子任务（即当前的各条分支末端）
+                depended = {dep for subtask in subtasks for dep in subtask.depends_on}
+                depends_on = [s.task_id for s in subtasks if s.task_id not in depended]
+            capabilities = self.extract_capabilities(clause) or task_request.required_capabilities
+            subtasks.append(SubTask(f"t{i}", clause, capabilities, depends_on))
+        return TaskPlan(task_request.original_prompt, subtasks)
+
+
+class PlanExecutor:
+    """按DAG执行子任务：依赖满足即启动，独立子任务并发执行，上游输出注入下游提示词
+
+    同一个Hub的团队实例不支持并发调用，分配到同一Hub的子任务由 AgentExchange 的执行锁串行执行。
+    """
+
+    def __init__(self, exchange):
+        self.exchange = exchange
+
+    def build_prompt(self, plan: TaskPlan, subtask: SubTask) -> str:
+        parts = [
+            f"[整体任务] {plan.original_prompt}",
+            f"[当前子任务] {subtask.prompt}",
+        ]
+        for dependency in subtask.depends_on:
+            upstream = plan.by_id[dependency]
+            if upstream.result:
+                parts.append(f"[上游子任务结果: {upstream.prompt}]\n{upstream.result}")
+        parts.append("请只完成当前子任务，可以直接使用上游子任务的结果。")
+        return "\n\n".join(parts)
+
+    def select_hub(self, subtask: SubTask):
+        # usp 依赖本模块生成计划，这里延迟导入避免循环引用
+        from .usp import TaskRequest
+        ranked = self.exchange.rank_hubs(TaskRequest(subtask.prompt, subtask.required_capabilities))
+        return ranked[0][0] if ranked else None
+
+    async def _run_subtask(self, plan: TaskPlan, subtask: SubTask, task_request: 'TaskRequest'):
+        hub = self.select_hub(subtask)
+        if hub is None:
+            subtask.status = "failed"
+            return
+        subtask.hub_id = hub.hub_id
+
+        subtask.status = "running"
+        started = time.perf_counter()
+        subtask.result = await self.exchange.arun_member(hub, self.build_prompt(plan, subtask), task_request)
+        subtask.latency = time.perf_counter() - started
+        subtask.status = "done" if subtask.result is not None else "failed"
+
+    async def execute(self, plan: TaskPlan, task_request: 'TaskRequest') -> Optional[str]:
+        """执行计划，返回末端子任务的合并输出"""
+        running: Dict[asyncio.Task, SubTask] = {}
+
+        def launch_ready():
+            # 反复扫描直到状态不再变化，使「上游失败 -> 跳过」沿依赖链传播
+            changed = True
+            while changed:
+                changed = False
+                for subtask in plan.subtasks:
+                    if subtask.status != "pending":
+                        continue
+                    deps = [plan.by_id[dep] for dep in subtask.depends_on]
+                    if any(dep.status in ("failed", "skipped") for dep in deps):
+                        subtask.status = "skipped"
+                        changed = True
+                    elif all(dep.status == "done" for dep in deps):
+                        subtask.status = "scheduled"
+                        running[asyncio.ensure_future(self._run_subtask(plan, subtask, task_request))] = subtask
+
+        started = time.perf_counter()
+        launch_ready()
+        while running:
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                subtask = running.pop(task)
+                if task.exception():
+                    console.print(f"[red]子任务 {subtask.task_id} 执行失败: {task.exception()}[/red]")
+                    subtask.status = "failed"
+            launch_ready()
+
+        self.display_report(plan, time.perf_counter() - started)
+
+        outputs = [subtask for subtask in plan.sinks() if subtask.result]
+        if not outputs:
+            return None
+        if len(outputs) == 1:
+            return outputs[0].result
+        return "\n\n".join(f"## {subtask.prompt}\n\n{subtask.result}" for subtask in outputs)
+
+    def display_report(self, plan: TaskPlan, wall_time: float):
+        table = Table(title="子任务执行报告")
+        table.add_column("子任务", style="cyan")
+        table.add_column("依赖", style="white")
+        table.add_column("能力", style="green")
+        table.add_column("Hub", style="magenta")
+        table.add_column("状态", style="bold")
+        table.add_column("耗时(s)", style="yellow")
+        for subtask in plan.subtasks:
+            table.add_row(
+                f"{subtask.task_id}: {subtask.prompt[:30]}",
+                ", ".join(subtask.depends_on) or "-",
+                ", ".join(subtask.required_capabilities),
+                subtask.hub_id or "-",
+                subtask.status,
+                f"{subtask.latency:.2f}",
+            )
+        console.print(table)
+        serial = sum(subtask.latency for subtask in plan.subtasks)
+        console.print(f"[dim]总耗时 {wall_time:.2f}s | 关键路径 {plan.critical_path_latency():.2f}s | "
+                      f"串行耗时 {serial:.2f}s[/dim]")
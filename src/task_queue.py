@@ -0,0 +1,436 @@
+"""
+Task Queue
+持久化任务队列：基于SQLite的至少一次（at-least-once）执行队列和可恢复的工作进程
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+import multiprocessing
+from typing import List, Dict, Any, Optional, Callable
+from pathlib import Path
+from rich.console import Console
+
+from .usp import TaskRequest, DEFAULT_TENANT, DEFAULT_PRIORITY
+from .agent_hub import is_partial_output
+from .scheduler import PRIORITY_SHARES
+
+console = Console()
+
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+FAILED = "failed"
+
+
+class QueueFullError(Exception):
+    """队列积压超过上限（背压）"""
+    pass
+
+
+class LeasedTask:
+    """已被工作进程租约占用的任务"""
+
+    def __init__(self, task_id: int, task_request: TaskRequest, attempts: int,
+                 lease_owner: str, lease_expires_at: float):
+        self.task_id = task_id
+        self.task_request = task_request
+        self.attempts = attempts
+        self.lease_owner = lease_owner
+        self.lease_expires_at = lease_expires_at
+
+
+class TaskQueue:
+    """SQLite持久化任务队列
+
+    租约过期（可见性超时）的任务会被重新投递给其他工作进程，
+    因此任务可能被执行多次，但不会因进程崩溃而丢失。
+
+    租用顺序与 FairScheduler 相同：先按租户份额、再按租户内的优先级份额做步进调度，
+    各队列的进度保存在数据库中，所有工作进程共享；同一租户同一优先级内按可执行时间先后出队。
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        payload TEXT NOT NULL,
+        status TEXT NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        max_attempts INTEGER NOT NULL,
+        lease_owner TEXT,
+        lease_expires_at REAL,
+        available_at REAL NOT NULL,
+        enqueued_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL,
+        result TEXT,
+        error TEXT,
+        tenant TEXT NOT NULL DEFAULT 'default',
+        priority TEXT NOT NULL DEFAULT 'normal'
+    );
+    CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, available_at);
+    CREATE TABLE IF NOT EXISTS lease_pass (
+        scope TEXT NOT NULL,
+        name TEXT NOT NULL,
+        pass REAL NOT NULL,
+        PRIMARY KEY (scope, name)
+    );
+    """
+
+    def __init__(self, db_path: str = "cache/task_queue.db", max_pending: int = 10000,
+                 max_attempts: int = 3, retry_backoff: float = 5.0,
+                 tenant_shares: Optional[Dict[str, float]] = None,
+                 priority_shares: Optional[Dict[str, float]] = None,
+                 default_share: float = 1.0):
+        self.db_path = db_path
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.tenant_shares = dict(tenant_shares or {})
+        self.priority_shares = dict(priority_shares or PRIORITY_SHARES)
+        self.default_share = default_share
+
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=30, isolation_level=None,
+                                     check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(self.SCHEMA)
+        self._migrate()
+
+    def _migrate(self):
+        """为旧版本的队列库补充租户和优先级列"""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(tasks)")}
+        if "tenant" not in columns:
+            def add_columns(conn):
+                conn.execute(f"ALTER TABLE tasks ADD COLUMN tenant TEXT NOT NULL DEFAULT '{DEFAULT_TENANT}'")
+                conn.execute(f"ALTER TABLE tasks ADD COLUMN priority TEXT NOT NULL DEFAULT '{DEFAULT_PRIORITY}'")
+                rows = conn.execute("SELECT id, payload FROM tasks WHERE status IN (?, ?)",
+                                    (PENDING, LEASED)).fetchall()
+                for task_id, payload in rows:
+                    data = json.loads(payload)
+                    conn.execute("UPDATE tasks SET tenant = ?, priority = ? WHERE id = ?",
+                                 (data.get("tenant", DEFAULT_TENANT), data.get("priority", DEFAULT_PRIORITY), task_id))
+
+            self._transaction(add_columns)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_tasks_tenant "
+                           "ON tasks (tenant, priority, status, available_at)")
+
+    def _transaction(self, fn):
+        """在IMMEDIATE事务中执行，保证跨进程租约的原子性"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn(self._conn)
+                self._conn.execute("COMMIT")
+                return result
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def enqueue(self, task_request: TaskRequest, max_attempts: int = None) -> int:
+        """入队任务，积压超过上限时抛出 QueueFullError"""
+        now = time.time()
+        payload = json.dumps(task_request.to_dict(), ensure_ascii=False)
+
+        def insert(conn):
+            backlog = conn.execute(
+                "SELECT COUNT(*) FROM tasks WHERE status IN (?, ?)", (PENDING, LEASED)
+            ).fetchone()[0]
+            if backlog >= self.max_pending:
+                raise QueueFullError(f"队列积压已达上限 {self.max_pending}")
+            cursor = conn.execute(
+                "INSERT INTO tasks (payload, status, max_attempts, available_at, enqueued_at, tenant, priority) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (payload, PENDING, max_attempts or self.max_attempts, now, now,
+                 task_request.tenant or DEFAULT_TENANT, task_request.priority or DEFAULT_PRIORITY)
+            )
+            return cursor.lastrowid
+
+        return self._transaction(insert)
+
+    @staticmethod
+    def _stride_pick(conn, scope: str, shares: Dict[str, float]) -> str:
+        """步进调度：选出进度最小的积压队列并推进其进度 1/份额
+
+        scope 为空字符串时在租户间选择，否则在该租户的优先级间选择；name 为空的行保存该范围的虚拟时间。
+        """
+        names = list(shares)
+        stored = dict(conn.execute(
+            f"SELECT name, pass FROM lease_pass WHERE scope = ? AND name IN ({', '.join('?' * (len(names) + 1))})",
+            (scope, "", *names)
+        ).fetchall())
+        virtual_time = stored.get("", 0.0)
+        # 重新变为积压的队列从当前虚拟时间开始，空闲期间不累积额度
+        passes = {name: max(stored.get(name, 0.0), virtual_time) for name in names}
+        chosen = min(names, key=lambda name: (passes[name], -shares[name], name))
+        conn.executemany(
+            "INSERT OR REPLACE INTO lease_pass (scope, name, pass) VALUES (?, ?, ?)",
+            [(scope, "", passes[chosen]), (scope, chosen, passes[chosen] + 1.0 / shares[chosen])]
+        )
+        return chosen
+
+    def lease(self, worker_id: str, visibility_timeout: float = 300.0) -> Optional[LeasedTask]:
+        """按租户和优先级份额租用一个可执行的任务（包括租约已过期的任务）"""
+        now = time.time()
+        ready = "((status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at < ?))"
+
+        def claim(conn):
+            # 超过最大尝试次数且租约过期的任务直接判定失败
+            conn.execute(
+                "UPDATE tasks SET status = ?, finished_at = ?, "
+                "error = COALESCE(error, '租约过期且超过最大尝试次数') "
+                "WHERE status = ? AND lease_expires_at < ? AND attempts >= max_attempts",
+                (FAILED, now, LEASED, now)
+            )
+            backlog: Dict[str, List[str]] = {}
+            for tenant, priority in conn.execute(
+                f"SELECT DISTINCT tenant, priority FROM tasks WHERE {ready}", (PENDING, now, LEASED, now)
+            ):
+                backlog.setdefault(tenant, []).append(priority)
+            if not backlog:
+                return None
+            tenant = self._stride_pick(conn, "", {
+                name: self.tenant_shares.get(name, self.default_share) for name in backlog
+            })
+            priority = self._stride_pick(conn, tenant, {
+                name: self.priority_shares.get(name, 1.0) for name in backlog[tenant]
+            })
+            task_id, payload, attempts = conn.execute(
+                f"SELECT id, payload, attempts FROM tasks WHERE tenant = ? AND priority = ? AND {ready} "
+                "ORDER BY available_at, id LIMIT 1",
+                (tenant, priority, PENDING, now, LEASED, now)
+            ).fetchone()
+            expires_at = now + visibility_timeout
+            conn.execute(
+                "UPDATE tasks SET status = ?, attempts = attempts + 1, lease_owner = ?, "
+                "lease_expires_at = ?, started_at = ? WHERE id = ?",
+                (LEASED, worker_id, expires_at, now, task_id)
+            )
+            task_request = TaskRequest.from_dict(json.loads(payload))
+            # timeout 是每次执行的时限，从租用时刻起算，排队和重试退避的时间不占用
+            task_request.restart_deadline()
+            return LeasedTask(task_id, task_request, attempts + 1, worker_id, expires_at)
+
+        return self._transaction(claim)
+
+    def extend_lease(self, task: LeasedTask, visibility_timeout: float = 300.0) -> bool:
+        """续租，返回False表示租约已被其他工作进程接管"""
+        expires_at = time.time() + visibility_timeout
+
+        def extend(conn):
+            cursor = conn.execute(
+                "UPDATE tasks SET lease_expires_at = ? "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (expires_at, task.task_id, LEASED, task.lease_owner)
+            )
+            return cursor.rowcount == 1
+
+        extended = self._transaction(extend)
+        if extended:
+            task.lease_expires_at = expires_at
+        return extended
+
+    def ack(self, task: LeasedTask, result: str) -> bool:
+        """确认任务完成"""
+        def complete(conn):
+            cursor = conn.execute(
+                "UPDATE tasks SET status = ?, result = ?, finished_at = ?, lease_expires_at = NULL "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (DONE, result, time.time(), task.task_id, LEASED, task.lease_owner)
+            )
+            return cursor.rowcount == 1
+
+        return self._transaction(complete)
+
+    def nack(self, task: LeasedTask, error: str) -> bool:
+        """任务执行失败：未超过最大尝试次数时按退避时间重新排队"""
+        now = time.time()
+
+        def fail(conn):
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM tasks "
+                "WHERE id = ? AND status = ? AND lease_owner = ?",
+                (task.task_id, LEASED, task.lease_owner)
+            ).fetchone()
+            if row is None:
+                return False
+            attempts, max_attempts = row
+            if attempts >= max_attempts:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, finished_at = ?, "
+                    "lease_expires_at = NULL WHERE id = ?",
+                    (FAILED, error, now, task.task_id)
+                )
+            else:
+                conn.execute(
+                    "UPDATE tasks SET status = ?, error = ?, lease_owner = NULL, "
+                    "lease_expires_at = NULL, available_at = ? WHERE id = ?",
+                    (PENDING, error, now + self.retry_backoff * attempts, task.task_id)
+                )
+            return True
+
+        return self._transaction(fail)
+
+    def get(self, task_id: int) -> Optional[Dict[str, Any]]:
+        """查询任务状态和结果"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT id, payload, status, attempts, result, error, enqueued_at, finished_at "
+                "FROM tasks WHERE id = ?", (task_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        keys = ("id", "payload", "status", "attempts", "result", "error", "enqueued_at", "finished_at")
+        task = dict(zip(keys, row))
+        task["payload"] = json.loads(task["payload"])
+        return task
+
+    def stats(self, window: float = 60.0) -> Dict[str, Any]:
+        """队列深度、吞吐量和延迟统计"""
+        now = time.time()
+        with self._lock:
+            counts = dict(self._conn.execute(
+                "SELECT status, COUNT(*) FROM tasks GROUP BY status"
+            ).fetchall())
+            completed, avg_latency, avg_run = self._conn.execute(
+                "SELECT COUNT(*), AVG(finished_at - enqueued_at), AVG(finished_at - started_at) "
+                "FROM tasks WHERE status = ? AND finished_at >= ?", (DONE, now - window)
+            ).fetchone()
+            oldest = self._conn.execute(
+                "SELECT MIN(enqueued_at) FROM tasks WHERE status = ?", (PENDING,)
+            ).fetchone()[0]
+        return {
+            "pending": counts.get(PENDING, 0),
+            "leased": counts.get(LEASED, 0),
+            "done": counts.get(DONE, 0),
+            "failed": counts.get(FAILED, 0),
+            "throughput_per_min": completed * 60.0 / window,
+            "avg_latency_s": avg_latency or 0.0,
+            "avg_run_s": avg_run or 0.0,
+            "oldest_pending_age_s": now - oldest if oldest else 0.0,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class QueueWorker:
+    """队列工作进程：租用、执行并确认任务"""
+
+    def __init__(self, queue: TaskQueue, exchange, worker_id: str = None,
+                 visibility_timeout: float = 300.0, poll_interval: float = 1.0):
+        self.queue = queue
+        self.exchange = exchange
+        self.worker_id = worker_id or f"worker-{os.getpid()}"
+        self.visibility_timeout = visibility_timeout
+        self.poll_interval = poll_interval
+        self.processed = 0
+        self.failed = 0
+        self._stop = threading.Event()
+
+    def _heartbeat(self, task: LeasedTask, done: threading.Event):
+        """执行期间定期续租，避免长任务被重复投递"""
+        interval = max(self.visibility_timeout / 3, 1.0)
+        while not done.wait(interval):
+            if not self.queue.extend_lease(task, self.visibility_timeout):
+                console.print(f"[yellow]任务 {task.task_id} 的租约已失效[/yellow]")
+                return
+
+    def process_one(self) -> bool:
+        """处理一个任务，队列为空时返回False"""
+        task = self.queue.lease(self.worker_id, self.visibility_timeout)
+        if task is None:
+            return False
+
+        console.print(f"[cyan]{self.worker_id} 开始执行任务 {task.task_id} "
+                      f"(第 {task.attempts} 次尝试)[/cyan]")
+        done = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(task, done), daemon=True)
+        heartbeat.start()
+        try:
+            result = self.exchange.execute_task(task.task_request)
+        except Exception as e:
+            result, error = None, str(e)
+        else:
+            error = "任务执行失败"
+        finally:
+            done.set()
+            heartbeat.join()
+
+        if is_partial_output(result):
+            # 超时返回的部分输出不是完成结果，按失败重试
+            result, error = None, "执行超时，仅返回部分输出"
+        if result:
+            self.queue.ack(task, result)
+            self.processed += 1
+        else:
+            self.queue.nack(task, error)
+            self.failed += 1
+        return True
+
+    def run(self, max_tasks: int = None):
+        """持续处理任务直到停止"""
+        while not self._stop.is_set():
+            if max_tasks is not None and self.processed + self.failed >= max_tasks:
+                break
+            if not self.process_one():
+                self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+
+
+def _worker_main(db_path: str, worker_id: str, visibility_timeout: float, poll_interval: float,
+                 exchange_factory: Optional[Callable[[], Any]] = None,
+                 tenant_shares: Optional[Dict[str, float]] = None,
+                 priority_shares: Optional[Dict[str, float]] = None):
+    """工作进程入口：每个进程持有独立的AgentExchange和Hub实例"""
+    from .aex import AgentExchange
+
+    exchange = exchange_factory() if exchange_factory else AgentExchange()
+    if not exchange.load_hub_configs():
+        return
+    queue = TaskQueue(db_path, tenant_shares=tenant_shares, priority_shares=priority_shares)
+    worker = QueueWorker(queue, exchange, worker_id=f"{worker_id}-{os.getpid()}",
+                         visibility_timeout=visibility_timeout, poll_interval=poll_interval)
+    try:
+        worker.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def run_workers(num_workers: int, db_path: str = "cache/task_queue.db",
+                visibility_timeout: float = 300.0, poll_interval: float = 1.0,
+                exchange_factory: Optional[Callable[[], Any]] = None,
+                tenant_shares: Optional[Dict[str, float]] = None,
+                priority_shares: Optional[Dict[str, float]] = None):
+    """启动多个队列工作进程并等待其退出
+
+    exchange_factory() 在每个工作进程中创建 AgentExchange，并配置限流器、LLM/工具缓存等
+    进程内共享的组件；未指定时使用默认配置。tenant_shares / priority_shares 为租用任务时的份额。
+    """
+    processes: List[multiprocessing.Process] = []
+    for i in range(num_workers):
+        process = multiprocessing.Process(
+            target=_worker_main,
+            args=(db_path, f"worker-{i}", visibility_timeout, poll_interval, exchange_factory,
+                  tenant_shares, priority_shares),
+            daemon=False
+        )
+        process.start()
+        processes.append(process)
+    console.print(f"[green]启动了 {num_workers} 个队列工作进程[/green]")
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        console.print("\n[yellow]正在停止工作进程...[/yellow]")
+        for process in processes:
+            process.terminate()
+            process.join()
@@ -0,0 +1,108 @@
+"""
+Team Composer
+团队组合：用位集贪心集合覆盖为多能力任务挑选少量Hub，按成本和延迟加权
+"""
+
+from typing import List, Optional, Tuple
+
+from .hub_stats import HubStatsRegistry
+
+
+class TeamMember:
+    """团队成员：Hub及其负责的能力"""
+
+    def __init__(self, hub, capabilities: List[str], weight: float):
+        self.hub = hub
+        self.capabilities = capabilities
+        self.weight = weight
+
+
+class TeamPlan:
+    """团队组合结果"""
+
+    def __init__(self, members: List[TeamMember], uncovered: List[str]):
+        self.members = members
+        self.uncovered = uncovered
+
+    @property
+    def total_weight(self) -> float:
+        return sum(member.weight for member in self.members)
+
+    @property
+    def is_complete(self) -> bool:
+        return not self.uncovered
+
+
+class TeamComposer:
+    """加权贪心集合覆盖
+
+    所需能力映射为位，每个Hub对应一个能力位掩码；每轮选择
+    「新覆盖能力数 / 权重」最大的Hub，直到全部覆盖或没有Hub能再覆盖新能力，
+    最后删除能力已被其他成员完全覆盖的冗余Hub。贪心解与最优解相差不超过 ln(n) 倍。
+
+    Hub权重 = 配置成本 × (1 + 预期延迟 / reference_latency)，
+    预期延迟优先使用EWMA观测值，无观测时使用Hub超时的一半，再无则取 reference_latency。
+    """
+
+    def __init__(self, reference_latency: float = 30.0, max_members: Optional[int] = None):
+        self.reference_latency = reference_latency
+        self.max_members = max_members
+
+    def hub_weight(self, hub, hub_stats: Optional[HubStatsRegistry] = None) -> float:
+        latency = None
+        if hub_stats is not None:
+            latency = hub_stats.get(hub.hub_id).ewma_latency
+        if latency is None:
+            latency = hub.timeout / 2 if hub.timeout else self.reference_latency
+        return max(hub.cost, 1e-6) * (1 + latency / self.reference_latency)
+
+    def compose(self, hubs: List, required_capabilities: List[str],
+                hub_stats: Optional[HubStatsRegistry] = None) -> TeamPlan:
+        """为所需能力挑选覆盖它们的最小加权Hub集合"""
+        required = list(dict.fromkeys(required_capabilities))
+        bits = {capability: 1 << i for i, capability in enumerate(required)}
+        full_mask = (1 << len(required)) - 1
+
+        candidates: List[Tuple[object, int, float]] = []
+        for hub in hubs:
+            mask = 0
+            for capability in hub.capabilities:
+                mask |= bits.get(capability, 0)
+            if mask:
+                candidates.append((hub, mask, self.hub_weight(hub, hub_stats)))
+
+        chosen: List[Tuple[object, int, float]] = []
+        covered = 0
+        while covered != full_mask:
+            if self.max_members and len(chosen) >= self.max_members:
+                break
+            best, best_ratio = None, 0.0
+            for candidate in candidates:
+                gain = bin(candidate[1] & ~covered).count("1")
+                ratio = gain / candidate[2]
+                if ratio > best_ratio:
+                    best, best_ratio = candidate, ratio
+            if best is None:
+                break
+            chosen.append(best)
+            covered |= best[1]
+
+        # 删除冗余成员：其余成员已覆盖其全部能力（优先删除权重大的）
+        for candidate in sorted(chosen, key=lambda c: c[2], reverse=True):
+            others = 0
+            for other in chosen:
+                if other is not candidate:
+                    others |= other[1]
+            if candidate[1] & ~others == 0 and len(chosen) > 1:
+                chosen.remove(candidate)
+
+        # 每个能力只分配给一个成员（先入选者优先），避免子任务重复执行
+        members = []
+        assigned = 0
+        for hub, mask, weight in chosen:
+            own = mask & ~assigned
+            assigned |= own
+            members.append(TeamMember(hub, [c for c in required if bits[c] & own], weight))
+
+        uncovered = [capability for capability in required if not bits[capability] & covered]
+        return TeamPlan(members, uncovered)
@@ -0,0 +1,210 @@
+"""
+Tool Result Cache
+工具结果缓存：按 (工具, 参数) 记忆化Hub智能体的工具调用，支持TTL、并发去重和命中率统计
+"""
+
+import json
+import time
+import asyncio
+import inspect
+import threading
+import functools
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, Callable
+
+
+class ToolStats:
+    """单个工具的调用统计"""
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.deduplicated = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.executions = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "hits": self.hits,
+            "deduplicated": self.deduplicated,
+            "hit_rate": (self.hits + self.deduplicated) / self.calls if self.calls else 0.0,
+            "errors": self.errors,
+            "avg_latency": self.total_latency / self.executions if self.executions else None,
+        }
+
+
+class _InFlight:
+    """正在执行的调用，后到的相同调用等待其结果"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class ToolResultCache:
+    """进程内共享的工具结果缓存
+
+    只缓存成功返回的结果，异常不缓存；相同调用正在执行时，后到的调用等待并复用其结果，
+    不会重复发起网络请求。条目超过 max_entries 时淘汰最久未使用的条目。
+    """
+
+    def __init__(self, ttl: float = 600.0, max_entries: int = 2048):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._in_flight: Dict[str, _InFlight] = {}
+        self._stats: Dict[str, ToolStats] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(tool_name: str, args: tuple, kwargs: dict) -> str:
+        arguments = json.dumps([args, kwargs], sort_keys=True, ensure_ascii=False, default=str)
+        return f"{tool_name}:{arguments}"
+
+    def _lookup_locked(self, key: str):
+        """返回 (是否命中, 结果)；过期条目顺便删除"""
+        entry = self._entries.get(key)
+        if entry is None:
+            return False, None
+        result, expires_at = entry
+        if expires_at < time.time():
+            del self._entries[key]
+            return False, None
+        self._entries.move_to_end(key)
+        return True, result
+
+    def _store_locked(self, key: str, result: Any):
+        self._entries[key] = (result, time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _begin(self, tool_name: str, key: str):
+        """返回 (命中结果, 需等待的调用, 本次是否负责执行)"""
+        with self._lock:
+            stats = self._stats.setdefault(tool_name, ToolStats())
+            stats.calls += 1
+            hit, result = self._lookup_locked(key)
+            if hit:
+                stats.hits += 1
+                return (result,), None, False
+            flight = self._in_flight.get(key)
+            if flight is not None:
+                stats.deduplicated += 1
+                return None, flight, False
+            flight = _InFlight()
+            self._in_flight[key] = flight
+            return None, flight, True
+
+    def _finish(self, tool_name: str, key: str, flight: _InFlight, started: float,
+                result: Any = None, error: BaseException = None):
+        with self._lock:
+            stats = self._stats[tool_name]
+            stats.executions += 1
+            stats.total_latency += time.perf_counter() - started
+            if error is None:
+                self._store_locked(key, result)
+            else:
+                stats.errors += 1
+            self._in_flight.pop(key, None)
+        flight.result, flight.error = result, error
+        flight.done.set()
+
+    def call(self, tool_name: str, fn: Callable, *args, **kwargs) -> Any:
+        key = self.make_key(tool_name, args, kwargs)
+        hit, flight, leader = self._begin(tool_name, key)
+        if hit is not None:
+            return hit[0]
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        started = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(tool_name, key, flight, started, error=e)
+            raise
+        self._finish(tool_name, key, flight, started, result=result)
+        return result
+
+    async def acall(self, tool_name: str, fn: Callable, *args, **kwargs) -> Any:
+        key = self.make_key(tool_name, args, kwargs)
+        hit, flight, leader = self._begin(tool_name, key)
+        if hit is not None:
+            return hit[0]
+        if not leader:
+            # 执行方可能在其他线程或事件循环中，等待放到线程里避免阻塞当前事件循环
+            await asyncio.to_thread(flight.done.wait)
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        started = time.perf_counter()
+        try:
+            result = await fn(*args, **kwargs)
+        except BaseException as e:
+            self._finish(tool_name, key, flight, started, error=e)
+            raise
+        self._finish(tool_name, key, flight, started, result=result)
+        return result
+
+    def wrap(self, tool_name: str, fn: Callable) -> Callable:
+        """包装工具函数，保留原签名和文档（智能体依赖它们生成工具描述）"""
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                return await self.acall(tool_name, fn, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            return self.call(tool_name, fn, *args, **kwargs)
+        return wrapper
+
+    def wrap_toolkit(self, toolkit):
+        """原地包装agno Toolkit中已注册的全部工具函数，返回toolkit本身"""
+        if self.ttl <= 0:
+            return toolkit
+        for functions in (getattr(toolkit, "functions", {}), getattr(toolkit, "async_functions", {})):
+            for name, function in functions.items():
+                entrypoint = getattr(function, "entrypoint", None)
+                if entrypoint is None or getattr(entrypoint, "_tool_cached", False):
+                    continue
+                function.entrypoint = self.wrap(f"{toolkit.name}.{name}", entrypoint)
+                function.entrypoint._tool_cached = True
+        return toolkit
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            calls = sum(stats.calls for stats in self._stats.values())
+            reused = sum(stats.hits + stats.deduplicated for stats in self._stats.values())
+            return {
+                "entries": len(self._entries),
+                "ttl": self.ttl,
+                "hit_rate": reused / calls if calls else 0.0,
+                "tools": {name: stats.to_dict() for name, stats in self._stats.items()},
+            }
+
+
+_tool_cache = ToolResultCache()
+
+
+def configure_tool_cache(ttl: float = 600.0, max_entries: int = 2048) -> ToolResultCache:
+    """设置进程内共享的工具结果缓存；ttl <= 0 时不包装工具"""
+    global _tool_cache
+    _tool_cache = ToolResultCache(ttl, max_entries)
+    return _tool_cache
+
+
+def get_tool_cache() -> ToolResultCache:
+    return _tool_cache
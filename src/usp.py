@@ -4,42 +4,93 @@ USP - User-Side Platform
 """
 
 import re
-from typing import List, Dict, Any
+import time
+from typing import List, Dict, Any, Optional
 from rich.console import Console
 from rich.prompt import Prompt
 from rich.panel import Panel
+from rich.table import Table
 
 from .embedding_service import EmbeddingService
 from .capability_mapper import CapabilityMapper
+from .keyword_matcher import KeywordMatcher
+from .task_planner import TaskPlanner, TaskPlan
 
 console = Console()
 
 
+DEFAULT_TENANT = "default"
+DEFAULT_PRIORITY = "normal"
+
+
 class TaskRequest:
     """任务请求对象"""
     
-    def __init__(self, original_prompt: str, required_capabilities: List[str]):
+    def __init__(self, original_prompt: str, required_capabilities: List[str],
+                 timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 tenant: str = DEFAULT_TENANT, priority: str = DEFAULT_PRIORITY):
         self.original_prompt = original_prompt
         self.required_capabilities = required_capabilities
+        # 多租户调度：租户决定公平份额，优先级决定租户内的出队顺序
+        self.tenant = tenant
+        self.priority = priority
+        # 绝对截止时间（time.time() 时间戳），timeout 为相对当前时间的秒数
+        self.timeout = timeout
+        if deadline is None and timeout is not None:
+            deadline = time.time() + timeout
+        self.deadline = deadline
+
+    def remaining_time(self) -> Optional[float]:
+        """距截止时间的剩余秒数，没有截止时间时返回None"""
+        if self.deadline is None:
+            return None
+        return self.deadline - time.time()
+
+    def restart_deadline(self):
+        """从当前时刻重新计算截止时间（例如队列任务被工作进程租用时）；没有设置 timeout 时不变"""
+        if self.timeout is not None:
+            self.deadline = time.time() + self.timeout
         
     def to_dict(self) -> Dict[str, Any]:
         return {
             "original_prompt": self.original_prompt,
-            "required_capabilities": self.required_capabilities
+            "required_capabilities": self.required_capabilities,
+            "deadline": self.deadline,
+            "timeout": self.timeout,
+            "tenant": self.tenant,
+            "priority": self.priority
         }
 
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'TaskRequest':
+        return cls(
+            original_prompt=data['original_prompt'],
+            required_capabilities=data['required_capabilities'],
+            timeout=data.get('timeout'),
+            deadline=data.get('deadline'),
+            tenant=data.get('tenant', DEFAULT_TENANT),
+            priority=data.get('priority', DEFAULT_PRIORITY)
+        )
+
 
 class UserSidePlatform:
     """用户端平台 - 处理用户输入和任务解析"""
 
-    def __init__(self, use_semantic_search: bool = True):
+    def __init__(self, use_semantic_search: bool = True, use_ann_index: bool = False,
+                 use_hybrid_search: bool = False, embedding_precision: str = "float32",
+                 embedding_dimensions: Optional[int] = None, truncate_locally: bool = False):
         self.use_semantic_search = use_semantic_search
 
         # 初始化嵌入服务和能力映射器
         if use_semantic_search:
             try:
-                self.embedding_service = EmbeddingService()
-                self.capability_mapper = CapabilityMapper(self.embedding_service)
+                self.embedding_service = EmbeddingService(precision=embedding_precision,
+                                                          dimensions=embedding_dimensions,
+                                                          truncate_locally=truncate_locally)
+                self.capability_mapper = CapabilityMapper(self.embedding_service,
+                                                          use_ann_index=use_ann_index,
+                                                          use_hybrid_search=use_hybrid_search,
+                                                          ann_precision=embedding_precision)
                 console.print("[green]智能语义搜索已启用[/green]")
             except Exception as e:
                 console.print(f"[yellow]语义搜索初始化失败，使用关键词匹配: {e}[/yellow]")
@@ -60,6 +111,8 @@ class UserSidePlatform:
             "代码": "coding",
 
         }
+        self.keyword_matcher = KeywordMatcher.from_keyword_mapping(self.keyword_to_capability)
+        self.task_planner = TaskPlanner(self.extract_capabilities)
     
     def get_user_input(self) -> str:
         """获取用户输入的任务"""
@@ -79,14 +132,7 @@ class UserSidePlatform:
     
     def extract_keywords(self, text: str) -> List[str]:
         """从文本中提取关键词"""
-        keywords = []
-        text_lower = text.lower()
-        
-        for keyword, capability in self.keyword_to_capability.items():
-            if keyword in text_lower:
-                keywords.append(keyword)
-        
-        return keywords
+        return self.keyword_matcher.find_keywords(text)
     
     def map_to_capabilities(self, keywords: List[str]) -> List[str]:
         """将关键词映射到标准能力"""
@@ -111,7 +157,33 @@ class UserSidePlatform:
         
         return list(capabilities)
     
-    def create_task_request(self, user_input: str) -> TaskRequest:
+    def extract_capabilities(self, text: str) -> List[str]:
+        """提取文本所需能力（语义搜索不可用时使用关键词匹配）"""
+        if self.use_semantic_search and self.capability_mapper:
+            return self.capability_mapper.extract_capabilities(text)
+        return self.map_to_capabilities(self.extract_keywords(text))
+
+    def plan_task(self, task_request: TaskRequest) -> TaskPlan:
+        """将任务拆分为子任务DAG，每个子任务单独提取所需能力"""
+        plan = self.task_planner.plan(task_request)
+        if len(plan) > 1:
+            self.display_task_plan(plan)
+        return plan
+
+    def display_task_plan(self, plan: TaskPlan):
+        """显示子任务拆分结果"""
+        table = Table(title="子任务拆分")
+        table.add_column("子任务", style="cyan")
+        table.add_column("内容", style="white")
+        table.add_column("所需能力", style="green")
+        table.add_column("依赖", style="yellow")
+        for subtask in plan.subtasks:
+            table.add_row(subtask.task_id, subtask.prompt, ", ".join(subtask.required_capabilities),
+                          ", ".join(subtask.depends_on) or "-")
+        console.print(table)
+
+    def create_task_request(self, user_input: str, timeout: Optional[float] = None,
+                            tenant: str = DEFAULT_TENANT, priority: str = DEFAULT_PRIORITY) -> TaskRequest:
         """创建任务请求对象"""
         if self.use_semantic_search and self.capability_mapper:
             # 使用智能语义搜索
@@ -135,7 +207,7 @@ class UserSidePlatform:
             console.print(f"\n[dim]检测到的关键词: {keywords}[/dim]")
             console.print(f"[dim]映射到的能力: {capabilities}[/dim]")
 
-        return TaskRequest(user_input, capabilities)
+        return TaskRequest(user_input, capabilities, timeout=timeout, tenant=tenant, priority=priority)
     
     def display_task_info(self, task_request: TaskRequest):
         """显示任务信息"""
@@ -0,0 +1,131 @@
+"""
+Test Fixtures
+测试共用的假嵌入服务、假Hub和AgentExchange构造（不访问网络和真实模型）
+"""
+
+import json
+import time
+import asyncio
+import hashlib
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+import pytest
+
+from src.agent_hub import BaseAgentHub
+from src.aex import AgentExchange
+
+
+class FakeEmbeddingService:
+    """按文本哈希生成确定性单位向量；vectors 中指定的文本使用给定向量"""
+
+    def __init__(self, dim: int = 16, vectors: Optional[Dict[str, np.ndarray]] = None):
+        self.dim = dim
+        self.vectors = dict(vectors or {})
+        self.calls = 0
+
+    def get_embedding(self, text: str) -> Optional[np.ndarray]:
+        self.calls += 1
+        if text in self.vectors:
+            return np.asarray(self.vectors[text], dtype=np.float32)
+        seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+        vector = np.random.default_rng(seed).standard_normal(self.dim).astype(np.float32)
+        return vector / np.linalg.norm(vector)
+
+
+class Chunk:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeTeam:
+    """模拟agno Team：每个输出块间隔 delay 秒，记录同时运行的次数"""
+
+    def __init__(self, delay: float = 0.01, chunks: int = 3, fail: bool = False):
+        self.delay = delay
+        self.chunks = chunks
+        self.fail = fail
+        self.active = 0
+        self.max_active = 0
+        self.runs = 0
+        self._lock = threading.Lock()
+
+    def _enter(self):
+        with self._lock:
+            self.runs += 1
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+
+    def _exit(self):
+        with self._lock:
+            self.active -= 1
+
+    def run(self, task: str, stream: bool = True):
+        self._enter()
+        try:
+            for i in range(self.chunks):
+                time.sleep(self.delay)
+                if self.fail:
+                    raise RuntimeError("team failed")
+                yield Chunk(f"{task}-{i};")
+        finally:
+            self._exit()
+
+    async def arun(self, task: str, stream: bool = False):
+        async def generate():
+            self._enter()
+            try:
+                for i in range(self.chunks):
+                    await asyncio.sleep(self.delay)
+                    if self.fail:
+                        raise RuntimeError("team failed")
+                    yield Chunk(f"{task}-{i};")
+            finally:
+                self._exit()
+
+        return generate()
+
+
+class FakeHub(BaseAgentHub):
+    """使用 FakeTeam 的Hub；类属性控制团队的输出节奏"""
+
+    delay = 0.01
+    chunks = 3
+    fail = False
+
+    def __init__(self):
+        super().__init__("fake", "fake hub")
+
+    def setup_team(self):
+        return FakeTeam(self.delay, self.chunks, self.fail)
+
+    def get_capabilities(self) -> list:
+        return ["a"]
+
+
+def hub_configs(count: int) -> List[dict]:
+    """h0..h{count-1}，都具备能力 "a"，另外各有一项专属能力 c{i}"""
+    return [{"hub_id": f"h{i}", "name": f"Hub {i}", "description": f"hub {i}",
+             "capabilities": ["a", f"c{i}"], "hub_class": "FakeHub"} for i in range(count)]
+
+
+@pytest.fixture(autouse=True)
+def reset_fake_hub():
+    """测试可修改 FakeHub 的类属性，结束后恢复默认值"""
+    yield
+    FakeHub.delay, FakeHub.chunks, FakeHub.fail = 0.01, 3, False
+
+
+@pytest.fixture
+def make_exchange(tmp_path):
+    """构造加载了假Hub配置的 AgentExchange"""
+    def build(configs=None, count: int = 2, **kwargs) -> AgentExchange:
+        config_file = tmp_path / "hubs.json"
+        config_file.write_text(json.dumps(configs or hub_configs(count)), encoding="utf-8")
+        aex = AgentExchange(str(config_file), **kwargs)
+        aex.hub_classes = {"FakeHub": FakeHub}
+        assert aex.load_hub_configs()
+        return aex
+
+    return build
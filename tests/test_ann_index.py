@@ -0,0 +1,76 @@
+"""
+ANN Index Tests
+IVF近似最近邻索引：召回率、增量更新、删除和持久化
+"""
+
+import numpy as np
+import pytest
+
+from src.ann_index import IVFIndex
+
+
+@pytest.fixture
+def dataset():
+    rng = np.random.default_rng(42)
+    vectors = rng.standard_normal((2000, 32)).astype(np.float32)
+    ids = [f"cap-{i}" for i in range(len(vectors))]
+    return ids, vectors
+
+
+def recall(index, queries, top_k=10, nprobe=None):
+    found = 0
+    for query in queries:
+        approx = {item_id for item_id, _ in index.search(query, top_k, nprobe=nprobe)}
+        exact = {item_id for item_id, _ in index.search_exact(query, top_k)}
+        found += len(approx & exact)
+    return found / (len(queries) * top_k)
+
+
+def test_full_probe_matches_exact_search(dataset):
+    ids, vectors = dataset
+    index = IVFIndex(nlist=16, nprobe=16)
+    index.build(ids, vectors)
+    assert recall(index, vectors[:20]) == pytest.approx(1.0)
+
+
+def test_partial_probe_keeps_reasonable_recall(dataset):
+    ids, vectors = dataset
+    index = IVFIndex(nlist=16, nprobe=8)
+    index.build(ids, vectors)
+    rng = np.random.default_rng(1)
+    queries = vectors[:50] + 0.05 * rng.standard_normal((50, 32))
+    assert recall(index, queries, top_k=5) >= 0.8
+    # 查询向量本身必然排在第一
+    assert index.search(vectors[3], top_k=1)[0][0] == "cap-3"
+
+
+def test_add_update_and_remove(dataset):
+    ids, vectors = dataset
+    index = IVFIndex(nlist=8, nprobe=8)
+    index.build(ids[:100], vectors[:100])
+
+    index.add("new", vectors[500])
+    assert index.search(vectors[500], top_k=1)[0][0] == "new"
+    index.add("new", vectors[600])
+    assert index.search(vectors[600], top_k=1)[0][0] == "new"
+    assert len(index) == 101
+
+    assert index.remove("new")
+    assert "new" not in index
+    assert all(item_id != "new" for item_id, _ in index.search(vectors[600], top_k=5))
+    with pytest.raises(ValueError):
+        index.add("bad", np.ones(8))
+
+
+def test_save_and_load_roundtrip(dataset, tmp_path):
+    ids, vectors = dataset
+    index = IVFIndex(nlist=8, nprobe=4, precision="int8", rescore=4)
+    index.build(ids[:300], vectors[:300])
+    index.remove("cap-0")
+    path = tmp_path / "index.npz"
+    index.save(str(path), metadata={"model": "test"})
+
+    loaded, metadata = IVFIndex.load(str(path))
+    assert metadata == {"model": "test"}
+    assert len(loaded) == 299 and "cap-0" not in loaded
+    assert loaded.search(vectors[5], top_k=3) == index.search(vectors[5], top_k=3)
@@ -0,0 +1,110 @@
+"""
+BM25 Index Tests
+BM25词法检索：分词、排序、增删文档、倒数排名融合，以及混合检索在词法结果明确时跳过嵌入接口
+"""
+
+import pytest
+
+from src.bm25_index import BM25Index, tokenize, reciprocal_rank_fusion
+from src.capability_mapper import CapabilityMapper
+from tests.conftest import FakeEmbeddingService
+
+
+class RecordingEmbeddingService(FakeEmbeddingService):
+    """记录语义检索调用，返回预设的相似度排名"""
+
+    def __init__(self, ranking=None):
+        super().__init__()
+        self.ranking = ranking or []
+        self.searches = 0
+
+    def find_most_similar(self, query, candidates, top_k=5):
+        self.searches += 1
+        return self.ranking[:top_k]
+
+
+@pytest.fixture
+def make_mapper():
+    def build(descriptions, keywords=None, ranking=None) -> CapabilityMapper:
+        service = RecordingEmbeddingService(ranking)
+        mapper = CapabilityMapper(service, prebuilt_path=None, use_hybrid_search=True)
+        mapper.capability_descriptions = dict(descriptions)
+        mapper.capability_keywords = dict(keywords or {})
+        mapper.bm25_index = type(mapper.bm25_index)()
+        for name in descriptions:
+            mapper._index_capability_text(name)
+        return mapper
+
+    return build
+
+
+def test_tokenize_words_and_cjk_bigrams():
+    assert tokenize("Python数据分析, v2_api!") == ["python", "数据", "据分", "分析", "v2_api"]
+    assert tokenize("写 a") == ["写", "a"]
+
+
+def test_rare_terms_rank_higher():
+    index = BM25Index()
+    index.add("d1", "python code python")
+    index.add("d2", "python report")
+    index.add("d3", "market report")
+    assert index.idf("code") > index.idf("python")
+    ranked = index.search("python code")
+    assert [doc_id for doc_id, _ in ranked] == ["d1", "d2"]
+    assert all(score > 0 for _, score in ranked)
+    assert index.search("python code", top_k=1)[0][0] == "d1"
+
+
+def test_repeated_query_terms_count_once():
+    index = BM25Index()
+    index.add("d1", "python")
+    index.add("d2", "report")
+    assert index.search("python python python") == index.search("python")
+
+
+def test_add_replaces_and_remove_cleans_postings():
+    index = BM25Index()
+    index.add("d1", "alpha beta")
+    index.add("d1", "gamma")
+    assert len(index) == 1 and "d1" in index
+    assert index.search("alpha") == [] and index.search("gamma")[0][0] == "d1"
+    assert index.total_length == 1
+
+    index.remove("d1")
+    index.remove("missing")
+    assert len(index) == 0 and index.postings == {} and index.total_length == 0
+    assert index.search("gamma") == []
+
+
+def test_reciprocal_rank_fusion_matches_hand_computation():
+    fused = dict(reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=10))
+    assert fused["a"] == pytest.approx(1 / 11 + 1 / 12)
+    assert fused["b"] == pytest.approx(1 / 12)
+    assert fused["c"] == pytest.approx(1 / 13 + 1 / 11)
+    assert [doc_id for doc_id, _ in reciprocal_rank_fusion([["a", "b", "c"], ["c", "a"]], k=10)] == ["a", "c", "b"]
+
+
+def test_clear_lexical_match_skips_embeddings(make_mapper):
+    mapper = make_mapper({"code_generation": "编写代码", "writing": "文章写作"},
+                         keywords={"code_generation": ["python", "代码"]})
+    # 小语料上BM25分数较低，相应调低 accept 阈值
+    mapper.lexical_accept_score = 2.0
+    assert mapper.lexical_match("用python写代码") == ["code_generation"]
+    assert mapper.extract_capabilities_hybrid("用python写代码") == ["code_generation"]
+    assert mapper.embedding_service.searches == 0
+
+
+def test_ambiguous_query_fuses_semantic_and_lexical(make_mapper):
+    descriptions = {"writing": "文章写作", "research": "资料调研", "marketing": "营销推广"}
+    mapper = make_mapper(descriptions, ranking=[("资料调研", 0.8), ("营销推广", 0.5), ("文章写作", 0.1)])
+    assert mapper.lexical_match("帮我做点事情") is None
+    matched = mapper.extract_capabilities_hybrid("帮我做点事情", threshold=0.3)
+    assert matched == ["research", "marketing"]
+    assert mapper.embedding_service.searches == 1
+
+
+def test_precomputed_semantic_ranking_is_used(make_mapper):
+    mapper = make_mapper({"writing": "文章写作", "research": "资料调研"})
+    matched = mapper.extract_capabilities_hybrid("随便", semantic_ranking=[("writing", 0.9), ("research", 0.1)])
+    assert matched == ["writing"]
+    assert mapper.embedding_service.searches == 0
@@ -0,0 +1,77 @@
+"""
+Circuit Breaker Tests
+熔断器：closed → open → half_open → closed / open 的状态转换，以及熔断Hub不参与路由和执行
+"""
+
+from src.circuit_breaker import CircuitBreaker, HubHealthRegistry, CLOSED, OPEN, HALF_OPEN
+from src.usp import TaskRequest
+from tests.conftest import FakeHub
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    breaker.record_failure("e", now=100)
+    breaker.record_failure("e", now=100)
+    breaker.record_success()
+    breaker.record_failure("e", now=100)
+    breaker.record_failure("e", now=100)
+    assert breaker.state == CLOSED
+    breaker.record_failure("e", now=100)
+    assert breaker.state == OPEN
+    assert not breaker.acquire(now=105)
+
+
+def test_half_open_allows_limited_probes_then_closes():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=10, half_open_max_calls=1)
+    breaker.record_failure("e", now=100)
+    assert breaker.acquire(now=111)
+    assert breaker.state == HALF_OPEN
+    # 试探名额已被占用
+    assert not breaker.is_available(now=111)
+    breaker.record_success()
+    assert breaker.state == CLOSED and breaker.acquire(now=112)
+
+
+def test_half_open_failure_reopens():
+    breaker = CircuitBreaker(failure_threshold=3, cooldown=10)
+    for _ in range(3):
+        breaker.record_failure("e", now=100)
+    assert breaker.acquire(now=111)
+    breaker.record_failure("probe failed", now=111)
+    assert breaker.state == OPEN and breaker.opened_at == 111
+    assert not breaker.is_available(now=115)
+    assert breaker.is_available(now=121)
+
+
+def test_release_returns_probe_slot():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0)
+    breaker.record_failure("e", now=100)
+    assert breaker.acquire(now=100)
+    assert not breaker.is_available(now=100)
+    breaker.release()
+    assert breaker.is_available(now=100)
+
+
+def test_registry_reports_transition_once():
+    registry = HubHealthRegistry(failure_threshold=2)
+    assert not registry.record_failure("h0", "e")
+    assert registry.record_failure("h0", "e")
+    assert not registry.record_failure("h0", "e")
+    snapshot = registry.snapshot()["h0"]
+    assert snapshot["state"] == OPEN and snapshot["last_error"] == "e"
+
+
+def test_open_hub_is_skipped_by_ranking(make_exchange):
+    aex = make_exchange(count=2, health=HubHealthRegistry(failure_threshold=1))
+    aex.health.record_failure("h0", "down")
+    ranked = aex.rank_hubs(TaskRequest("任务", ["a", "c0"]))
+    assert [hub.hub_id for hub, _ in ranked] == ["h1"]
+
+
+def test_failed_runs_trip_the_breaker(make_exchange):
+    FakeHub.fail = True
+    aex = make_exchange(count=1, health=HubHealthRegistry(failure_threshold=2))
+    for _ in range(2):
+        assert aex.execute_task(TaskRequest("任务", ["a"])) is None
+    assert aex.health.state("h0") == OPEN
+    assert aex.rank_hubs(TaskRequest("任务", ["a"])) == []
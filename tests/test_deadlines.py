@@ -0,0 +1,114 @@
+"""
+Deadline Tests
+截止时间：同步和异步执行超时返回部分输出，超时的团队停止后才释放Hub执行锁（最多等待宽限期），等待执行锁不超过截止时间，部分输出计为失败
+"""
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from src.agent_hub import TaskTimeoutError, PARTIAL_OUTPUT_SUFFIX, is_partial_output, is_cacheable_output
+from src.usp import TaskRequest
+from tests.conftest import FakeHub
+
+
+@pytest.fixture
+def slow_hub():
+    FakeHub.delay, FakeHub.chunks = 0.1, 5
+    hub = FakeHub()
+    assert hub.initialize()
+    return hub
+
+
+def test_run_returns_partial_output_on_timeout(slow_hub):
+    result = slow_hub.run("任务", deadline=time.time() + 0.25)
+    assert result == "任务-0;任务-1;" + PARTIAL_OUTPUT_SUFFIX
+    assert is_partial_output(result) and not is_cacheable_output(result)
+
+
+def test_run_without_output_before_deadline_returns_none(slow_hub):
+    assert slow_hub.run("任务", deadline=time.time() + 0.05) is None
+
+
+def test_stream_waits_for_team_to_stop(slow_hub):
+    with pytest.raises(TaskTimeoutError):
+        for _ in slow_hub.stream("任务", deadline=time.time() + 0.15):
+            pass
+    # 抛出超时前团队已在下一个输出块处停止
+    assert slow_hub.team.active == 0
+    assert slow_hub.team.runs == 1
+
+
+def test_arun_returns_partial_output_on_timeout(slow_hub):
+    result = asyncio.run(slow_hub.arun("任务", deadline=time.time() + 0.25))
+    assert result == "任务-0;任务-1;" + PARTIAL_OUTPUT_SUFFIX
+    assert slow_hub.team.active == 0
+
+
+def test_arun_completes_before_deadline(slow_hub):
+    result = asyncio.run(slow_hub.arun("任务", deadline=time.time() + 5))
+    assert result == "".join(f"任务-{i};" for i in range(5))
+
+
+def test_resolve_deadline_takes_earlier(make_exchange):
+    configs = [{"hub_id": "h0", "name": "Hub 0", "description": "d", "capabilities": ["a"],
+                "hub_class": "FakeHub", "timeout": 1}]
+    aex = make_exchange(configs)
+    hub = aex.get_hub("h0")
+    assert aex.resolve_deadline(hub, TaskRequest("任务", ["a"], timeout=60)) == pytest.approx(time.time() + 1, abs=0.1)
+    assert aex.resolve_deadline(hub, TaskRequest("任务", ["a"], timeout=0.5)) == pytest.approx(time.time() + 0.5, abs=0.1)
+
+
+def test_timed_out_run_holds_hub_lock_until_team_stops(make_exchange):
+    FakeHub.delay, FakeHub.chunks = 0.1, 5
+    aex = make_exchange(count=1)
+    hub = aex.get_hub("h0")
+    instance = aex.get_hub_instance(hub)
+
+    def timed_out_run():
+        with aex.track_execution("h0"):
+            instance.run("first", deadline=time.time() + 0.15)
+
+    thread = threading.Thread(target=timed_out_run)
+    thread.start()
+    time.sleep(0.05)
+    with aex.track_execution("h0"):
+        instance.run("second")
+    thread.join()
+    assert instance.team.max_active == 1
+
+
+def test_partial_async_result_counts_as_failure(make_exchange):
+    FakeHub.delay, FakeHub.chunks = 0.1, 5
+    aex = make_exchange(count=1)
+    hub = aex.get_hub("h0")
+    result = asyncio.run(aex.arun_member(hub, "任务", TaskRequest("任务", ["a"], timeout=0.25)))
+    assert is_partial_output(result)
+    stats = aex.hub_stats.get("h0")
+    assert stats.errors == 1 and stats.in_flight == 0
+
+
+def test_stream_stops_waiting_for_stuck_team_after_grace_period():
+    FakeHub.delay, FakeHub.chunks = 1.0, 2
+    hub = FakeHub()
+    hub.stop_grace_period = 0.1
+    started = time.perf_counter()
+    with pytest.raises(TaskTimeoutError):
+        list(hub.stream("任务", deadline=time.time() + 0.2))
+    assert time.perf_counter() - started < 0.8
+
+
+def test_lock_wait_bounded_by_deadline(make_exchange):
+    aex = make_exchange(count=1)
+    with aex.hold_hub("h0"):
+        with pytest.raises(TaskTimeoutError):
+            with aex.track_execution("h0", deadline=time.time() + 0.1):
+                pass
+        result = asyncio.run(aex.arun_member(aex.get_hub("h0"), "任务", TaskRequest("任务", ["a"], timeout=0.1)))
+    assert result is None
+    stats = aex.hub_stats.get("h0")
+    # 排队超时计入统计，但Hub并未执行，不计入熔断
+    assert stats.in_flight == 0 and stats.errors == 2
+    assert aex.health.snapshot()["h0"]["consecutive_failures"] == 0
@@ -0,0 +1,125 @@
+"""
+Distributed Tests
+分布式交换：一致性哈希的均衡和最小迁移、配置分区、分片合并全局top-k、按返回候选的节点转发执行和分片故障转移
+"""
+
+import json
+import asyncio
+import threading
+from collections import Counter
+
+import httpx
+import pytest
+
+from src.distributed import ConsistentHashRing, partition_hub_configs, ShardNode, DistributedExchange
+from src.usp import TaskRequest
+from tests.conftest import FakeHub, hub_configs
+
+
+@pytest.fixture
+def serve_shards():
+    """在后台事件循环中启动分片节点，返回 节点 -> URL"""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    servers = []
+
+    def start(shards):
+        nodes = {}
+        for node_id, aex in shards.items():
+            node = ShardNode(node_id, aex)
+            server = asyncio.run_coroutine_threadsafe(
+                asyncio.start_server(node.handle_connection, "127.0.0.1", 0), loop).result()
+            servers.append(server)
+            nodes[node_id] = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}"
+        return nodes
+
+    yield start
+    for server in servers:
+        loop.call_soon_threadsafe(server.close)
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join(timeout=5)
+
+
+def shard_configs(hub_ids, capabilities=("a",)):
+    return [{"hub_id": hub_id, "name": hub_id, "description": hub_id, "capabilities": list(capabilities),
+             "hub_class": "FakeHub"} for hub_id in hub_ids]
+
+
+def test_ring_balances_keys():
+    ring = ConsistentHashRing([f"node-{i}" for i in range(4)])
+    counts = Counter(ring.node_for(f"hub-{i}") for i in range(20000))
+    assert set(counts) == set(ring.nodes)
+    assert max(counts.values()) / min(counts.values()) < 1.5
+
+
+def test_adding_node_moves_only_its_share():
+    keys = [f"hub-{i}" for i in range(10000)]
+    ring = ConsistentHashRing([f"node-{i}" for i in range(4)])
+    before = {key: ring.node_for(key) for key in keys}
+    ring.add_node("node-4")
+    moved = [key for key in keys if ring.node_for(key) != before[key]]
+    # 只有约 1/5 的Hub迁移，且全部迁移到新节点
+    assert 0.12 < len(moved) / len(keys) < 0.28
+    assert {ring.node_for(key) for key in moved} == {"node-4"}
+
+    ring.remove_node("node-4")
+    assert all(ring.node_for(key) == before[key] for key in keys)
+    with pytest.raises(ValueError):
+        ConsistentHashRing().node_for("hub")
+
+
+def test_partition_covers_every_hub_once(tmp_path):
+    config_file = tmp_path / "hubs.json"
+    config_file.write_text(json.dumps(hub_configs(50)), encoding="utf-8")
+    ring = ConsistentHashRing(["n0", "n1", "n2"])
+    paths = partition_hub_configs(str(config_file), ring, str(tmp_path / "shards"))
+    seen = []
+    for node, path in paths.items():
+        with open(path, encoding="utf-8") as f:
+            hub_ids = [config["hub_id"] for config in json.load(f)]
+        assert all(ring.node_for(hub_id) == node for hub_id in hub_ids)
+        seen.extend(hub_ids)
+    assert sorted(seen) == sorted(f"h{i}" for i in range(50))
+
+
+def test_router_merges_top_k_and_forwards_to_owner(make_exchange, serve_shards):
+    shards = {
+        "n0": make_exchange(shard_configs(["x0", "x1"], ["a", "b", "c"]) + shard_configs(["y0"], ["a"])),
+        "n1": make_exchange(shard_configs(["x2"], ["a", "b"]) + shard_configs(["y1"], ["a", "z"])),
+    }
+    router = DistributedExchange(serve_shards(shards), top_k=3)
+    request = TaskRequest("任务", ["a", "b"])
+    ranked = router.rank_hubs(request)
+    local = sorted(((hub.hub_id, score) for aex in shards.values() for hub, score in aex.rank_hubs(request)),
+                   key=lambda item: item[1], reverse=True)[:3]
+    assert [(hub.hub_id, score) for hub, score in ranked] == pytest.approx(local)
+    assert {hub.hub_id: hub.node_id for hub, _ in ranked}["x2"] == "n1"
+
+    assert router.execute_task(request) == "任务-0;任务-1;任务-2;"
+    best = ranked[0][0]
+    assert router.stats()["forwarded"][best.node_id] == 1
+    assert shards[best.node_id].hub_stats.get(best.hub_id).completed == 1
+
+
+def test_unreachable_shard_and_failed_hub_fail_over(make_exchange, serve_shards):
+    nodes = serve_shards({"n0": make_exchange(shard_configs(["h0"])), "n1": make_exchange(shard_configs(["h1"]))})
+    nodes["down"] = "http://127.0.0.1:9"
+    router = DistributedExchange(nodes, request_timeout=2.0)
+    ranked = router.rank_hubs(TaskRequest("任务", ["a"]))
+    assert sorted(hub.hub_id for hub, _ in ranked) == ["h0", "h1"]
+    assert router.stats()["shard_errors"]["down"] == 1
+
+    FakeHub.fail = True
+    assert router.execute_task(TaskRequest("任务", ["a"])) is None
+    assert router.stats()["shard_errors"]["n0"] == 1 and router.stats()["shard_errors"]["n1"] == 1
+
+
+def test_shard_validates_requests(make_exchange, serve_shards):
+    url = serve_shards({"n0": make_exchange(shard_configs(["h0"]))})["n0"]
+    task = TaskRequest("任务", ["a"]).to_dict()
+    assert httpx.post(f"{url}/rank", json={"task": task, "top_k": "many"}).status_code == 400
+    assert httpx.post(f"{url}/rank", json={}).status_code == 400
+    assert httpx.post(f"{url}/execute", json={"task": task, "hub_id": "other"}).status_code == 404
+    assert httpx.get(f"{url}/rank").status_code == 405
+    assert httpx.get(f"{url}/health").json()["hubs"] == 1
@@ -0,0 +1,134 @@
+"""
+Embedding Cache Tests
+追加日志向量缓存：跨实例读写、残尾记录恢复、压缩后其他实例重新加载、多进程并发写入不丢数据、写出时不阻塞查询
+"""
+
+import time
+import threading
+import multiprocessing
+
+import numpy as np
+import pytest
+
+import src.embedding_cache as embedding_cache_module
+from src.embedding_cache import EmbeddingCache
+
+
+def open_cache(path, **kwargs) -> EmbeddingCache:
+    return EmbeddingCache(str(path), background=False, **kwargs)
+
+
+def write_keys(path, prefix: str, count: int):
+    cache = open_cache(path)
+    for i in range(count):
+        cache[f"{prefix}:{i}"] = np.full(4, i, dtype=np.float32)
+        if i % 5 == 0:
+            cache.flush()
+    cache.flush()
+
+
+def test_round_trip_all_vector_kinds(tmp_path):
+    writer = open_cache(tmp_path)
+    writer["f32"] = np.arange(3, dtype=np.float32)
+    writer["f16"] = np.arange(3, dtype=np.float16)
+    writer["i8"] = (np.array([1, -2, 3], dtype=np.int8), 0.5)
+    writer.flush()
+
+    reader = open_cache(tmp_path)
+    assert len(reader) == 3
+    assert reader.get("f16").dtype == np.float16
+    codes, scale = reader.get("i8")
+    assert codes.tolist() == [1, -2, 3] and scale == 0.5
+    assert np.array_equal(reader.get("f32"), np.arange(3, dtype=np.float32))
+
+
+def test_refresh_picks_up_other_writers(tmp_path):
+    reader = open_cache(tmp_path)
+    writer = open_cache(tmp_path)
+    writer["k"] = np.ones(2, dtype=np.float32)
+    assert reader.get("k") is None
+    writer.flush()
+    reader.refresh()
+    assert "k" in reader
+
+
+def test_torn_tail_is_ignored_and_overwritten(tmp_path):
+    writer = open_cache(tmp_path)
+    writer["a"] = np.ones(4, dtype=np.float32)
+    writer.flush()
+    # 模拟写入进程崩溃留下的半条记录
+    with open(writer.log_path, "ab") as f:
+        f.write(b"\x01\xae\x05\x00garbage")
+
+    recovered = open_cache(tmp_path)
+    assert len(recovered) == 1
+    recovered["b"] = np.zeros(4, dtype=np.float32)
+    recovered.flush()
+    assert set(dict(open_cache(tmp_path).items())) == {"a", "b"}
+
+
+def test_compaction_removes_duplicates_and_readers_reload(tmp_path):
+    writer = open_cache(tmp_path, compact_ratio=100)
+    reader = open_cache(tmp_path)
+    for i in range(5):
+        writer["k"] = np.full(8, i, dtype=np.float32)
+        writer.flush()
+    size_before = writer.log_path.stat().st_size
+    writer["other"] = np.zeros(8, dtype=np.float32)
+    writer.flush()
+    writer.compact()
+    assert writer.log_path.stat().st_size < size_before
+
+    reader.refresh()
+    assert np.all(reader.get("k") == 4) and "other" in reader
+
+
+def test_automatic_compaction(tmp_path):
+    writer = open_cache(tmp_path, compact_ratio=2.0)
+    for i in range(5):
+        writer["k"] = np.full(8, i, dtype=np.float32)
+        writer.flush()
+    assert writer._log_records <= 2
+
+
+def test_concurrent_processes_do_not_lose_records(tmp_path):
+    if "fork" not in multiprocessing.get_all_start_methods():
+        pytest.skip("需要fork启动方式")
+    context = multiprocessing.get_context("fork")
+    processes = [context.Process(target=write_keys, args=(tmp_path, f"p{n}", 30)) for n in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(timeout=30)
+        assert process.exitcode == 0
+
+    cache = open_cache(tmp_path)
+    assert len(cache) == 120
+    assert np.all(cache.get("p3:29") == 29)
+
+
+def test_flush_does_not_block_lookups(tmp_path, monkeypatch):
+    cache = open_cache(tmp_path)
+    cache["old"] = np.zeros(4, dtype=np.float32)
+    cache.flush()
+    cache["new"] = np.ones(4, dtype=np.float32)
+
+    syncing, real_fsync = threading.Event(), embedding_cache_module.os.fsync
+
+    def slow_fsync(fd):
+        syncing.set()
+        time.sleep(0.3)
+        real_fsync(fd)
+
+    monkeypatch.setattr(embedding_cache_module.os, "fsync", slow_fsync)
+    flusher = threading.Thread(target=cache.flush)
+    flusher.start()
+    assert syncing.wait(1)
+    started = time.perf_counter()
+    assert cache.get("old") is not None and "new" in cache
+    cache["newer"] = np.ones(4, dtype=np.float32)
+    assert time.perf_counter() - started < 0.1
+    flusher.join()
+    monkeypatch.undo()
+    cache.flush()
+    assert len(open_cache(tmp_path)) == 3
@@ -0,0 +1,117 @@
+"""
+Embedding Dimension Tests
+Matryoshka降维：截断后重新归一化、按模型和维度隔离缓存、低维请求复用完整维度缓存向量、旧版pickle缓存原地迁移
+"""
+
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import src.embedding_service as embedding_module
+from src.embedding_service import EmbeddingService, truncate_embeddings
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+@pytest.fixture
+def api_requests(tmp_path, monkeypatch):
+    """在临时目录中运行，替换嵌入API请求并记录请求体"""
+    monkeypatch.chdir(tmp_path)
+    sent = []
+
+    def post(url, headers=None, json=None):
+        sent.append(json)
+        dim = json.get("dimensions", 1024)
+        data = []
+        for item in json["input"]:
+            seed = sum(item["text"].encode("utf-8"))
+            vector = np.random.default_rng(seed).standard_normal(1024)
+            data.append({"embedding": (vector / np.linalg.norm(vector))[:dim].tolist()})
+        return FakeResponse({"data": data})
+
+    monkeypatch.setattr(embedding_module.requests, "post", post)
+    return sent
+
+
+@pytest.fixture
+def make_service(api_requests):
+    services = []
+
+    def build(**kwargs) -> EmbeddingService:
+        service = EmbeddingService(api_key="test", **kwargs)
+        services.append(service)
+        return service
+
+    yield build
+    for service in services:
+        service.embedding_cache.close()
+
+
+def test_truncate_embeddings_renormalizes():
+    vectors = np.array([[3.0, 4.0, 12.0], [0.0, 0.0, 1.0]])
+    truncated = truncate_embeddings(vectors, 2)
+    assert truncated.dtype == np.float32
+    assert np.allclose(truncated[0], [0.6, 0.8])
+    # 前缀全为0时不除以0
+    assert np.allclose(truncated[1], [0.0, 0.0])
+
+
+def test_api_dimensions_parameter(make_service, api_requests):
+    service = make_service(dimensions=256)
+    assert service.namespace == "jina-clip-v2:256"
+    assert service.get_embedding("文本").shape == (256,)
+    assert api_requests[-1]["dimensions"] == 256
+
+
+def test_local_truncation_requests_full_vector(make_service, api_requests):
+    service = make_service(dimensions=128, truncate_locally=True)
+    embedding = service.get_embedding("文本")
+    assert "dimensions" not in api_requests[-1]
+    assert embedding.shape == (128,)
+    assert np.linalg.norm(embedding) == pytest.approx(1.0, abs=1e-5)
+
+
+def test_reduced_dimension_reuses_cached_full_vector(make_service, api_requests):
+    full_service = make_service()
+    full = full_service.get_embedding("文本")
+    full_service.save_cache()
+    assert len(api_requests) == 1
+
+    reduced = make_service(dimensions=64).get_embedding("文本")
+    assert len(api_requests) == 1
+    assert np.allclose(reduced, truncate_embeddings(full, 64), atol=1e-6)
+
+
+def test_namespaces_do_not_collide(make_service):
+    service = make_service(dimensions=64)
+    service.get_batch_embeddings(["甲", "乙"])
+    assert service._get_cache_key("甲") != service._get_cache_key("甲", "jina-clip-v2:full")
+    assert service.embedding_cache.get(service._get_cache_key("甲", "jina-clip-v2:full")) is None
+    assert service.embedding_cache.get(service._get_cache_key("甲")) is not None
+
+
+def test_legacy_pickle_is_migrated_in_place(api_requests):
+    legacy = {"旧文本": np.arange(4, dtype=np.float64)}
+    legacy_file = Path("cache/embeddings/embeddings.pkl")
+    legacy_file.parent.mkdir(parents=True, exist_ok=True)
+    legacy_file.write_bytes(pickle.dumps(legacy))
+
+    service = EmbeddingService(cache_flush_interval=0)
+    assert service.embedding_cache.get("jina-clip-v2:full:旧文本") is not None
+    # 原文件保留，标记文件避免重复迁移
+    assert legacy_file.exists() and legacy_file.with_suffix(".pkl.migrated").exists()
+    service.embedding_cache.close()
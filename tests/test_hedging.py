@@ -0,0 +1,115 @@
+"""
+Hedging Tests
+对冲执行：慢主Hub被备选Hub超越、失败时立即启动下一个候选、部分输出不胜出、取消落后的执行并释放在途计数
+"""
+
+import asyncio
+
+from src.agent_hub import PARTIAL_OUTPUT_SUFFIX
+from src.hedging import run_hedged, HedgeSummary
+from src.hub_stats import HubStatsRegistry
+from src.usp import TaskRequest
+from tests.conftest import FakeHub
+
+
+class TimedHub:
+    """arun 等待 delay 秒后返回 output（None 表示失败）"""
+
+    def __init__(self, delay: float, output):
+        self.delay = delay
+        self.output = output
+        self.cancelled = False
+
+    async def arun(self, prompt, deadline=None):
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.output
+
+
+def test_hedge_wins_when_primary_is_slow():
+    stats = HubStatsRegistry()
+    slow, fast = TimedHub(1.0, "slow"), TimedHub(0.01, "fast")
+    finished = []
+    result, report = asyncio.run(run_hedged([("h0", slow), ("h1", fast)], "任务", stats,
+                                            hedge_delay=0.05,
+                                            on_finish=lambda hub_id, ok: finished.append((hub_id, ok))))
+
+    assert result == "fast" and report.winner_hub_id == "h1"
+    assert report.started == ["h0", "h1"] and report.cancelled == ["h0"]
+    assert slow.cancelled and report.latency < 0.5
+    assert finished == [("h1", True)]
+    assert stats.get("h0").in_flight == 0 and stats.get("h1").in_flight == 0
+
+
+def test_primary_fast_enough_never_hedges():
+    stats = HubStatsRegistry()
+    result, report = asyncio.run(run_hedged([("h0", TimedHub(0.01, "primary")), ("h1", TimedHub(0.01, "b"))],
+                                            "任务", stats, hedge_delay=0.5))
+    assert result == "primary" and not report.hedged
+
+
+def test_failure_starts_next_candidate_immediately():
+    stats = HubStatsRegistry()
+    result, report = asyncio.run(run_hedged([("h0", TimedHub(0.01, None)), ("h1", TimedHub(0.01, "backup"))],
+                                            "任务", stats, hedge_delay=5.0))
+    assert result == "backup"
+    assert report.failed == ["h0"] and report.latency < 1.0
+    assert stats.get("h0").errors == 1
+
+
+def test_partial_output_does_not_cancel_other_candidates():
+    stats = HubStatsRegistry()
+    partial = "部分" + PARTIAL_OUTPUT_SUFFIX
+    slow = TimedHub(0.2, "complete")
+    result, report = asyncio.run(run_hedged([("h0", TimedHub(0.01, partial)), ("h1", slow)],
+                                            "任务", stats, hedge_delay=0))
+    assert result == "complete" and report.winner_hub_id == "h1"
+    assert not slow.cancelled and report.cancelled == []
+
+
+def test_partial_output_returned_after_all_candidates_finish():
+    stats = HubStatsRegistry()
+    partial = "部分" + PARTIAL_OUTPUT_SUFFIX
+    result, report = asyncio.run(run_hedged([("h0", TimedHub(0.01, partial)), ("h1", TimedHub(0.1, None))],
+                                            "任务", stats, hedge_delay=0))
+    assert result == partial and report.winner_hub_id == "h0"
+    assert report.failed == ["h1"] and report.latency >= 0.1
+
+
+def test_exclusive_hook_wraps_each_execution():
+    held = []
+
+    class Hold:
+        def __init__(self, hub_id):
+            self.hub_id = hub_id
+
+        async def __aenter__(self):
+            held.append(self.hub_id)
+
+        async def __aexit__(self, *exc):
+            held.remove(self.hub_id)
+
+    result, _ = asyncio.run(run_hedged([("h0", TimedHub(0.01, "ok"))], "任务", HubStatsRegistry(),
+                                       exclusive=Hold))
+    assert result == "ok" and held == []
+
+
+def test_summary_counts_hedge_wins():
+    summary = HedgeSummary()
+    _, report = asyncio.run(run_hedged([("h0", TimedHub(1.0, "slow")), ("h1", TimedHub(0.01, "fast"))],
+                                       "任务", HubStatsRegistry(), hedge_delay=0.01))
+    summary.record(report)
+    assert summary.to_dict()["hedges_fired"] == 1 and summary.to_dict()["hedge_wins"] == 1
+
+
+def test_exchange_hedged_execution(make_exchange):
+    FakeHub.delay = 0.01
+    aex = make_exchange(count=2)
+    result = aex.execute_task_hedged(TaskRequest("任务", ["a"]), top_k=2, hedge_delay=0)
+    assert result == "任务-0;任务-1;任务-2;"
+    summary = aex.hedge_summary.to_dict()
+    assert summary["runs"] == 1 and summary["hedges_fired"] == 1
+    assert all(aex.hub_stats.get(hub_id).in_flight == 0 for hub_id in ("h0", "h1"))
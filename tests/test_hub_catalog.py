@@ -0,0 +1,113 @@
+"""
+Hub Catalog Tests
+内存映射Hub目录：与JSON配置往返一致、二分查找、倒排能力匹配、版本校验，以及与JSON注册表相同的路由结果
+"""
+
+import os
+import random
+import struct
+
+import pytest
+
+from src.hub_catalog import HubCatalog, compile_catalog, CATALOG_MAGIC
+from src.usp import TaskRequest
+from tests.conftest import hub_configs
+
+
+def random_configs(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    capabilities = [f"cap{i}" for i in range(30)] + ["写作", "数据分析"]
+    return [{
+        "hub_id": f"hub-{rng.randrange(10 ** 9):09d}-{i}",
+        "name": f"Hub {i} 名称",
+        "description": "描述" * rng.randint(0, 5),
+        "capabilities": rng.sample(capabilities, rng.randint(1, 5)),
+        "hub_class": rng.choice(["FakeHub", "OtherHub"]),
+        "cacheable": rng.random() < 0.8,
+        "timeout": rng.choice([None, 30.0, 120.0]),
+        "cost": rng.choice([1.0, 2.5]),
+        "cache_ttl": rng.choice([None, 600.0]),
+    } for i in range(count)]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    configs = random_configs(500)
+    catalog = HubCatalog(HubCatalog.write(str(tmp_path / "hubs.bin"), configs))
+    yield catalog, configs
+    catalog.close()
+
+
+def test_round_trip_matches_configs(catalog):
+    catalog, configs = catalog
+    assert len(catalog) == len(configs)
+    for view, config in zip(catalog, configs):
+        expected = dict(config, capabilities=sorted(config["capabilities"], key=catalog.capability_ids.get))
+        assert view.to_dict() == expected
+    assert catalog[-1].hub_id == configs[-1]["hub_id"]
+    with pytest.raises(IndexError):
+        catalog[len(configs)]
+
+
+def test_lookup_by_hub_id(catalog):
+    catalog, configs = catalog
+    for row in (0, 123, 499):
+        assert catalog.index_of(configs[row]["hub_id"]) == row
+        assert catalog.get(configs[row]["hub_id"]).row == row
+    assert catalog.get("missing") is None
+    assert catalog.index_of("") is None
+
+
+def test_match_counts_agree_with_naive_scan(catalog):
+    catalog, configs = catalog
+    required = ["cap1", "写作", "cap7", "unknown"]
+    rows, counts = catalog.match_counts(required)
+    naive = {row: len(set(required) & set(config["capabilities"]))
+             for row, config in enumerate(configs) if set(required) & set(config["capabilities"])}
+    assert dict(zip(rows.tolist(), counts.tolist())) == naive
+    assert len(catalog.match_counts(["unknown"])[0]) == 0
+
+
+def test_rejects_foreign_and_outdated_files(tmp_path):
+    foreign = tmp_path / "foreign.bin"
+    foreign.write_bytes(b"\0" * 64)
+    with pytest.raises(ValueError):
+        HubCatalog(str(foreign))
+
+    outdated = tmp_path / "outdated.bin"
+    outdated.write_bytes(struct.pack("<8sIIII", CATALOG_MAGIC, 1, 0, 0, 0))
+    with pytest.raises(ValueError):
+        HubCatalog(str(outdated))
+
+    with pytest.raises(ValueError):
+        HubCatalog.write(str(tmp_path / "dup.bin"), hub_configs(1) * 2)
+
+
+def test_replacement_does_not_disturb_mapped_readers(tmp_path):
+    path = str(tmp_path / "hubs.bin")
+    HubCatalog.write(path, hub_configs(3))
+    old = HubCatalog(path)
+    HubCatalog.write(path, hub_configs(5))
+    assert len(old) == 3 and old[2].hub_id == "h2"
+    assert len(HubCatalog(path)) == 5
+    assert not [name for name in os.listdir(tmp_path) if ".tmp-" in name]
+    old.close()
+    assert old._mmap.closed
+
+
+def test_exchange_routes_identically_from_catalog(make_exchange, tmp_path):
+    configs = hub_configs(6)
+    configs[2]["capabilities"] = ["a", "c1", "c3"]
+    json_aex = make_exchange(configs)
+    config_file = tmp_path / "hubs.json"
+    catalog_file = compile_catalog(str(config_file), str(tmp_path / "hubs.bin"))
+    catalog_aex = make_exchange(configs, catalog_file=catalog_file)
+
+    for capabilities in (["a"], ["c1", "c3"], ["a", "c5"]):
+        request = TaskRequest("任务", capabilities)
+        # 目录只对至少匹配一项能力的Hub打分，JSON注册表中其余Hub记0分
+        expected = [(hub.hub_id, score) for hub, score in json_aex.rank_hubs(request) if score > 0]
+        actual = [(hub.hub_id, score) for hub, score in catalog_aex.rank_hubs(request)]
+        assert actual == pytest.approx(expected)
+    assert catalog_aex.get_hub("h4").name == "Hub 4"
+    assert catalog_aex.execute_task(TaskRequest("任务", ["c3"])) == "任务-0;任务-1;任务-2;"
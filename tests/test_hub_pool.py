@@ -0,0 +1,140 @@
+"""
+Hub Pool Tests
+Hub实例池：内存估算、空闲超时回收、LRU数量和内存上限、固定、借出与执行中的Hub不回收、后台重新估算
+"""
+
+import time
+
+from src.hub_pool import HubInstancePool, estimate_memory
+from src.usp import TaskRequest
+
+
+class Instance:
+    """可控制大小的假Hub实例"""
+
+    def __init__(self, size: int = 1000):
+        self.memory = ["x" * size]
+        self.torn_down = False
+
+    def teardown(self):
+        self.torn_down = True
+        self.memory = []
+
+
+def test_estimate_memory_counts_once_and_excludes_shared():
+    shared = ["y" * 10_000]
+    payload = "x" * 10_000
+    instance = Instance(0)
+    instance.memory = [payload, payload, shared]
+    with_shared = estimate_memory(instance)
+    without_shared = estimate_memory(instance, exclude=[shared])
+    assert 10_000 < without_shared < 11_000
+    assert with_shared - without_shared >= 10_000
+
+
+def test_idle_instances_are_reclaimed():
+    pool = HubInstancePool(idle_timeout=0.05)
+    old, fresh = Instance(), Instance()
+    pool.put("old", old)
+    time.sleep(0.06)
+    pool.put("fresh", fresh)
+    assert pool.evict_idle() == ["old"]
+    assert old.torn_down and not fresh.torn_down
+    assert pool.stats()["evictions"] == {"idle": 1}
+
+
+def test_lru_respects_max_resident_and_recent_use():
+    pool = HubInstancePool(max_resident=2)
+    instances = {hub_id: Instance() for hub_id in ("a", "b", "c")}
+    pool.put("a", instances["a"])
+    pool.put("b", instances["b"])
+    pool.get("a")
+    pool.put("c", instances["c"])
+    assert pool.keys() == ["a", "c"] and instances["b"].torn_down
+
+
+def test_memory_cap_skips_pinned_and_busy_hubs():
+    busy = {"b"}
+    pool = HubInstancePool(max_memory_bytes=25_000, pinned=["a"], in_use=lambda hub_id: hub_id in busy)
+    for hub_id in ("a", "b", "c"):
+        pool.put(hub_id, Instance(10_000))
+    # 放入时不估算内存，留给后台线程
+    assert all(hub["memory_bytes"] == 0 for hub in pool.stats()["hubs"].values())
+    # a 固定、b 执行中留到下一轮估算，不回收
+    pool.remeasure()
+    assert set(pool.keys()) == {"a", "b", "c"}
+    busy.clear()
+    pool.put("d", Instance(10_000))
+    pool.remeasure()
+    assert "b" not in pool and "c" not in pool and "a" in pool and "d" in pool
+    assert pool.stats()["evictions"]["max_memory"] == 2
+
+
+def test_leased_instances_are_not_evicted():
+    pool = HubInstancePool(max_resident=1)
+    leased = Instance()
+    pool.put("a", leased, lease=True)
+    pool.put("b", Instance())
+    assert set(pool.keys()) == {"a", "b"} and not pool.evict("a")
+    pool.release("a")
+    assert pool.evict("a") and leased.torn_down
+
+
+def test_remeasure_picks_up_growth_and_evicts():
+    pool = HubInstancePool(max_memory_bytes=30_000)
+    growing, other = Instance(1000), Instance(1000)
+    pool.put("grow", growing)
+    pool.put("other", other)
+    growing.memory.append("z" * 40_000)
+    pool.refresh("grow")
+    assert pool.stats()["hubs"]["grow"]["memory_bytes"] < 5_000
+    pool.remeasure()
+    assert "grow" not in pool and growing.torn_down
+    assert pool.stats()["reclaimed_bytes"] > 40_000
+
+
+def test_remeasure_defers_busy_instances():
+    busy = {"a"}
+    pool = HubInstancePool(in_use=lambda hub_id: hub_id in busy)
+    instance = Instance(1000)
+    pool.put("a", instance)
+    instance.memory.append("z" * 20_000)
+    pool.refresh("a")
+    pool.remeasure()
+    assert pool.stats()["hubs"]["a"]["memory_bytes"] < 5_000
+    busy.clear()
+    pool.remeasure()
+    assert pool.stats()["hubs"]["a"]["memory_bytes"] > 20_000
+
+
+def test_reaper_thread_remeasures_and_evicts():
+    pool = HubInstancePool(idle_timeout=0.05, max_memory_bytes=1 << 30, remeasure_interval=0.01)
+    instance = Instance()
+    pool.put("a", instance)
+    pool.start_reaper(interval=0.02)
+    try:
+        deadline = time.time() + 2
+        while "a" in pool and time.time() < deadline:
+            time.sleep(0.01)
+    finally:
+        pool.stop()
+    assert instance.torn_down
+
+
+def test_exchange_recreates_evicted_instance(make_exchange):
+    aex = make_exchange(count=1, hub_pool=HubInstancePool(max_resident=1))
+    hub = aex.get_hub("h0")
+    first = aex.get_hub_instance(hub)
+    assert aex.get_hub_instance(hub) is first
+    assert aex.hub_pool.evict("h0")
+    assert aex.get_hub_instance(hub) is not first
+    assert aex.execute_task(TaskRequest("任务", ["a"])) == "任务-0;任务-1;任务-2;"
+
+
+def test_exchange_keeps_leased_instance_until_execution_ends(make_exchange):
+    aex = make_exchange(count=1)
+    hub = aex.get_hub("h0")
+    with aex.lease_hub_instance(hub) as instance:
+        # 调用方已取得实例、尚未开始执行
+        assert not aex.hub_pool.evict("h0")
+    assert aex.hub_pool.evict("h0") and instance.team is None
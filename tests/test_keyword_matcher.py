@@ -0,0 +1,61 @@
+"""
+Keyword Matcher Tests
+Aho-Corasick关键词匹配：与朴素子串匹配结果一致，支持重叠关键词、增量更新和加权投票
+"""
+
+import random
+
+from src.keyword_matcher import KeywordMatcher
+
+
+def naive_vote(capability_keywords, text):
+    """朴素实现：每个出现在文本中的关键词为其能力投一票"""
+    text = text.lower()
+    scores = {}
+    for capability, keywords in capability_keywords.items():
+        for keyword in keywords:
+            if keyword.lower() in text:
+                scores[capability] = scores.get(capability, 0.0) + 1.0
+    return scores
+
+
+def test_matches_naive_substring_search_on_random_texts():
+    rng = random.Random(7)
+    alphabet = "abcde数据分析代码"
+    capability_keywords = {
+        f"cap{i}": list({"".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4))) for _ in range(5)})
+        for i in range(20)
+    }
+    matcher = KeywordMatcher.from_capability_keywords(capability_keywords)
+    for _ in range(200):
+        text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+        assert matcher.vote(text) == naive_vote(capability_keywords, text)
+
+
+def test_overlapping_and_nested_keywords():
+    matcher = KeywordMatcher.from_keyword_mapping({"he": "a", "she": "b", "hers": "c", "his": "d"})
+    assert matcher.find_keywords("ushers") == ["she", "he", "hers"]
+    assert matcher.match_capabilities("ushers") == ["b", "a", "c"]
+
+
+def test_case_insensitive_and_weighted_votes():
+    matcher = KeywordMatcher()
+    matcher.add_keywords("code_generation", {"Python": 2.0, "代码": 1.0})
+    matcher.add_keywords("data_analysis", ["数据", "python"])
+    scores = matcher.vote("用PYTHON写代码分析数据")
+    assert scores == {"code_generation": 3.0, "data_analysis": 2.0}
+    assert matcher.match_capabilities("用PYTHON写代码分析数据", min_score=2.5) == ["code_generation"]
+
+
+def test_incremental_updates():
+    matcher = KeywordMatcher.from_capability_keywords({"writing": ["写作"]})
+    assert matcher.match_capabilities("帮我写作") == ["writing"]
+
+    matcher.add_keyword("写", "drafting")
+    assert set(matcher.match_capabilities("帮我写作")) == {"writing", "drafting"}
+
+    matcher.set_keywords("writing", ["撰写"])
+    assert matcher.match_capabilities("帮我写作") == ["drafting"]
+    matcher.remove_capability("drafting")
+    assert matcher.match_capabilities("帮我写作") == []
+    assert matcher.stats()["capabilities"] == 1
@@ -0,0 +1,171 @@
+"""
+LLM Cache Tests
+模型响应缓存：相同请求命中、键字段区分、只缓存成功的完整响应、回放模式未命中、按字节LRU淘汰
+"""
+
+import json
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from src.llm_cache import (LLMResponseCache, CachingTransport, AsyncCachingTransport,
+                           READ_WRITE, RECORD, REPLAY)
+
+URL = "https://llm.example/v1/chat/completions"
+
+
+def chat(temperature=0.0, content="你好", stream=False):
+    return {"model": "m", "messages": [{"role": "user", "content": content}],
+            "temperature": temperature, "stream": stream}
+
+
+class Upstream:
+    """记录请求次数的上游；status 控制返回码，stream_chunks 为流式响应体分块"""
+
+    def __init__(self, status=200, stream_chunks=None):
+        self.status = status
+        self.stream_chunks = stream_chunks
+        self.calls = 0
+
+    def __call__(self, request):
+        self.calls += 1
+        if self.stream_chunks:
+            return httpx.Response(self.status, content=iter(self.stream_chunks),
+                                  headers={"content-type": "text/event-stream"})
+        return httpx.Response(self.status, json={"answer": self.calls})
+
+
+@pytest.fixture
+def make_client(tmp_path):
+    clients = []
+
+    def build(upstream, mode=READ_WRITE, max_bytes=1 << 20):
+        cache = LLMResponseCache(str(tmp_path / "llm.db"), max_bytes=max_bytes, mode=mode)
+        client = httpx.Client(transport=CachingTransport(cache, httpx.MockTransport(upstream)))
+        clients.append(client)
+        return client, cache
+
+    yield build
+    for client in clients:
+        client.close()
+
+
+def test_identical_request_hits_cache(make_client):
+    upstream = Upstream()
+    client, cache = make_client(upstream)
+    first = client.post(URL, json=chat()).json()
+    second = client.post(URL, json=chat()).json()
+    assert first == second == {"answer": 1}
+    assert upstream.calls == 1
+    assert cache.stats()["hits"] == 1 and cache.stats()["entries"] == 1
+
+
+def test_key_fields_distinguish_requests(make_client):
+    upstream = Upstream()
+    client, _ = make_client(upstream)
+    client.post(URL, json=chat())
+    client.post(URL, json=chat(temperature=0.7))
+    client.post(URL, json=chat(stream=True))
+    # 不参与缓存键的字段（如 user）不影响命中
+    client.post(URL, json=dict(chat(), user="someone"))
+    assert upstream.calls == 3
+    assert LLMResponseCache.make_key(chat()) == LLMResponseCache.make_key(json.loads(json.dumps(chat())))
+
+
+def test_other_endpoints_and_errors_are_not_cached(make_client):
+    upstream = Upstream(status=500)
+    client, cache = make_client(upstream)
+    client.post(URL, json=chat())
+    client.post(URL, json=chat())
+    client.post("https://llm.example/v1/embeddings", json=chat())
+    assert upstream.calls == 3 and cache.stats()["entries"] == 0
+
+
+def test_streamed_response_cached_only_after_full_read(make_client):
+    upstream = Upstream(stream_chunks=[b"data: a\n\n", b"data: b\n\n"])
+    client, cache = make_client(upstream)
+    with client.stream("POST", URL, json=chat(stream=True)) as response:
+        next(response.iter_bytes())
+    assert cache.stats()["entries"] == 0
+
+    with client.stream("POST", URL, json=chat(stream=True)) as response:
+        body = response.read()
+    assert cache.stats()["entries"] == 1
+
+    replayed = client.post(URL, json=chat(stream=True))
+    assert replayed.content == body and replayed.headers["content-type"] == "text/event-stream"
+    assert upstream.calls == 2
+
+
+def test_replay_miss_and_record_mode(make_client):
+    upstream = Upstream()
+    client, _ = make_client(upstream, mode=REPLAY)
+    response = client.post(URL, json=chat())
+    assert response.status_code == 400 and response.json()["error"]["type"] == "llm_cache_miss"
+    assert upstream.calls == 0
+
+    recorder, _ = make_client(upstream, mode=RECORD)
+    recorder.post(URL, json=chat())
+    assert recorder.post(URL, json=chat()).json() == {"answer": 2}
+
+    replay, _ = make_client(upstream, mode=REPLAY)
+    assert replay.post(URL, json=chat()).json() == {"answer": 2}
+    assert upstream.calls == 2
+
+
+def test_lru_eviction_by_bytes(tmp_path):
+    cache = LLMResponseCache(str(tmp_path / "llm.db"), max_bytes=250)
+    response = httpx.Response(200)
+    for key in ("a", "b", "c"):
+        cache.put(key, "m", response, b"x" * 100)
+        if key == "b":
+            # 访问 a 使其比 b 更近
+            cache.get("a")
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_async_transport_shares_cache(tmp_path):
+    upstream = Upstream()
+    cache = LLMResponseCache(str(tmp_path / "llm.db"))
+
+    async def run():
+        transport = AsyncCachingTransport(cache, httpx.MockTransport(upstream))
+        async with httpx.AsyncClient(transport=transport) as client:
+            first = (await client.post(URL, json=chat())).json()
+            # 写入在线程池中完成
+            await asyncio.sleep(0.05)
+            second = (await client.post(URL, json=chat())).json()
+        return first, second
+
+    assert asyncio.run(run()) == ({"answer": 1}, {"answer": 1})
+    with httpx.Client(transport=CachingTransport(cache, httpx.MockTransport(upstream))) as client:
+        assert client.post(URL, json=chat()).json() == {"answer": 1}
+    assert upstream.calls == 1
+
+
+def test_async_transport_keeps_cache_io_off_event_loop(tmp_path):
+    class RecordingCache(LLMResponseCache):
+        threads = []
+
+        def lookup(self, request):
+            self.threads.append(threading.get_ident())
+            return super().lookup(request)
+
+        def put(self, *args):
+            self.threads.append(threading.get_ident())
+            return super().put(*args)
+
+    cache = RecordingCache(str(tmp_path / "llm.db"))
+
+    async def run():
+        transport = AsyncCachingTransport(cache, httpx.MockTransport(Upstream()))
+        async with httpx.AsyncClient(transport=transport) as client:
+            await client.post(URL, json=chat())
+        return threading.get_ident()
+
+    loop_thread = asyncio.run(run())
+    assert len(RecordingCache.threads) == 2 and loop_thread not in RecordingCache.threads
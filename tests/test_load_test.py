@@ -0,0 +1,121 @@
+"""
+Load Test Tests
+压测工具：延迟分布解析、模拟LLM服务的流式输出和错误注入、开环压测把排队时间计入延迟
+"""
+
+import json
+import random
+import asyncio
+import threading
+import statistics
+
+import httpx
+import pytest
+
+from src.mock_llm_server import MockLLMServer, LatencyDistribution
+from src.load_test import LoadGenerator, percentile
+from tests.conftest import FakeHub
+
+
+class StubUSP:
+    def extract_capabilities(self, prompt):
+        return ["a"]
+
+
+@pytest.fixture
+def mock_server():
+    def start(**kwargs):
+        server = MockLLMServer(port=0, seed=1, **kwargs)
+        return server, server.start_in_thread()
+
+    return start
+
+
+def test_latency_distribution_parsing_and_sampling():
+    assert str(LatencyDistribution.parse("0.2")) == "fixed:0.2"
+    assert LatencyDistribution.parse("uniform:0.1,0.5").params == [0.1, 0.5]
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("gamma:1")
+    with pytest.raises(ValueError):
+        LatencyDistribution.parse("uniform:a,b")
+
+    rng = random.Random(0)
+    lognormal = LatencyDistribution.parse("lognormal:0.3,0.5")
+    samples = [lognormal.sample(rng) for _ in range(2000)]
+    assert statistics.median(samples) == pytest.approx(0.3, rel=0.1)
+    assert percentile(samples, 99) > 2 * percentile(samples, 50)
+
+
+def test_percentile_nearest_rank():
+    assert percentile([], 50) is None
+    assert percentile([3, 1, 2, 4], 50) == 3
+    assert percentile([3, 1, 2, 4], 100) == 4
+
+
+def test_mock_server_completion_and_stream(mock_server):
+    server, base_url = mock_server(ttft=LatencyDistribution("fixed", [0.0]), tokens_per_second=0,
+                                   output_tokens=4)
+    with httpx.Client(base_url=base_url) as client:
+        assert client.get("/models").json()["data"][0]["id"] == "mock-model"
+
+        body = {"model": "m", "messages": [{"role": "user", "content": "你好"}]}
+        completion = client.post("/chat/completions", json=body).json()
+        assert completion["choices"][0]["message"]["content"] == "[mock] 你好 token1 token2 token3"
+        assert completion["usage"]["completion_tokens"] == 4
+
+        stream_body = dict(body, stream=True, stream_options={"include_usage": True}, max_tokens=2)
+        with client.stream("POST", "/chat/completions", json=stream_body) as response:
+            events = [line[len("data: "):] for line in response.iter_lines() if line.startswith("data: ")]
+        assert events[-1] == "[DONE]"
+        chunks = [json.loads(event) for event in events[:-1]]
+        content = "".join(c["choices"][0]["delta"].get("content", "") for c in chunks if c["choices"])
+        assert content == "[mock] 你好 token1"
+        assert chunks[-1]["usage"]["completion_tokens"] == 2
+
+        assert client.get("/unknown").status_code == 404
+    assert server.stats()["tokens_generated"] == 6
+
+
+def test_mock_server_injects_rate_limits(mock_server):
+    server, base_url = mock_server(rate_limit_rate=1.0)
+    response = httpx.post(f"{base_url}/chat/completions", json={"messages": []})
+    assert response.status_code == 429 and response.json()["error"]["code"] == 429
+    assert server.stats()["errors_injected"] == 1
+
+
+def test_open_loop_latency_includes_queueing(make_exchange):
+    FakeHub.delay, FakeHub.chunks = 0.05, 2
+    aex = make_exchange(count=1)
+    generator = LoadGenerator(StubUSP(), aex, mode="stream", max_in_flight=4)
+    report = asyncio.run(generator.run(qps=100, num_requests=4, arrival="uniform", seed=0))
+
+    overall = report.overall()
+    assert overall["requests"] == overall["succeeded"] == 4 and overall["error_rate"] == 0
+    latencies = sorted(record.latency for record in report.records)
+    # 同一Hub串行执行：每个请求约0.1秒，最后一个请求等待了前面三个
+    assert latencies[-1] >= 0.3
+    assert all(record.ttft is not None and record.ttft < record.latency for record in report.records)
+    assert set(report.per_hub()) == {"h0"}
+
+
+def test_failures_are_recorded(make_exchange):
+    FakeHub.fail = True
+    aex = make_exchange(count=1)
+    report = asyncio.run(LoadGenerator(StubUSP(), aex, mode="async").run(qps=50, num_requests=2, seed=0))
+    assert report.overall()["succeeded"] == 0 and report.overall()["error_rate"] == 1.0
+    with pytest.raises(ValueError):
+        LoadGenerator(StubUSP(), aex, mode="batch")
+
+
+def test_blocking_routing_runs_off_event_loop(make_exchange):
+    class RecordingUSP(StubUSP):
+        threads = []
+
+        def extract_capabilities(self, prompt):
+            self.threads.append(threading.get_ident())
+            return super().extract_capabilities(prompt)
+
+    aex = make_exchange(count=1)
+    report = asyncio.run(LoadGenerator(RecordingUSP(), aex, mode="async").run(qps=50, num_requests=2, seed=0))
+    assert report.overall()["succeeded"] == 2
+    assert len(RecordingUSP.threads) == 2 and threading.get_ident() not in RecordingUSP.threads
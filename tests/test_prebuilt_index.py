@@ -0,0 +1,122 @@
+"""
+Prebuilt Index Tests
+预构建能力索引：产物读写、版本/模型/Hub源码变化时失效、映射器加载产物时不重建能力描述也不调用嵌入接口
+"""
+
+import hashlib
+
+import numpy as np
+import pytest
+
+from src.prebuilt_index import (PrebuiltCapabilityIndex, build_prebuilt_index, hub_content_hashes,
+                                ARTIFACT_VERSION)
+from src.capability_mapper import CapabilityMapper
+from tests.conftest import FakeEmbeddingService, FakeHub
+
+
+class SeedableEmbeddingService(FakeEmbeddingService):
+    """带命名空间、批量接口和预热缓存的假嵌入服务"""
+
+    namespace = "fake:16"
+
+    def __init__(self):
+        super().__init__()
+        self.seeded = {}
+        self.batches = 0
+
+    def get_batch_embeddings(self, texts):
+        self.batches += 1
+        return {text: self.get_embedding(text) for text in texts}
+
+    def seed_embeddings(self, embeddings):
+        self.seeded.update(embeddings)
+
+
+class StubMapper:
+    def __init__(self, service, descriptions):
+        self.embedding_service = service
+        self.capability_descriptions = descriptions
+        self.hub_classes = {"FakeHub": FakeHub}
+
+
+@pytest.fixture
+def artifact(tmp_path):
+    service = SeedableEmbeddingService()
+    # writing 和 summary 共用同一段描述，只请求一次向量
+    descriptions = {"writing": "写作", "summary": "写作", "coding": "编程"}
+    index = build_prebuilt_index(StubMapper(service, descriptions), batch_size=1)
+    path = tmp_path / "capabilities.npz"
+    index.save(str(path))
+    return path, index, service
+
+
+def test_build_deduplicates_descriptions(artifact):
+    _, index, service = artifact
+    assert index.names == ["writing", "summary", "coding"]
+    assert service.calls == 2 and service.batches == 2
+    assert np.array_equal(index.embeddings[0], index.embeddings[1])
+
+
+def test_save_load_round_trip(artifact):
+    path, index, _ = artifact
+    loaded = PrebuiltCapabilityIndex.load(str(path))
+    assert loaded.version == ARTIFACT_VERSION
+    assert loaded.names == index.names and loaded.descriptions == index.descriptions
+    assert loaded.embeddings.dtype == np.float32
+    assert np.allclose(loaded.embeddings, index.embeddings)
+    assert set(loaded.embedding_map()) == {"写作", "编程"}
+    assert not list(path.parent.glob("*.tmp.*"))
+
+
+def test_validate_detects_stale_artifacts(artifact):
+    path, _, _ = artifact
+    loaded = PrebuiltCapabilityIndex.load(str(path))
+    hashes = hub_content_hashes({"FakeHub": FakeHub})
+    assert loaded.validate("fake:16", hashes) == (True, "ok")
+
+    valid, reason = loaded.validate("fake:32", hashes)
+    assert not valid and "fake:32" in reason
+    valid, reason = loaded.validate("fake:16", {"FakeHub": "changed", "NewHub": "x"})
+    assert not valid and "FakeHub" in reason and "NewHub" in reason
+    loaded.version = ARTIFACT_VERSION - 1
+    assert not loaded.validate("fake:16", hashes)[0]
+
+
+def test_hub_hash_follows_source_file():
+    hashes = hub_content_hashes({"FakeHub": FakeHub})
+    assert hashes == hub_content_hashes({"FakeHub": FakeHub})
+    # 同名类换了源文件，哈希随之变化
+    assert hashes != hub_content_hashes({"FakeHub": SeedableEmbeddingService})
+    # 没有源文件的类按类名计算
+    builtin = type("Dynamic", (), {"__module__": "builtins"})
+    assert hub_content_hashes({"Dynamic": builtin}) == {"Dynamic": hashlib.md5(b"Dynamic").hexdigest()}
+
+
+def test_mapper_loads_valid_artifact_without_rebuilding(tmp_path, monkeypatch):
+    service = SeedableEmbeddingService()
+    probe = CapabilityMapper(service, prebuilt_path=None)
+    names = list(probe.capability_descriptions)
+    index = PrebuiltCapabilityIndex(service.namespace, hub_content_hashes(probe.hub_classes), names,
+                                    dict(probe.capability_descriptions),
+                                    np.stack([service.get_embedding(probe.capability_descriptions[name])
+                                              for name in names]))
+    path = tmp_path / "capabilities.npz"
+    index.save(str(path))
+
+    def fail():
+        raise AssertionError("不应重建能力描述")
+
+    monkeypatch.setattr(CapabilityMapper, "_build_dynamic_capability_descriptions", lambda self: fail())
+    fresh = SeedableEmbeddingService()
+    mapper = CapabilityMapper(fresh, prebuilt_path=str(path))
+    assert mapper.capability_descriptions == probe.capability_descriptions
+    assert fresh.calls == 0 and set(fresh.seeded) == set(index.embedding_map())
+
+
+def test_mapper_ignores_stale_artifact(artifact):
+    path, _, _ = artifact
+    service = SeedableEmbeddingService()
+    service.namespace = "other:16"
+    mapper = CapabilityMapper(service, prebuilt_path=str(path))
+    assert service.seeded == {}
+    assert "coding" in mapper.capability_descriptions and len(mapper.capability_descriptions) > 3
@@ -0,0 +1,95 @@
+"""
+Quantization Tests
+向量量化：int8 / float16 存储的还原误差、分块打分与float32一致、扩容追加和精确重排后的召回率
+"""
+
+import numpy as np
+import pytest
+
+from src.quantization import QuantizedVectors, quantize_int8, dequantize_int8, pack_vector, unpack_vector
+
+
+def unit_vectors(count: int, dim: int, seed: int = 0) -> np.ndarray:
+    vectors = np.random.default_rng(seed).standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def test_int8_round_trip_error_is_bounded():
+    vectors = unit_vectors(50, 32)
+    codes, scales = quantize_int8(vectors)
+    assert codes.dtype == np.int8 and scales.shape == (50,)
+    # 每个分量的误差不超过半个量化步长
+    error = np.abs(dequantize_int8(codes, scales) - vectors)
+    assert np.all(error <= scales[:, None] / 2 + 1e-6)
+
+
+def test_zero_vector_and_packed_round_trip():
+    codes, scales = quantize_int8(np.zeros(4))
+    assert np.all(codes == 0) and scales[0] == 1.0
+
+    vector = unit_vectors(1, 16)[0]
+    for precision in ("float32", "float16", "int8"):
+        restored = unpack_vector(pack_vector(vector, precision))
+        assert restored.dtype == np.float32
+        assert np.allclose(restored, vector, atol=0.01)
+    assert unpack_vector(vector.astype(np.float64)).dtype == np.float32
+
+    with pytest.raises(ValueError):
+        pack_vector(vector, "int4")
+
+
+@pytest.mark.parametrize("precision", ["float32", "float16", "int8"])
+def test_blocked_scores_match_dequantized_product(precision):
+    vectors = unit_vectors(300, 24)
+    query = unit_vectors(1, 24, seed=1)[0]
+    store = QuantizedVectors.from_vectors(vectors, precision)
+    store.block_size = 64
+    expected = store.rows(np.arange(300)) @ query
+    assert np.allclose(store.scores(query), expected, atol=1e-5)
+
+    rows = np.array([5, 250, 17])
+    assert np.allclose(store.scores(query, rows), expected[rows], atol=1e-5)
+    assert np.allclose(store.scores(query), vectors @ query, atol=0.02)
+
+
+def test_int8_uses_quarter_of_float32_memory():
+    vectors = unit_vectors(1000, 128)
+    int8_store = QuantizedVectors.from_vectors(vectors, "int8")
+    float32_store = QuantizedVectors.from_vectors(vectors, "float32")
+    assert int8_store.nbytes < float32_store.nbytes * 0.27
+
+
+def test_append_grows_capacity_and_keeps_rows():
+    store = QuantizedVectors(8, "int8", keep_exact=True)
+    first, second = unit_vectors(10, 8), unit_vectors(20, 8, seed=2)
+    assert store.append(first) == 0
+    assert store.append(second) == 10
+    assert len(store) == 30 and store.capacity >= 30
+    assert np.allclose(store.rows(np.arange(10)), first, atol=0.01)
+    assert np.array_equal(store.exact[10:30], second)
+
+
+def test_from_arrays_restores_store():
+    vectors = unit_vectors(20, 8)
+    store = QuantizedVectors.from_vectors(vectors, "int8", keep_exact=True)
+    restored = QuantizedVectors.from_arrays(store.codes[:len(store)], store.scales[:len(store)], "int8",
+                                            exact=store.exact[:len(store)])
+    query = vectors[3]
+    assert restored.search(query, top_k=3, rescore=2) == store.search(query, top_k=3, rescore=2)
+
+
+def test_rescoring_recovers_exact_top_k():
+    vectors = unit_vectors(2000, 64)
+    store = QuantizedVectors.from_vectors(vectors, "int8", keep_exact=True)
+    recalls = []
+    for seed in range(10):
+        query = unit_vectors(1, 64, seed=100 + seed)[0]
+        exact = set(np.argsort(-(vectors @ query))[:10].tolist())
+        approx = {row for row, _ in store.search(query, top_k=10)}
+        rescored = store.search(query, top_k=10, rescore=4)
+        recalls.append(len(exact & approx) / 10)
+        assert {row for row, _ in rescored} == exact
+        # 重排后的分数为float32精确内积，且按降序排列
+        assert [score for _, score in rescored] == sorted((score for _, score in rescored), reverse=True)
+        assert rescored[0][1] == pytest.approx(float(vectors[rescored[0][0]] @ query), abs=1e-5)
+    assert np.mean(recalls) >= 0.9
@@ -0,0 +1,137 @@
+"""
+Rate Limiter Tests
+令牌桶限流：突发容量后按速率排队、token桶按实际用量修正、429时全体退让、共享SQLite额度和传输层接入
+"""
+
+import json
+import time
+import asyncio
+
+import httpx
+import pytest
+
+from src.rate_limiter import (RateLimiter, RateLimitedTransport, AsyncRateLimitedTransport, configure_rate_limiter,
+                              estimate_request_tokens, usage_from_body, limiter_key)
+
+KEY = limiter_key("https://llm.example/v1", "secret", "m")
+URL = "https://llm.example/v1/chat/completions"
+
+
+def test_burst_then_queue_at_refill_rate():
+    limiter = RateLimiter(rpm=60)
+    waits = [limiter.reserve(KEY) for _ in range(63)]
+    assert waits[:60] == [0.0] * 60
+    # 每秒补充一个请求额度，后到的调用方依次排在后面
+    assert waits[60:] == pytest.approx([1.0, 2.0, 3.0], abs=0.05)
+    assert limiter.stats()["waits"] == 3
+
+
+def test_token_bucket_and_usage_adjustment():
+    limiter = RateLimiter(tpm=600)
+    assert limiter.reserve(KEY, tokens=600) == 0.0
+    assert limiter.reserve(KEY, tokens=100) == pytest.approx(10.0, abs=0.05)
+    # 实际用量比估计少500，退还额度后不再需要等待
+    limiter.adjust(KEY, -500)
+    assert limiter.reserve(KEY, tokens=100) == pytest.approx(0.0, abs=0.05)
+
+
+def test_refund_never_exceeds_capacity():
+    limiter = RateLimiter(tpm=600)
+    limiter.adjust(KEY, -10_000)
+    limiter.reserve(KEY, tokens=600)
+    assert limiter.reserve(KEY, tokens=60) == pytest.approx(6.0, abs=0.05)
+
+
+def test_penalize_makes_everyone_back_off():
+    limiter = RateLimiter(rpm=120)
+    limiter.penalize(KEY, retry_after=2.0)
+    assert limiter.reserve(KEY) == pytest.approx(2.5, abs=0.05)
+    assert limiter.stats()["throttled"] == 1
+
+
+def test_overrides_and_disabled_limits():
+    limiter = RateLimiter(rpm=60, overrides={"https://embed.example": (0, 0)})
+    embed_key = limiter_key("https://embed.example/v1", "k", "e")
+    assert limiter.limits(embed_key) == (0, 0)
+    assert all(limiter.reserve(embed_key) == 0.0 for _ in range(100))
+    assert configure_rate_limiter() is None
+    assert configure_rate_limiter(rpm=10) is not None
+    configure_rate_limiter()
+
+
+def test_shared_buckets_span_limiters(tmp_path):
+    path = str(tmp_path / "limits.db")
+    first, second = RateLimiter(rpm=60, shared_path=path), RateLimiter(rpm=60, shared_path=path)
+    for _ in range(30):
+        first.reserve(KEY)
+        second.reserve(KEY)
+    # SQLite事务较慢，期间补充的额度使等待时间略短
+    assert first.reserve(KEY) == pytest.approx(1.0, abs=0.3)
+    second.penalize(KEY, retry_after=5.0)
+    assert first.reserve(KEY) == pytest.approx(6.0, abs=0.3)
+
+
+def test_shared_async_acquire_does_not_block_loop(tmp_path):
+    limiter = RateLimiter(rpm=6000, shared_path=str(tmp_path / "limits.db"))
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.ensure_future(ticker())
+        await asyncio.gather(*(limiter.aacquire(KEY) for _ in range(20)))
+        await asyncio.sleep(0.02)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) > 1
+
+
+def test_request_estimates_and_usage_parsing():
+    chat = {"messages": [{"role": "user", "content": "你好"}], "max_tokens": 100}
+    assert estimate_request_tokens(chat) == 103
+    assert estimate_request_tokens({"input": [{"text": "你好世界"}]}) == 5
+    assert usage_from_body(json.dumps({"usage": {"total_tokens": 42}}).encode()) == 42
+    stream = b'data: {"choices": []}\n\ndata: {"choices": [], "usage": {"total_tokens": 7}}\n\ndata: [DONE]\n\n'
+    assert usage_from_body(stream) == 7
+    assert usage_from_body(b"data: [DONE]\n\n") is None
+
+
+def test_transport_reserves_adjusts_and_backs_off():
+    limiter = RateLimiter(rpm=60, tpm=6_000)
+    responses = iter([
+        httpx.Response(200, json={"usage": {"total_tokens": 10}}),
+        httpx.Response(429, headers={"retry-after": "3"}),
+    ])
+    transport = RateLimitedTransport(limiter, "https://llm.example/v1", "secret",
+                                     httpx.MockTransport(lambda request: next(responses)))
+    with httpx.Client(transport=transport) as client:
+        body = {"model": "m", "messages": [{"role": "user", "content": "hi"}], "max_tokens": 1000}
+        client.post(URL, json=body)
+        # 第一次请求估计约1000个token，按实际用量10修正后token桶几乎是满的
+        assert limiter.reserve(KEY, tokens=5_980) == pytest.approx(0.0, abs=0.05)
+        limiter.adjust(KEY, -5_980)
+        client.post(URL, json=body)
+    assert limiter.stats()["throttled"] == 1
+    # 429后请求桶被压到 -3，再申请一次需等待约4秒
+    assert limiter.reserve(KEY) == pytest.approx(4.0, abs=0.1)
+
+
+def test_async_transport_penalizes():
+    limiter = RateLimiter(rpm=60)
+    transport = AsyncRateLimitedTransport(limiter, "https://llm.example/v1", "secret",
+                                          httpx.MockTransport(lambda request: httpx.Response(429)))
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            return await client.post(URL, json={"model": "m", "messages": []})
+
+    assert asyncio.run(run()).status_code == 429
+    assert limiter.stats()["throttled"] == 1
+    started = time.time()
+    assert limiter.reserve(KEY) > 0.9 and time.time() - started < 0.5
@@ -0,0 +1,94 @@
+"""
+Result Cache Tests
+语义结果缓存：近重复命中、按Hub隔离、TTL过期和占位输出不缓存
+"""
+
+import time
+
+import numpy as np
+
+from src.result_cache import ResultCache, HyperplaneLSH
+from src.agent_hub import EMPTY_OUTPUT_PLACEHOLDER, PARTIAL_OUTPUT_SUFFIX
+from tests.conftest import FakeEmbeddingService
+
+
+def near(vector, noise=0.01, seed=1):
+    rng = np.random.default_rng(seed)
+    return vector + noise * rng.standard_normal(vector.shape[0])
+
+
+def test_near_duplicate_prompt_hits():
+    base = np.ones(16, dtype=np.float32)
+    service = FakeEmbeddingService(vectors={"写一份报告": base, "请写一份报告": near(base)})
+    cache = ResultCache(service, threshold=0.95)
+
+    assert cache.store("h0", "写一份报告", "结果")
+    hit = cache.lookup("h0", "请写一份报告")
+    assert hit is not None
+    assert hit[0] == "结果" and hit[1] > 0.95
+    assert cache.stats()["hits"] == 1
+
+
+def test_dissimilar_prompt_and_other_hub_miss():
+    service = FakeEmbeddingService()
+    cache = ResultCache(service, threshold=0.95)
+    cache.store("h0", "写一份报告", "结果")
+
+    assert cache.lookup("h0", "分析这段代码") is None
+    assert cache.lookup("h1", "写一份报告") is None
+
+
+def test_entries_expire_after_ttl():
+    service = FakeEmbeddingService()
+    cache = ResultCache(service, ttl=3600)
+    cache.store("h0", "prompt", "fresh", ttl=0.05)
+    assert cache.lookup("h0", "prompt")[0] == "fresh"
+    time.sleep(0.06)
+    assert cache.lookup("h0", "prompt") is None
+
+
+def test_max_entries_evicts_oldest():
+    service = FakeEmbeddingService()
+    cache = ResultCache(service, max_entries_per_hub=2)
+    for prompt in ("p1", "p2", "p3"):
+        cache.store("h0", prompt, prompt.upper())
+    assert cache.stats()["entries"] == 2
+    assert cache.lookup("h0", "p1") is None
+    assert cache.lookup("h0", "p3")[0] == "P3"
+
+
+def test_lsh_returns_identical_vector_as_candidate():
+    rng = np.random.default_rng(0)
+    index = HyperplaneLSH(dim=32)
+    vectors = rng.standard_normal((50, 32))
+    for item_id, vector in enumerate(vectors):
+        index.add(item_id, vector)
+    assert 7 in index.candidates(vectors[7])
+    index.remove(7, vectors[7])
+    assert 7 not in index.candidates(vectors[7])
+
+
+def test_exchange_skips_placeholder_and_partial_output(make_exchange):
+    cache = ResultCache(FakeEmbeddingService())
+    aex = make_exchange(result_cache=cache)
+    hub = aex.get_hub("h0")
+
+    aex.store_result(hub, "p1", EMPTY_OUTPUT_PLACEHOLDER)
+    aex.store_result(hub, "p2", "部分" + PARTIAL_OUTPUT_SUFFIX)
+    assert cache.stats()["entries"] == 0
+
+    aex.store_result(hub, "p3", "完整结果")
+    assert aex.lookup_cached_result(hub, "p3")[0] == "完整结果"
+
+
+def test_exchange_uses_hub_cache_ttl(make_exchange):
+    configs = [{"hub_id": "h0", "name": "Hub 0", "description": "d", "capabilities": ["a"],
+                "hub_class": "FakeHub", "cache_ttl": 0.05}]
+    cache = ResultCache(FakeEmbeddingService(), ttl=3600)
+    aex = make_exchange(configs, result_cache=cache)
+    hub = aex.get_hub("h0")
+
+    aex.store_result(hub, "prompt", "结果")
+    assert aex.lookup_cached_result(hub, "prompt") is not None
+    time.sleep(0.06)
+    assert aex.lookup_cached_result(hub, "prompt") is None
@@ -0,0 +1,107 @@
+"""
+Routing Pool Tests
+多进程路由：共享目录的打分与 AgentExchange 一致，工作池结果与进程内一致，服务端对池结果做熔断过滤
+"""
+
+import numpy as np
+import pytest
+
+from src.routing_pool import SharedCatalog, RoutingPool
+from src.server import AEXServer
+from tests.conftest import FakeEmbeddingService
+
+
+def unit(index: int, dim: int = 8) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[index] = 1.0
+    return vector
+
+
+CAPABILITY_VECTORS = {"a": unit(0), "c0": unit(1), "c1": unit(2), "c2": unit(3)}
+
+
+@pytest.fixture
+def catalog_path(tmp_path, make_exchange):
+    aex = make_exchange(count=3)
+    hubs = [(hub.hub_id, hub.capabilities) for hub in aex.available_hubs]
+    return SharedCatalog.write(str(tmp_path / "routing"), CAPABILITY_VECTORS, hubs), aex
+
+
+def test_write_is_content_addressed(tmp_path):
+    hubs = [("h0", ["a"])]
+    first = SharedCatalog.write(str(tmp_path), CAPABILITY_VECTORS, hubs)
+    assert SharedCatalog.write(str(tmp_path), CAPABILITY_VECTORS, hubs) == first
+    assert SharedCatalog.write(str(tmp_path), CAPABILITY_VECTORS, [("h1", ["a"])]) != first
+
+
+def test_catalog_scores_match_exchange(catalog_path):
+    path, aex = catalog_path
+    catalog = SharedCatalog(path)
+    query = unit(0) + unit(2)
+    result = catalog.route(query, threshold=0.5)
+
+    assert sorted(result.required_capabilities) == ["a", "c1"]
+    for hub_id, score in result.hub_scores:
+        expected = aex.calculate_hub_score(aex.get_hub(hub_id), result.required_capabilities)
+        assert score == pytest.approx(expected)
+    assert result.hub_scores[0][0] == "h1"
+
+
+def test_catalog_rejects_mismatched_dimension(catalog_path):
+    catalog = SharedCatalog(catalog_path[0])
+    assert catalog.route(np.ones(3)).capabilities == []
+
+
+def test_pool_matches_in_process_routing(catalog_path):
+    path, _ = catalog_path
+    catalog = SharedCatalog(path)
+    queries = [unit(i % 4) + 0.5 * unit((i + 1) % 4) for i in range(10)]
+    pool = RoutingPool(path, num_workers=2, threshold=0.3)
+    try:
+        results = pool.route_batch(queries)
+    finally:
+        pool.close()
+    assert pool.routed == len(queries)
+    expected = [catalog.route(query, threshold=0.3) for query in queries]
+    assert [result.to_dict() for result in results] == [result.to_dict() for result in expected]
+
+
+def test_pool_returns_all_candidates_unless_limited(catalog_path):
+    path, aex = catalog_path
+    query = unit(0)
+    pool = RoutingPool(path, num_workers=1, threshold=0.5)
+    try:
+        unlimited = pool.route(query)
+        limited = pool.route(query, top_k=1)
+    finally:
+        pool.close()
+    assert len(unlimited.hub_scores) == len(aex.available_hubs)
+    assert limited.hub_scores == unlimited.hub_scores[:1]
+
+
+class StubMapper:
+    use_hybrid_search = False
+
+
+class StubPlatform:
+    use_semantic_search = True
+
+    def __init__(self):
+        self.capability_mapper = StubMapper()
+        self.embedding_service = FakeEmbeddingService(vectors={"任务": unit(0) + unit(2)})
+
+
+def test_server_pool_route_skips_open_hubs(catalog_path):
+    path, aex = catalog_path
+    pool = RoutingPool(path, num_workers=1, threshold=0.5)
+    try:
+        server = AEXServer(StubPlatform(), aex, routing_pool=pool)
+        for _ in range(aex.health.failure_threshold):
+            aex.health.record_failure("h1", "down")
+        task_request, hub_scores = server.route({"prompt": "任务", "timeout": 5})
+    finally:
+        pool.close()
+    assert sorted(task_request.required_capabilities) == ["a", "c1"]
+    assert task_request.deadline is not None
+    assert "h1" not in [hub.hub_id for hub, _ in hub_scores]
+    assert hub_scores
@@ -0,0 +1,118 @@
+"""
+Fair Scheduler Tests
+多租户公平调度：竞争时按3:1份额分配槽位、租户内按优先级份额出队、单租户用满槽位、取消等待归还名额
+"""
+
+import asyncio
+import threading
+
+import pytest
+
+from src.scheduler import FairScheduler, parse_shares
+from src.usp import TaskRequest
+
+
+def request(tenant: str, priority: str = "normal") -> TaskRequest:
+    return TaskRequest("任务", ["a"], tenant=tenant, priority=priority)
+
+
+def grant_order(scheduler: FairScheduler, requests) -> list:
+    """占住全部槽位后提交 requests，再逐个释放，返回获得槽位的顺序"""
+    order = []
+
+    async def run():
+        blocker = asyncio.Event()
+
+        async def hold():
+            async with scheduler.aslot(request("blocker")):
+                await blocker.wait()
+
+        async def job(task_request):
+            async with scheduler.aslot(task_request):
+                order.append((task_request.tenant, task_request.priority))
+                await asyncio.sleep(0)
+
+        holders = [asyncio.ensure_future(hold()) for _ in range(scheduler.max_concurrent)]
+        await asyncio.sleep(0)
+        jobs = [asyncio.ensure_future(job(task_request)) for task_request in requests]
+        await asyncio.sleep(0)
+        blocker.set()
+        await asyncio.gather(*holders, *jobs)
+
+    asyncio.run(run())
+    return order
+
+
+def test_contending_tenants_get_three_to_one_shares():
+    scheduler = FairScheduler(max_concurrent=1, tenant_shares={"alice": 3, "bob": 1})
+    order = grant_order(scheduler, [request("alice") for _ in range(40)] + [request("bob") for _ in range(40)])
+    first = [tenant for tenant, _ in order[:40]]
+    assert first.count("alice") == 30 and first.count("bob") == 10
+    # 份额大的租户积压耗尽后，剩余槽位全部给另一个租户
+    assert [tenant for tenant, _ in order[-20:]] == ["bob"] * 20
+
+
+def test_priorities_share_within_tenant_without_starvation():
+    scheduler = FairScheduler(max_concurrent=1)
+    requests = [request("t", priority) for priority in ("high", "normal", "low") for _ in range(14)]
+    order = [priority for _, priority in grant_order(scheduler, requests)[:14]]
+    assert (order.count("high"), order.count("normal"), order.count("low")) == (8, 4, 2)
+
+
+def test_single_tenant_uses_all_slots():
+    scheduler = FairScheduler(max_concurrent=3, tenant_shares={"alice": 3, "bob": 1})
+    entered, release = threading.Barrier(4), threading.Event()
+
+    def job():
+        with scheduler.slot(request("bob")):
+            entered.wait(timeout=5)
+            release.wait(timeout=5)
+
+    threads = [threading.Thread(target=job) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    entered.wait(timeout=5)
+    assert scheduler.stats()["running"] == 3
+    release.set()
+    for thread in threads:
+        thread.join()
+    stats = scheduler.stats()["tenants"]["bob"]
+    assert stats["completed"] == 3 and stats["queue_depth"] == 0
+
+
+def test_idle_tenant_does_not_bank_credit():
+    scheduler = FairScheduler(max_concurrent=1)
+    grant_order(scheduler, [request("alice") for _ in range(20)])
+    # bob 之前一直空闲，加入后与 alice 交替出队，而不是连续占用20个槽位
+    order = [tenant for tenant, _ in grant_order(scheduler, [request("alice") for _ in range(6)]
+                                                 + [request("bob") for _ in range(6)])]
+    assert order[:6].count("bob") == 3
+
+
+def test_cancelled_wait_leaves_queue():
+    scheduler = FairScheduler(max_concurrent=1)
+
+    async def run():
+        async with scheduler.aslot(request("alice")):
+            waiter = asyncio.ensure_future(scheduler.aslot(request("bob")).__aenter__())
+            await asyncio.sleep(0)
+            assert scheduler.stats()["queued"] == 1
+            waiter.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiter
+        return scheduler.stats()
+
+    stats = asyncio.run(run())
+    assert stats["queued"] == 0 and stats["running"] == 0
+    assert stats["tenants"]["bob"]["abandoned"] == 1
+
+
+def test_parse_shares_and_priority_validation():
+    assert parse_shares("alice=3, bob=1.5") == {"alice": 3.0, "bob": 1.5}
+    assert parse_shares("") == {}
+    for spec in ("alice", "alice=0", "=2"):
+        with pytest.raises(ValueError):
+            parse_shares(spec)
+    with pytest.raises(ValueError):
+        with FairScheduler().slot(request("t", "urgent")):
+            pass
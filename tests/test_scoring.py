@@ -0,0 +1,105 @@
+"""
+Scoring Tests
+负载感知打分：延迟、在途任务和错误率对同等能力Hub排名的影响，以及运行统计
+"""
+
+import threading
+import time
+
+import pytest
+
+from src.hub_stats import HubStats, HubStatsRegistry
+from src.scoring import LoadAwareScoringPolicy, CapabilityScoringPolicy, get_scoring_policy
+from src.usp import TaskRequest
+
+
+def stats(latency=None, in_flight=0, error_rate=0.0) -> HubStats:
+    hub_stats = HubStats("h")
+    hub_stats.ewma_latency = latency
+    hub_stats.in_flight = in_flight
+    hub_stats.error_rate = error_rate
+    return hub_stats
+
+
+def test_load_aware_prefers_fast_idle_healthy_hubs():
+    policy = LoadAwareScoringPolicy()
+    base = policy.score(None, ["a"], 1.0, stats(latency=5.0))
+    assert policy.score(None, ["a"], 1.0, stats(latency=60.0)) < base
+    assert policy.score(None, ["a"], 1.0, stats(latency=5.0, in_flight=3)) < base
+    assert policy.score(None, ["a"], 1.0, stats(latency=5.0, error_rate=0.5)) < base
+    # 能力不匹配的Hub不会因为健康而得分
+    assert policy.score(None, ["a"], 0.0, stats(latency=1.0)) == 0.0
+
+
+def test_policy_validation_and_lookup():
+    with pytest.raises(ValueError):
+        LoadAwareScoringPolicy(latency_weight=0.5, load_weight=0.5, error_weight=0.5)
+    assert isinstance(get_scoring_policy("capability"), CapabilityScoringPolicy)
+    with pytest.raises(ValueError):
+        get_scoring_policy("random")
+
+
+def test_stats_track_latency_errors_and_in_flight():
+    registry = HubStatsRegistry(alpha=0.5)
+    with registry.track("h0"):
+        assert registry.get("h0").in_flight == 1
+    with registry.track("h0") as outcome:
+        outcome["success"] = False
+    with pytest.raises(RuntimeError):
+        with registry.track("h0"):
+            raise RuntimeError("boom")
+
+    hub_stats = registry.get("h0")
+    assert hub_stats.in_flight == 0
+    assert hub_stats.completed == 3 and hub_stats.errors == 2
+    assert hub_stats.error_rate == pytest.approx(0.75)
+
+    registry.start("h0")
+    registry.abandon("h0")
+    assert hub_stats.in_flight == 0 and hub_stats.completed == 3
+
+
+def test_latency_percentile_needs_samples():
+    hub_stats = HubStats("h")
+    for latency in (1, 2, 3, 4):
+        hub_stats.record(latency, True)
+    assert hub_stats.latency_percentile(95) is None
+    hub_stats.record(10, True)
+    assert hub_stats.latency_percentile(95) == 10
+    assert hub_stats.latency_percentile(50) == 3
+
+
+def test_exchange_ranks_equal_hubs_by_load(make_exchange):
+    aex = make_exchange(count=2, scoring_policy=LoadAwareScoringPolicy())
+    aex.hub_stats.get("h0").in_flight = 4
+    ranked = aex.rank_hubs(TaskRequest("任务", ["a"]))
+    assert [hub.hub_id for hub, _ in ranked] == ["h1", "h0"]
+
+
+
+def test_lock_waiters_count_as_in_flight(make_exchange):
+    aex = make_exchange(count=1)
+    holding, release = threading.Event(), threading.Event()
+
+    def hold():
+        with aex.track_execution("h0"):
+            holding.set()
+            release.wait()
+
+    def wait_for_lock():
+        with aex.track_execution("h0"):
+            pass
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    holding.wait()
+    waiter = threading.Thread(target=wait_for_lock)
+    waiter.start()
+    time.sleep(0.1)
+    assert aex.hub_stats.get("h0").in_flight == 2
+    release.set()
+    holder.join()
+    waiter.join()
+    stats = aex.hub_stats.get("h0")
+    # 等锁时间计入延迟
+    assert stats.in_flight == 0 and min(stats.recent_latencies) >= 0.1
@@ -0,0 +1,151 @@
+"""
+Server Tests
+HTTP服务：路由、NDJSON事件流、参数校验、熔断时的503、同一Hub的串行执行和客户端断开后的槽位释放
+"""
+
+import json
+import asyncio
+
+import httpx
+import pytest
+
+from src.server import AEXServer
+from src.usp import TaskRequest
+from tests.conftest import FakeHub
+
+
+class StubPlatform:
+    """不做能力解析的USP：所有任务都需要能力 "a" """
+
+    use_semantic_search = False
+
+    def create_task_request(self, prompt, timeout=None, **scheduling):
+        return TaskRequest(prompt, ["a"], timeout=timeout, **scheduling)
+
+
+async def request(server: AEXServer, method: str, path: str, payload=None) -> httpx.Response:
+    listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+    port = listener.sockets[0].getsockname()[1]
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=10) as client:
+            return await client.request(method, path, json=payload)
+    finally:
+        listener.close()
+        await listener.wait_closed()
+
+
+def events(response: httpx.Response):
+    return [json.loads(line) for line in response.text.splitlines() if line]
+
+
+@pytest.fixture
+def server(make_exchange):
+    return AEXServer(StubPlatform(), make_exchange(count=3))
+
+
+def test_route_returns_ranking(server):
+    response = asyncio.run(request(server, "POST", "/route",
+                                   {"prompt": "任务", "required_capabilities": ["a", "c1"], "top_k": 2}))
+    assert response.status_code == 200
+    data = response.json()
+    assert data["hub"]["hub_id"] == "h1"
+    assert len(data["candidates"]) == 2
+
+
+@pytest.mark.parametrize("payload", [
+    {"prompt": "任务", "top_k": "3"},
+    {"prompt": "任务", "top_k": 0},
+    {"prompt": "任务", "timeout": "10"},
+    {"prompt": "任务", "priority": "urgent"},
+    {"prompt": ""},
+])
+def test_invalid_fields_return_400(server, payload):
+    response = asyncio.run(request(server, "POST", "/route", payload))
+    assert response.status_code == 400
+
+
+def test_unknown_path_and_wrong_method(server):
+    assert asyncio.run(request(server, "GET", "/nope")).status_code == 404
+    assert asyncio.run(request(server, "GET", "/route")).status_code == 405
+
+
+def test_all_hubs_open_returns_503(server):
+    for hub in server.aex.available_hubs:
+        for _ in range(server.aex.health.failure_threshold):
+            server.aex.health.record_failure(hub.hub_id, "down")
+    response = asyncio.run(request(server, "POST", "/route", {"prompt": "任务"}))
+    assert response.status_code == 503
+
+    response = asyncio.run(request(server, "POST", "/tasks", {"prompt": "任务"}))
+    assert events(response) == [{"type": "error", "status": 503, "message": "所有Hub均处于熔断状态"}]
+
+
+def test_task_streams_route_chunks_and_done(server):
+    response = asyncio.run(request(server, "POST", "/tasks",
+                                   {"prompt": "任务", "required_capabilities": ["c2"]}))
+    stream = events(response)
+    assert [event["type"] for event in stream] == ["route", "chunk", "chunk", "chunk", "done"]
+    assert stream[0]["hub"]["hub_id"] == "h2"
+    assert stream[-1]["result"] == "任务-0;任务-1;任务-2;"
+    assert stream[-1]["timed_out"] is False
+
+
+def test_task_timeout_reports_partial_output(server):
+    FakeHub.delay = 0.2
+    response = asyncio.run(request(server, "POST", "/tasks", {"prompt": "任务", "timeout": 0.3}))
+    done = events(response)[-1]
+    assert done["type"] == "done" and done["timed_out"] is True
+    assert done["result"] == "任务-0;"
+
+
+def test_concurrent_tasks_on_same_hub_are_serialized(server):
+    FakeHub.delay = 0.05
+
+    async def run_all():
+        return await asyncio.gather(*(
+            request(server, "POST", "/tasks", {"prompt": f"p{i}", "required_capabilities": ["c0"]})
+            for i in range(3)
+        ))
+
+    responses = asyncio.run(run_all())
+    assert all(events(response)[-1]["type"] == "done" for response in responses)
+    team = server.aex.hub_pool.get("h0").team
+    assert team.runs == 3 and team.max_active == 1
+
+
+def test_bool_hedge_delay_is_rejected(server):
+    response = asyncio.run(request(server, "POST", "/tasks", {"prompt": "任务", "hedge": True, "hedge_delay": True}))
+    assert events(response)[0]["status"] == 400
+
+
+def test_malformed_content_length_returns_400(server):
+    async def send_raw():
+        listener = await asyncio.start_server(server.handle_connection, "127.0.0.1", 0)
+        port = listener.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(b"POST /route HTTP/1.1\r\nHost: x\r\nContent-Length: abc\r\n\r\n")
+            await writer.drain()
+            status_line = await reader.readline()
+            writer.close()
+            return status_line
+        finally:
+            listener.close()
+            await listener.wait_closed()
+
+    assert asyncio.run(send_raw()).split()[1] == b"400"
+
+
+def test_disconnect_keeps_slot_until_execution_ends(server):
+    FakeHub.delay = 0.1
+
+    async def disconnect_mid_stream():
+        stream = server.task_events({"prompt": "任务", "required_capabilities": ["c0"]})
+        assert (await stream.__anext__())["type"] == "route"
+        assert (await stream.__anext__())["type"] == "chunk"
+        await stream.aclose()
+        running_after_disconnect = server.scheduler.stats()["running"]
+        await asyncio.sleep(0.5)
+        return running_after_disconnect, server.scheduler.stats()["running"]
+
+    assert asyncio.run(disconnect_mid_stream()) == (1, 0)
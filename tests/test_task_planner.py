@@ -0,0 +1,131 @@
+"""
+Task Planner Tests
+子任务DAG：拓扑分层与环检测、按连接词拆分依赖、独立子任务并发执行、上游结果注入和失败跳过
+"""
+
+import time
+import asyncio
+
+import pytest
+
+from src.task_planner import SubTask, TaskPlan, TaskPlanner, PlanExecutor
+from src.result_cache import ResultCache
+from src.usp import TaskRequest
+from tests.conftest import FakeEmbeddingService, FakeHub
+
+
+class StubHub:
+    def __init__(self, hub_id):
+        self.hub_id = hub_id
+
+
+class StubExchange:
+    """每个子任务按能力路由到同名Hub，执行耗时 delay 秒；fail 中的能力返回None"""
+
+    def __init__(self, delay=0.1, fail=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.prompts = {}
+
+    def rank_hubs(self, task_request):
+        return [(StubHub(task_request.required_capabilities[0]), 1.0)]
+
+    async def arun_member(self, hub, prompt, task_request):
+        self.prompts[hub.hub_id] = prompt
+        await asyncio.sleep(self.delay)
+        return None if hub.hub_id in self.fail else f"{hub.hub_id}-out"
+
+
+def diamond() -> TaskPlan:
+    return TaskPlan("整体", [
+        SubTask("t1", "调研", ["research"]),
+        SubTask("t2", "分析", ["analysis"]),
+        SubTask("t3", "写作", ["writing"], depends_on=["t1", "t2"]),
+    ])
+
+
+def test_levels_and_sinks():
+    plan = diamond()
+    assert [[s.task_id for s in level] for level in plan.levels()] == [["t1", "t2"], ["t3"]]
+    assert [s.task_id for s in plan.sinks()] == ["t3"]
+    for subtask, latency in zip(plan.subtasks, (1.0, 3.0, 2.0)):
+        subtask.latency = latency
+    assert plan.critical_path_latency() == 5.0
+
+
+def test_invalid_plans_are_rejected():
+    with pytest.raises(ValueError):
+        TaskPlan("x", [SubTask("t1", "a", [], depends_on=["t9"])])
+    with pytest.raises(ValueError):
+        TaskPlan("x", [SubTask("t1", "a", [], depends_on=["t2"]), SubTask("t2", "b", [], depends_on=["t1"])])
+
+
+def test_planner_links_sequential_clauses_to_branch_ends():
+    planner = TaskPlanner(lambda clause: ["writing"] if "报告" in clause else ["research"])
+    plan = planner.plan(TaskRequest("调研国内市场，同时调研海外市场，然后基于调研结果撰写报告", ["general"]))
+    assert [s.depends_on for s in plan.subtasks] == [[], [], ["t1", "t2"]]
+    assert plan.subtasks[2].required_capabilities == ["writing"]
+
+
+def test_planner_splits_before_output_connectives():
+    planner = TaskPlanner(lambda clause: ["writing"] if "报告" in clause else ["research"])
+    plan = planner.plan(TaskRequest("调研2025年AI Agent的发展趋势并生成一份总结报告", ["general"]))
+    assert [s.prompt for s in plan.subtasks] == ["调研2025年AI Agent的发展趋势", "并生成一份总结报告"]
+    assert [s.depends_on for s in plan.subtasks] == [[], ["t1"]]
+
+
+@pytest.mark.parametrize("clause, sequential", [
+    ("then write the docs", True),
+    ("review the code based on the spec", True),
+    ("fix the authentication flow", False),
+    ("also check the tests", False),
+    ("再写一份报告", True),
+    ("调研再生能源市场", False),
+    ("再生能源市场调研", False),
+])
+def test_sequential_markers_match_whole_words(clause, sequential):
+    assert TaskPlanner.is_sequential(clause) is sequential
+
+
+def test_planner_keeps_single_clause_and_caps_subtasks():
+    planner = TaskPlanner(lambda clause: [], max_subtasks=3)
+    single = planner.plan(TaskRequest("写一首诗", ["writing"]))
+    assert len(single) == 1 and single.subtasks[0].required_capabilities == ["writing"]
+
+    clauses = planner.split_clauses("第一件事情；第二件事情；第三件事情；第四件事情；好")
+    assert len(clauses) == 3 and clauses[-1] == "第三件事情，第四件事情好"
+
+
+def test_independent_subtasks_run_concurrently_and_feed_downstream():
+    exchange = StubExchange(delay=0.1)
+    plan = diamond()
+    started = time.perf_counter()
+    result = asyncio.run(PlanExecutor(exchange).execute(plan, TaskRequest("整体", ["research"])))
+    assert result == "writing-out"
+    # 关键路径为两层，约0.2秒，而串行需要0.3秒
+    assert time.perf_counter() - started < 0.28
+    assert "research-out" in exchange.prompts["writing"] and "analysis-out" in exchange.prompts["writing"]
+
+
+def test_failed_upstream_skips_dependents():
+    exchange = StubExchange(delay=0.01, fail={"research"})
+    plan = TaskPlan("整体", diamond().subtasks + [SubTask("t4", "审校", ["review"], depends_on=["t3"]),
+                                                SubTask("t5", "配图", ["design"])])
+    result = asyncio.run(PlanExecutor(exchange).execute(plan, TaskRequest("整体", ["research"])))
+    assert [s.status for s in plan.subtasks] == ["failed", "done", "skipped", "skipped", "done"]
+    assert "writing" not in exchange.prompts
+    assert result == "design-out"
+
+
+def test_exchange_plan_results_are_cached_under_best_hub(make_exchange):
+    aex = make_exchange(count=2, result_cache=ResultCache(FakeEmbeddingService()))
+    plan = TaskPlan("整体", [SubTask("t1", "甲", ["c0"]), SubTask("t2", "乙", ["c1"])])
+    request = TaskRequest("整体", ["a"])
+    result = aex.execute_task_plan(plan, request)
+    assert result.startswith("## 甲") and "## 乙" in result
+
+    best_hub = aex.rank_hubs(request)[0][0]
+    assert aex.lookup_cached_result(best_hub, "整体")[0] == result
+    FakeHub.fail = True
+    fresh_plan = TaskPlan("整体", [SubTask("t1", "甲", ["c0"]), SubTask("t2", "乙", ["c1"])])
+    assert aex.execute_task_plan(fresh_plan, request) == result
@@ -0,0 +1,182 @@
+"""
+Task Queue Tests
+持久化任务队列：租约、过期重投、重试退避、背压、工作进程的确认（部分输出按失败重试）、租用时起算的截止时间，以及按租户和优先级份额租用
+"""
+
+import json
+import time
+import sqlite3
+
+import pytest
+
+from src.task_queue import TaskQueue, QueueWorker, QueueFullError
+from src.agent_hub import PARTIAL_OUTPUT_SUFFIX
+from src.usp import TaskRequest
+
+
+def make_request(prompt: str = "任务", **kwargs) -> TaskRequest:
+    return TaskRequest(prompt, ["a"], **kwargs)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), retry_backoff=0.05)
+    yield queue
+    queue.close()
+
+
+def test_lease_and_ack(queue):
+    task_id = queue.enqueue(make_request("p1"))
+    task = queue.lease("w1")
+    assert task.task_id == task_id and task.attempts == 1
+    assert task.task_request.original_prompt == "p1"
+    assert queue.lease("w2") is None
+
+    assert queue.ack(task, "done")
+    record = queue.get(task_id)
+    assert record["status"] == "done" and record["result"] == "done"
+
+
+def test_expired_lease_is_redelivered(queue):
+    task_id = queue.enqueue(make_request())
+    first = queue.lease("w1", visibility_timeout=0.05)
+    time.sleep(0.06)
+
+    second = queue.lease("w2", visibility_timeout=60)
+    assert second.task_id == task_id and second.attempts == 2
+    # 原工作进程的租约已被接管，续租和确认都失败
+    assert not queue.extend_lease(first)
+    assert not queue.ack(first, "late")
+    assert queue.ack(second, "ok")
+
+
+def test_expired_lease_fails_after_max_attempts(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), max_attempts=1)
+    task_id = queue.enqueue(make_request())
+    queue.lease("w1", visibility_timeout=0.01)
+    time.sleep(0.02)
+    assert queue.lease("w2") is None
+    assert queue.get(task_id)["status"] == "failed"
+
+
+def test_nack_retries_with_backoff_then_fails(queue):
+    task_id = queue.enqueue(make_request(), max_attempts=2)
+    queue.nack(queue.lease("w1"), "boom")
+    assert queue.get(task_id)["status"] == "pending"
+    assert queue.lease("w1") is None
+    time.sleep(0.06)
+
+    task = queue.lease("w1")
+    assert task.attempts == 2
+    queue.nack(task, "boom again")
+    record = queue.get(task_id)
+    assert record["status"] == "failed" and record["error"] == "boom again"
+
+
+def test_backpressure(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), max_pending=2)
+    queue.enqueue(make_request())
+    queue.enqueue(make_request())
+    with pytest.raises(QueueFullError):
+        queue.enqueue(make_request())
+
+
+def test_queue_survives_reopen(tmp_path):
+    path = str(tmp_path / "queue.db")
+    TaskQueue(path).enqueue(make_request("persisted", tenant="alice", priority="high"))
+    task = TaskQueue(path).lease("w1")
+    assert task.task_request.original_prompt == "persisted"
+    assert task.task_request.tenant == "alice" and task.task_request.priority == "high"
+
+
+class StubExchange:
+    def __init__(self, results):
+        self.results = list(results)
+
+    def execute_task(self, task_request):
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+def test_worker_acks_and_nacks(queue):
+    ok_id = queue.enqueue(make_request("ok"))
+    failed_id = queue.enqueue(make_request("fail"), max_attempts=1)
+    worker = QueueWorker(queue, StubExchange(["结果", RuntimeError("boom")]), worker_id="w1",
+                         poll_interval=0.01)
+    worker.run(max_tasks=2)
+
+    assert (worker.processed, worker.failed) == (1, 1)
+    assert queue.get(ok_id)["result"] == "结果"
+    assert queue.get(failed_id)["error"] == "boom"
+    stats = queue.stats()
+    assert stats["done"] == 1 and stats["failed"] == 1 and stats["pending"] == 0
+
+
+def test_worker_retries_partial_output(queue):
+    task_id = queue.enqueue(make_request(), max_attempts=2)
+    worker = QueueWorker(queue, StubExchange(["部分" + PARTIAL_OUTPUT_SUFFIX, "完整结果"]),
+                         worker_id="w1", poll_interval=0.01)
+    assert worker.process_one()
+    task = queue.get(task_id)
+    assert task["status"] == "pending" and task["result"] is None
+    time.sleep(0.06)
+    worker.run(max_tasks=2)
+    assert queue.get(task_id)["result"] == "完整结果"
+
+
+def test_deadline_starts_at_lease_time(queue):
+    queue.enqueue(make_request(timeout=0.2))
+    time.sleep(0.3)
+    leased = queue.lease("w1")
+    assert leased.task_request.timeout == 0.2
+    assert leased.task_request.remaining_time() == pytest.approx(0.2, abs=0.05)
+
+
+def test_lease_follows_tenant_and_priority_shares(tmp_path):
+    queue = TaskQueue(str(tmp_path / "queue.db"), tenant_shares={"alice": 3, "bob": 1})
+    for tenant in ("alice", "bob"):
+        for i in range(40):
+            queue.enqueue(make_request(f"{tenant}-{i}", tenant=tenant, priority="high" if i % 2 else "low"))
+
+    leased = [queue.lease("w1").task_request for _ in range(40)]
+    tenants = [task_request.tenant for task_request in leased]
+    assert tenants.count("alice") == 30 and tenants.count("bob") == 10
+    # 同一租户内 high:low 按 4:1 出队
+    alice = [task_request.priority for task_request in leased if task_request.tenant == "alice"][:25]
+    assert (alice.count("high"), alice.count("low")) == (20, 5)
+    # 同一租户同一优先级内先入先出
+    assert [t.original_prompt for t in leased if t.tenant == "bob" and t.priority == "high"][:2] == ["bob-1", "bob-3"]
+
+
+def test_lease_progress_is_shared_between_workers(tmp_path):
+    path = str(tmp_path / "queue.db")
+    first = TaskQueue(path, tenant_shares={"alice": 3, "bob": 1})
+    second = TaskQueue(path, tenant_shares={"alice": 3, "bob": 1})
+    for tenant in ("alice", "bob"):
+        for _ in range(10):
+            first.enqueue(make_request(tenant=tenant))
+    tenants = [(first if i % 2 else second).lease(f"w{i % 2}").task_request.tenant for i in range(8)]
+    assert tenants.count("alice") == 6
+
+
+def test_old_database_is_migrated(tmp_path):
+    path = str(tmp_path / "queue.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE tasks (id INTEGER PRIMARY KEY AUTOINCREMENT, payload TEXT NOT NULL, "
+                 "status TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, max_attempts INTEGER NOT NULL, "
+                 "lease_owner TEXT, lease_expires_at REAL, available_at REAL NOT NULL, "
+                 "enqueued_at REAL NOT NULL, started_at REAL, finished_at REAL, result TEXT, error TEXT)")
+    payload = json.dumps(make_request("old", tenant="alice", priority="high").to_dict(), ensure_ascii=False)
+    conn.execute("INSERT INTO tasks (payload, status, max_attempts, available_at, enqueued_at) "
+                 "VALUES (?, 'pending', 3, 0, 0)", (payload,))
+    conn.commit()
+    conn.close()
+
+    queue = TaskQueue(path)
+    assert queue.get(1)["status"] == "pending"
+    task = queue.lease("w1")
+    assert task.task_request.original_prompt == "old" and task.task_request.tenant == "alice"
+    tenant, priority = queue._conn.execute("SELECT tenant, priority FROM tasks WHERE id = 1").fetchone()
+    assert (tenant, priority) == ("alice", "high")
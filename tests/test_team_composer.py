@@ -0,0 +1,117 @@
+"""
+Team Composer Tests
+团队组合：加权贪心集合覆盖、冗余成员删除、能力只分配一次，以及团队结果按成员集合缓存
+"""
+
+import math
+import random
+import itertools
+
+from src.aex import HubInfo
+from src.team_composer import TeamComposer
+from src.hub_stats import HubStatsRegistry
+from src.result_cache import ResultCache
+from src.usp import TaskRequest
+from tests.conftest import FakeEmbeddingService
+
+
+def hub(hub_id, capabilities, cost=1.0, timeout=None):
+    return HubInfo(hub_id, hub_id, hub_id, capabilities, "FakeHub", timeout=timeout, cost=cost)
+
+
+def team_configs(cache_ttls=(None, None)):
+    return [
+        {"hub_id": "writer", "name": "Writer", "description": "w", "capabilities": ["writing"],
+         "hub_class": "FakeHub", "cache_ttl": cache_ttls[0]},
+        {"hub_id": "coder", "name": "Coder", "description": "c", "capabilities": ["coding"],
+         "hub_class": "FakeHub", "cache_ttl": cache_ttls[1]},
+    ]
+
+
+def test_single_hub_covering_everything_wins():
+    hubs = [hub("a", ["x"]), hub("b", ["y"]), hub("all", ["x", "y", "z"])]
+    plan = TeamComposer().compose(hubs, ["x", "y", "z"])
+    assert [member.hub.hub_id for member in plan.members] == ["all"]
+    assert plan.is_complete
+
+
+def test_cost_outweighs_coverage():
+    hubs = [hub("cheap_x", ["x"], cost=1), hub("cheap_y", ["y"], cost=1), hub("costly", ["x", "y"], cost=10)]
+    plan = TeamComposer().compose(hubs, ["x", "y"])
+    assert sorted(member.hub.hub_id for member in plan.members) == ["cheap_x", "cheap_y"]
+
+
+def test_observed_latency_raises_weight():
+    stats = HubStatsRegistry()
+    stats.get("slow").ewma_latency = 300.0
+    composer = TeamComposer(reference_latency=30.0)
+    assert composer.hub_weight(hub("slow", ["x"]), stats) == 11.0
+    assert composer.hub_weight(hub("fresh", ["x"], timeout=60), stats) == 2.0
+    plan = composer.compose([hub("slow", ["x"]), hub("fast", ["x"])], ["x"], stats)
+    assert [member.hub.hub_id for member in plan.members] == ["fast"]
+
+
+def test_redundant_members_are_dropped_and_capabilities_assigned_once():
+    hubs = [hub("xy", ["x", "y"]), hub("yz", ["y", "z"]), hub("y", ["y"], cost=0.1)]
+    plan = TeamComposer().compose(hubs, ["x", "y", "z", "x"])
+    ids = [member.hub.hub_id for member in plan.members]
+    assert "y" not in ids and len(ids) == 2
+    assigned = [capability for member in plan.members for capability in member.capabilities]
+    assert sorted(assigned) == ["x", "y", "z"]
+
+
+def test_uncovered_and_member_limit():
+    hubs = [hub("a", ["x"]), hub("b", ["y"])]
+    plan = TeamComposer().compose(hubs, ["x", "y", "missing"])
+    assert plan.uncovered == ["missing"] and not plan.is_complete
+
+    limited = TeamComposer(max_members=1).compose(hubs, ["x", "y"])
+    assert len(limited.members) == 1 and len(limited.uncovered) == 1
+
+
+def test_greedy_within_log_bound_of_optimum():
+    rng = random.Random(3)
+    capabilities = [f"c{i}" for i in range(6)]
+    composer = TeamComposer()
+    for _ in range(30):
+        hubs = [hub(f"h{i}", rng.sample(capabilities, rng.randint(1, 3)), cost=rng.uniform(0.5, 3))
+                for i in range(7)]
+        plan = composer.compose(hubs, capabilities)
+        coverable = set().union(*(h.capabilities for h in hubs))
+        assert set(plan.uncovered) == set(capabilities) - coverable
+        if plan.uncovered:
+            continue
+        optimum = min(
+            sum(composer.hub_weight(h) for h in subset)
+            for size in range(1, len(hubs) + 1)
+            for subset in itertools.combinations(hubs, size)
+            if set().union(*(h.capabilities for h in subset)) >= set(capabilities)
+        )
+        harmonic = sum(1 / k for k in range(1, len(capabilities) + 1))
+        assert plan.total_weight <= optimum * harmonic + 1e-9
+        assert harmonic <= math.log(len(capabilities)) + 1
+
+
+def test_team_runs_members_in_parallel_and_caches_merged_result(make_exchange):
+    service = FakeEmbeddingService()
+    aex = make_exchange(team_configs(), result_cache=ResultCache(service))
+    request = TaskRequest("写代码并写文档", ["writing", "coding"])
+
+    merged = aex.execute_task_team(request)
+    assert "## Writer（writing）" in merged and "## Coder（coding）" in merged
+    writer, coder = aex.get_hub("writer"), aex.get_hub("coder")
+    assert aex.get_hub_instance(writer).team.runs == 1 and aex.get_hub_instance(coder).team.runs == 1
+
+    assert aex.execute_task_team(request) == merged
+    assert aex.get_hub_instance(writer).team.runs == 1
+    # 团队结果不会命中单个成员的缓存
+    assert aex.lookup_cached_result(writer, request.original_prompt) is None
+    assert aex.team_cache_key([coder, writer]) == aex.team_cache_key([writer, coder]) == "team:coder+writer"
+
+
+def test_team_result_uses_shortest_member_ttl(make_exchange):
+    aex = make_exchange(team_configs(cache_ttls=(3600, 5)), result_cache=ResultCache(FakeEmbeddingService()))
+    hubs = [aex.get_hub("writer"), aex.get_hub("coder")]
+    aex.store_team_result(hubs, "任务", "合并结果")
+    entry = next(iter(aex.result_cache._entries[aex.team_cache_key(hubs)].values()))
+    assert entry.expires_at - entry.created_at == 5
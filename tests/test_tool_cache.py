@@ -0,0 +1,144 @@
+"""
+Tool Cache Tests
+工具结果缓存：相同参数命中、TTL过期、异常不缓存、并发相同调用只执行一次、LRU淘汰和Toolkit包装
+"""
+
+import time
+import asyncio
+import threading
+
+import pytest
+
+from src.tool_cache import ToolResultCache
+
+
+class CountingTool:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = 0
+
+    def __call__(self, query, limit=5):
+        self.calls += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("tool failed")
+        return f"{query}:{limit}"
+
+
+def test_same_arguments_hit_and_different_arguments_miss():
+    cache = ToolResultCache()
+    tool = CountingTool()
+    assert cache.call("search", tool, "a", limit=3) == "a:3"
+    assert cache.call("search", tool, "a", limit=3) == "a:3"
+    assert cache.call("search", tool, "a", limit=4) == "a:4"
+    assert tool.calls == 2
+    stats = cache.stats()["tools"]["search"]
+    assert stats["calls"] == 3 and stats["hits"] == 1
+
+
+def test_entries_expire_and_errors_are_not_cached():
+    cache = ToolResultCache(ttl=0.05)
+    tool = CountingTool()
+    cache.call("search", tool, "a")
+    time.sleep(0.06)
+    cache.call("search", tool, "a")
+    assert tool.calls == 2
+
+    failing = CountingTool(fail=True)
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            cache.call("broken", failing, "a")
+    assert failing.calls == 2 and cache.stats()["tools"]["broken"]["errors"] == 2
+
+
+def test_concurrent_identical_calls_execute_once():
+    cache = ToolResultCache()
+    tool = CountingTool(delay=0.1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.call("search", tool, "a")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tool.calls == 1 and results == ["a:5"] * 8
+    stats = cache.stats()["tools"]["search"]
+    assert stats["deduplicated"] + stats["hits"] == 7 and stats["hit_rate"] == 1 - 1 / 8
+
+
+def test_in_flight_error_propagates_to_waiters():
+    cache = ToolResultCache()
+    tool = CountingTool(delay=0.1, fail=True)
+    errors = []
+
+    def call():
+        try:
+            cache.call("search", tool, "a")
+        except RuntimeError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert tool.calls == 1 and len(errors) == 4
+
+
+def test_async_calls_deduplicate():
+    cache = ToolResultCache()
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return url.upper()
+
+    async def run():
+        return await asyncio.gather(*(cache.acall("fetch", fetch, "u") for _ in range(5)))
+
+    assert asyncio.run(run()) == ["U"] * 5
+    assert calls == ["u"]
+
+
+def test_lru_eviction():
+    cache = ToolResultCache(max_entries=2)
+    tool = CountingTool()
+    cache.call("t", tool, "a")
+    cache.call("t", tool, "b")
+    cache.call("t", tool, "a")
+    cache.call("t", tool, "c")
+    assert cache.stats()["entries"] == 2
+    cache.call("t", tool, "a")
+    cache.call("t", tool, "b")
+    assert tool.calls == 4
+
+
+class Function:
+    def __init__(self, entrypoint):
+        self.entrypoint = entrypoint
+
+
+class Toolkit:
+    def __init__(self, tool):
+        self.name = "web"
+        self.functions = {"search": Function(tool)}
+
+
+def test_wrap_toolkit_keeps_signature_and_is_idempotent():
+    def search(query: str, limit: int = 5) -> str:
+        """搜索网页"""
+        return query
+
+    cache = ToolResultCache()
+    toolkit = cache.wrap_toolkit(Toolkit(search))
+    wrapped = toolkit.functions["search"].entrypoint
+    assert wrapped.__doc__ == "搜索网页" and wrapped.__wrapped__ is search
+    assert cache.wrap_toolkit(toolkit).functions["search"].entrypoint is wrapped
+    wrapped("q")
+    wrapped("q")
+    assert cache.stats()["tools"]["web.search"]["hits"] == 1
+
+    disabled = ToolResultCache(ttl=0).wrap_toolkit(Toolkit(search))
+    assert disabled.functions["search"].entrypoint is search